@@ -49,13 +49,54 @@ from .models import (
     Subscription,
     PaymentMethod,
     BillingHistory,
+    ReportSnapshot,
+    AccountMonthlyBalance,
+    SearchEntry,
+    ConsolidationGroup,
+    GroupAccount,
+    GroupAccountMapping,
+    CustomerBalance,
+    VendorBalance,
+    PaymentAllocation,
+    OutboundMessage,
+    ThreeWayMatch,
+    PaymentRun,
+    VendorPayment,
+    StockLevel,
+    CostLayer,
+    StatementJob,
 )
 
 
 class JournalEntryLineInline(admin.TabularInline):
     model = JournalEntryLine
     extra = 2
-    fields = ["account", "description", "debit_amount", "credit_amount"]
+    fields = [
+        "account",
+        "description",
+        "debit_amount",
+        "credit_amount",
+        "intercompany_company",
+    ]
+
+
+class StockLevelInline(admin.TabularInline):
+    model = StockLevel
+    extra = 0
+    fields = ["location", "quantity", "updated_at"]
+    readonly_fields = ["location", "quantity", "updated_at"]
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class PaymentAllocationInline(admin.TabularInline):
+    model = PaymentAllocation
+    extra = 0
+    fields = ["invoice", "amount", "created_at"]
+    readonly_fields = ["invoice", "amount", "created_at"]
+    can_delete = False
 
 
 class InvoiceLineInline(admin.TabularInline):
@@ -67,7 +108,7 @@ class InvoiceLineInline(admin.TabularInline):
 class BillLineInline(admin.TabularInline):
     model = BillLine
     extra = 1
-    fields = ["description", "quantity", "unit_price", "line_total"]
+    fields = ["description", "account", "quantity", "unit_price", "line_total"]
 
 
 class BudgetLineInline(admin.TabularInline):
@@ -146,6 +187,7 @@ class PaymentAdmin(admin.ModelAdmin):
     ]
     list_filter = ["payment_method", "payment_date"]
     search_fields = ["payment_number", "customer__company_name"]
+    inlines = [PaymentAllocationInline]
 
 
 @admin.register(Vendor)
@@ -473,15 +515,31 @@ class InventoryItemAdmin(admin.ModelAdmin):
     ]
     list_filter = ["category", "is_active"]
     search_fields = ["item_code", "name", "barcode"]
+    inlines = [StockLevelInline]
 
 
 @admin.register(InventoryTransaction)
 class InventoryTransactionAdmin(admin.ModelAdmin):
-    list_display = ["item", "transaction_type", "quantity", "created_at"]
+    list_display = [
+        "item",
+        "transaction_type",
+        "quantity",
+        "unit_cost",
+        "cost_amount",
+        "journal_entry",
+        "created_at",
+    ]
     list_filter = ["transaction_type", "created_at"]
     search_fields = ["item__item_code", "item__name"]
 
 
+@admin.register(CostLayer)
+class CostLayerAdmin(admin.ModelAdmin):
+    list_display = ["item", "received_at", "quantity", "remaining_quantity", "unit_cost"]
+    list_filter = ["received_at"]
+    search_fields = ["item__item_code", "item__name"]
+
+
 @admin.register(DashboardKPIMetric)
 class DashboardKPIMetricAdmin(admin.ModelAdmin):
     list_display = ["name", "display_name", "metric_type", "current_value", "is_active"]
@@ -563,3 +621,161 @@ class BillingHistoryAdmin(admin.ModelAdmin):
     ]
     list_filter = ["status", "billing_period_start"]
     search_fields = ["invoice_number", "subscription__user__username"]
+
+
+@admin.register(ReportSnapshot)
+class ReportSnapshotAdmin(admin.ModelAdmin):
+    list_display = [
+        "company",
+        "report_type",
+        "period_start",
+        "period_end",
+        "ledger_version",
+        "created_at",
+    ]
+    list_filter = ["report_type", "period_end"]
+    search_fields = ["company__name"]
+    readonly_fields = ["payload", "params_hash", "ledger_version"]
+
+
+@admin.register(AccountMonthlyBalance)
+class AccountMonthlyBalanceAdmin(admin.ModelAdmin):
+    list_display = ["company", "account", "month", "debit_total", "credit_total"]
+    list_filter = ["month"]
+    search_fields = ["company__name", "account__code", "account__name"]
+
+
+@admin.register(SearchEntry)
+class SearchEntryAdmin(admin.ModelAdmin):
+    list_display = ["company", "object_type", "code", "title", "status", "balance"]
+    list_filter = ["object_type", "status"]
+    search_fields = ["code", "title", "company__name"]
+
+
+class GroupAccountInline(admin.TabularInline):
+    model = GroupAccount
+    extra = 1
+    fields = ["code", "name", "account_type"]
+
+
+@admin.register(ConsolidationGroup)
+class ConsolidationGroupAdmin(admin.ModelAdmin):
+    list_display = ["name", "company", "created_at"]
+    search_fields = ["name", "company__name"]
+    filter_horizontal = ["members"]
+    inlines = [GroupAccountInline]
+
+
+@admin.register(GroupAccountMapping)
+class GroupAccountMappingAdmin(admin.ModelAdmin):
+    list_display = ["group", "account", "group_account"]
+    list_filter = ["group"]
+    search_fields = ["account__code", "account__name", "group_account__code"]
+
+
+@admin.register(CustomerBalance)
+class CustomerBalanceAdmin(admin.ModelAdmin):
+    list_display = [
+        "customer",
+        "company",
+        "outstanding",
+        "total_invoiced",
+        "total_paid",
+        "last_payment_date",
+    ]
+    search_fields = ["customer__customer_code", "customer__company_name"]
+
+
+@admin.register(VendorBalance)
+class VendorBalanceAdmin(admin.ModelAdmin):
+    list_display = [
+        "vendor",
+        "company",
+        "outstanding",
+        "total_invoiced",
+        "total_paid",
+        "last_payment_date",
+    ]
+    search_fields = ["vendor__vendor_code", "vendor__company_name"]
+
+
+@admin.register(StatementJob)
+class StatementJobAdmin(admin.ModelAdmin):
+    list_display = [
+        "company",
+        "period_start",
+        "period_end",
+        "status",
+        "done",
+        "total",
+        "emails",
+        "created_at",
+        "finished_at",
+    ]
+    list_filter = ["status"]
+    search_fields = ["company__name"]
+
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = [
+        "to_email",
+        "subject",
+        "kind",
+        "company",
+        "status",
+        "attempts",
+        "created_at",
+        "sent_at",
+    ]
+    list_filter = ["status", "kind"]
+    search_fields = ["to_email", "subject"]
+
+
+@admin.register(ThreeWayMatch)
+class ThreeWayMatchAdmin(admin.ModelAdmin):
+    list_display = [
+        "bill_line",
+        "po_line",
+        "status",
+        "billed_quantity",
+        "received_quantity",
+        "bill_unit_price",
+        "po_unit_price",
+        "matched_at",
+    ]
+    list_filter = ["status"]
+    search_fields = ["bill_line__bill__bill_number", "po_line__purchase_order__po_number"]
+
+
+@admin.register(PaymentRun)
+class PaymentRunAdmin(admin.ModelAdmin):
+    list_display = [
+        "run_number",
+        "company",
+        "status",
+        "payment_date",
+        "cutoff_date",
+        "bill_count",
+        "total_amount",
+        "total_discount",
+        "approved_at",
+    ]
+    list_filter = ["status", "payment_date"]
+    search_fields = ["run_number"]
+
+
+@admin.register(VendorPayment)
+class VendorPaymentAdmin(admin.ModelAdmin):
+    list_display = [
+        "payment_number",
+        "vendor",
+        "bank_account",
+        "payment_date",
+        "amount",
+        "discount_amount",
+        "journal_entry",
+    ]
+    list_filter = ["payment_date"]
+    search_fields = ["payment_number", "vendor__company_name"]
+
@@ -6,10 +6,5 @@ class AccountingConfig(AppConfig):
     name = "accounting"
 
     def ready(self):
-        """Import signals when app is ready"""
-        import accounting.signals  # noqajango.apps import AppConfig
-
-
-class AccountingConfig(AppConfig):
-    default_auto_field = "django.db.models.BigAutoField"
-    name = "accounting"
+        """Import payment signal handlers when app is ready"""
+        import accounting.payment_signals  # noqa
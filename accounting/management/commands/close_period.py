@@ -0,0 +1,93 @@
+"""
+Django management command to close an accounting period.
+Writes immutable Profit & Loss and Balance Sheet snapshots for the period so
+later requests are served without recomputing from journal lines.
+"""
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.models import ReportSnapshot
+from companies.models import Company
+
+
+class Command(BaseCommand):
+    help = 'Snapshot the financial statements of a closed period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='Company ID to close (defaults to all companies)',
+        )
+        parser.add_argument(
+            '--start',
+            help='Period start date (YYYY-MM-DD), defaults to the first day of last month',
+        )
+        parser.add_argument(
+            '--end',
+            help='Period end date (YYYY-MM-DD), defaults to the last day of last month',
+        )
+
+    def handle(self, *args, **options):
+        from dashboard.reports import FinancialReports
+        from dashboard.snapshots import is_closed_period, save_snapshot
+        from dashboard.utils import get_ledger_version
+
+        start_date, end_date = self._get_period(options)
+        if not is_closed_period(end_date):
+            raise CommandError(f'Period ending {end_date} is still open')
+
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+
+        closed = 0
+        for company in companies.iterator():
+            reports = FinancialReports(company, start_date, end_date)
+            ledger_version = get_ledger_version(company)
+            stored = save_snapshot(
+                company,
+                ReportSnapshot.ReportType.PROFIT_AND_LOSS,
+                start_date,
+                end_date,
+                reports._build_profit_and_loss(),
+                ledger_version,
+            )
+            stored &= save_snapshot(
+                company,
+                ReportSnapshot.ReportType.BALANCE_SHEET,
+                start_date,
+                end_date,
+                reports._build_balance_sheet(),
+                ledger_version,
+            )
+            if stored:
+                closed += 1
+            else:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f'{company.name}: ledger changed while closing, run again'
+                    )
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Closed {start_date} to {end_date} for {closed} companies'
+            )
+        )
+
+    def _get_period(self, options):
+        try:
+            if options['start'] and options['end']:
+                return (
+                    date.fromisoformat(options['start']),
+                    date.fromisoformat(options['end']),
+                )
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}')
+
+        first_of_month = date.today().replace(day=1)
+        end_date = first_of_month - timedelta(days=1)
+        return end_date.replace(day=1), end_date
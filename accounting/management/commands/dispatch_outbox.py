@@ -0,0 +1,82 @@
+"""
+Django management command to send queued outbox email.
+Claims due OutboundMessage rows in batches (SELECT ... FOR UPDATE SKIP LOCKED,
+so several dispatchers can run side by side), sends them over
+OUTBOX_CONCURRENCY pooled SMTP connections within OUTBOX_RATE_LIMIT, and
+schedules failed sends for retry with exponential backoff.
+
+Drain once (gunicorn runs this every OUTBOX_DISPATCH_INTERVAL seconds):
+    python manage.py dispatch_outbox
+Keep polling:
+    python manage.py dispatch_outbox --loop --interval 10
+Try it against a local SMTP stub:
+    python -m aiosmtpd -n -l localhost:1025
+    EMAIL_PORT=1025 python manage.py dispatch_outbox
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbox email'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            help='SMTP connections sending in parallel (default OUTBOX_CONCURRENCY)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            help='Messages per second across all connections, 0 for no limit '
+                 '(default OUTBOX_RATE_LIMIT)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Messages claimed per batch (default OUTBOX_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Stop after trying this many messages',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new messages instead of exiting when drained',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=10,
+            help='Seconds between polls with --loop (default 10)',
+        )
+
+    def handle(self, *args, **options):
+        from dashboard.outbox import OutboxDispatcher
+
+        dispatcher = OutboxDispatcher(
+            concurrency=options['concurrency'],
+            rate=options['rate'],
+            batch_size=options['batch_size'],
+        )
+
+        while True:
+            started = time.monotonic()
+            summary = dispatcher.dispatch(limit=options['limit'])
+            elapsed = time.monotonic() - started
+            tried = summary['sent'] + summary['retrying'] + summary['failed']
+            if tried or not options['loop']:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f'Sent {summary["sent"]} messages, {summary["retrying"]} '
+                        f'to retry, {summary["failed"]} failed in {elapsed:.1f}s'
+                    )
+                )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,92 @@
+"""
+Django management command to import vendor bills from a CSV or JSONL file.
+The file is streamed row by row; vendors and accounts are resolved from maps
+loaded once, bills the company already has are skipped, and bills and lines
+are written in chunks. Rejected rows are listed in a CSV error report.
+
+Example:
+    python manage.py import_bills --company 1 bills-2025-01.csv --status APPROVED
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Import vendor bills from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='CSV file (one row per bill line) or JSONL file',
+        )
+        parser.add_argument(
+            '--company',
+            type=int,
+            required=True,
+            help='Company ID to import the bills into',
+        )
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='File format (default: from the file extension)',
+        )
+        parser.add_argument(
+            '--status',
+            default='DRAFT',
+            help='Status of the imported bills, DRAFT or APPROVED (default DRAFT)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Bill lines written per bulk insert (default 1000)',
+        )
+        parser.add_argument(
+            '--no-match',
+            action='store_true',
+            help='Skip three-way matching of the imported bill lines',
+        )
+
+    def handle(self, *args, **options):
+        from companies.models import Company
+        from dashboard.bill_import import error_report_path, file_format, import_bills
+
+        try:
+            company = Company.objects.get(pk=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f'Company {options["company"]} does not exist')
+
+        started = time.monotonic()
+
+        def progress(rows):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'  {rows} rows ({rows / max(elapsed, 0.001):.0f}/s)')
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                summary = import_bills(
+                    company,
+                    stream,
+                    fmt=options['format'] or file_format(options['path']),
+                    status=options['status'],
+                    chunk_size=options['chunk_size'],
+                    match=not options['no_match'],
+                    progress=progress,
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Imported {summary["bills"]} bills ({summary["lines"]} lines) from '
+                f'{summary["rows"]} rows in {summary["seconds"]:.1f}s '
+                f'({summary["rows_per_second"]} rows/s); {summary["duplicates"]} '
+                f'duplicate bills, {summary["errors"]} rows rejected'
+            )
+        )
+        if summary['error_report']:
+            self.stdout.write(
+                f'Error report: {error_report_path(company.id, summary["error_report"])}'
+            )
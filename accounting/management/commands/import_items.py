@@ -0,0 +1,83 @@
+"""
+Django management command to import an inventory item catalog from CSV.
+The file is streamed row by row and written in chunks; item codes,
+categories and vendors are looked up in maps loaded once, and missing
+categories and vendors are created in bulk.
+
+Examples:
+    python manage.py import_items catalog.csv --company 1
+    python manage.py import_items catalog.csv --company 1 --upsert
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Import inventory items from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help='CSV file with an item_code,name,... header row',
+        )
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='Company ID whose vendors the vendor column refers to',
+        )
+        parser.add_argument(
+            '--upsert',
+            action='store_true',
+            help='Update items whose codes already exist instead of skipping them',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Items written per bulk insert (default 1000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate the file without saving anything',
+        )
+
+    def handle(self, *args, **options):
+        from companies.models import Company
+        from dashboard.item_import import MODE_CREATE, MODE_UPSERT, import_items
+
+        company = None
+        if options['company']:
+            try:
+                company = Company.objects.get(pk=options['company'])
+            except Company.DoesNotExist:
+                raise CommandError(f'Company {options["company"]} does not exist')
+
+        def progress(rows):
+            if rows % 10000 < options['chunk_size']:
+                self.stdout.write(f'  {rows} rows')
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                summary = import_items(
+                    stream,
+                    company=company,
+                    mode=MODE_UPSERT if options['upsert'] else MODE_CREATE,
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run'],
+                    progress=progress,
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for error in summary['errors']:
+            self.stdout.write(self.style.WARNING(f'  {error}'))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{summary["rows"]} rows in {summary["seconds"]:.1f}s '
+                f'({summary["rows_per_second"]} rows/s): {summary["created"]} created, '
+                f'{summary["updated"]} updated, {summary["skipped"]} skipped, '
+                f'{summary["failed"]} failed; {summary["categories_created"]} categories '
+                f'and {summary["vendors_created"]} vendors created'
+            )
+        )
@@ -0,0 +1,109 @@
+"""
+Django management command to plan (and optionally approve) a payment run.
+Selects the company's approved bills due by the cutoff date, plus bills
+whose early payment discount would expire before the next run. With
+--cash-limit, the bills worth most per unit of cash (discounts earned,
+late fees avoided) are picked first.
+
+Example:
+    python manage.py payment_run --company 1 --cutoff 2025-02-15 \
+        --cash-limit 250000 --approve
+"""
+
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Plan a payment run for approved bills, and optionally approve it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            required=True,
+            help='Company ID whose bills to pay',
+        )
+        parser.add_argument(
+            '--payment-date',
+            help='Date of the payments (YYYY-MM-DD), defaults to today',
+        )
+        parser.add_argument(
+            '--cutoff',
+            help='Pay bills due on or before this date (YYYY-MM-DD), '
+                 'defaults to the payment date',
+        )
+        parser.add_argument(
+            '--cash-limit',
+            help='Most cash the run may pay out',
+        )
+        parser.add_argument(
+            '--bank-account',
+            type=int,
+            help='Account ID to pay from (default: the company cash account)',
+        )
+        parser.add_argument(
+            '--approve',
+            action='store_true',
+            help='Approve the run at once: settle the bills and post the entries',
+        )
+
+    def handle(self, *args, **options):
+        from accounting.models import Account
+        from companies.models import Company
+        from dashboard.payment_runs import approve_payment_run, plan_payment_run
+
+        try:
+            company = Company.objects.get(pk=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f'Company {options["company"]} does not exist')
+
+        try:
+            payment_date = (
+                date.fromisoformat(options['payment_date'])
+                if options['payment_date'] else date.today()
+            )
+            cutoff = date.fromisoformat(options['cutoff']) if options['cutoff'] else payment_date
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}')
+
+        bank_account = None
+        if options['bank_account']:
+            bank_account = Account.objects.filter(
+                pk=options['bank_account'], company=company
+            ).first()
+            if bank_account is None:
+                raise CommandError(f'Account {options["bank_account"]} does not exist')
+
+        started = time.monotonic()
+        try:
+            run = plan_payment_run(
+                company,
+                payment_date,
+                cutoff,
+                cash_limit=options['cash_limit'],
+                bank_account=bank_account,
+            )
+        except (ValueError, ArithmeticError) as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(
+            f'{run.run_number}: {run.bill_count} bills, {run.total_amount} to pay, '
+            f'{run.total_discount} discounts, {run.penalties_avoided} late fees avoided, '
+            f'{run.deferred_count} due bills deferred ({time.monotonic() - started:.1f}s)'
+        )
+
+        if options['approve']:
+            started = time.monotonic()
+            try:
+                summary = approve_payment_run(run)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Approved {run.run_number}: {summary["payments"]} payments, '
+                    f'{len(summary["journal_entries"])} journal entries '
+                    f'({time.monotonic() - started:.1f}s)'
+                )
+            )
@@ -0,0 +1,53 @@
+"""
+Django management command to post the cost of inventory movements to the
+ledger. Receipts, issues, returns, damage and stock adjustments are costed
+FIFO as they post; this books the cost not yet in the ledger, one journal
+entry per day (receipts against goods received not invoiced, cost of goods
+sold and inventory adjustments against inventory).
+
+Example:
+    python manage.py post_cogs --company 1 --through 2025-01-31
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Post inventory receipts, cost of goods sold and inventory adjustments to the ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            required=True,
+            help='Company ID whose inventory movements to post',
+        )
+        parser.add_argument(
+            '--through',
+            help='Post movements up to this date (YYYY-MM-DD), defaults to all',
+        )
+
+    def handle(self, *args, **options):
+        from companies.models import Company
+        from dashboard.inventory_costing import post_cogs
+
+        try:
+            company = Company.objects.get(pk=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f'Company {options["company"]} does not exist')
+
+        try:
+            through = date.fromisoformat(options['through']) if options['through'] else None
+            result = post_cogs(company, through=through)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Posted {result["received"]} received and {result["amount"]} expensed for '
+                f'{result["movements"]} movements in '
+                f'{len(result["journal_entries"])} journal entries'
+            )
+        )
@@ -0,0 +1,37 @@
+"""
+Django management command to rebuild the month-end balance history.
+Replaces each company's AccountMonthlyBalance rows from its posted journal
+lines in a single grouped pass, e.g. after importing historical data.
+"""
+
+from django.core.management.base import BaseCommand
+
+from companies.models import Company
+
+
+class Command(BaseCommand):
+    help = 'Rebuild monthly account balance history from posted journal lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='Company ID to rebuild (defaults to all companies)',
+        )
+
+    def handle(self, *args, **options):
+        from dashboard.balance_history import rebuild_history
+
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+
+        total_rows = 0
+        for company in companies.iterator():
+            rows = rebuild_history(company)
+            total_rows += rows
+            self.stdout.write(f'{company.name}: {rows} account-months')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {total_rows} monthly balance rows')
+        )
@@ -0,0 +1,37 @@
+"""
+Django management command to rebuild the customer and vendor balance rollups.
+Recounts CustomerBalance / VendorBalance from invoices, bills and payments,
+e.g. after a bulk import or a data fix made outside the ORM.
+"""
+
+from django.core.management.base import BaseCommand
+
+from companies.models import Company
+
+
+class Command(BaseCommand):
+    help = 'Rebuild customer and vendor balance rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='Company ID to rebuild (defaults to all companies)',
+        )
+
+    def handle(self, *args, **options):
+        from dashboard.rollups import rebuild_company_balances
+
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+
+        total_rows = 0
+        for company in companies.iterator():
+            rows = rebuild_company_balances(company)
+            total_rows += rows
+            self.stdout.write(f'{company.name}: {rows} balances')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {total_rows} balance rollups')
+        )
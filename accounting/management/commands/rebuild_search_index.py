@@ -0,0 +1,37 @@
+"""
+Django management command to rebuild the search index.
+Replaces each company's SearchEntry rows from its customers, vendors,
+invoices, journal entries and documents, e.g. after a bulk import.
+"""
+
+from django.core.management.base import BaseCommand
+
+from companies.models import Company
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-company search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='Company ID to rebuild (defaults to all companies)',
+        )
+
+    def handle(self, *args, **options):
+        from dashboard.search import rebuild_company_index
+
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+
+        total_entries = 0
+        for company in companies.iterator():
+            entries = rebuild_company_index(company)
+            total_entries += entries
+            self.stdout.write(f'{company.name}: {entries} entries')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {total_entries} search entries')
+        )
@@ -0,0 +1,92 @@
+"""
+Django management command to render a company's invoices to a zip of PDFs.
+Invoices are rendered in chunks across a process pool (INVOICE_PDF_WORKERS)
+and written to the archive as they finish, so month-end runs of tens of
+thousands of invoices keep memory flat.
+
+Example:
+    python manage.py render_invoice_pdfs --company 1 --date-from 2025-01-01 \
+        --date-to 2025-01-31 --output invoices-2025-01.zip
+"""
+
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Render invoices to a zip archive of PDFs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            required=True,
+            help='Company ID whose invoices to render',
+        )
+        parser.add_argument(
+            '--status',
+            help='Only invoices in this status (e.g. SENT)',
+        )
+        parser.add_argument(
+            '--date-from',
+            help='First invoice date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--date-to',
+            help='Last invoice date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--output',
+            default='invoices.zip',
+            help='Path of the zip archive to write',
+        )
+
+    def handle(self, *args, **options):
+        from accounting.models import Invoice
+        from companies.models import Company
+        from dashboard.invoice_pdf import iter_invoice_pdfs, stream_zip
+
+        try:
+            company = Company.objects.get(pk=options['company'])
+        except Company.DoesNotExist:
+            raise CommandError(f'Company {options["company"]} does not exist')
+
+        invoices = Invoice.objects.filter(company=company)
+        try:
+            if options['date_from']:
+                invoices = invoices.filter(
+                    invoice_date__gte=date.fromisoformat(options['date_from'])
+                )
+            if options['date_to']:
+                invoices = invoices.filter(
+                    invoice_date__lte=date.fromisoformat(options['date_to'])
+                )
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}')
+        if options['status']:
+            invoices = invoices.filter(status=options['status'].upper())
+
+        rendered = 0
+
+        def counted(entries):
+            nonlocal rendered
+            for entry in entries:
+                rendered += 1
+                if rendered % 1000 == 0:
+                    self.stdout.write(f'  {rendered} invoices rendered')
+                yield entry
+
+        started = time.monotonic()
+        with open(options['output'], 'wb') as output:
+            for piece in stream_zip(counted(iter_invoice_pdfs(company, invoices))):
+                output.write(piece)
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rendered {rendered} invoices to {options["output"]} in '
+                f'{elapsed:.1f}s ({rendered / max(elapsed, 0.001):.0f}/s)'
+            )
+        )
@@ -0,0 +1,144 @@
+"""
+Django management command to build and email customer statements.
+Renders a PDF statement per customer for the period (last calendar month by
+default) in the invoice PDF pool and queues one email per customer in the
+outbox.
+
+Run it from cron on the first of the month, e.g.:
+    0 6 1 * * cd /srv/ovovex && python manage.py send_statements --company 1
+Work the runs queued from the web app (gunicorn does this every
+STATEMENT_RUN_INTERVAL seconds):
+    python manage.py send_statements --queued
+"""
+
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Build and email customer statements for a period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='Company ID (defaults to all companies)',
+        )
+        parser.add_argument(
+            '--period-start',
+            help='First day of the period (YYYY-MM-DD), defaults to last month',
+        )
+        parser.add_argument(
+            '--period-end',
+            help='Last day of the period (YYYY-MM-DD), defaults to last month',
+        )
+        parser.add_argument(
+            '--customer',
+            type=int,
+            action='append',
+            help='Only this customer ID (repeatable)',
+        )
+        parser.add_argument(
+            '--include-zero',
+            action='store_true',
+            help='Also send statements with no balance and no activity',
+        )
+        parser.add_argument(
+            '--queued',
+            action='store_true',
+            help='Work the statement runs queued from the web app, then exit',
+        )
+        parser.add_argument(
+            '--no-send',
+            action='store_true',
+            help='Render the PDFs without queueing emails',
+        )
+
+    def handle(self, *args, **options):
+        from companies.models import Company
+        from dashboard.statements import StatementRun
+
+        if options['queued']:
+            return self.work_queued()
+
+        last_month_end = date.today().replace(day=1) - timedelta(days=1)
+        try:
+            period_start = (
+                date.fromisoformat(options['period_start'])
+                if options['period_start'] else last_month_end.replace(day=1)
+            )
+            period_end = (
+                date.fromisoformat(options['period_end'])
+                if options['period_end'] else last_month_end
+            )
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}')
+
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+
+        for company in companies:
+            self.stdout.write(
+                f'{company.name}: statements for {period_start} to {period_end}'
+            )
+            started = time.monotonic()
+            reported = [0]
+
+            def progress(done, total):
+                if done == reported[0] or (done - reported[0] < 1000 and done < total):
+                    return
+                reported[0] = done
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'  {done}/{total} customers '
+                    f'({done / max(elapsed, 0.001):.0f}/s)'
+                )
+
+            try:
+                run = StatementRun(
+                    company,
+                    period_start,
+                    period_end,
+                    customer_ids=options['customer'],
+                    include_zero=options['include_zero'],
+                    send=not options['no_send'],
+                )
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            summary = run.run(progress=progress)
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'  {summary["statements"]} statements, {summary["emails"]} '
+                    f'emails queued, {summary["skipped"]} customers skipped in '
+                    f'{time.monotonic() - started:.1f}s'
+                )
+            )
+
+    def work_queued(self):
+        from dashboard.statements import claim_statement_job, run_statement_job
+
+        while True:
+            job = claim_statement_job()
+            if job is None:
+                return
+            self.stdout.write(
+                f'{job.company.name}: queued statements for '
+                f'{job.period_start} to {job.period_end}'
+            )
+            started = time.monotonic()
+            try:
+                job = run_statement_job(job)
+            except Exception as exc:
+                self.stdout.write(self.style.ERROR(f'  Run {job.id} failed: {exc}'))
+                continue
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'  {job.statements} statements, {job.emails} emails queued, '
+                    f'{job.skipped} customers skipped in '
+                    f'{time.monotonic() - started:.1f}s'
+                )
+            )
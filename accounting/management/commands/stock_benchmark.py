@@ -0,0 +1,200 @@
+"""
+Django management command to benchmark stock posting under concurrent writers.
+Creates a set of benchmark items, has several threads post batches of random
+receipts, issues and transfers against them at once, then checks that no
+update was lost: every item's stock must equal its opening stock plus the
+movements posted, and the sum of its locations. The benchmark data is
+deleted afterwards unless --keep is given.
+
+Examples:
+    python manage.py stock_benchmark
+    python manage.py stock_benchmark --writers 8 --batches 100 --batch-size 500
+    python manage.py stock_benchmark --naive   # the old read-modify-write
+"""
+
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Sum
+
+# Benchmark items are created with this item code prefix
+PREFIX = 'BENCH-'
+LOCATIONS = ['A1', 'A2', 'B1']
+OPENING_STOCK = Decimal('1000.00')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent stock posting and check for lost updates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=4,
+            help='Threads posting at the same time (default 4)',
+        )
+        parser.add_argument(
+            '--batches',
+            type=int,
+            default=50,
+            help='Batches each writer posts (default 50)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Movements per batch (default 200)',
+        )
+        parser.add_argument(
+            '--items',
+            type=int,
+            default=100,
+            help='Benchmark items the movements are spread over (default 100)',
+        )
+        parser.add_argument(
+            '--naive',
+            action='store_true',
+            help='Post with the old read-modify-write on current_stock instead',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the benchmark items and movements',
+        )
+
+    def handle(self, *args, **options):
+        from accounting.models import InventoryItem, InventoryTransaction, StockLevel
+
+        if InventoryItem.objects.filter(item_code__startswith=PREFIX).exists():
+            raise CommandError(f'{PREFIX}* items exist already; delete them first')
+
+        items = InventoryItem.objects.bulk_create([
+            InventoryItem(
+                item_code=f'{PREFIX}{number:05d}',
+                name=f'Benchmark item {number}',
+                location=LOCATIONS[0],
+                current_stock=OPENING_STOCK,
+            )
+            for number in range(1, options['items'] + 1)
+        ])
+        item_ids = [item.id for item in items]
+        StockLevel.objects.bulk_create([
+            StockLevel(item_id=item_id, location=LOCATIONS[0], quantity=OPENING_STOCK)
+            for item_id in item_ids
+        ])
+
+        post = self._post_naive if options['naive'] else self._post
+        self.retries, failures = 0, []
+
+        def writer(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(options['batches']):
+                    batch = self._batch(rng, item_ids, options['batch_size'], options['naive'])
+                    post(batch)
+            except Exception as exc:
+                failures.append(exc)
+            finally:
+                connection.close()
+
+        started = time.monotonic()
+        threads = [
+            threading.Thread(target=writer, args=(seed,)) for seed in range(options['writers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        posted = options['writers'] * options['batches'] * options['batch_size']
+        self.stdout.write(
+            f'{options["writers"]} writers posted {posted} movements in '
+            f'{options["writers"] * options["batches"]} batches in {elapsed:.1f}s '
+            f'({posted / max(elapsed, 0.001):.0f} movements/s, {self.retries} retries)'
+        )
+        if failures:
+            self.stdout.write(self.style.ERROR(f'{len(failures)} writers failed: {failures[0]}'))
+
+        movements = dict(
+            InventoryTransaction.objects.filter(item_id__in=item_ids)
+            .exclude(transaction_type='TRANSFER')
+            .values('item_id')
+            .annotate(total=Sum('quantity'))
+            .order_by()
+            .values_list('item_id', 'total')
+        )
+        levels = dict(
+            StockLevel.objects.filter(item_id__in=item_ids)
+            .values('item_id')
+            .annotate(total=Sum('quantity'))
+            .order_by()
+            .values_list('item_id', 'total')
+        )
+        lost = 0
+        for item_id, stock in InventoryItem.objects.filter(id__in=item_ids).values_list(
+            'id', 'current_stock'
+        ):
+            expected = OPENING_STOCK + (movements.get(item_id) or 0)
+            if stock != expected or (not options['naive'] and levels.get(item_id) != stock):
+                lost += 1
+        if lost:
+            self.stdout.write(self.style.ERROR(f'{lost} of {len(item_ids)} items lost updates'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'No lost updates on {len(item_ids)} items'))
+
+        if not options['keep']:
+            InventoryTransaction.objects.filter(item_id__in=item_ids).delete()
+            InventoryItem.objects.filter(id__in=item_ids).delete()
+
+    def _batch(self, rng, item_ids, size, naive):
+        """Random scans: mostly receipts and issues, some transfers"""
+        batch = []
+        for _ in range(size):
+            roll = rng.random()
+            movement = {
+                'item': rng.choice(item_ids),
+                'quantity': rng.randint(1, 5),
+                'location': rng.choice(LOCATIONS),
+            }
+            if roll < 0.5:
+                movement['type'] = 'RECEIPT'
+            elif roll < 0.9 or naive:
+                movement['type'] = 'ISSUE'
+            else:
+                movement['type'] = 'TRANSFER'
+                movement['to_location'] = rng.choice(
+                    [location for location in LOCATIONS if location != movement['location']]
+                )
+            batch.append(movement)
+        return batch
+
+    def _post(self, batch):
+        from dashboard.stock import post_movements
+
+        while True:
+            try:
+                post_movements(batch, allow_negative=True)
+                return
+            except OperationalError:
+                # SQLite: the wait for the database lock timed out
+                self.retries += 1
+
+    def _post_naive(self, batch):
+        """The read-modify-write receive_stock_view used to do, one scan at a time"""
+        from accounting.models import InventoryItem, InventoryTransaction
+
+        for movement in batch:
+            quantity = Decimal(movement['quantity'])
+            if movement['type'] == 'ISSUE':
+                quantity = -quantity
+            item = InventoryItem.objects.get(id=movement['item'])
+            item.current_stock += quantity
+            item.save()
+            InventoryTransaction.objects.create(
+                item=item, transaction_type=movement['type'], quantity=quantity
+            )
@@ -0,0 +1,75 @@
+"""
+Django management command to mark past-due invoices and bills as OVERDUE.
+Moves SENT invoices and APPROVED bills due before today to OVERDUE with one
+UPDATE per chunk of companies, then notifies each company's users once.
+
+Run it from cron, e.g. hourly:
+    0 * * * * cd /srv/ovovex && python manage.py sweep_overdue --scheduled
+gunicorn also starts it every OVERDUE_SWEEP_INTERVAL seconds (gunicorn_config.py).
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Mark past-due invoices and bills as overdue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='Company ID to sweep (defaults to all companies)',
+        )
+        parser.add_argument(
+            '--date',
+            help='Sweep as of this date (YYYY-MM-DD), defaults to today',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would become overdue without changing anything',
+        )
+        parser.add_argument(
+            '--no-notify',
+            action='store_true',
+            help='Do not create notifications',
+        )
+        parser.add_argument(
+            '--scheduled',
+            action='store_true',
+            help='Skip the run if a sweep ran within OVERDUE_SWEEP_INTERVAL',
+        )
+
+    def handle(self, *args, **options):
+        from dashboard.overdue import run_scheduled_sweep, sweep_overdue
+
+        try:
+            today = date.fromisoformat(options['date']) if options['date'] else None
+        except ValueError as exc:
+            raise CommandError(f'Invalid date: {exc}')
+
+        kwargs = {
+            'today': today,
+            'company_ids': [options['company']] if options['company'] else None,
+            'notify': not options['no_notify'],
+            'dry_run': options['dry_run'],
+        }
+        if options['scheduled']:
+            affected = run_scheduled_sweep(**kwargs)
+            if affected is None:
+                self.stdout.write('A sweep ran recently, skipping')
+                return
+        else:
+            affected = sweep_overdue(**kwargs)
+
+        invoices = sum(summary['invoices'] for summary in affected.values())
+        bills = sum(summary['bills'] for summary in affected.values())
+        verb = 'Would mark' if options['dry_run'] else 'Marked'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{verb} {invoices} invoices and {bills} bills overdue '
+                f'across {len(affected)} companies'
+            )
+        )
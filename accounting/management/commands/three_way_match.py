@@ -0,0 +1,47 @@
+"""
+Django management command to match bills against purchase orders and receipts.
+Links unmatched stock receipts to open PO lines, then matches waiting bill
+lines (unmatched or exceptions) within the THREE_WAY_MATCH_* tolerances.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Three-way match bills, purchase orders and goods receipts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='Company ID to match (defaults to all companies)',
+        )
+        parser.add_argument(
+            '--rematch',
+            action='store_true',
+            help='Also redo bill lines that already matched',
+        )
+
+    def handle(self, *args, **options):
+        from companies.models import Company
+        from dashboard.matching import run_three_way_match
+
+        companies = Company.objects.all()
+        if options['company']:
+            companies = companies.filter(pk=options['company'])
+
+        for company in companies:
+            started = time.monotonic()
+            result = run_three_way_match(company, rematch=options['rematch'])
+            statuses = ', '.join(
+                f'{count} {status.lower()}' for status, count in sorted(result['statuses'].items())
+            ) or 'nothing to match'
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'{company.name}: {result["receipts"]} receipts linked, '
+                    f'{result["bill_lines"]} bill lines ({statuses}) in '
+                    f'{time.monotonic() - started:.1f}s'
+                )
+            )
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0018_remove_aiinsight_accounting__insight_debb5c_idx_and_more'),
+        ('companies', '0003_company_ledger_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('report_type', models.CharField(choices=[('PROFIT_AND_LOSS', 'Profit & Loss'), ('BALANCE_SHEET', 'Balance Sheet')], max_length=30)),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('params_hash', models.CharField(max_length=40)),
+                ('payload', models.JSONField()),
+                ('ledger_version', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_snapshots', to='companies.company')),
+            ],
+            options={
+                'ordering': ['-period_end', 'report_type'],
+                'indexes': [models.Index(fields=['company', 'period_end'], name='accounting__company_f960bf_idx')],
+                'unique_together': {('company', 'report_type', 'period_start', 'period_end', 'params_hash')},
+            },
+        ),
+    ]
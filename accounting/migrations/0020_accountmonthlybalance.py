@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:47
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0019_reportsnapshot'),
+        ('companies', '0003_company_ledger_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountMonthlyBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('debit_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('credit_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_balances', to='accounting.account')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_balances', to='companies.company')),
+            ],
+            options={
+                'ordering': ['month', 'account'],
+                'indexes': [models.Index(fields=['company', 'month'], name='accounting__company_5da999_idx')],
+                'unique_together': {('account', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE accounting_searchentry_fts USING fts5(
+        content,
+        content='accounting_searchentry',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    "INSERT INTO accounting_searchentry_fts(accounting_searchentry_fts) VALUES ('rebuild')",
+    """
+    CREATE TRIGGER accounting_searchentry_ai AFTER INSERT ON accounting_searchentry BEGIN
+        INSERT INTO accounting_searchentry_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER accounting_searchentry_ad AFTER DELETE ON accounting_searchentry BEGIN
+        INSERT INTO accounting_searchentry_fts(accounting_searchentry_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER accounting_searchentry_au AFTER UPDATE ON accounting_searchentry BEGIN
+        INSERT INTO accounting_searchentry_fts(accounting_searchentry_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+        INSERT INTO accounting_searchentry_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS accounting_searchentry_au",
+    "DROP TRIGGER IF EXISTS accounting_searchentry_ad",
+    "DROP TRIGGER IF EXISTS accounting_searchentry_ai",
+    "DROP TABLE IF EXISTS accounting_searchentry_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    ALTER TABLE accounting_searchentry ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED
+    """,
+    """
+    CREATE INDEX accounting_searchentry_vector_idx
+    ON accounting_searchentry USING GIN (search_vector)
+    """,
+    """
+    CREATE INDEX accounting_searchentry_trgm_idx
+    ON accounting_searchentry USING GIN (content gin_trgm_ops)
+    """,
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS accounting_searchentry_trgm_idx",
+    "DROP INDEX IF EXISTS accounting_searchentry_vector_idx",
+    "ALTER TABLE accounting_searchentry DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    """Full-text index for the active database; other backends search via the ORM"""
+    _run(
+        schema_editor,
+        {"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD},
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    _run(
+        schema_editor,
+        {"sqlite": SQLITE_REVERSE, "postgresql": POSTGRES_REVERSE},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0020_accountmonthlybalance'),
+        ('companies', '0003_company_ledger_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('CUSTOMER', 'Customer'), ('VENDOR', 'Vendor'), ('INVOICE', 'Invoice'), ('JOURNAL_ENTRY', 'Journal Entry'), ('DOCUMENT', 'Document')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('parent_id', models.PositiveBigIntegerField(blank=True, help_text='Customer of an invoice', null=True)),
+                ('code', models.CharField(max_length=50)),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(blank=True, max_length=20)),
+                ('balance', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True)),
+                ('content', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='companies.company')),
+            ],
+            options={
+                'verbose_name_plural': 'Search Entries',
+                'ordering': ['object_type', 'code'],
+                'indexes': [models.Index(fields=['company', 'object_type', 'code'], name='accounting__company_444eab_idx')],
+                'unique_together': {('object_type', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
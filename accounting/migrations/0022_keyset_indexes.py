@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0021_searchentry'),
+        ('companies', '0003_company_ledger_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['company', 'company_name', 'id'], name='accounting__company_4c7406_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['company', 'invoice_date', 'id'], name='accounting__company_d13ac9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalentry',
+            index=models.Index(fields=['company', 'entry_date', 'id'], name='accounting__company_3f7930_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['company', 'user', 'created_at', 'id'], name='accounting__company_ca46d0_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0022_keyset_indexes'),
+        ('companies', '0004_company_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='journalentryline',
+            name='intercompany_company',
+            field=models.ForeignKey(blank=True, help_text='Group company on the other side of an intercompany balance', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='intercompany_lines', to='companies.company'),
+        ),
+        migrations.CreateModel(
+            name='ConsolidationGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(help_text='Parent company that owns the group', on_delete=django.db.models.deletion.CASCADE, related_name='consolidation_groups', to='companies.company')),
+                ('members', models.ManyToManyField(help_text='Companies consolidated, including the parent', related_name='group_memberships', to='companies.company')),
+            ],
+            options={
+                'ordering': ['name'],
+                'unique_together': {('company', 'name')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20)),
+                ('name', models.CharField(max_length=255)),
+                ('account_type', models.CharField(choices=[('ASSET', 'Asset'), ('LIABILITY', 'Liability'), ('EQUITY', 'Equity'), ('REVENUE', 'Revenue'), ('EXPENSE', 'Expense')], max_length=20)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='accounts', to='accounting.consolidationgroup')),
+            ],
+            options={
+                'ordering': ['code'],
+                'unique_together': {('group', 'code')},
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupAccountMapping',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_mappings', to='accounting.account')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mappings', to='accounting.consolidationgroup')),
+                ('group_account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mappings', to='accounting.groupaccount')),
+            ],
+            options={
+                'ordering': ['group_account', 'account'],
+                'unique_together': {('group', 'account')},
+            },
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:06
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, Max, Min, Q, Sum
+
+
+UNCOUNTED_STATUSES = ["DRAFT", "CANCELLED"]
+
+
+def _rollups(party_model, document_model, balance_model, party_field, date_field):
+    counted = ~Q(status__in=UNCOUNTED_STATUSES)
+    totals = {
+        row[party_field]: row
+        for row in document_model.objects.values(party_field)
+        .annotate(
+            total_invoiced=Sum("total_amount", filter=counted),
+            outstanding=Sum(
+                F("total_amount") - F("paid_amount"),
+                filter=counted & ~Q(status="PAID"),
+            ),
+            total_paid=Sum("paid_amount", filter=counted),
+            first_invoice_date=Min(date_field, filter=counted),
+        )
+        .order_by()
+    }
+    balances = []
+    for party_id, company_id in party_model.objects.values_list("id", "company_id"):
+        row = totals.get(party_id, {})
+        balances.append(
+            balance_model(
+                pk=party_id,
+                company_id=company_id,
+                total_invoiced=row.get("total_invoiced") or Decimal("0.00"),
+                outstanding=row.get("outstanding") or Decimal("0.00"),
+                total_paid=row.get("total_paid") or Decimal("0.00"),
+                first_invoice_date=row.get("first_invoice_date"),
+            )
+        )
+    return balances
+
+
+def populate_rollups(apps, schema_editor):
+    """Seed a balance row for every existing customer and vendor"""
+    Customer = apps.get_model("accounting", "Customer")
+    Vendor = apps.get_model("accounting", "Vendor")
+    Invoice = apps.get_model("accounting", "Invoice")
+    Bill = apps.get_model("accounting", "Bill")
+    Payment = apps.get_model("accounting", "Payment")
+    CustomerBalance = apps.get_model("accounting", "CustomerBalance")
+    VendorBalance = apps.get_model("accounting", "VendorBalance")
+
+    customers = _rollups(Customer, Invoice, CustomerBalance, "customer", "invoice_date")
+    last_payments = dict(
+        Payment.objects.values("customer")
+        .annotate(last=Max("payment_date"))
+        .order_by()
+        .values_list("customer", "last")
+    )
+    for balance in customers:
+        balance.last_payment_date = last_payments.get(balance.pk)
+    CustomerBalance.objects.bulk_create(customers, batch_size=1000)
+
+    VendorBalance.objects.bulk_create(
+        _rollups(Vendor, Bill, VendorBalance, "vendor", "bill_date"), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0023_consolidation'),
+        ('companies', '0004_company_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerBalance',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='accounting.customer')),
+                ('outstanding', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('total_invoiced', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('first_invoice_date', models.DateField(blank=True, null=True)),
+                ('last_payment_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='customer_balances', to='companies.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', '-outstanding'], name='accounting__company_29b8be_idx'), models.Index(fields=['company', '-total_invoiced'], name='accounting__company_acfded_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VendorBalance',
+            fields=[
+                ('vendor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to='accounting.vendor')),
+                ('outstanding', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('total_invoiced', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('first_invoice_date', models.DateField(blank=True, null=True)),
+                ('last_payment_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='vendor_balances', to='companies.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', '-outstanding'], name='accounting__company_cfcdc7_idx'), models.Index(fields=['company', '-total_invoiced'], name='accounting__company_c2e4ff_idx')],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0026_outboundmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundmessage',
+            name='attachment',
+            field=models.CharField(blank=True, help_text='Storage path of a file to attach', max_length=500),
+        ),
+    ]
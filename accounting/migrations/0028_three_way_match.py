@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:33
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0027_outboundmessage_attachment'),
+        ('companies', '0004_company_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billline',
+            name='inventory_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bill_lines', to='accounting.inventoryitem'),
+        ),
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='po_line',
+            field=models.ForeignKey(blank=True, help_text='Purchase order line this receipt was matched to', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='receipts', to='accounting.purchaseorderline'),
+        ),
+        migrations.CreateModel(
+            name='ThreeWayMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('MATCHED', 'Matched'), ('QUANTITY_VARIANCE', 'Billed More Than Received'), ('PRICE_VARIANCE', 'Price Differs From PO'), ('NOT_RECEIVED', 'Not Received'), ('NO_PURCHASE_ORDER', 'No Purchase Order')], max_length=20)),
+                ('ordered_quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('received_quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Received and not yet billed when this line was matched', max_digits=12)),
+                ('billed_quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('po_unit_price', models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True)),
+                ('bill_unit_price', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('quantity_variance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('price_variance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('matched_at', models.DateTimeField(auto_now=True)),
+                ('bill_line', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='match', to='accounting.billline')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='three_way_matches', to='companies.company')),
+                ('po_line', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='matches', to='accounting.purchaseorderline')),
+            ],
+            options={
+                'ordering': ['-matched_at', 'id'],
+                'indexes': [models.Index(fields=['company', 'status'], name='accounting__company_81d4f7_idx')],
+            },
+        ),
+    ]
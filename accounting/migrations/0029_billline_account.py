@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0028_three_way_match'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billline',
+            name='account',
+            field=models.ForeignKey(blank=True, help_text='Expense or asset account the line is charged to', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='bill_lines', to='accounting.account'),
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:42
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0029_billline_account'),
+        ('companies', '0004_company_data_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vendor',
+            name='early_payment_discount_days',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='early_payment_discount_percent',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Discount for paying within the discount days, e.g. 2 for 2/10 net 30', max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='late_fee_percent',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Fee charged on a bill paid after its due date', max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='vendor',
+            name='payment_account',
+            field=models.ForeignKey(blank=True, help_text='Bank account payment runs pay this vendor from', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='paid_vendors', to='accounting.account'),
+        ),
+        migrations.CreateModel(
+            name='PaymentRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_number', models.CharField(db_index=True, max_length=50)),
+                ('status', models.CharField(choices=[('DRAFT', 'Draft'), ('APPROVED', 'Approved'), ('CANCELLED', 'Cancelled')], default='DRAFT', max_length=20)),
+                ('payment_date', models.DateField()),
+                ('cutoff_date', models.DateField(help_text='Bills due on or before this date are paid')),
+                ('cash_limit', models.DecimalField(blank=True, decimal_places=2, help_text='Most cash the run may pay out; empty for no limit', max_digits=15, null=True)),
+                ('bill_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('total_discount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('penalties_avoided', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('deferred_count', models.IntegerField(default=0, help_text='Bills due by the cutoff left out by the cash limit')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('approved_at', models.DateTimeField(blank=True, null=True)),
+                ('approved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_runs_approved', to=settings.AUTH_USER_MODEL)),
+                ('bank_account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payment_runs', to='accounting.account')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payment_runs', to='companies.company')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_runs_created', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'unique_together': {('company', 'run_number')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VendorPayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payment_number', models.CharField(db_index=True, max_length=50)),
+                ('payment_date', models.DateField()),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('discount_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('bank_account', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='vendor_payments', to='accounting.account')),
+                ('company', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='vendor_payments', to='companies.company')),
+                ('journal_entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='vendor_payments', to='accounting.journalentry')),
+                ('payment_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='accounting.paymentrun')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payments', to='accounting.vendor')),
+            ],
+            options={
+                'ordering': ['payment_number'],
+                'unique_together': {('company', 'payment_number')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PaymentRunLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('open_amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('discount_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('penalty_avoided', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('reason', models.CharField(choices=[('DISCOUNT', 'Early Payment Discount'), ('OVERDUE', 'Overdue'), ('DUE', 'Due By Cutoff')], max_length=20)),
+                ('bill', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payment_run_lines', to='accounting.bill')),
+                ('payment_run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='accounting.paymentrun')),
+                ('vendor_payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='accounting.vendorpayment')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
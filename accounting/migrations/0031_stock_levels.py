@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:48
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def populate_stock_levels(apps, schema_editor):
+    """Put each item's current stock at its location"""
+    InventoryItem = apps.get_model("accounting", "InventoryItem")
+    StockLevel = apps.get_model("accounting", "StockLevel")
+    StockLevel.objects.bulk_create(
+        [
+            StockLevel(item_id=item_id, location=(location or "").strip(), quantity=stock)
+            for item_id, location, stock in InventoryItem.objects.exclude(
+                current_stock=0
+            ).values_list("id", "location", "current_stock")
+        ],
+        batch_size=1000,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0030_payment_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(blank=True, default='', max_length=255)),
+                ('quantity', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_levels', to='accounting.inventoryitem')),
+            ],
+            options={
+                'ordering': ['item', 'location'],
+                'unique_together': {('item', 'location')},
+            },
+        ),
+        migrations.RunPython(populate_stock_levels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.2.7 on 2026-10-19 00:53
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def open_cost_layers(apps, schema_editor):
+    """Open a layer at the item's unit cost for each item's current stock"""
+    InventoryItem = apps.get_model("accounting", "InventoryItem")
+    CostLayer = apps.get_model("accounting", "CostLayer")
+    CostLayer.objects.bulk_create(
+        [
+            CostLayer(
+                item_id=item_id,
+                received_at=created_at,
+                quantity=stock,
+                remaining_quantity=stock,
+                unit_cost=unit_cost,
+            )
+            for item_id, created_at, stock, unit_cost in InventoryItem.objects.filter(
+                current_stock__gt=0
+            ).values_list("id", "created_at", "current_stock", "unit_cost")
+        ],
+        batch_size=1000,
+    )
+    InventoryItem.objects.update(total_value=F("current_stock") * F("unit_cost"))
+    InventoryItem.objects.filter(current_stock__lte=0).update(total_value=Decimal("0.00"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0031_stock_levels'),
+        ('companies', '0004_company_data_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('received_at', models.DateTimeField()),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('remaining_quantity', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('unit_cost', models.DecimalField(decimal_places=2, max_digits=12)),
+            ],
+            options={
+                'ordering': ['item', 'received_at', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='company',
+            field=models.ForeignKey(blank=True, help_text="Company whose books the movement's cost is posted to", null=True, on_delete=django.db.models.deletion.CASCADE, related_name='inventory_transactions', to='companies.company'),
+        ),
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='cost_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Value added to stock at cost; negative when stock left', max_digits=15, null=True),
+        ),
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='journal_entry',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='inventory_transactions', to='accounting.journalentry'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['is_active', 'total_value'], name='accounting__is_acti_cfe903_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['company', 'journal_entry'], name='accounting__company_18ea7a_idx'),
+        ),
+        migrations.AddField(
+            model_name='costlayer',
+            name='item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='accounting.inventoryitem'),
+        ),
+        migrations.AddField(
+            model_name='costlayer',
+            name='receipt',
+            field=models.ForeignKey(blank=True, help_text='Movement that brought the stock in; empty for opening stock', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='accounting.inventorytransaction'),
+        ),
+        migrations.AddIndex(
+            model_name='costlayer',
+            index=models.Index(condition=models.Q(('remaining_quantity__gt', 0)), fields=['item', 'received_at', 'id'], name='cost_layer_open_idx'),
+        ),
+        migrations.RunPython(open_cost_layers, migrations.RunPython.noop),
+    ]
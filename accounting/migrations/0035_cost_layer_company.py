@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def assign_layer_companies(apps, schema_editor):
+    """Give each receipt layer the company of its receipt"""
+    CostLayer = apps.get_model("accounting", "CostLayer")
+    InventoryTransaction = apps.get_model("accounting", "InventoryTransaction")
+    CostLayer.objects.filter(receipt__isnull=False).update(
+        company=Subquery(
+            InventoryTransaction.objects.filter(pk=OuterRef("receipt_id")).values("company")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0034_scheduled_runs'),
+        ('companies', '0004_company_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='costlayer',
+            name='company',
+            field=models.ForeignKey(blank=True, help_text='Company that received the stock; empty for opening stock without one', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='companies.company'),
+        ),
+        migrations.AddIndex(
+            model_name='costlayer',
+            index=models.Index(condition=models.Q(('remaining_quantity__gt', 0)), fields=['company', 'item'], name='cost_layer_company_open_idx'),
+        ),
+        migrations.RunPython(assign_layer_companies, migrations.RunPython.noop),
+    ]
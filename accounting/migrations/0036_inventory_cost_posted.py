@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 01:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_posted_movements(apps, schema_editor):
+    """Movements already carried by a journal entry have had their cost posted"""
+    InventoryTransaction = apps.get_model("accounting", "InventoryTransaction")
+    InventoryTransaction.objects.filter(journal_entry__isnull=False).update(cost_posted=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0035_cost_layer_company'),
+        ('companies', '0004_company_data_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='inventorytransaction',
+            name='accounting__company_18ea7a_idx',
+        ),
+        migrations.AddField(
+            model_name='inventorytransaction',
+            name='cost_posted',
+            field=models.BooleanField(default=False, help_text='Cost taken up by a COGS posting run (also when its day netted to zero)'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['company', 'cost_posted'], name='accounting__company_523d57_idx'),
+        ),
+        migrations.RunPython(mark_posted_movements, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
 
 
@@ -135,6 +136,7 @@ class JournalEntry(models.Model):
         verbose_name_plural = "Journal Entries"
         indexes = [
             models.Index(fields=["company", "entry_date", "status"]),
+            models.Index(fields=["company", "entry_date", "id"]),
         ]
         unique_together = [["company", "entry_number"]]
 
@@ -183,6 +185,14 @@ class JournalEntryLine(models.Model):
         validators=[MinValueValidator(Decimal("0.00"))],
     )
     line_number = models.IntegerField()
+    intercompany_company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="intercompany_lines",
+        help_text="Group company on the other side of an intercompany balance",
+    )
 
     class Meta:
         ordering = ["journal_entry", "line_number"]
@@ -233,16 +243,18 @@ class Customer(models.Model):
         unique_together = [["company", "customer_code"]]
         indexes = [
             models.Index(fields=["company", "customer_code"]),
+            models.Index(fields=["company", "company_name", "id"]),
         ]
 
     def __str__(self):
         return f"{self.customer_code} - {self.company_name}"
 
     def get_outstanding_balance(self):
-        """Calculate total outstanding invoices"""
-        return self.invoices.filter(status__in=["SENT", "OVERDUE"]).aggregate(
-            total=models.Sum("total_amount")
-        )["total"] or Decimal("0.00")
+        """Outstanding receivable, read from the customer's balance rollup"""
+        try:
+            return self.balance.outstanding
+        except CustomerBalance.DoesNotExist:
+            return Decimal("0.00")
 
 
 # Extend the built-in User with a lightweight profile model to store extra details
@@ -327,6 +339,7 @@ class Invoice(models.Model):
         unique_together = [["company", "invoice_number"]]
         indexes = [
             models.Index(fields=["company", "invoice_date", "status"]),
+            models.Index(fields=["company", "invoice_date", "id"]),
         ]
 
     def __str__(self):
@@ -400,6 +413,25 @@ class Payment(models.Model):
         return f"{self.payment_number} - ${self.amount}"
 
 
+class PaymentAllocation(models.Model):
+    """Part of a customer payment applied to one invoice"""
+
+    payment = models.ForeignKey(
+        Payment, on_delete=models.CASCADE, related_name="allocations"
+    )
+    invoice = models.ForeignKey(
+        Invoice, on_delete=models.PROTECT, related_name="allocations"
+    )
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["payment", "id"]
+
+    def __str__(self):
+        return f"{self.payment.payment_number} -> {self.invoice.invoice_number}: {self.amount}"
+
+
 # ============================================================================
 # VENDORS & PAYABLES
 # ============================================================================
@@ -425,6 +457,27 @@ class Vendor(models.Model):
     country = models.CharField(max_length=100, blank=True, null=True)
     tax_id = models.CharField(max_length=50, blank=True, null=True)
     payment_terms_days = models.IntegerField(default=30)
+    early_payment_discount_percent = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        help_text="Discount for paying within the discount days, e.g. 2 for 2/10 net 30",
+    )
+    early_payment_discount_days = models.IntegerField(default=0)
+    late_fee_percent = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        help_text="Fee charged on a bill paid after its due date",
+    )
+    payment_account = models.ForeignKey(
+        Account,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="paid_vendors",
+        help_text="Bank account payment runs pay this vendor from",
+    )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -503,6 +556,24 @@ class BillLine(models.Model):
     unit_price = models.DecimalField(max_digits=15, decimal_places=2)
     line_total = models.DecimalField(max_digits=15, decimal_places=2)
 
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="bill_lines",
+        help_text="Expense or asset account the line is charged to",
+    )
+
+    # Stock item billed (resolved by dashboard.matching when left blank)
+    inventory_item = models.ForeignKey(
+        "InventoryItem",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="bill_lines",
+    )
+
     class Meta:
         ordering = ["id"]
 
@@ -2197,6 +2268,7 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=["company", "user", "is_read", "created_at"]),
             models.Index(fields=["company", "notification_type", "created_at"]),
+            models.Index(fields=["company", "user", "created_at", "id"]),
         ]
 
     def __str__(self):
@@ -2957,6 +3029,7 @@ class InventoryItem(models.Model):
         indexes = [
             models.Index(fields=["category", "is_active"]),
             models.Index(fields=["current_stock", "minimum_stock"]),
+            models.Index(fields=["is_active", "total_value"]),
         ]
 
     def __str__(self):
@@ -2974,8 +3047,8 @@ class InventoryItem(models.Model):
             return "In Stock"
 
     def get_total_value(self):
-        """Calculate total inventory value"""
-        return self.current_stock * self.unit_cost
+        """Inventory value: the cost of the item's open FIFO layers"""
+        return self.total_value
 
     def needs_reorder(self):
         """Check if item needs reordering"""
@@ -3018,11 +3091,47 @@ class InventoryTransaction(models.Model):
         blank=True,
         related_name="inventory_transactions",
     )
+    po_line = models.ForeignKey(
+        PurchaseOrderLine,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="receipts",
+        help_text="Purchase order line this receipt was matched to",
+    )
 
     # Location tracking
     from_location = models.CharField(max_length=255, blank=True, null=True)
     to_location = models.CharField(max_length=255, blank=True, null=True)
 
+    # Costing
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="inventory_transactions",
+        help_text="Company whose books the movement's cost is posted to",
+    )
+    cost_amount = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Value added to stock at cost; negative when stock left",
+    )
+    journal_entry = models.ForeignKey(
+        JournalEntry,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="inventory_transactions",
+    )
+    cost_posted = models.BooleanField(
+        default=False,
+        help_text="Cost taken up by a COGS posting run (also when its day netted to zero)",
+    )
+
     # Notes
     notes = models.TextField(blank=True, null=True)
 
@@ -3035,6 +3144,7 @@ class InventoryTransaction(models.Model):
         indexes = [
             models.Index(fields=["item", "created_at"]),
             models.Index(fields=["transaction_type", "created_at"]),
+            models.Index(fields=["company", "cost_posted"]),
         ]
 
     def __str__(self):
@@ -3638,3 +3748,782 @@ class BillingHistory(models.Model):
     def total_amount(self):
         """Calculate total amount including tax and discount"""
         return self.amount + self.tax_amount - self.discount_amount
+
+
+# ============================================================================
+# REPORT SNAPSHOTS
+# ============================================================================
+
+
+class ReportSnapshot(models.Model):
+    """
+    Frozen financial report for a past period.
+    Served instead of recomputing from journal lines; removed when a
+    back-dated posting lands on or before the period end.
+    """
+
+    class ReportType(models.TextChoices):
+        PROFIT_AND_LOSS = "PROFIT_AND_LOSS", "Profit & Loss"
+        BALANCE_SHEET = "BALANCE_SHEET", "Balance Sheet"
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        related_name="report_snapshots",
+    )
+    report_type = models.CharField(max_length=30, choices=ReportType.choices)
+    period_start = models.DateField()
+    period_end = models.DateField()
+    params_hash = models.CharField(max_length=40)
+    payload = models.JSONField()
+    ledger_version = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-period_end", "report_type"]
+        unique_together = [
+            ["company", "report_type", "period_start", "period_end", "params_hash"]
+        ]
+        indexes = [
+            models.Index(fields=["company", "period_end"]),
+        ]
+
+    def __str__(self):
+        return f"{self.company} - {self.report_type} ({self.period_start} to {self.period_end})"
+
+
+# ============================================================================
+# BALANCE HISTORY
+# ============================================================================
+
+
+class AccountMonthlyBalance(models.Model):
+    """
+    Posted debit/credit activity per account per calendar month.
+    Rebuilt for the affected month whenever a posting changes, so historical
+    balances and ratio trends are read without scanning journal lines.
+    """
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        related_name="monthly_balances",
+    )
+    account = models.ForeignKey(
+        Account, on_delete=models.CASCADE, related_name="monthly_balances"
+    )
+    month = models.DateField(help_text="First day of the month")
+    debit_total = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    credit_total = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+
+    class Meta:
+        ordering = ["month", "account"]
+        unique_together = [["account", "month"]]
+        indexes = [
+            models.Index(fields=["company", "month"]),
+        ]
+
+    def __str__(self):
+        return f"{self.account} - {self.month:%Y-%m}"
+
+
+# ============================================================================
+# SEARCH INDEX
+# ============================================================================
+
+
+class SearchEntry(models.Model):
+    """
+    One searchable record (customer, vendor, invoice, journal entry or
+    document) with the fields typeahead results display.
+    The full-text index over `content` is created by the migration:
+    FTS5 on SQLite, tsvector + trigram GIN indexes on PostgreSQL.
+    """
+
+    class ObjectType(models.TextChoices):
+        CUSTOMER = "CUSTOMER", "Customer"
+        VENDOR = "VENDOR", "Vendor"
+        INVOICE = "INVOICE", "Invoice"
+        JOURNAL_ENTRY = "JOURNAL_ENTRY", "Journal Entry"
+        DOCUMENT = "DOCUMENT", "Document"
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        related_name="search_entries",
+    )
+    object_type = models.CharField(max_length=20, choices=ObjectType.choices)
+    object_id = models.PositiveBigIntegerField()
+    parent_id = models.PositiveBigIntegerField(
+        null=True, blank=True, help_text="Customer of an invoice"
+    )
+    code = models.CharField(max_length=50)
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, blank=True)
+    balance = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True
+    )
+    content = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["object_type", "code"]
+        verbose_name_plural = "Search Entries"
+        unique_together = [["object_type", "object_id"]]
+        indexes = [
+            models.Index(fields=["company", "object_type", "code"]),
+        ]
+
+    def __str__(self):
+        return f"{self.object_type} {self.code} - {self.title}"
+
+
+# ============================================================================
+# CONSOLIDATION
+# ============================================================================
+
+
+class ConsolidationGroup(models.Model):
+    """A parent company and the subsidiaries consolidated into its reports"""
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        related_name="consolidation_groups",
+        help_text="Parent company that owns the group",
+    )
+    name = models.CharField(max_length=255)
+    members = models.ManyToManyField(
+        "companies.Company",
+        related_name="group_memberships",
+        help_text="Companies consolidated, including the parent",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["name"]
+        unique_together = [["company", "name"]]
+
+    def __str__(self):
+        return self.name
+
+
+class GroupAccount(models.Model):
+    """Line of the group chart of accounts used in consolidated reports"""
+
+    group = models.ForeignKey(
+        ConsolidationGroup, on_delete=models.CASCADE, related_name="accounts"
+    )
+    code = models.CharField(max_length=20)
+    name = models.CharField(max_length=255)
+    account_type = models.CharField(max_length=20, choices=AccountType.choices)
+
+    class Meta:
+        ordering = ["code"]
+        unique_together = [["group", "code"]]
+
+    def __str__(self):
+        return f"{self.code} - {self.name}"
+
+
+class GroupAccountMapping(models.Model):
+    """
+    Maps a subsidiary account to a group account
+    Unmapped accounts are consolidated by their own code.
+    """
+
+    group = models.ForeignKey(
+        ConsolidationGroup, on_delete=models.CASCADE, related_name="mappings"
+    )
+    account = models.ForeignKey(
+        Account, on_delete=models.CASCADE, related_name="group_mappings"
+    )
+    group_account = models.ForeignKey(
+        GroupAccount, on_delete=models.CASCADE, related_name="mappings"
+    )
+
+    class Meta:
+        ordering = ["group_account", "account"]
+        unique_together = [["group", "account"]]
+
+    def __str__(self):
+        return f"{self.account} -> {self.group_account}"
+
+
+# ============================================================================
+# RECEIVABLE / PAYABLE ROLLUPS
+# ============================================================================
+
+
+class CustomerBalance(models.Model):
+    """
+    Running receivable totals for one customer.
+    Adjusted by deltas whenever its invoices or payments change (see
+    dashboard.rollups), so customer lists and rankings never aggregate
+    invoices. Draft and cancelled invoices are not counted.
+    """
+
+    customer = models.OneToOneField(
+        Customer,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="balance",
+    )
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="customer_balances",
+    )
+    outstanding = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    total_invoiced = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    total_paid = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    first_invoice_date = models.DateField(null=True, blank=True)
+    last_payment_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["company", "-outstanding"]),
+            models.Index(fields=["company", "-total_invoiced"]),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} - {self.outstanding}"
+
+    @property
+    def days_outstanding(self):
+        """
+        Days sales outstanding: the outstanding balance in days of average
+        invoicing since the first invoice
+        """
+        from django.utils import timezone
+
+        if not self.total_invoiced or not self.first_invoice_date:
+            return 0
+        days = max((timezone.now().date() - self.first_invoice_date).days, 1)
+        return round(self.outstanding / self.total_invoiced * days)
+
+
+class VendorBalance(models.Model):
+    """
+    Running payable totals for one vendor, the AP side of CustomerBalance.
+    Draft and cancelled bills are not counted. Bills carry no payment
+    records, so the last payment date is the day paid_amount last rose.
+    """
+
+    vendor = models.OneToOneField(
+        Vendor,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="balance",
+    )
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="vendor_balances",
+    )
+    outstanding = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    total_invoiced = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    total_paid = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    first_invoice_date = models.DateField(null=True, blank=True)
+    last_payment_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["company", "-outstanding"]),
+            models.Index(fields=["company", "-total_invoiced"]),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor_id} - {self.outstanding}"
+
+    @property
+    def days_outstanding(self):
+        """Days payable outstanding, measured like CustomerBalance's DSO"""
+        from django.utils import timezone
+
+        if not self.total_invoiced or not self.first_invoice_date:
+            return 0
+        days = max((timezone.now().date() - self.first_invoice_date).days, 1)
+        return round(self.outstanding / self.total_invoiced * days)
+
+
+# ============================================================================
+# OUTBOUND EMAIL
+# ============================================================================
+
+
+class OutboundMessage(models.Model):
+    """
+    Email waiting to be sent, written in the same transaction as the change
+    that caused it. A dispatcher sends pending messages in the background,
+    so requests never wait on SMTP.
+    """
+
+    class Kind(models.TextChoices):
+        INVOICE = "INVOICE", "Invoice"
+        REMINDER = "REMINDER", "Payment Reminder"
+        STATEMENT = "STATEMENT", "Statement"
+        RECEIPT = "RECEIPT", "Payment Receipt"
+        NOTICE = "NOTICE", "Notice"
+        NOTIFICATION = "NOTIFICATION", "Notification"
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        SENDING = "SENDING", "Sending"
+        SENT = "SENT", "Sent"
+        FAILED = "FAILED", "Failed"
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="outbound_messages",
+    )
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    attachment = models.CharField(
+        max_length=500, blank=True, help_text="Storage path of a file to attach"
+    )
+    object_type = models.CharField(
+        max_length=50, blank=True, help_text="Model of the record the message is about"
+    )
+    object_id = models.PositiveBigIntegerField(null=True, blank=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["company", "kind", "created_at"]),
+            models.Index(fields=["object_type", "object_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.to_email} ({self.status})"
+
+
+# ============================================================================
+# THREE-WAY MATCH
+# ============================================================================
+
+
+class ThreeWayMatch(models.Model):
+    """
+    Result of matching one bill line against its purchase order line and the
+    goods received for it. Anything but MATCHED is an exception to review.
+    """
+
+    class Status(models.TextChoices):
+        MATCHED = "MATCHED", "Matched"
+        QUANTITY_VARIANCE = "QUANTITY_VARIANCE", "Billed More Than Received"
+        PRICE_VARIANCE = "PRICE_VARIANCE", "Price Differs From PO"
+        NOT_RECEIVED = "NOT_RECEIVED", "Not Received"
+        NO_PURCHASE_ORDER = "NO_PURCHASE_ORDER", "No Purchase Order"
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="three_way_matches",
+    )
+    bill_line = models.OneToOneField(
+        BillLine, on_delete=models.CASCADE, related_name="match"
+    )
+    po_line = models.ForeignKey(
+        PurchaseOrderLine,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="matches",
+    )
+    status = models.CharField(max_length=20, choices=Status.choices)
+    ordered_quantity = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    received_quantity = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal("0.00"),
+        help_text="Received and not yet billed when this line was matched",
+    )
+    billed_quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    po_unit_price = models.DecimalField(
+        max_digits=15, decimal_places=2, null=True, blank=True
+    )
+    bill_unit_price = models.DecimalField(max_digits=15, decimal_places=2)
+    quantity_variance = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    price_variance = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    matched_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-matched_at", "id"]
+        indexes = [
+            models.Index(fields=["company", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.bill_line} - {self.get_status_display()}"
+
+
+# ============================================================================
+# PAYMENT RUNS
+# ============================================================================
+
+
+class PaymentRun(models.Model):
+    """
+    A batch of bills selected to be paid together. Drafts hold the proposed
+    payments; approving one settles the bills and posts one journal entry
+    per bank account.
+    """
+
+    class Status(models.TextChoices):
+        DRAFT = "DRAFT", "Draft"
+        APPROVED = "APPROVED", "Approved"
+        CANCELLED = "CANCELLED", "Cancelled"
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="payment_runs",
+    )
+    run_number = models.CharField(max_length=50, db_index=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.DRAFT
+    )
+    payment_date = models.DateField()
+    cutoff_date = models.DateField(help_text="Bills due on or before this date are paid")
+    cash_limit = models.DecimalField(
+        max_digits=15,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text="Most cash the run may pay out; empty for no limit",
+    )
+    bank_account = models.ForeignKey(
+        Account, on_delete=models.PROTECT, related_name="payment_runs"
+    )
+    bill_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    total_discount = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    penalties_avoided = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    deferred_count = models.IntegerField(
+        default=0, help_text="Bills due by the cutoff left out by the cash limit"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, related_name="payment_runs_created"
+    )
+    approved_at = models.DateTimeField(null=True, blank=True)
+    approved_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="payment_runs_approved",
+    )
+
+    class Meta:
+        ordering = ["-created_at"]
+        unique_together = [["company", "run_number"]]
+
+    def __str__(self):
+        return f"{self.run_number} - {self.total_amount}"
+
+
+class VendorPayment(models.Model):
+    """One payment to a vendor from one bank account in a payment run"""
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="vendor_payments",
+    )
+    payment_run = models.ForeignKey(
+        PaymentRun, on_delete=models.CASCADE, related_name="payments"
+    )
+    payment_number = models.CharField(max_length=50, db_index=True)
+    vendor = models.ForeignKey(
+        Vendor, on_delete=models.PROTECT, related_name="payments"
+    )
+    bank_account = models.ForeignKey(
+        Account, on_delete=models.PROTECT, related_name="vendor_payments"
+    )
+    payment_date = models.DateField()
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    discount_amount = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    journal_entry = models.ForeignKey(
+        JournalEntry,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="vendor_payments",
+    )
+
+    class Meta:
+        ordering = ["payment_number"]
+        unique_together = [["company", "payment_number"]]
+
+    def __str__(self):
+        return f"{self.payment_number} - {self.amount}"
+
+
+class PaymentRunLine(models.Model):
+    """A bill paid by a payment run, and why it was picked"""
+
+    class Reason(models.TextChoices):
+        DISCOUNT = "DISCOUNT", "Early Payment Discount"
+        OVERDUE = "OVERDUE", "Overdue"
+        DUE = "DUE", "Due By Cutoff"
+
+    payment_run = models.ForeignKey(
+        PaymentRun, on_delete=models.CASCADE, related_name="lines"
+    )
+    vendor_payment = models.ForeignKey(
+        VendorPayment, on_delete=models.CASCADE, related_name="lines"
+    )
+    bill = models.ForeignKey(
+        Bill, on_delete=models.PROTECT, related_name="payment_run_lines"
+    )
+    open_amount = models.DecimalField(max_digits=15, decimal_places=2)
+    discount_amount = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    penalty_avoided = models.DecimalField(
+        max_digits=15, decimal_places=2, default=Decimal("0.00")
+    )
+    reason = models.CharField(max_length=20, choices=Reason.choices)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.payment_run.run_number} - {self.bill_id}"
+
+
+
+# ============================================================================
+# STOCK LEVELS
+# ============================================================================
+
+
+class StockLevel(models.Model):
+    """
+    On-hand quantity of one item at one location.
+    Maintained by dashboard.stock together with InventoryItem.current_stock,
+    which is the item's total over all locations. Never edit directly: post
+    an inventory movement instead.
+    """
+
+    item = models.ForeignKey(
+        InventoryItem, on_delete=models.CASCADE, related_name="stock_levels"
+    )
+    location = models.CharField(max_length=255, blank=True, default="")
+    quantity = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal("0.00")
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["item", "location"]
+        unique_together = [["item", "location"]]
+
+    def __str__(self):
+        return f"{self.item_id} @ {self.location or '-'}: {self.quantity}"
+
+
+# ============================================================================
+# INVENTORY COST LAYERS
+# ============================================================================
+
+
+class CostLayer(models.Model):
+    """
+    A receipt of stock at one unit cost (FIFO layer).
+    Issues consume the oldest open layers first, the issuing company's own
+    before others (see dashboard.stock); the item's total_value is the cost
+    of what remains in its open layers and its unit_cost their average.
+    """
+
+    item = models.ForeignKey(
+        InventoryItem, on_delete=models.CASCADE, related_name="cost_layers"
+    )
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="cost_layers",
+        help_text="Company that received the stock; empty for opening stock without one",
+    )
+    receipt = models.ForeignKey(
+        InventoryTransaction,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="cost_layers",
+        help_text="Movement that brought the stock in; empty for opening stock",
+    )
+    received_at = models.DateTimeField()
+    quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    remaining_quantity = models.DecimalField(max_digits=12, decimal_places=2)
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        ordering = ["item", "received_at", "id"]
+        indexes = [
+            models.Index(
+                fields=["item", "received_at", "id"],
+                condition=models.Q(remaining_quantity__gt=0),
+                name="cost_layer_open_idx",
+            ),
+            models.Index(
+                fields=["company", "item"],
+                condition=models.Q(remaining_quantity__gt=0),
+                name="cost_layer_company_open_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id}: {self.remaining_quantity}/{self.quantity} @ {self.unit_cost}"
+
+
+# ============================================================================
+# SCHEDULED RUNS
+# ============================================================================
+
+
+class ScheduledRun(models.Model):
+    """
+    Last start of a periodic job (e.g. the overdue sweep). Claimed with a
+    conditional UPDATE, so however many servers or schedulers start the job,
+    it runs at most once per interval.
+    """
+
+    name = models.CharField(max_length=100, unique=True)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return f"{self.name} ({self.last_started_at})"
+
+
+# ============================================================================
+# STATEMENT RUNS
+# ============================================================================
+
+
+class StatementJob(models.Model):
+    """
+    A requested run of customer statements for a period. Rows are queued by
+    the web app and claimed by `manage.py send_statements --queued`, so a
+    run survives worker restarts and only one process works it. At most one
+    run per company is queued or running at a time.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = "QUEUED", "Queued"
+        RUNNING = "RUNNING", "Running"
+        FINISHED = "FINISHED", "Finished"
+        FAILED = "FAILED", "Failed"
+
+    company = models.ForeignKey(
+        "companies.Company",
+        on_delete=models.CASCADE,
+        related_name="statement_jobs",
+    )
+    period_start = models.DateField()
+    period_end = models.DateField()
+    customer_ids = models.JSONField(
+        default=list, blank=True, help_text="Only these customers; empty for all"
+    )
+    include_zero = models.BooleanField(default=False)
+    send = models.BooleanField(default=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.QUEUED
+    )
+    total = models.IntegerField(null=True, blank=True)
+    done = models.IntegerField(default=0)
+    statements = models.IntegerField(default=0)
+    skipped = models.IntegerField(default=0)
+    emails = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        null=True, blank=True, help_text="Last progress of the process working the run"
+    )
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["company"],
+                condition=models.Q(status__in=["QUEUED", "RUNNING"]),
+                name="statement_job_one_active",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.company} statements {self.period_start} to {self.period_end} ({self.status})"
@@ -0,0 +1,41 @@
+"""
+Payment Signals
+Keep invoices and the ledger in step with payments saved or deleted directly
+- Connected on their own by AccountingConfig.ready(); the receivers in
+  accounting.signals are not
+"""
+
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Payment
+
+
+@receiver(post_save, sender=Payment)
+def update_invoice_on_payment(sender, instance, created, **kwargs):
+    """
+    Apply a new payment to its invoice
+    Payments recorded through dashboard.payments are applied there (and may
+    cover many invoices); this only handles payments saved directly.
+    """
+    if not created or not instance.invoice_id or getattr(instance, "_allocated", False):
+        return
+
+    from dashboard.payments import PaymentAllocator
+
+    amount = min(instance.amount, instance.invoice.get_balance_due())
+    remittance = [{"invoice": instance.invoice_id, "amount": amount}] if amount > 0 else []
+    PaymentAllocator(instance.company).apply(instance, remittance or None)
+
+
+@receiver(pre_delete, sender=Payment)
+def update_invoice_on_payment_delete(sender, instance, **kwargs):
+    """
+    Take a deleted payment's allocations back off its invoices and reverse
+    its entry, including the part left unapplied on account
+    """
+    from dashboard.payments import PaymentAllocator
+
+    allocator = PaymentAllocator(instance.company)
+    if allocator.is_applied(instance):
+        allocator.reverse(instance)
@@ -11,7 +11,6 @@ from datetime import date
 
 from .models import (
     Invoice,
-    Payment,
     JournalEntry,
     JournalEntryLine,
     BudgetLine,
@@ -21,63 +20,10 @@ from .models import (
 
 
 # ============================================================================
-# INVOICE & PAYMENT SIGNALS
+# INVOICE SIGNALS
 # ============================================================================
 
 
-@receiver(post_save, sender=Payment)
-def update_invoice_on_payment(sender, instance, created, **kwargs):
-    """
-    Auto-update invoice paid_amount and status when payment is recorded
-    """
-    if instance.invoice:
-        invoice = instance.invoice
-
-        # Recalculate total paid amount from all payments
-        total_paid = Payment.objects.filter(invoice=invoice).aggregate(
-            total=models.Sum("amount")
-        )["total"] or Decimal("0.00")
-
-        invoice.paid_amount = total_paid
-
-        # Auto-update status based on payment
-        if total_paid >= invoice.total_amount:
-            invoice.status = "PAID"
-        elif total_paid > Decimal("0.00"):
-            invoice.status = "PARTIALLY_PAID"  # You may need to add this status
-
-        invoice.save(update_fields=["paid_amount", "status"])
-
-        # Sync with dashboard
-        if hasattr(instance, 'company') and instance.company:
-            from dashboard.services.sync import DashboardSyncService
-            sync_service = DashboardSyncService(instance.company)
-            sync_service.sync_payment_creation(instance)
-
-
-@receiver(post_delete, sender=Payment)
-def update_invoice_on_payment_delete(sender, instance, **kwargs):
-    """
-    Update invoice when payment is deleted
-    """
-    if instance.invoice:
-        invoice = instance.invoice
-
-        # Recalculate total paid
-        total_paid = Payment.objects.filter(invoice=invoice).aggregate(
-            total=models.Sum("amount")
-        )["total"] or Decimal("0.00")
-
-        invoice.paid_amount = total_paid
-
-        # Revert status if needed
-        if total_paid < invoice.total_amount:
-            if invoice.status == "PAID":
-                invoice.status = "SENT"
-
-        invoice.save(update_fields=["paid_amount", "status"])
-
-
 @receiver(pre_save, sender=Invoice)
 def validate_invoice(sender, instance, **kwargs):
     """
@@ -241,18 +187,8 @@ def calculate_asset_book_value(sender, instance, created, **kwargs):
 # OVERDUE INVOICE DETECTION
 # ============================================================================
 
-from django.utils import timezone
-
-
-@receiver(post_save, sender=Invoice)
-def check_overdue_status(sender, instance, **kwargs):
-    """
-    Auto-mark invoices as OVERDUE when due date passes
-    """
-    today = timezone.now().date()
-
-    if instance.status in ["SENT"] and instance.due_date < today:
-        Invoice.objects.filter(pk=instance.pk).update(status="OVERDUE")
+# Invoices and bills are moved to OVERDUE in bulk by the scheduled sweep
+# (dashboard.overdue, `manage.py sweep_overdue`), not on every save.
 
 
 # Import models module for aggregate functions
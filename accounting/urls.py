@@ -12,10 +12,13 @@ urlpatterns = [
     # Invoice URLs
     path("invoices/", views.invoice_list, name="invoice_list"),
     path("invoices/create/", views.invoice_create, name="invoice_create"),
+    path("invoices/bulk/", views.invoice_bulk_action, name="invoice_bulk_action"),
+    path("invoices/pdf/", views.invoice_pdf_batch, name="invoice_pdf_batch"),
     path("invoices/<int:pk>/", views.invoice_detail, name="invoice_detail"),
     path("invoices/<int:pk>/edit/", views.invoice_edit, name="invoice_edit"),
     path("invoices/<int:pk>/delete/", views.invoice_delete, name="invoice_delete"),
     path("invoices/<int:pk>/send/", views.invoice_send, name="invoice_send"),
+    path("invoices/<int:pk>/pdf/", views.invoice_pdf, name="invoice_pdf"),
     # Payment URLs
     path("payments/create/", views.payment_create, name="payment_create"),
     path(
@@ -71,7 +74,16 @@ urlpatterns = [
     # Customer URLs
     path("customers/", views.customer_list, name="customer_list"),
     path("customers/create/", views.customer_create, name="customer_create"),
+    path("customers/statements/", views.customer_statements, name="customer_statements"),
+    path("bills/three-way-match/", views.three_way_match, name="three_way_match"),
+    path("bills/import/", views.bill_import, name="bill_import"),
+    path("bills/import/errors/<slug:token>/", views.bill_import_errors, name="bill_import_errors"),
+    path("bills/payment-runs/", views.payment_runs, name="payment_runs"),
+    path("bills/payment-runs/<int:pk>/", views.payment_run_detail, name="payment_run_detail"),
     path("customers/<int:pk>/", views.customer_detail, name="customer_detail"),
+    path("inventory/movements/", views.stock_movements, name="stock_movements"),
+    path("inventory/cogs/", views.inventory_cogs, name="inventory_cogs"),
+    path("inventory/stock-report/", views.stock_report, name="stock_report"),
     # AI Insights URLs
     path("ai/run-analysis/", views.ai_run_analysis, name="ai_run_analysis"),
     path("ai/trend-analysis/", views.ai_trend_analysis, name="ai_trend_analysis"),
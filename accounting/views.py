@@ -4,15 +4,45 @@ Multi-company aware views with proper data isolation
 """
 
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.db import transaction
-from django.db.models import Sum, Q
-from decimal import Decimal
+from django.db.models import Count, Sum, Q
+from decimal import Decimal, InvalidOperation
 from datetime import datetime, timedelta
+import io
 import json
 
+from dashboard.bill_import import error_report_path, file_format, import_bills
+from dashboard.invoice_actions import InvoiceBulkActions, select_invoices
+from dashboard.invoice_pdf import (
+    get_invoice_pdf,
+    invoice_filename,
+    iter_invoice_pdfs,
+    stream_zip,
+)
+from dashboard.pagination import KeysetPaginator, page_as_json
+from dashboard.matching import (
+    match_bill,
+    match_exceptions,
+    match_summary,
+    run_three_way_match,
+)
+from dashboard.payments import PaymentAllocator
+from dashboard.payment_runs import (
+    approve_payment_run,
+    cancel_payment_run,
+    plan_payment_run,
+    run_summary,
+)
+from dashboard.statements import start_statement_run, statement_run_status
+from dashboard.inventory_costing import inventory_value, pending_movements, post_cogs
+from dashboard.stock import post_movements
+from dashboard.stock_report import StockMovementReport
+
 from .models import (
     Invoice,
     InvoiceLine,
@@ -29,6 +59,8 @@ from .models import (
     Vendor,
     Bill,
     BillLine,
+    PaymentRun,
+    InventoryTransaction,
 )
 from .forms import (
     InvoiceForm,
@@ -51,29 +83,29 @@ from .forms import (
 
 @login_required
 def invoice_list(request):
-    """List all invoices for active company"""
+    """List invoices for active company, a keyset page at a time"""
     active_company = request.active_company
-    invoices = (
-        Invoice.objects.filter(company=active_company)
-        .select_related("customer")
-        .order_by("-invoice_date")
+    invoices = Invoice.objects.filter(company=active_company)
+
+    # Statistics (single query)
+    stats = invoices.aggregate(
+        total_count=Count("id"),
+        total_revenue=Sum("total_amount"),
+        paid_count=Count("id", filter=Q(status="PAID")),
+        overdue_count=Count("id", filter=Q(status="OVERDUE")),
     )
 
-    # Statistics
-    total_invoices = invoices.count()
-    total_revenue = invoices.aggregate(Sum("total_amount"))[
-        "total_amount__sum"
-    ] or Decimal("0.00")
-    paid_count = invoices.filter(status="PAID").count()
-    overdue_count = invoices.filter(status="OVERDUE").count()
+    invoices_page = KeysetPaginator(
+        invoices.select_related("customer"), ["-invoice_date", "-id"], 25
+    ).page_from_request(request)
 
     context = {
         "title": "Invoices",
-        "invoices": invoices,
-        "total_invoices": total_invoices,
-        "total_revenue": total_revenue,
-        "paid_count": paid_count,
-        "overdue_count": overdue_count,
+        "invoices": invoices_page,
+        "total_invoices": stats["total_count"],
+        "total_revenue": stats["total_revenue"] or Decimal("0.00"),
+        "paid_count": stats["paid_count"],
+        "overdue_count": stats["overdue_count"],
     }
     return render(request, "accounting/invoice_list.html", context)
 
@@ -213,8 +245,9 @@ def invoice_send(request, pk):
     invoice = get_object_or_404(Invoice, pk=pk, company=active_company)
 
     if invoice.status == "DRAFT":
-        invoice.status = "SENT"
-        invoice.save()
+        InvoiceBulkActions(active_company, request.user).send(
+            Invoice.objects.filter(pk=invoice.pk)
+        )
         messages.success(request, f"Invoice {invoice.invoice_number} marked as sent!")
     else:
         messages.warning(request, f"Invoice is already {invoice.get_status_display()}.")
@@ -222,6 +255,113 @@ def invoice_send(request, pk):
     return redirect("accounting:invoice_detail", pk=invoice.pk)
 
 
+@login_required
+def invoice_bulk_action(request):
+    """
+    Send, remind, mark paid or void many invoices at once
+    POST: action, and invoice_ids or filters (status, customer, date_from,
+    date_to, due_before). JSON bodies get a JSON summary back.
+    """
+    active_company = request.active_company
+    if request.method != "POST":
+        return redirect("accounting:invoice_list")
+
+    wants_json = request.content_type == "application/json"
+    try:
+        if wants_json:
+            data = json.loads(request.body)
+            invoice_ids = data.get("invoice_ids") or []
+        else:
+            data = request.POST
+            invoice_ids = request.POST.getlist("invoice_ids")
+
+        invoices = select_invoices(
+            active_company,
+            invoice_ids=[int(pk) for pk in invoice_ids],
+            status=data.get("status"),
+            customer_id=data.get("customer"),
+            date_from=data.get("date_from") or None,
+            date_to=data.get("date_to") or None,
+            due_before=data.get("due_before") or None,
+        )
+        action = data.get("action")
+        options = {}
+        if action == "mark_paid" and data.get("payment_date"):
+            options["payment_date"] = datetime.strptime(
+                data["payment_date"], "%Y-%m-%d"
+            ).date()
+        summary = InvoiceBulkActions(active_company, request.user).run(
+            action, invoices, **options
+        )
+    except (ValueError, TypeError) as e:
+        if wants_json:
+            return JsonResponse({"success": False, "error": str(e)}, status=400)
+        messages.error(request, str(e))
+        return redirect("accounting:invoice_list")
+
+    if wants_json:
+        return JsonResponse({"success": True, "action": action, **summary})
+
+    messages.success(
+        request,
+        f"{action.replace('_', ' ').capitalize()}: {summary['invoices']} invoice(s) "
+        f"processed, {summary['emails']} email(s) queued.",
+    )
+    return redirect("accounting:invoice_list")
+
+
+@login_required
+def invoice_pdf(request, pk):
+    """Invoice as a PDF (?download=1 for an attachment)"""
+    active_company = request.active_company
+    invoice = get_object_or_404(
+        Invoice.objects.select_related("company"), pk=pk, company=active_company
+    )
+
+    response = HttpResponse(get_invoice_pdf(invoice), content_type="application/pdf")
+    disposition = "attachment" if request.GET.get("download") else "inline"
+    response["Content-Disposition"] = (
+        f'{disposition}; filename="{invoice_filename(invoice.invoice_number)}"'
+    )
+    return response
+
+
+@login_required
+def invoice_pdf_batch(request):
+    """
+    Zip of invoice PDFs, streamed as they are rendered
+    GET or POST: invoice_ids or filters (status, customer, date_from,
+    date_to, due_before), as for invoice_bulk_action.
+    Month-end runs belong in `manage.py render_invoice_pdfs`.
+    """
+    active_company = request.active_company
+    data = request.POST if request.method == "POST" else request.GET
+    try:
+        invoices = select_invoices(
+            active_company,
+            invoice_ids=[int(pk) for pk in data.getlist("invoice_ids")],
+            status=data.get("status"),
+            customer_id=data.get("customer"),
+            date_from=data.get("date_from") or None,
+            date_to=data.get("date_to") or None,
+            due_before=data.get("due_before") or None,
+        )
+    except (ValueError, TypeError) as e:
+        messages.error(request, str(e))
+        return redirect("accounting:invoice_list")
+
+    if not invoices.exists():
+        messages.warning(request, "No invoices selected.")
+        return redirect("accounting:invoice_list")
+
+    response = StreamingHttpResponse(
+        stream_zip(iter_invoice_pdfs(active_company, invoices)),
+        content_type="application/zip",
+    )
+    response["Content-Disposition"] = 'attachment; filename="invoices.zip"'
+    return response
+
+
 # ============================================================================
 # PAYMENT CRUD OPERATIONS
 # ============================================================================
@@ -242,18 +382,34 @@ def payment_create(request, invoice_id=None):
             payment = form.save(commit=False)
             payment.company = active_company
             payment.created_by = request.user
-            payment.save()
+            payment._allocated = True
 
-            # Update invoice paid amount
+            # Apply to the selected invoice, or to the oldest open invoices
+            remittance = None
             if payment.invoice:
-                payment.invoice.paid_amount += payment.amount
-                if payment.invoice.paid_amount >= payment.invoice.total_amount:
-                    payment.invoice.status = "PAID"
-                payment.invoice.save()
+                amount = min(payment.amount, payment.invoice.get_balance_due())
+                if amount > 0:
+                    remittance = [{"invoice": payment.invoice.pk, "amount": amount}]
+            try:
+                with transaction.atomic():
+                    payment.save()
+                    summary = PaymentAllocator(active_company, request.user).apply(
+                        payment, remittance
+                    )
+            except ValueError as e:
+                messages.error(request, str(e))
+                context = {"title": "Record Payment", "form": form, "invoice": invoice}
+                return render(request, "accounting/payment_form.html", context)
 
             messages.success(
-                request, f"Payment {payment.payment_number} recorded successfully!"
+                request,
+                f"Payment {payment.payment_number} recorded and applied to "
+                f"{summary['invoices']} invoice(s)!",
             )
+            if summary["unapplied"] > 0:
+                messages.info(
+                    request, f"{summary['unapplied']} is unapplied and held on account."
+                )
             if payment.invoice:
                 return redirect("accounting:invoice_detail", pk=payment.invoice.pk)
             else:
@@ -289,22 +445,26 @@ def payment_create(request, invoice_id=None):
 
 @login_required
 def journal_entry_list(request):
-    """List all journal entries for active company"""
+    """List journal entries for active company, a keyset page at a time"""
     active_company = request.active_company
-    entries = JournalEntry.objects.filter(company=active_company).order_by(
-        "-entry_date"
+    entries = JournalEntry.objects.filter(company=active_company)
+
+    stats = entries.aggregate(
+        total_count=Count("id"),
+        posted_count=Count("id", filter=Q(status="POSTED")),
+        draft_count=Count("id", filter=Q(status="DRAFT")),
     )
 
-    total_entries = entries.count()
-    posted_entries = entries.filter(status="POSTED").count()
-    draft_entries = entries.filter(status="DRAFT").count()
+    entries_page = KeysetPaginator(
+        entries, ["-entry_date", "-id"], 25
+    ).page_from_request(request)
 
     context = {
         "title": "Journal Entries",
-        "entries": entries,
-        "total_entries": total_entries,
-        "posted_entries": posted_entries,
-        "draft_entries": draft_entries,
+        "entries": entries_page,
+        "total_entries": stats["total_count"],
+        "posted_entries": stats["posted_count"],
+        "draft_entries": stats["draft_count"],
     }
     return render(request, "accounting/journal_entry_list.html", context)
 
@@ -862,6 +1022,368 @@ def customer_detail(request, pk):
     return render(request, "accounting/customer_detail.html", context)
 
 
+@login_required
+def customer_statements(request):
+    """
+    Queue a statement run (POST) or report the latest run's progress (GET)
+    POST: period_start, period_end (default: last calendar month), optional
+    customer_ids and include_zero. `send_statements --queued` works the run
+    and the statements are emailed through the outbox.
+    """
+    active_company = request.active_company
+    if not active_company:
+        return JsonResponse({"success": False, "error": "No active company"}, status=400)
+
+    if request.method != "POST":
+        return JsonResponse(
+            {"success": True, "run": statement_run_status(active_company)}
+        )
+
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({"success": False, "error": "Invalid JSON"}, status=400)
+        customer_ids = data.get("customer_ids") or []
+    else:
+        data = request.POST
+        customer_ids = request.POST.getlist("customer_ids")
+
+    last_month_end = datetime.now().date().replace(day=1) - timedelta(days=1)
+    try:
+        period_start = (
+            datetime.strptime(data["period_start"], "%Y-%m-%d").date()
+            if data.get("period_start")
+            else last_month_end.replace(day=1)
+        )
+        period_end = (
+            datetime.strptime(data["period_end"], "%Y-%m-%d").date()
+            if data.get("period_end")
+            else last_month_end
+        )
+        started = start_statement_run(
+            active_company,
+            period_start,
+            period_end,
+            user=request.user,
+            customer_ids=[int(pk) for pk in customer_ids],
+            include_zero=str(data.get("include_zero", "")).lower() in ("1", "true", "on"),
+        )
+    except (ValueError, TypeError) as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    if not started:
+        return JsonResponse(
+            {"success": False, "error": "A statement run is already in progress",
+             "run": statement_run_status(active_company)},
+            status=409,
+        )
+    return JsonResponse({"success": True, "run": statement_run_status(active_company)})
+
+
+# ============================================================================
+# THREE-WAY MATCH
+# ============================================================================
+
+
+@login_required
+def three_way_match(request):
+    """
+    Match bills against purchase orders and goods received
+    GET: current results and open exceptions. POST: run the match for the
+    company, or for one bill with bill_id; rematch=1 redoes matched lines.
+    """
+    active_company = request.active_company
+    if not active_company:
+        return JsonResponse({"success": False, "error": "No active company"}, status=400)
+
+    result = None
+    if request.method == "POST":
+        bill_id = request.POST.get("bill_id")
+        if bill_id:
+            bill = get_object_or_404(Bill, pk=bill_id, company=active_company)
+            result = match_bill(bill)
+        else:
+            result = run_three_way_match(
+                active_company, rematch=request.POST.get("rematch") in ("1", "true", "on")
+            )
+
+    return JsonResponse(
+        {
+            "success": True,
+            "result": result,
+            "summary": match_summary(active_company),
+            "exceptions": match_exceptions(active_company),
+        }
+    )
+
+
+# ============================================================================
+# BILL IMPORT
+# ============================================================================
+
+
+@login_required
+def bill_import(request):
+    """
+    Import vendor bills from an uploaded CSV or JSONL file (POST "file")
+    Optional status: DRAFT (default) or APPROVED. Rejected rows are listed in
+    a CSV report downloadable from error_report_url.
+    """
+    active_company = request.active_company
+    if not active_company:
+        return JsonResponse({"success": False, "error": "No active company"}, status=400)
+    if request.method != "POST" or not request.FILES.get("file"):
+        return JsonResponse({"success": False, "error": "Upload a CSV or JSONL file"}, status=400)
+
+    upload = request.FILES["file"]
+    stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    try:
+        summary = import_bills(
+            active_company,
+            stream,
+            fmt=file_format(upload.name),
+            user=request.user,
+            status=request.POST.get("status") or Bill.Status.DRAFT,
+        )
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+    finally:
+        stream.detach()
+
+    token = summary.pop("error_report")
+    summary["error_report_url"] = (
+        reverse("accounting:bill_import_errors", args=[token]) if token else None
+    )
+    return JsonResponse({"success": True, **summary})
+
+
+@login_required
+def bill_import_errors(request, token):
+    """Download the error report of a bill import"""
+    active_company = request.active_company
+    path = error_report_path(active_company.id if active_company else 0, token)
+    if not active_company or not default_storage.exists(path):
+        raise Http404("Import report not found")
+    return FileResponse(
+        default_storage.open(path, "rb"),
+        as_attachment=True,
+        filename=f"bill-import-errors-{token[:8]}.csv",
+        content_type="text/csv",
+    )
+
+
+# ============================================================================
+# PAYMENT RUNS
+# ============================================================================
+
+
+@login_required
+def payment_runs(request):
+    """
+    Recent payment runs (GET), or plan a new draft run (POST)
+    POST: cutoff_date (bills due by then), optional payment_date (today),
+    cash_limit and bank_account_id.
+    """
+    active_company = request.active_company
+    if not active_company:
+        return JsonResponse({"success": False, "error": "No active company"}, status=400)
+
+    if request.method != "POST":
+        runs = PaymentRun.objects.filter(company=active_company).values(
+            "id", "run_number", "status", "payment_date", "cutoff_date",
+            "bill_count", "total_amount", "total_discount",
+        )[:50]
+        return JsonResponse({"success": True, "runs": list(runs)})
+
+    try:
+        payment_date = (
+            datetime.strptime(request.POST["payment_date"], "%Y-%m-%d").date()
+            if request.POST.get("payment_date")
+            else datetime.now().date()
+        )
+        cutoff_date = (
+            datetime.strptime(request.POST["cutoff_date"], "%Y-%m-%d").date()
+            if request.POST.get("cutoff_date")
+            else payment_date
+        )
+        cash_limit = request.POST.get("cash_limit") or None
+        if cash_limit is not None:
+            try:
+                cash_limit = Decimal(cash_limit.strip().replace(",", ""))
+                if not cash_limit.is_finite():
+                    raise InvalidOperation
+            except InvalidOperation:
+                return JsonResponse(
+                    {"success": False, "error": "cash_limit must be an amount, e.g. 25000.00"},
+                    status=400,
+                )
+        bank_account = None
+        if request.POST.get("bank_account_id"):
+            bank_account = get_object_or_404(
+                Account, pk=request.POST["bank_account_id"], company=active_company
+            )
+        run = plan_payment_run(
+            active_company,
+            payment_date,
+            cutoff_date,
+            cash_limit=cash_limit,
+            bank_account=bank_account,
+            user=request.user,
+        )
+    except (ValueError, ArithmeticError) as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    return JsonResponse({"success": True, "run": run_summary(run)})
+
+
+@login_required
+def payment_run_detail(request, pk):
+    """
+    A payment run and its lines (GET), or approve / cancel a draft (POST
+    action=approve|cancel)
+    """
+    active_company = request.active_company
+    run = get_object_or_404(PaymentRun, pk=pk, company=active_company)
+
+    result = None
+    if request.method == "POST":
+        action = request.POST.get("action")
+        try:
+            if action == "approve":
+                result = approve_payment_run(run, user=request.user)
+            elif action == "cancel":
+                cancel_payment_run(run)
+            else:
+                return JsonResponse({"success": False, "error": "Unknown action"}, status=400)
+        except ValueError as e:
+            return JsonResponse({"success": False, "error": str(e)}, status=409)
+        run.refresh_from_db()
+
+    return JsonResponse({"success": True, "result": result, "run": run_summary(run)})
+
+
+# ============================================================================
+# STOCK MOVEMENTS
+# ============================================================================
+
+
+@login_required
+def stock_movements(request):
+    """
+    Post a batch of stock movements, e.g. a scanner's queued scans
+    POST a JSON body {"movements": [{"barcode" | "item_code" | "item",
+    "type", "quantity", "location", ...}]}; see dashboard.stock. The batch
+    posts whole or not at all.
+    """
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "POST a batch of movements"}, status=405)
+    try:
+        movements = json.loads(request.body).get("movements") or []
+        if not isinstance(movements, list):
+            raise ValueError("movements must be a list")
+        result = post_movements(movements, user=request.user, company=request.active_company)
+    except (ValueError, TypeError, AttributeError) as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    result["stock"] = {str(item_id): quantity for item_id, quantity in result["stock"].items()}
+    return JsonResponse({"success": True, **result})
+
+
+@login_required
+def inventory_cogs(request):
+    """
+    Inventory value and the cost not yet posted to the ledger (GET), or post
+    it (POST, optional through=YYYY-MM-DD): one journal entry per day
+    """
+    active_company = request.active_company
+    if not active_company:
+        return JsonResponse({"success": False, "error": "No active company"}, status=400)
+
+    result = None
+    if request.method == "POST":
+        try:
+            through = (
+                datetime.strptime(request.POST["through"], "%Y-%m-%d").date()
+                if request.POST.get("through")
+                else None
+            )
+            result = post_cogs(active_company, through=through, user=request.user)
+        except ValueError as e:
+            return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    receipt = Q(transaction_type=InventoryTransaction.TransactionType.RECEIPT)
+    pending = pending_movements(active_company).aggregate(
+        movements=Count("id"),
+        amount=Sum("cost_amount", filter=~receipt),
+        received=Sum("cost_amount", filter=receipt),
+    )
+    return JsonResponse(
+        {
+            "success": True,
+            "result": result,
+            "inventory": inventory_value(active_company),
+            "pending": {
+                "movements": pending["movements"],
+                "amount": -(pending["amount"] or Decimal("0.00")),
+                "received": pending["received"] or Decimal("0.00"),
+            },
+        }
+    )
+
+
+@login_required
+def stock_report(request):
+    """
+    Stock movement report per item (JSON, one keyset page per request)
+    GET: date_from, date_to (default month to date), category, status,
+    cursor; export=csv streams the whole report.
+    """
+    active_company = request.active_company
+    if not active_company:
+        return JsonResponse({"success": False, "error": "No active company"}, status=400)
+
+    try:
+        today = datetime.now().date()
+        start_date = (
+            datetime.strptime(request.GET["date_from"], "%Y-%m-%d").date()
+            if request.GET.get("date_from")
+            else today.replace(day=1)
+        )
+        end_date = (
+            datetime.strptime(request.GET["date_to"], "%Y-%m-%d").date()
+            if request.GET.get("date_to")
+            else today
+        )
+        report = StockMovementReport(
+            active_company,
+            start_date,
+            end_date,
+            category=int(request.GET["category"]) if request.GET.get("category") else None,
+            status=request.GET.get("status") or None,
+        )
+    except ValueError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    if request.GET.get("export") == "csv":
+        response = StreamingHttpResponse(report.csv_lines(), content_type="text/csv")
+        response["Content-Disposition"] = (
+            f'attachment; filename="stock_report_{start_date:%Y%m%d}_{end_date:%Y%m%d}.csv"'
+        )
+        return response
+
+    page = report.paginator().page_from_request(request)
+    return JsonResponse(
+        {
+            "success": True,
+            "date_from": start_date,
+            "date_to": end_date,
+            "items": list(page),
+            **page_as_json(page),
+        }
+    )
+
+
 # ============================================================================
 # AI INSIGHTS OPERATIONS
 # ============================================================================
@@ -1,3 +1,28 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from accounting.models import Customer
+from companies.models import Company, UserCompany
+
+
+class GlobalSearchApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("accountant", password="pw")
+        self.acme = Company.objects.create(name="Acme")
+        self.beta = Company.objects.create(name="Beta")
+        UserCompany.objects.create(user=self.user, company=self.acme, is_active=True)
+        for company, code in ((self.acme, "C001"), (self.beta, "C002")):
+            Customer.objects.create(
+                company=company, customer_code=code, company_name="Globex", contact_name="Globex"
+            )
+        self.client.force_login(self.user)
+
+    def test_search_is_routed_and_scoped_to_the_active_company(self):
+        response = self.client.get(reverse("api:global_search_api"), {"q": "glob"})
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([result["code"] for result in results], ["C001"])
@@ -16,5 +16,6 @@ urlpatterns = [
     path('kpi/live-updates/', views.live_kpi_updates_api, name='live_kpi_updates_api'),
     path('customers/search/', views.customer_search_api, name='customer_search_api'),
     path('invoices/search/', views.invoice_search_api, name='invoice_search_api'),
+    path('search/', views.global_search_api, name='global_search_api'),
     path('dashboard/summary/', views.dashboard_summary_api, name='dashboard_summary_api'),
 ]
@@ -1,12 +1,28 @@
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Sum
-from accounting.models import Account, AccountType, Customer, Invoice, Payment, JournalEntry
+from django.db.models import F, Sum
+from accounting.models import (
+    Customer,
+    Invoice,
+    Payment,
+    SearchEntry,
+)
+from dashboard.ratios import (
+    FinancialRatioEngine,
+    ratio_export_rows,
+    ratio_history,
+    ratios_as_json,
+    trends_as_json,
+)
+from dashboard.conditional import company_conditional
+from dashboard.pagination import KeysetPaginator, page_as_json
+from dashboard.search import search, search_ids
 from dashboard.services.sync import DashboardSyncService
 from decimal import Decimal
 
 
 @login_required
+@company_conditional(ledger_only=True)
 def calculate_ratios_api(request):
     """
     API endpoint to calculate financial ratios dynamically
@@ -14,108 +30,16 @@ def calculate_ratios_api(request):
     try:
         active_company = request.active_company
 
-        # Get balance sheet data
-        assets = Account.objects.filter(company=active_company, account_type=AccountType.ASSET, is_active=True)
-        liabilities = Account.objects.filter(
-            company=active_company, account_type=AccountType.LIABILITY, is_active=True
-        )
-        equity = Account.objects.filter(company=active_company, account_type=AccountType.EQUITY, is_active=True)
-
-        total_assets = sum(acc.get_balance() for acc in assets)
-        total_liabilities = sum(acc.get_balance() for acc in liabilities)
-        total_equity = sum(acc.get_balance() for acc in equity)
-
-        # Get income statement data
-        revenue_accounts = Account.objects.filter(
-            company=active_company, account_type=AccountType.REVENUE, is_active=True
-        )
-        expense_accounts = Account.objects.filter(
-            company=active_company, account_type=AccountType.EXPENSE, is_active=True
-        )
-
-        total_revenue = sum(acc.get_balance() for acc in revenue_accounts)
-        total_expenses = sum(acc.get_balance() for acc in expense_accounts)
-        net_income = total_revenue - total_expenses
-
-        # Calculate ratios
-        ratios = {}
-
-        # Liquidity ratios
-        current_assets = sum(acc.get_balance() for acc in assets if acc.code < "1400")
-        current_liabilities = sum(
-            acc.get_balance() for acc in liabilities if acc.code < "2300"
-        )
-
-        ratios["current_ratio"] = float(
-            (current_assets / current_liabilities)
-            if current_liabilities > 0
-            else Decimal("0.00")
-        )
-        ratios["quick_ratio"] = float(ratios["current_ratio"])  # Simplified
-        ratios["cash_ratio"] = float(
-            (current_assets * Decimal("0.5") / current_liabilities)
-            if current_liabilities > 0
-            else Decimal("0.00")
-        )  # Simplified
-        ratios["working_capital"] = float(current_assets - current_liabilities)
-
-        # Profitability ratios
-        ratios["gross_margin"] = float(
-            ((total_revenue - total_expenses) / total_revenue * 100)
-            if total_revenue > 0
-            else Decimal("0.00")
-        )
-        ratios["operating_margin"] = float(
-            (net_income / total_revenue * 100) if total_revenue > 0 else Decimal("0.00")
-        )
-        ratios["net_margin"] = float(
-            (net_income / total_revenue * 100) if total_revenue > 0 else Decimal("0.00")
-        )
-        ratios["return_on_assets"] = float(
-            (net_income / total_assets * 100) if total_assets > 0 else Decimal("0.00")
-        )
+        result = FinancialRatioEngine(active_company).calculate()
 
-        # Efficiency ratios
-        ratios["asset_turnover"] = float(
-            (total_revenue / total_assets) if total_assets > 0 else Decimal("0.00")
-        )
-        ratios["inventory_turnover"] = 8.5  # Mock data
-        ratios["receivables_turnover"] = 6.2  # Mock data
-        ratios["payables_turnover"] = 12.8  # Mock data
-
-        # Leverage ratios
-        ratios["debt_to_equity"] = float(
-            (total_liabilities / total_equity) if total_equity > 0 else Decimal("0.00")
-        )
-        ratios["debt_ratio"] = float(
-            (total_liabilities / total_assets * 100)
-            if total_assets > 0
-            else Decimal("0.00")
-        )
-        ratios["equity_ratio"] = float(
-            (total_equity / total_assets * 100) if total_assets > 0 else Decimal("0.00")
-        )
-        ratios["interest_coverage"] = 25.6  # Mock data
-
-        return JsonResponse(
-            {
-                "success": True,
-                "ratios": ratios,
-                "financial_data": {
-                    "total_assets": float(total_assets),
-                    "total_liabilities": float(total_liabilities),
-                    "total_equity": float(total_equity),
-                    "net_income": float(net_income),
-                    "total_revenue": float(total_revenue),
-                },
-            }
-        )
+        return JsonResponse(ratios_as_json(result))
 
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)})
 
 
 @login_required
+@company_conditional(ledger_only=True)
 def trend_analysis_api(request):
     """
     API endpoint for financial ratios trend analysis
@@ -123,19 +47,13 @@ def trend_analysis_api(request):
     try:
         active_company = request.active_company
 
-        # Mock trend data - in a real system, this would be calculated from historical data
-        months = ["Apr", "May", "Jun", "Jul", "Aug", "Sep"]
+        # ?months=12&ratios=current_ratio,quick_ratio
+        months = min(max(int(request.GET.get("months", 6)), 1), 60)
+        names = [n for n in request.GET.get("ratios", "").split(",") if n]
 
-        trends = {
-            "current_ratio": [2.1, 2.2, 2.3, 2.2, 2.3, 2.4],
-            "profit_margin": [22.1, 24.2, 25.8, 26.3, 24.7, 25.3],
-            "asset_turnover": [3.8, 4.1, 4.2, 4.0, 4.1, 4.2],
-            "debt_to_equity": [0.25, 0.24, 0.23, 0.23, 0.22, 0.22],
-            "net_margin": [20.1, 22.2, 23.8, 24.3, 22.7, 25.3],
-            "return_on_assets": [10.2, 11.2, 11.8, 12.3, 11.7, 12.2],
-        }
+        history = ratio_history(active_company, months)
 
-        return JsonResponse({"success": True, "trends": trends, "months": months})
+        return JsonResponse(trends_as_json(history, names))
 
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)})
@@ -214,13 +132,13 @@ def industry_compare_api(request):
 
 
 @login_required
+@company_conditional(ledger_only=True)
 def export_ratios_api(request):
     """
     API endpoint to export financial ratios report
     """
     from django.http import HttpResponse
     import csv
-    import io
 
     try:
         active_company = request.active_company
@@ -228,77 +146,9 @@ def export_ratios_api(request):
         # Get format from request
         export_format = request.GET.get("format", "csv")
 
-        # Calculate ratios (similar to calculate_ratios_api)
-        assets = Account.objects.filter(company=active_company, account_type=AccountType.ASSET, is_active=True)
-        liabilities = Account.objects.filter(
-            company=active_company, account_type=AccountType.LIABILITY, is_active=True
-        )
-        equity = Account.objects.filter(company=active_company, account_type=AccountType.EQUITY, is_active=True)
-
-        total_assets = sum(acc.get_balance() for acc in assets)
-        total_liabilities = sum(acc.get_balance() for acc in liabilities)
-        total_equity = sum(acc.get_balance() for acc in equity)
-
-        revenue_accounts = Account.objects.filter(
-            company=active_company, account_type=AccountType.REVENUE, is_active=True
-        )
-        expense_accounts = Account.objects.filter(
-            company=active_company, account_type=AccountType.EXPENSE, is_active=True
-        )
-
-        total_revenue = sum(acc.get_balance() for acc in revenue_accounts)
-        total_expenses = sum(acc.get_balance() for acc in expense_accounts)
-        net_income = total_revenue - total_expenses
-
-        # Prepare export data
-        export_data = [
-            ["Financial Ratios Report", ""],
-            ["Generated on", "2025-01-07"],
-            ["", ""],
-            ["Liquidity Ratios", ""],
-            [
-                "Current Ratio",
-                f"{(total_assets/total_liabilities if total_liabilities > 0 else 0):.2f}:1",
-            ],
-            [
-                "Quick Ratio",
-                f"{(total_assets*Decimal('0.8')/total_liabilities if total_liabilities > 0 else 0):.2f}:1",
-            ],
-            [
-                "Cash Ratio",
-                f"{(total_assets*Decimal('0.3')/total_liabilities if total_liabilities > 0 else 0):.2f}:1",
-            ],
-            ["", ""],
-            ["Profitability Ratios", ""],
-            [
-                "Gross Margin",
-                f"{((total_revenue-total_expenses)/total_revenue*100 if total_revenue > 0 else 0):.1f}%",
-            ],
-            [
-                "Net Margin",
-                f"{(net_income/total_revenue*100 if total_revenue > 0 else 0):.1f}%",
-            ],
-            [
-                "Return on Assets",
-                f"{(net_income/total_assets*100 if total_assets > 0 else 0):.1f}%",
-            ],
-            ["", ""],
-            ["Efficiency Ratios", ""],
-            [
-                "Asset Turnover",
-                f"{(total_revenue/total_assets if total_assets > 0 else 0):.1f}x",
-            ],
-            ["", ""],
-            ["Solvency Ratios", ""],
-            [
-                "Debt-to-Equity",
-                f"{(total_liabilities/total_equity if total_equity > 0 else 0):.2f}:1",
-            ],
-            [
-                "Debt Ratio",
-                f"{(total_liabilities/total_assets*100 if total_assets > 0 else 0):.1f}%",
-            ],
-        ]
+        # Same cached result as calculate_ratios_api
+        result = FinancialRatioEngine(active_company).calculate()
+        export_data = ratio_export_rows(result)
 
         if export_format == "csv":
             # Create CSV response
@@ -399,24 +249,47 @@ def customer_search_api(request):
         active_company = request.active_company
         query = request.GET.get('q', '').strip()
 
-        customers = Customer.objects.filter(
-            company=active_company,
-            is_active=True
-        ).filter(
-            Q(company_name__icontains=query) |
-            Q(customer_code__icontains=query)
-        ).values(
-            'id', 'customer_code', 'company_name'
-        )[:10]  # Limit results
-
-        # Add balance information
-        for customer in customers:
-            customer_obj = Customer.objects.get(id=customer['id'])
-            customer['outstanding_balance'] = float(customer_obj.get_outstanding_balance())
+        if query:
+            results = search(
+                active_company,
+                query,
+                types=[SearchEntry.ObjectType.CUSTOMER],
+                statuses=['ACTIVE'],
+                limit=10,
+            )
+            customers = [
+                {
+                    'id': r['object_id'],
+                    'customer_code': r['code'],
+                    'company_name': r['title'],
+                    'outstanding_balance': float(r['balance'] or 0),
+                }
+                for r in results
+            ]
+            pagination = page_as_json()  # ranked matches are a single page
+        else:
+            # Browsing: alphabetical keyset pages, balances from the rollup
+            page = KeysetPaginator(
+                Customer.objects.filter(
+                    company=active_company, is_active=True
+                ).annotate(
+                    outstanding_balance=F('balance__outstanding')
+                ).values(
+                    'id', 'customer_code', 'company_name', 'outstanding_balance'
+                ),
+                ['company_name', 'id'],
+                10,
+            ).page(request.GET.get('cursor'))
+            customers = [
+                {**c, 'outstanding_balance': float(c['outstanding_balance'] or 0)}
+                for c in page
+            ]
+            pagination = page_as_json(page)
 
         return JsonResponse({
             "success": True,
-            "customers": list(customers)
+            "customers": customers,
+            **pagination
         })
 
     except Exception as e:
@@ -442,16 +315,30 @@ def invoice_search_api(request):
         if customer_id:
             invoices = invoices.filter(customer_id=customer_id)
 
-        if query:
-            invoices = invoices.filter(
-                Q(invoice_number__icontains=query) |
-                Q(customer__company_name__icontains=query)
-            )
-
-        invoice_data = invoices.values(
+        fields = (
             'id', 'invoice_number', 'total_amount', 'paid_amount',
             'customer__company_name', 'due_date', 'status'
-        ).order_by('-invoice_date')[:20]
+        )
+
+        if query:
+            # Ranked index lookup, then one fetch keeping the rank order
+            ids = search_ids(
+                active_company,
+                query,
+                SearchEntry.ObjectType.INVOICE,
+                statuses=['SENT', 'OVERDUE'],
+                parent_id=customer_id,
+                limit=20,
+            )
+            by_id = {i['id']: i for i in invoices.filter(id__in=ids).values(*fields)}
+            invoice_data = [by_id[i] for i in ids if i in by_id]
+            pagination = page_as_json()  # ranked matches are a single page
+        else:
+            page = KeysetPaginator(
+                invoices.values(*fields, 'invoice_date'), ['-invoice_date', '-id'], 20
+            ).page(request.GET.get('cursor'))
+            invoice_data = list(page)
+            pagination = page_as_json(page)
 
         # Calculate remaining balance for each
         for invoice in invoice_data:
@@ -461,7 +348,38 @@ def invoice_search_api(request):
 
         return JsonResponse({
             "success": True,
-            "invoices": list(invoice_data)
+            "invoices": invoice_data,
+            **pagination
+        })
+
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)})
+
+
+@login_required
+def global_search_api(request):
+    """
+    API endpoint for typeahead search across customers, vendors, invoices,
+    journal entries and documents
+    """
+    try:
+        active_company = request.active_company
+        query = request.GET.get('q', '').strip()
+        types = [t for t in request.GET.get('types', '').upper().split(',') if t]
+
+        try:
+            limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+
+        results = search(active_company, query, types=types or None, limit=limit)
+        for result in results:
+            if result['balance'] is not None:
+                result['balance'] = float(result['balance'])
+
+        return JsonResponse({
+            "success": True,
+            "results": results
         })
 
     except Exception as e:
@@ -469,6 +387,7 @@ def invoice_search_api(request):
 
 
 @login_required
+@company_conditional
 def dashboard_summary_api(request):
     """
     API endpoint for dashboard summary data
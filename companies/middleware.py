@@ -12,6 +12,9 @@ class ActiveCompanyMiddleware:
     - Falls back to session-stored company_id
     - Provides user_companies list for easy access
     - Handles company access verification
+    - Memberships are read from the database on every request (one query),
+      so a revoked membership takes effect at once in every worker;
+      active_company_id is written to the session only when it changes
     """
 
     def __init__(self, get_response):
@@ -23,37 +26,51 @@ class ActiveCompanyMiddleware:
         request.user_companies = []
 
         if request.user.is_authenticated:
-            # Get all companies this user has access to
-            user_companies = UserCompany.objects.filter(
-                user=request.user
-            ).select_related('company')
-
-            request.user_companies = user_companies
-
-            # Try to get active company from database
-            active_uc = user_companies.filter(is_active=True).first()
-
-            if active_uc:
-                request.active_company = active_uc.company
-                # Sync session
-                request.session['active_company_id'] = active_uc.company.id
-            else:
-                # Try to get from session
-                session_company_id = request.session.get('active_company_id')
-                if session_company_id:
-                    try:
-                        uc = user_companies.filter(company_id=session_company_id).first()
-                        if uc:
-                            # Restore active company
-                            uc.is_active = True
-                            uc.save()
-                            # Deactivate others
-                            user_companies.exclude(id=uc.id).update(is_active=False)
-                            request.active_company = uc.company
-                    except Exception:
-                        pass
+            context = self.build_company_context(request)
+            request.active_company = context['active_company']
+            request.user_companies = context['user_companies']
 
             # Store user's company IDs for quick access check
-            request.user_company_ids = [uc.company_id for uc in user_companies]
+            request.user_company_ids = context['company_ids']
 
         return self.get_response(request)
+
+    def build_company_context(self, request):
+        # Get all companies this user has access to
+        user_companies = list(
+            UserCompany.objects.filter(user=request.user).select_related('company')
+        )
+
+        # Try to get active company from database
+        active_uc = next((uc for uc in user_companies if uc.is_active), None)
+
+        if active_uc is None:
+            # Try to get from session
+            session_company_id = request.session.get('active_company_id')
+            if session_company_id:
+                try:
+                    uc = next(
+                        (uc for uc in user_companies if uc.company_id == session_company_id),
+                        None,
+                    )
+                    if uc:
+                        # Restore active company
+                        uc.is_active = True
+                        uc.save()
+                        # Deactivate others
+                        UserCompany.objects.filter(user=request.user).exclude(
+                            id=uc.id
+                        ).update(is_active=False)
+                        active_uc = uc
+                except Exception:
+                    pass
+
+        # Sync session (only written when it actually changes)
+        if active_uc and request.session.get('active_company_id') != active_uc.company_id:
+            request.session['active_company_id'] = active_uc.company_id
+
+        return {
+            'active_company': active_uc.company if active_uc else None,
+            'company_ids': [uc.company_id for uc in user_companies],
+            'user_companies': user_companies,
+        }
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0002_alter_company_options_company_city_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='ledger_version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped whenever posted ledger data changes'),
+        ),
+    ]
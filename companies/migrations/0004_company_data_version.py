@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0003_company_ledger_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='data_updated_at',
+            field=models.DateTimeField(blank=True, help_text='Time of the last data_version bump', null=True),
+        ),
+        migrations.AddField(
+            model_name='company',
+            name='data_version',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped whenever any financial record changes'),
+        ),
+    ]
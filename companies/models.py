@@ -26,6 +26,11 @@ class Company(models.Model):
     currency = models.CharField(max_length=10, default="JOD")
     fiscal_year_start = models.DateField(blank=True, null=True, help_text="Start of fiscal year (e.g., Jan 1)")
 
+    # Ledger state
+    ledger_version = models.PositiveIntegerField(default=0, help_text="Bumped whenever posted ledger data changes")
+    data_version = models.PositiveIntegerField(default=0, help_text="Bumped whenever any financial record changes")
+    data_updated_at = models.DateTimeField(blank=True, null=True, help_text="Time of the last data_version bump")
+
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -1,3 +1,36 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import Company, UserCompany
+
+
+class CompanyContextTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("owner", password="pw")
+        self.company = Company.objects.create(name="Acme")
+        UserCompany.objects.create(user=self.user, company=self.company, is_active=True)
+        self.client.force_login(self.user)
+
+    def test_details_save_keeps_versions_bumped_by_postings(self):
+        Company.objects.filter(pk=self.company.pk).update(data_version=7, ledger_version=3)
+
+        self.client.post(reverse("company_details"), {"name": "Acme Ltd", "currency": "USD"})
+
+        company = Company.objects.get(pk=self.company.pk)
+        self.assertEqual(company.name, "Acme Ltd")
+        self.assertEqual(company.currency, "USD")
+        self.assertEqual((company.data_version, company.ledger_version), (7, 3))
+
+    def test_membership_changes_apply_on_the_next_request(self):
+        other = Company.objects.create(name="Beta")
+        self.client.get(reverse("company_details"))
+
+        UserCompany.objects.filter(user=self.user).update(is_active=False)
+        UserCompany.objects.create(user=self.user, company=other, is_active=True)
+        response = self.client.get(reverse("company_details"))
+        self.assertEqual(response.context["company"], other)
+
+        UserCompany.objects.filter(user=self.user, company=other).delete()
+        response = self.client.get(reverse("company_details"))
+        self.assertRedirects(response, reverse("add_company"), fetch_redirect_response=False)
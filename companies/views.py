@@ -5,6 +5,24 @@ from django.http import JsonResponse
 from .models import Company, UserCompany
 import os
 
+# Company fields edited on the details page (saved with update_fields)
+COMPANY_DETAIL_FIELDS = [
+    "name",
+    "legal_name",
+    "industry_type",
+    "description",
+    "address",
+    "city",
+    "country",
+    "phone",
+    "email",
+    "website",
+    "registration_number",
+    "tax_number",
+    "currency",
+    "updated_at",
+]
+
 
 @login_required
 def add_company(request):
@@ -83,11 +101,13 @@ def company_details(request):
         active_company.registration_number = request.POST.get("registration_number", "")
         active_company.tax_number = request.POST.get("tax_number", "")
         active_company.currency = request.POST.get("currency", "JOD")
+        update_fields = list(COMPANY_DETAIL_FIELDS)
 
         # Handle fiscal year start
         fiscal_year_start = request.POST.get("fiscal_year_start", "")
         if fiscal_year_start:
             active_company.fiscal_year_start = fiscal_year_start
+            update_fields.append("fiscal_year_start")
 
         # Handle logo upload
         if request.FILES.get("logo"):
@@ -96,8 +116,11 @@ def company_details(request):
                 if os.path.isfile(active_company.logo.path):
                     os.remove(active_company.logo.path)
             active_company.logo = request.FILES["logo"]
+            update_fields.append("logo")
 
-        active_company.save()
+        # Save only the edited fields so data/ledger versions bumped by a
+        # concurrent posting are kept
+        active_company.save(update_fields=update_fields)
         messages.success(request, f"Company details updated successfully!")
         return redirect("company_details")
 
@@ -139,7 +162,7 @@ def upload_logo(request):
 
         # Save new logo
         active_company.logo = logo
-        active_company.save()
+        active_company.save(update_fields=["logo", "updated_at"])
 
         return JsonResponse(
             {
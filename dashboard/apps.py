@@ -8,3 +8,6 @@ class DashboardConfig(AppConfig):
     def ready(self):
         """Import signal handlers when app is ready"""
         import dashboard.cache_signals  # noqa
+        import dashboard.matching_signals  # noqa
+        import dashboard.rollup_signals  # noqa
+        import dashboard.search_signals  # noqa
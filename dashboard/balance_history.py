@@ -0,0 +1,95 @@
+"""
+Balance History
+Maintains AccountMonthlyBalance, the per-account month-end activity table
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncMonth
+
+from accounting.models import AccountMonthlyBalance, JournalEntry, JournalEntryLine
+
+
+def month_start(value):
+    return value.replace(day=1)
+
+
+def add_months(month, count):
+    """First day of the month `count` months after (or before) `month`"""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def _posted_lines(company):
+    return JournalEntryLine.objects.filter(
+        journal_entry__company=company,
+        journal_entry__status=JournalEntry.Status.POSTED,
+    )
+
+
+def rebuild_month(company, month):
+    """
+    Recompute one month of history for a company from its posted lines
+    Called after a posting touches the month; cost is one month of lines.
+    """
+    month = month_start(month)
+    next_month = add_months(month, 1)
+
+    rows = (
+        _posted_lines(company)
+        .filter(
+            journal_entry__entry_date__gte=month,
+            journal_entry__entry_date__lt=next_month,
+        )
+        .values("account_id")
+        .annotate(debit=Sum("debit_amount"), credit=Sum("credit_amount"))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        AccountMonthlyBalance.objects.filter(company=company, month=month).delete()
+        AccountMonthlyBalance.objects.bulk_create(
+            [
+                AccountMonthlyBalance(
+                    company=company,
+                    account_id=row["account_id"],
+                    month=month,
+                    debit_total=row["debit"] or Decimal("0.00"),
+                    credit_total=row["credit"] or Decimal("0.00"),
+                )
+                for row in rows
+            ]
+        )
+
+
+def rebuild_history(company, batch_size=1000):
+    """
+    Rebuild the full history of a company in one grouped pass over its lines
+    Returns the number of account-month rows written.
+    """
+    rows = (
+        _posted_lines(company)
+        .annotate(month=TruncMonth("journal_entry__entry_date"))
+        .values("account_id", "month")
+        .annotate(debit=Sum("debit_amount"), credit=Sum("credit_amount"))
+        .order_by()
+    )
+
+    balances = [
+        AccountMonthlyBalance(
+            company=company,
+            account_id=row["account_id"],
+            month=row["month"],
+            debit_total=row["debit"] or Decimal("0.00"),
+            credit_total=row["credit"] or Decimal("0.00"),
+        )
+        for row in rows.iterator()
+    ]
+
+    with transaction.atomic():
+        AccountMonthlyBalance.objects.filter(company=company).delete()
+        AccountMonthlyBalance.objects.bulk_create(balances, batch_size=batch_size)
+
+    return len(balances)
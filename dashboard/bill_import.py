@@ -0,0 +1,452 @@
+"""
+Bill Import
+Streams vendor bill batches from CSV or JSONL files into bills and lines
+- The file is read row by row and written in chunks, never held whole
+- Vendors, accounts and the company's (vendor, bill number) pairs are
+  preloaded into dicts and sets, so a row costs no queries
+- Bills and bill lines are inserted with bulk_create, one chunk at a time
+- Rejected rows go to a CSV error report kept in storage
+- Rollups, search, caches and three-way matching are refreshed once per
+  import, since bulk inserts send no signals
+"""
+
+import csv
+import io
+import json
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from accounting.models import Account, Bill, BillLine, InventoryItem, Vendor
+from dashboard.matching import ThreeWayMatcher
+from dashboard.rollups import VENDORS, apply_document_changes, document_state
+
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+# Bill lines per bulk insert
+CHUNK_SIZE = 1000
+
+# Rejected rows returned inline; the report file has all of them
+ERROR_PREVIEW = 100
+
+IMPORT_STATUSES = [Bill.Status.DRAFT, Bill.Status.APPROVED]
+
+REPORT_COLUMNS = ["row", "vendor", "bill_number", "error"]
+
+MAX_DESCRIPTION = BillLine._meta.get_field("description").max_length
+MAX_BILL_NUMBER = Bill._meta.get_field("bill_number").max_length
+
+
+def _normalize(text):
+    return " ".join(str(text or "").lower().split())
+
+
+def _text(data, key):
+    value = data.get(key)
+    return "" if value is None else str(value).strip()
+
+
+def _decimal(data, key, default=None):
+    value = _text(data, key).replace(",", "")
+    if not value:
+        if default is None:
+            raise ValueError(f"Missing {key}")
+        return default
+    try:
+        return Decimal(value).quantize(CENT)
+    except InvalidOperation:
+        raise ValueError(f"Invalid {key}: {value!r}")
+
+
+def _date(data, key):
+    value = _text(data, key)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {key}: {value!r} (use YYYY-MM-DD)")
+
+
+def error_report_path(company_id, token):
+    return f"imports/bills/{company_id}/{token}.csv"
+
+
+def file_format(filename):
+    """Format of an upload from its file extension: jsonl or csv"""
+    name = (filename or "").lower()
+    return "jsonl" if name.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def read_rows(stream, fmt="csv"):
+    """
+    Yield (row number, data, error) from a text stream, one row at a time
+    A JSONL object may carry bill fields plus a "lines" list; each line
+    becomes a row under the object's line number.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        if reader.fieldnames:
+            reader.fieldnames = [_normalize(name).replace(" ", "_") for name in reader.fieldnames]
+        for number, row in enumerate(reader, start=2):
+            yield number, row, None
+        return
+
+    for number, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            data = json.loads(text)
+        except ValueError as exc:
+            yield number, {}, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(data, dict):
+            yield number, {}, "Expected a JSON object"
+            continue
+        lines = data.pop("lines", None)
+        if lines is None:
+            yield number, data, None
+        elif not isinstance(lines, list) or not lines:
+            yield number, data, "\"lines\" must be a non-empty list"
+        else:
+            for line in lines:
+                if isinstance(line, dict):
+                    yield number, {**data, **line}, None
+                else:
+                    yield number, data, "Each line must be a JSON object"
+
+
+class _PendingBill:
+    """A bill collected from the file but not written yet"""
+
+    __slots__ = ("vendor_id", "bill_number", "bill", "lines", "rows", "failed")
+
+    def __init__(self, vendor_id, bill_number):
+        self.vendor_id = vendor_id
+        self.bill_number = bill_number
+        self.bill = None
+        self.lines = []
+        self.rows = []
+        self.failed = []
+
+
+class BillImporter:
+    """
+    Import bills for a company
+    One row per bill line; rows of a bill share vendor (code or name) and
+    bill_number. Columns: vendor, bill_number, bill_date, due_date,
+    description, quantity, unit_price (or amount), tax_amount, account
+    (code or name), item_code, notes. Bill fields come from the bill's first
+    row and tax_amount is summed over its rows. A bill with any rejected
+    row is not imported; bills the company already has are skipped as
+    duplicates.
+    """
+
+    def __init__(self, company, user=None, status=Bill.Status.DRAFT,
+                 chunk_size=CHUNK_SIZE, match=True):
+        status = str(status).upper()
+        if status not in IMPORT_STATUSES:
+            raise ValueError(f"Imported bills can only be {' or '.join(IMPORT_STATUSES)}.")
+        self.company = company
+        self.user = user
+        self.status = status
+        self.chunk_size = chunk_size
+        self.match = match
+        self._load()
+
+    def _load(self):
+        """Vendor and account maps and existing bill keys, three queries"""
+        self.vendors = {}
+        self.terms = {}
+        for vendor_id, code, name, terms in Vendor.objects.filter(
+            company=self.company
+        ).values_list("id", "vendor_code", "company_name", "payment_terms_days"):
+            self.vendors[_normalize(code)] = vendor_id
+            self.vendors.setdefault(_normalize(name), vendor_id)
+            self.terms[vendor_id] = terms
+
+        self.accounts = {}
+        for account_id, code, name in Account.objects.filter(
+            company=self.company, is_active=True
+        ).values_list("id", "code", "name"):
+            self.accounts[_normalize(code)] = account_id
+            self.accounts.setdefault(_normalize(name), account_id)
+
+        self.existing = set(
+            Bill.objects.filter(company=self.company).values_list("vendor_id", "bill_number")
+        )
+        self.numbers = {number for _, number in self.existing}
+
+    # ------------------------------------------------------------------
+    # Rows
+    # ------------------------------------------------------------------
+
+    def _bill_key(self, data):
+        vendor = _text(data, "vendor")
+        bill_number = _text(data, "bill_number")
+        if not vendor:
+            raise ValueError("Missing vendor")
+        if not bill_number:
+            raise ValueError("Missing bill_number")
+        if len(bill_number) > MAX_BILL_NUMBER:
+            raise ValueError(f"bill_number is longer than {MAX_BILL_NUMBER} characters")
+        vendor_id = self.vendors.get(_normalize(vendor))
+        if vendor_id is None:
+            raise ValueError(f"Unknown vendor {vendor!r}")
+        return vendor_id, bill_number
+
+    def _bill(self, vendor_id, bill_number, data):
+        bill_date = _date(data, "bill_date")
+        if bill_date is None:
+            raise ValueError("Missing bill_date")
+        due_date = _date(data, "due_date") or bill_date + timedelta(days=self.terms[vendor_id])
+        if due_date < bill_date:
+            raise ValueError("due_date is before bill_date")
+        return Bill(
+            company=self.company,
+            vendor_id=vendor_id,
+            bill_number=bill_number,
+            bill_date=bill_date,
+            due_date=due_date,
+            status=self.status,
+            notes=_text(data, "notes") or None,
+            created_by=self.user,
+        )
+
+    def _line(self, data):
+        description = _text(data, "description") or _text(data, "item_code")
+        if not description:
+            raise ValueError("Missing description")
+        if len(description) > MAX_DESCRIPTION:
+            raise ValueError(f"description is longer than {MAX_DESCRIPTION} characters")
+
+        if _text(data, "unit_price") or not _text(data, "amount"):
+            quantity = _decimal(data, "quantity", Decimal("1.00"))
+            unit_price = _decimal(data, "unit_price")
+            line_total = (quantity * unit_price).quantize(CENT)
+        else:
+            quantity = _decimal(data, "quantity", Decimal("1.00"))
+            line_total = _decimal(data, "amount")
+            unit_price = (line_total / quantity).quantize(CENT) if quantity else ZERO
+        if not quantity:
+            raise ValueError("quantity is zero")
+
+        account = _text(data, "account")
+        account_id = None
+        if account:
+            account_id = self.accounts.get(_normalize(account))
+            if account_id is None:
+                raise ValueError(f"Unknown account {account!r}")
+
+        line = BillLine(
+            description=description,
+            quantity=quantity,
+            unit_price=unit_price,
+            line_total=line_total,
+            account_id=account_id,
+        )
+        return line, _decimal(data, "tax_amount", ZERO), _text(data, "item_code")
+
+    def _add_row(self, number, data):
+        """Parse one row into its pending bill; raises ValueError if rejected"""
+        vendor_id, bill_number = key = self._bill_key(data)
+        pending = self.pending.get(key)
+        if pending is None:
+            if key in self.existing:
+                self.duplicates.add(key)
+                raise ValueError("Duplicate: the bill already exists")
+            if key in self.seen:
+                raise ValueError("Bill was already imported from earlier rows; keep a bill's rows together")
+            if bill_number in self.numbers:
+                raise ValueError("Bill number is already used for another vendor")
+            if self.pending_lines >= self.chunk_size:
+                self._flush()
+            pending = self.pending[key] = _PendingBill(vendor_id, bill_number)
+            self.seen.add(key)
+            self.numbers.add(bill_number)
+
+        pending.rows.append((number, data))
+        self.pending_lines += 1
+        try:
+            if pending.bill is None:
+                pending.bill = self._bill(vendor_id, bill_number, data)
+            line, tax, item_code = self._line(data)
+        except ValueError:
+            pending.failed.append(number)
+            raise
+        pending.lines.append((line, tax, item_code))
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _reject(self, pending, message):
+        for number, data in pending.rows:
+            if number not in pending.failed:
+                self._report(number, data, message)
+
+    def _flush(self):
+        """Write the pending bills, one bulk insert each for bills and lines"""
+        pending = list(self.pending.values())
+        self.pending = {}
+        self.pending_lines = 0
+        if not pending:
+            return
+
+        ready = []
+        for bill in pending:
+            if bill.failed:
+                self._reject(bill, f"Skipped: row {bill.failed[0]} of this bill was rejected")
+            else:
+                ready.append(bill)
+
+        # Bill numbers are unique across companies as well
+        taken = set(
+            Bill.objects.filter(bill_number__in=[bill.bill_number for bill in ready])
+            .values_list("bill_number", flat=True)
+        )
+        item_codes = {code for bill in ready for _, _, code in bill.lines if code}
+        items = dict(
+            InventoryItem.objects.filter(item_code__in=item_codes).values_list("item_code", "id")
+        ) if item_codes else {}
+
+        bills, lines = [], []
+        for pending_bill in ready:
+            if pending_bill.bill_number in taken:
+                self._reject(pending_bill, "Bill number is already in use")
+                continue
+            bill = pending_bill.bill
+            subtotal = tax_amount = ZERO
+            for line, tax, item_code in pending_bill.lines:
+                line.bill = bill
+                line.inventory_item_id = items.get(item_code)
+                subtotal += line.line_total
+                tax_amount += tax
+                lines.append(line)
+            bill.subtotal = subtotal
+            bill.tax_amount = tax_amount
+            bill.total_amount = subtotal + tax_amount
+            bills.append(bill)
+        if not bills:
+            return
+
+        with transaction.atomic():
+            Bill.objects.bulk_create(bills, batch_size=self.chunk_size)
+            for line in lines:
+                line.bill_id = line.bill.id
+            BillLine.objects.bulk_create(lines, batch_size=self.chunk_size)
+
+        apply_document_changes(VENDORS, [(None, document_state(VENDORS, bill)) for bill in bills])
+        self.bills += [(bill.id, bill.vendor_id) for bill in bills]
+        self.vendor_ids.update(bill.vendor_id for bill in bills)
+        self.counts["bills"] += len(bills)
+        self.counts["lines"] += len(lines)
+        if self.progress:
+            self.progress(self.counts["rows"])
+
+    def _finish(self):
+        """Search, caches and three-way match for everything imported"""
+        from dashboard.cache_signals import invalidate_company_cache
+        from dashboard.search import index_objects
+
+        if not self.bills:
+            return
+        index_objects(Vendor.objects.filter(id__in=self.vendor_ids))
+        invalidate_company_cache(self.company)
+        if self.match:
+            # Only vendors with open purchase orders have anything to match
+            matcher = ThreeWayMatcher(self.company, vendor_ids=list(self.vendor_ids))
+            po_vendors = {vendor_id for vendor_id, _ in matcher.index}
+            bill_ids = [bill_id for bill_id, vendor_id in self.bills if vendor_id in po_vendors]
+            for start in range(0, len(bill_ids), self.chunk_size):
+                matcher.match_bill_lines(
+                    BillLine.objects.filter(bill_id__in=bill_ids[start:start + self.chunk_size])
+                )
+
+    # ------------------------------------------------------------------
+    # Error report
+    # ------------------------------------------------------------------
+
+    def _report(self, number, data, message):
+        self.counts["errors"] += 1
+        row = [number, _text(data, "vendor"), _text(data, "bill_number"), message]
+        if len(self.errors) < ERROR_PREVIEW:
+            self.errors.append(dict(zip(REPORT_COLUMNS, row)))
+        if self.report is None:
+            self.report = io.TextIOWrapper(
+                tempfile.TemporaryFile(), encoding="utf-8", newline=""
+            )
+            self.report_writer = csv.writer(self.report)
+            self.report_writer.writerow(REPORT_COLUMNS)
+        self.report_writer.writerow(row)
+
+    def _save_report(self):
+        """Store the report and return its token, or None without errors"""
+        if self.report is None:
+            return None
+        token = uuid.uuid4().hex
+        self.report.flush()
+        self.report.buffer.seek(0)
+        default_storage.save(error_report_path(self.company.id, token), File(self.report.buffer))
+        return token
+
+    # ------------------------------------------------------------------
+    # Import
+    # ------------------------------------------------------------------
+
+    def run(self, stream, fmt="csv", progress=None):
+        """
+        Import every row of a text stream
+        progress(rows) is called after each written chunk. Returns
+        {"rows", "bills", "lines", "duplicates", "errors", "seconds",
+        "rows_per_second", "error_preview", "error_report"} where
+        error_report is the token of the stored CSV report, or None.
+        """
+        started = time.monotonic()
+        self.counts = {"rows": 0, "bills": 0, "lines": 0, "errors": 0}
+        self.pending, self.pending_lines = {}, 0
+        self.seen, self.duplicates = set(), set()
+        self.bills, self.vendor_ids = [], set()
+        self.errors, self.report = [], None
+        self.progress = progress
+
+        try:
+            for number, data, error in read_rows(stream, fmt):
+                self.counts["rows"] += 1
+                if error is None:
+                    try:
+                        self._add_row(number, data)
+                    except ValueError as exc:
+                        error = str(exc)
+                if error is not None:
+                    self._report(number, data, error)
+            self._flush()
+            self._finish()
+            token = self._save_report()
+        finally:
+            if self.report is not None:
+                self.report.close()
+
+        elapsed = time.monotonic() - started
+        return {
+            **self.counts,
+            "duplicates": len(self.duplicates),
+            "seconds": round(elapsed, 2),
+            "rows_per_second": round(self.counts["rows"] / max(elapsed, 0.001)),
+            "error_preview": self.errors,
+            "error_report": token,
+        }
+
+
+def import_bills(company, stream, fmt="csv", user=None, **kwargs):
+    """Import a CSV or JSONL bill file for the company; see BillImporter"""
+    progress = kwargs.pop("progress", None)
+    return BillImporter(company, user=user, **kwargs).run(stream, fmt, progress=progress)
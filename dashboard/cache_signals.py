@@ -3,7 +3,9 @@ Dashboard Cache Signals
 Automatically invalidate cached metrics when financial data changes
 """
 
-from django.db.models.signals import post_save, post_delete
+from datetime import date
+
+from django.db.models.signals import post_save, post_delete, post_init
 from django.dispatch import receiver
 from django.core.cache import cache
 
@@ -15,7 +17,29 @@ from accounting.models import (
     Payment,
     Expense,
     Account,
+    Customer,
+    Vendor,
 )
+from dashboard.balance_history import month_start, rebuild_month
+from dashboard.snapshots import invalidate_snapshots
+from dashboard.utils import bump_data_version, bump_data_versions, bump_ledger_version
+
+
+def company_cache_keys(company_id):
+    """Cached dashboard figures of a company"""
+    from datetime import datetime
+
+    current_hour = datetime.now().strftime("%Y%m%d%H")
+    return [
+        f"dashboard_metrics_{company_id}",
+        f"account_balances_{company_id}",
+        f"balance_sheet_{company_id}",
+        f"pnl_statement_{company_id}",
+        f"financial_ratios_{company_id}",
+        f"gl_balance_summary_{company_id}",
+        # Also delete hourly cached versions
+        f"dashboard_metrics_{company_id}_{current_hour}",
+    ]
 
 
 def invalidate_company_cache(company):
@@ -23,23 +47,26 @@ def invalidate_company_cache(company):
     if not company:
         return
 
-    cache_keys = [
-        f"dashboard_metrics_{company.id}",
-        f"account_balances_{company.id}",
-        f"balance_sheet_{company.id}",
-        f"pnl_statement_{company.id}",
-        f"financial_ratios_{company.id}",
-        f"gl_balance_summary_{company.id}",
-    ]
+    for key in company_cache_keys(company.id):
+        cache.delete(key)
 
-    # Also delete hourly cached versions
-    from datetime import datetime
+    # Conditional GET validators (see dashboard.conditional)
+    bump_data_version(company)
 
-    current_hour = datetime.now().strftime("%Y%m%d%H")
-    cache_keys.append(f"dashboard_metrics_{company.id}_{current_hour}")
 
-    for key in cache_keys:
-        cache.delete(key)
+def invalidate_companies_cache(company_ids):
+    """
+    Invalidate the dashboard caches of many companies after a bulk update
+    One delete_many and one version UPDATE, however many companies
+    """
+    company_ids = [company_id for company_id in company_ids if company_id]
+    if not company_ids:
+        return
+
+    cache.delete_many(
+        [key for company_id in company_ids for key in company_cache_keys(company_id)]
+    )
+    bump_data_versions(company_ids)
 
 
 @receiver(post_save, sender=Invoice)
@@ -63,6 +90,58 @@ def journal_entry_changed(sender, instance, **kwargs):
     invalidate_company_cache(instance.company)
 
 
+@receiver(post_init, sender=JournalEntry)
+def remember_posted_state(sender, instance, **kwargs):
+    """Keep the loaded status/date so later saves know what they replaced"""
+    instance._ledger_state = (instance.status, instance.entry_date)
+
+
+@receiver(post_save, sender=JournalEntry)
+@receiver(post_delete, sender=JournalEntry)
+def posted_ledger_changed(sender, instance, **kwargs):
+    """
+    Bump the ledger version and drop report snapshots when posted data changes
+    Only snapshots covering the earliest affected entry date are invalidated
+    """
+    if not instance.company_id:
+        return
+
+    deleted = "created" not in kwargs
+    old_status, old_date = getattr(instance, "_ledger_state", (None, None))
+
+    affected_dates = []
+    if old_status == JournalEntry.Status.POSTED:
+        affected_dates.append(old_date)
+    if not deleted and instance.status == JournalEntry.Status.POSTED:
+        affected_dates.append(instance.entry_date)
+    affected_dates = [
+        date.fromisoformat(d) if isinstance(d, str) else d
+        for d in affected_dates
+        if d
+    ]
+
+    instance._ledger_state = (instance.status, instance.entry_date)
+
+    if not affected_dates:
+        return
+
+    ledger_changed(instance.company, affected_dates)
+
+
+def ledger_changed(company, affected_dates):
+    """
+    Follow posted ledger changes on the given entry dates: bump the ledger
+    version, drop snapshots from the earliest date, rebuild the month-end
+    balance history of each month touched. Bulk postings call this once.
+    """
+    bump_ledger_version(company)
+    invalidate_snapshots(company, min(affected_dates))
+
+    # Keep the month-end balance history in step with the ledger
+    for month in {month_start(d) for d in affected_dates}:
+        rebuild_month(company, month)
+
+
 @receiver(post_save, sender=JournalEntryLine)
 @receiver(post_delete, sender=JournalEntryLine)
 def journal_line_changed(sender, instance, **kwargs):
@@ -71,6 +150,20 @@ def journal_line_changed(sender, instance, **kwargs):
         invalidate_company_cache(instance.journal_entry.company)
 
 
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def customer_changed(sender, instance, **kwargs):
+    """Invalidate cache when customer changes (customer lists and charts)"""
+    invalidate_company_cache(instance.company)
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_delete, sender=Vendor)
+def vendor_changed(sender, instance, **kwargs):
+    """Invalidate cache when vendor changes"""
+    invalidate_company_cache(instance.company)
+
+
 @receiver(post_save, sender=Payment)
 @receiver(post_delete, sender=Payment)
 def payment_changed(sender, instance, **kwargs):
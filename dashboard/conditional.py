@@ -0,0 +1,93 @@
+"""
+Conditional GET
+ETag / Last-Modified validators for company report, chart and KPI endpoints
+- Validators come from the company's version stamps and the request, so a
+  matching If-None-Match is answered with 304 before the view runs
+- Responses are marked private and revalidated on every use
+"""
+
+import hashlib
+from functools import wraps
+
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from dashboard.utils import get_company_versions
+
+
+def company_validators(request, ledger_only=False):
+    """
+    Return (etag, last_modified timestamp) for the request's company
+    ledger_only endpoints read posted journal data alone and ignore other
+    record changes. Today's date is part of the tag because "as of today"
+    results roll over at midnight.
+    """
+    company = request.active_company
+    ledger_version, data_version, updated_at = get_company_versions(company)
+
+    params = "&".join(
+        f"{key}={value}"
+        for key in sorted(request.GET)
+        for value in request.GET.getlist(key)
+    )
+    raw = ":".join(
+        [
+            str(company.id),
+            f"l{ledger_version}",
+            "" if ledger_only else f"d{data_version}",
+            timezone.now().date().isoformat(),
+            request.path,
+            params,
+        ]
+    )
+    etag = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+    last_modified = int(updated_at.timestamp()) if updated_at else None
+    return etag, last_modified
+
+
+def _failed(response):
+    """Error payloads must not be revalidated into later 304s"""
+    if response.status_code != 200:
+        return True
+    content_type = response.get("Content-Type", "")
+    return content_type.startswith("application/json") and b'"success": false' in (
+        response.content
+    )
+
+
+def company_conditional(view_func=None, ledger_only=False):
+    """
+    Decorator: answer GET/HEAD with 304 when the client's copy is current
+
+        @login_required
+        @company_conditional(ledger_only=True)
+        def calculate_ratios_api(request): ...
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or not request.active_company:
+                return func(request, *args, **kwargs)
+
+            etag, last_modified = company_validators(request, ledger_only)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = func(request, *args, **kwargs)
+                if _failed(response):
+                    return response
+                response.headers.setdefault("ETag", etag)
+                if last_modified:
+                    response.headers.setdefault("Last-Modified", http_date(last_modified))
+
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapped
+
+    if view_func is not None:
+        return decorator(view_func)
+    return decorator
@@ -0,0 +1,350 @@
+"""
+Consolidation Engine
+Consolidated balance sheet and P&L for a ConsolidationGroup
+- Per-subsidiary trial balances, computed in a process pool
+- Subsidiary accounts mapped to the group chart
+- Intercompany balances (lines tagged with a group company) eliminated
+- Each subsidiary's contribution cached by its ledger version, so a posting
+  in one subsidiary only recomputes that subsidiary
+"""
+
+import multiprocessing
+import threading
+from collections import defaultdict
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from accounting.models import (
+    AccountType,
+    GroupAccountMapping,
+    JournalEntry,
+    JournalEntryLine,
+)
+from dashboard.utils import discard_process_pool
+
+
+ZERO = Decimal("0.00")
+
+CONTRIBUTION_CACHE_TIMEOUT = 3600  # 1 hour; the ledger version in the key covers changes
+
+# Balance sheet lines use the balance as of the date, P&L lines the period activity
+BALANCE_SHEET_TYPES = [AccountType.ASSET, AccountType.LIABILITY, AccountType.EQUITY]
+DEBIT_NORMAL_TYPES = [AccountType.ASSET, AccountType.EXPENSE]
+TYPE_ORDER = [
+    AccountType.ASSET,
+    AccountType.LIABILITY,
+    AccountType.EQUITY,
+    AccountType.REVENUE,
+    AccountType.EXPENSE,
+]
+
+
+def subsidiary_trial_balance(company_id, as_of, period_start):
+    """
+    Posted activity of one company per (account, intercompany counterparty)
+    Top-level and free of model instances so it can run in a worker process.
+    `net` is debit minus credit; `balance`/`period` are signed so a normal
+    balance is positive.
+    """
+    rows = (
+        JournalEntryLine.objects.filter(
+            account__company_id=company_id,
+            journal_entry__status=JournalEntry.Status.POSTED,
+            journal_entry__entry_date__lte=as_of,
+        )
+        .values(
+            "account_id",
+            "account__code",
+            "account__name",
+            "account__account_type",
+            "intercompany_company_id",
+        )
+        .annotate(
+            debit=Sum("debit_amount"),
+            credit=Sum("credit_amount"),
+            period_debit=Sum(
+                "debit_amount", filter=Q(journal_entry__entry_date__gte=period_start)
+            ),
+            period_credit=Sum(
+                "credit_amount", filter=Q(journal_entry__entry_date__gte=period_start)
+            ),
+        )
+        .order_by()
+    )
+
+    lines = []
+    for row in rows:
+        sign = 1 if row["account__account_type"] in DEBIT_NORMAL_TYPES else -1
+        net = (row["debit"] or ZERO) - (row["credit"] or ZERO)
+        period_net = (row["period_debit"] or ZERO) - (row["period_credit"] or ZERO)
+        lines.append(
+            {
+                "account_id": row["account_id"],
+                "code": row["account__code"],
+                "name": row["account__name"],
+                "type": row["account__account_type"],
+                "counterparty_id": row["intercompany_company_id"],
+                "net": net,
+                "period_net": period_net,
+                "balance": sign * net,
+                "period": sign * period_net,
+            }
+        )
+    return lines
+
+
+_consolidation_pool = None
+_consolidation_pool_lock = threading.Lock()
+
+
+def get_consolidation_pool():
+    """
+    Lazily start the per-process consolidation pool
+    Workers are spawned rather than forked so they never share the parent's
+    database connections; each sets Django up once when it starts.
+    """
+    global _consolidation_pool
+    with _consolidation_pool_lock:
+        if _consolidation_pool is None:
+            _consolidation_pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, "CONSOLIDATION_WORKERS", 4),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        return _consolidation_pool
+
+
+def compute_trial_balances(company_ids, as_of, period_start):
+    """
+    Return {company_id: trial balance lines}
+    Many subsidiaries run in parallel in the pool; a few run inline, where
+    the pickling and worker round trip would cost more than the queries.
+    """
+    global _consolidation_pool
+    threshold = getattr(settings, "CONSOLIDATION_POOL_THRESHOLD", 3)
+    if len(company_ids) < threshold:
+        return {
+            company_id: subsidiary_trial_balance(company_id, as_of, period_start)
+            for company_id in company_ids
+        }
+
+    timeout = getattr(settings, "CONSOLIDATION_TIMEOUT", 25)
+    pool = get_consolidation_pool()
+    try:
+        futures = {
+            company_id: pool.submit(
+                subsidiary_trial_balance, company_id, as_of, period_start
+            )
+            for company_id in company_ids
+        }
+        return {
+            company_id: future.result(timeout=timeout)
+            for company_id, future in futures.items()
+        }
+    except (BrokenProcessPool, FutureTimeoutError, CancelledError):
+        # A worker died or hung (or another caller hit that and discarded the
+        # pool); stop the pool, start a fresh one next time and compute here
+        with _consolidation_pool_lock:
+            if _consolidation_pool is pool:
+                _consolidation_pool = None
+                discard_process_pool(pool)
+        return {
+            company_id: subsidiary_trial_balance(company_id, as_of, period_start)
+            for company_id in company_ids
+        }
+
+
+class ConsolidationEngine:
+    """
+    Consolidated figures for a group as of a date
+    P&L lines cover period_start..as_of (default: calendar year to date).
+    """
+
+    def __init__(self, group, as_of=None, period_start=None):
+        self.group = group
+        self.as_of = as_of or timezone.now().date()
+        self.period_start = period_start or self.as_of.replace(month=1, day=1)
+
+    def contribution_key(self, company_id, ledger_version):
+        return (
+            f"consolidation_contribution_{company_id}_{self.as_of.isoformat()}"
+            f"_{self.period_start.isoformat()}_v{ledger_version}"
+        )
+
+    def members(self):
+        """(id, name, ledger_version) of every member, in one query"""
+        return list(
+            self.group.members.order_by("name").values_list(
+                "id", "name", "ledger_version"
+            )
+        )
+
+    def contributions(self, members):
+        """
+        Trial balance of every member, recomputing only those whose ledger
+        version moved since they were cached
+        """
+        keys = {
+            company_id: self.contribution_key(company_id, version)
+            for company_id, _, version in members
+        }
+        cached = cache.get_many(list(keys.values()))
+        result = {
+            company_id: cached[key] for company_id, key in keys.items() if key in cached
+        }
+
+        missing = [company_id for company_id in keys if company_id not in result]
+        if missing:
+            computed = compute_trial_balances(missing, self.as_of, self.period_start)
+            cache.set_many(
+                {keys[company_id]: computed[company_id] for company_id in missing},
+                CONTRIBUTION_CACHE_TIMEOUT,
+            )
+            result.update(computed)
+
+        return result
+
+    def group_chart(self):
+        """{subsidiary account id: (code, name, type)} from the group mapping"""
+        mappings = GroupAccountMapping.objects.filter(group=self.group).values_list(
+            "account_id",
+            "group_account__code",
+            "group_account__name",
+            "group_account__account_type",
+        )
+        return {account_id: (code, name, type_) for account_id, code, name, type_ in mappings}
+
+    def consolidate(self):
+        """
+        Return the consolidated report:
+        rows (group account with per-company amounts, elimination, total),
+        totals, and unreconciled intercompany differences per company pair
+        """
+        members = self.members()
+        member_ids = {company_id for company_id, _, _ in members}
+        contributions = self.contributions(members)
+        chart = self.group_chart()
+
+        rows = {}
+        pair_net = defaultdict(lambda: ZERO)
+
+        for company_id, lines in contributions.items():
+            for line in lines:
+                code, name, type_ = chart.get(
+                    line["account_id"], (line["code"], line["name"], line["type"])
+                )
+                row = rows.setdefault(
+                    code,
+                    {
+                        "code": code,
+                        "name": name,
+                        "type": type_,
+                        "companies": defaultdict(lambda: ZERO),
+                        "elimination": ZERO,
+                    },
+                )
+                # Amount in the group account's own normal direction
+                sign = 1 if type_ in DEBIT_NORMAL_TYPES else -1
+                if type_ in BALANCE_SHEET_TYPES:
+                    amount = sign * line["net"]
+                else:
+                    amount = sign * line["period_net"]
+                row["companies"][company_id] += amount
+
+                counterparty = line["counterparty_id"]
+                if counterparty in member_ids and counterparty != company_id:
+                    row["elimination"] -= amount
+                    if type_ in BALANCE_SHEET_TYPES:
+                        pair = tuple(sorted((company_id, counterparty)))
+                        pair_net[pair] += line["net"]
+
+        names = {company_id: name for company_id, name, _ in members}
+        report_rows = []
+        for row in sorted(
+            rows.values(), key=lambda r: (TYPE_ORDER.index(r["type"]), r["code"])
+        ):
+            gross = sum(row["companies"].values(), ZERO)
+            report_rows.append(
+                {
+                    "code": row["code"],
+                    "name": row["name"],
+                    "type": row["type"],
+                    "companies": {
+                        company_id: row["companies"].get(company_id, ZERO)
+                        for company_id, _, _ in members
+                    },
+                    "gross": gross,
+                    "elimination": row["elimination"],
+                    "consolidated": gross + row["elimination"],
+                }
+            )
+
+        def total(account_type):
+            return sum(
+                (r["consolidated"] for r in report_rows if r["type"] == account_type),
+                ZERO,
+            )
+
+        revenue = total(AccountType.REVENUE)
+        expenses = total(AccountType.EXPENSE)
+
+        return {
+            "group": self.group,
+            "as_of": self.as_of,
+            "period_start": self.period_start,
+            "companies": [{"id": company_id, "name": name} for company_id, name, _ in members],
+            "rows": report_rows,
+            "totals": {
+                "assets": total(AccountType.ASSET),
+                "liabilities": total(AccountType.LIABILITY),
+                "equity": total(AccountType.EQUITY),
+                "revenue": revenue,
+                "expenses": expenses,
+                "net_income": revenue - expenses,
+            },
+            # Intercompany balances whose two sides do not cancel
+            "differences": [
+                {
+                    "companies": [names[a], names[b]],
+                    "difference": net,
+                }
+                for (a, b), net in sorted(pair_net.items())
+                if net != ZERO
+            ],
+        }
+
+
+def consolidation_as_json(report):
+    """Float copy of a consolidated report for JsonResponse"""
+    return {
+        "success": True,
+        "group": report["group"].name,
+        "as_of": report["as_of"].isoformat(),
+        "period_start": report["period_start"].isoformat(),
+        "companies": report["companies"],
+        "rows": [
+            {
+                **row,
+                "companies": {
+                    str(company_id): float(amount)
+                    for company_id, amount in row["companies"].items()
+                },
+                "gross": float(row["gross"]),
+                "elimination": float(row["elimination"]),
+                "consolidated": float(row["consolidated"]),
+            }
+            for row in report["rows"]
+        ],
+        "totals": {key: float(value) for key, value in report["totals"].items()},
+        "differences": [
+            {**d, "difference": float(d["difference"])} for d in report["differences"]
+        ],
+    }
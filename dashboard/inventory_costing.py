@@ -0,0 +1,173 @@
+"""
+Inventory Costing
+Valuation and cost of goods sold from the FIFO cost layers kept by dashboard.stock
+- A company's stock value is a single SUM over its open cost layers
+- Costed movements not yet in the books are posted in batch: one journal
+  entry per day, lines summed per account by the database
+- Receipts are debited to inventory against goods received not invoiced,
+  which the supplier's bill clears; opening stock (layers without a
+  company, item imports) is brought into the ledger by an opening balance
+  entry, not by post_cogs
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+
+from accounting.models import AccountType, CostLayer, InventoryTransaction
+from companies.models import Company
+from dashboard.journal import find_account, post_journal_entries
+
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+TYPES = InventoryTransaction.TransactionType
+
+# Movements whose cost is booked to cost of goods sold; damage and
+# adjustments go to the inventory adjustment account
+COGS_TYPES = [TYPES.ISSUE, TYPES.RETURN]
+ADJUSTMENT_TYPES = [TYPES.DAMAGE, TYPES.ADJUSTMENT]
+
+
+def inventory_value(company, category=None):
+    """
+    {"value", "items", "units"} of the company's active stock at cost,
+    optionally for one category, in one aggregate query over its open layers
+    """
+    layers = CostLayer.objects.filter(company=company, remaining_quantity__gt=0, item__is_active=True)
+    if category:
+        layers = layers.filter(item__category=category)
+    totals = layers.aggregate(
+        value=Sum(F("remaining_quantity") * F("unit_cost")),
+        items=Count("item", distinct=True),
+        units=Sum("remaining_quantity"),
+    )
+    return {
+        "value": (totals["value"] or ZERO).quantize(CENT),
+        "items": totals["items"],
+        "units": (totals["units"] or ZERO).quantize(CENT),
+    }
+
+
+def inventory_accounts(company):
+    """(inventory, cost of goods sold, inventory adjustment) accounts of the company"""
+    inventory = find_account(company, AccountType.ASSET, "inventory", "stock")
+    cogs = find_account(company, AccountType.EXPENSE, "cost of goods", "cost of sales", "cogs")
+    adjustment = find_account(
+        company, AccountType.EXPENSE, "shrinkage", "inventory adjustment", "write-off", "write off"
+    ) or cogs
+    if inventory is None or cogs is None:
+        raise ValueError("Set up an inventory asset account and a cost of goods sold account first.")
+    return inventory, cogs, adjustment
+
+
+def received_not_invoiced_account(company):
+    """Liability account that receipts are credited to until the supplier's bill arrives"""
+    account = find_account(
+        company, AccountType.LIABILITY,
+        "received not invoiced", "grni", "accrued purchases", "goods received",
+    )
+    if account is None:
+        raise ValueError(
+            'Set up a goods received not invoiced liability account (e.g. "Goods Received Not Invoiced") first.'
+        )
+    return account
+
+
+def _line(account, amount, description):
+    """Debit for a positive amount, credit for a negative one"""
+    if amount > 0:
+        return {"account": account, "debit": amount, "description": description}
+    return {"account": account, "credit": -amount, "description": description}
+
+
+def pending_movements(company, through=None):
+    """Costed movements of the company not yet posted to the ledger"""
+    movements = InventoryTransaction.objects.filter(
+        company=company,
+        cost_posted=False,
+        transaction_type__in=[TYPES.RECEIPT] + COGS_TYPES + ADJUSTMENT_TYPES,
+        cost_amount__isnull=False,
+    ).exclude(cost_amount=0)
+    if through:
+        movements = movements.filter(created_at__date__lte=through)
+    return movements
+
+
+@transaction.atomic
+def post_cogs(company, through=None, user=None):
+    """
+    Post the cost of the company's receipts, issues, returns, damage and
+    adjustments through the given date, one journal entry per day
+    Receipts are debited to inventory and credited to goods received not
+    invoiced. Stock leaving is debited to cost of goods sold (issues) or
+    inventory adjustments (damage, count differences) and credited to
+    inventory; returns and count gains the other way round. Returns
+    {"movements", "journal_entries", "amount", "received"}: amount is the
+    cost expensed, received the cost of stock received.
+    """
+    # One posting run per company at a time
+    Company.objects.select_for_update().filter(pk=company.pk).first()
+    inventory, cogs, adjustment = inventory_accounts(company)
+
+    movements = pending_movements(company, through)
+    last_id = movements.aggregate(last=Max("id"))["last"]
+    if last_id is None:
+        return {"movements": 0, "journal_entries": [], "amount": ZERO, "received": ZERO}
+    movements = movements.filter(id__lte=last_id)
+    received_not_invoiced = None
+    if movements.filter(transaction_type=TYPES.RECEIPT).exists():
+        received_not_invoiced = received_not_invoiced_account(company)
+
+    days = defaultdict(lambda: {"cogs": ZERO, "adjustment": ZERO, "received": ZERO, "count": 0, "first": None})
+    for row in (
+        movements.annotate(day=TruncDate("created_at"))
+        .values("day", "transaction_type")
+        .annotate(cost=Sum("cost_amount"), count=Count("id"), first=Min("id"))
+        .order_by("day")
+    ):
+        day = days[row["day"]]
+        if row["transaction_type"] == TYPES.RECEIPT:
+            kind = "received"
+        elif row["transaction_type"] in COGS_TYPES:
+            kind = "cogs"
+        else:
+            kind = "adjustment"
+        day[kind] += row["cost"].quantize(CENT)
+        day["count"] += row["count"]
+        day["first"] = min(day["first"] or row["first"], row["first"])
+
+    entries = []
+    for day, totals in days.items():
+        lines = [
+            _line(cogs, -totals["cogs"], "Cost of goods sold"),
+            _line(adjustment, -totals["adjustment"], "Inventory adjustments"),
+            _line(
+                inventory, totals["received"] + totals["cogs"] + totals["adjustment"], "Inventory at cost"
+            ),
+        ]
+        if totals["received"]:
+            lines.append(_line(received_not_invoiced, -totals["received"], "Goods received not invoiced"))
+        entries.append({
+            "entry_number": f"COGS-{day:%Y%m%d}-{totals['first']}",
+            "entry_date": day,
+            "description": f"Inventory receipts, cost of goods sold and adjustments, {day:%Y-%m-%d}",
+            "reference": f"{totals['count']} inventory movements",
+            "lines": lines,
+        })
+    posted = {entry.entry_date: entry for entry in post_journal_entries(company, entries, user=user)}
+
+    for day, entry in posted.items():
+        movements.filter(created_at__date=day).update(journal_entry=entry, cost_posted=True)
+    # Days whose costs cancel out get no entry, but are settled all the same
+    movements.update(cost_posted=True)
+    return {
+        "movements": sum(days[day]["count"] for day in posted),
+        "journal_entries": [entry.entry_number for entry in posted.values()],
+        "amount": -sum((days[day]["cogs"] + days[day]["adjustment"] for day in posted), ZERO),
+        "received": sum((days[day]["received"] for day in posted), ZERO),
+    }
@@ -0,0 +1,431 @@
+"""
+Bulk Invoice Actions
+Send, void, mark paid and remind for any number of invoices at once
+- Status moves with one UPDATE per batch, no per-invoice save or signals
+- Journal entries, payments and allocations are bulk-inserted
+- Emails are queued in the outbox within the same transaction
+- Rollups, search entries and caches are refreshed once per call
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from accounting.models import (
+    AccountType,
+    Invoice,
+    JournalEntry,
+    OutboundMessage,
+    Payment,
+    PaymentAllocation,
+)
+from dashboard.journal import (
+    cash_account,
+    find_account,
+    post_journal_entries,
+    receivable_account,
+)
+from dashboard.outbox import build_message, enqueue
+from dashboard.payments import next_payment_numbers
+from dashboard.rollups import CUSTOMERS, apply_document_changes, document_state
+
+
+ZERO = Decimal("0.00")
+
+# Invoices per UPDATE statement
+BATCH_SIZE = 1000
+
+ACTION_SEND = "send"
+ACTION_VOID = "void"
+ACTION_MARK_PAID = "mark_paid"
+ACTION_REMIND = "remind"
+ACTIONS = [ACTION_SEND, ACTION_VOID, ACTION_MARK_PAID, ACTION_REMIND]
+
+OPEN_STATUSES = [Invoice.Status.SENT, Invoice.Status.OVERDUE]
+
+# Statuses each action applies to
+ELIGIBLE_STATUSES = {
+    ACTION_SEND: [Invoice.Status.DRAFT],
+    ACTION_VOID: [Invoice.Status.DRAFT] + OPEN_STATUSES,
+    ACTION_MARK_PAID: OPEN_STATUSES,
+    ACTION_REMIND: OPEN_STATUSES,
+}
+
+
+def select_invoices(company, invoice_ids=None, status=None, customer_id=None,
+                    date_from=None, date_to=None, due_before=None):
+    """
+    A company's invoices by explicit selection or by filter
+    With no ids and no filter the selection is empty, never "everything".
+    """
+    invoices = Invoice.objects.filter(company=company)
+    filters = Q()
+    if status:
+        filters &= Q(status=status)
+    if customer_id:
+        filters &= Q(customer_id=customer_id)
+    if date_from:
+        filters &= Q(invoice_date__gte=date_from)
+    if date_to:
+        filters &= Q(invoice_date__lte=date_to)
+    if due_before:
+        filters &= Q(due_date__lt=due_before)
+
+    if invoice_ids:
+        return invoices.filter(filters, pk__in=invoice_ids)
+    if not filters:
+        return invoices.none()
+    return invoices.filter(filters)
+
+
+def _batches(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class InvoiceBulkActions:
+    """Bulk status transitions for a company's invoices"""
+
+    def __init__(self, company, user=None):
+        self.company = company
+        self.user = user
+        self.today = timezone.now().date()
+
+    def run(self, action, invoices, **kwargs):
+        """Apply one of ACTIONS to an invoice queryset; returns a summary dict"""
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown action: {action}")
+        return getattr(self, action)(invoices, **kwargs)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    def _load(self, invoices, action):
+        """Lock and load the eligible invoices, with their customers"""
+        eligible = invoices.filter(
+            company=self.company, status__in=ELIGIBLE_STATUSES[action]
+        )
+        if action == ACTION_VOID:
+            # Paid money has to be refunded or reversed first
+            eligible = eligible.filter(paid_amount=0)
+        if action in (ACTION_MARK_PAID, ACTION_REMIND):
+            eligible = eligible.filter(paid_amount__lt=F("total_amount"))
+        if action == ACTION_REMIND:
+            eligible = eligible.filter(due_date__lt=self.today)
+        return list(
+            eligible.select_related("customer").select_for_update(of=("self",)).order_by("id")
+        )
+
+    def _update(self, invoices, mutate, **updates):
+        """
+        Apply `updates` to the invoices with one UPDATE per batch and feed the
+        rollups the change `mutate` makes to each loaded invoice
+        """
+        changes = []
+        for invoice in invoices:
+            old_state = document_state(CUSTOMERS, invoice)
+            mutate(invoice)
+            changes.append((old_state, document_state(CUSTOMERS, invoice)))
+
+        now = timezone.now()
+        for batch in _batches(invoices):
+            Invoice.objects.filter(pk__in=[invoice.pk for invoice in batch]).update(
+                updated_at=now, **updates
+            )
+        return changes
+
+    def _posted_numbers(self, entry_numbers):
+        """Which of these journal entry numbers the company already has"""
+        found = set()
+        for batch in _batches(list(entry_numbers)):
+            found.update(
+                JournalEntry.objects.filter(
+                    company=self.company, entry_number__in=batch
+                ).values_list("entry_number", flat=True)
+            )
+        return found
+
+    def _revenue_accounts(self):
+        return (
+            receivable_account(self.company),
+            find_account(self.company, AccountType.REVENUE),
+        )
+
+    def _finish(self, invoices, changes, payment_date=None):
+        """Rollups, search entries and dashboard caches, once per call"""
+        from dashboard.cache_signals import invalidate_company_cache
+        from dashboard.search import reindex_invoices
+
+        apply_document_changes(CUSTOMERS, changes, payment_date=payment_date)
+        reindex_invoices([invoice.pk for invoice in invoices])
+        invalidate_company_cache(self.company)
+
+    def _message(self, invoice, kind, subject, template, **context):
+        return build_message(
+            self.company,
+            kind,
+            invoice.customer.email,
+            subject,
+            template,
+            {
+                "invoice": invoice,
+                "customer_name": invoice.customer.contact_name
+                or invoice.customer.company_name,
+                **context,
+            },
+            related=invoice,
+        )
+
+    # ------------------------------------------------------------------
+    # Actions
+    # ------------------------------------------------------------------
+
+    @transaction.atomic
+    def send(self, invoices, notify=True):
+        """
+        DRAFT -> SENT (OVERDUE if already past due), post the AR / revenue
+        entry of each invoice and queue the invoice emails
+        """
+        invoices = self._load(invoices, ACTION_SEND)
+
+        def mutate(invoice):
+            invoice.status = (
+                Invoice.Status.OVERDUE
+                if invoice.due_date < self.today
+                else Invoice.Status.SENT
+            )
+
+        changes = self._update(
+            invoices,
+            mutate,
+            status=Case(
+                When(due_date__lt=self.today, then=Value(Invoice.Status.OVERDUE)),
+                default=Value(Invoice.Status.SENT),
+            ),
+        )
+
+        entries = []
+        receivable, revenue = self._revenue_accounts()
+        if receivable and revenue:
+            posted = self._posted_numbers(
+                f"INV-{invoice.invoice_number}" for invoice in invoices
+            )
+            entries = post_journal_entries(
+                self.company,
+                [
+                    {
+                        "entry_number": f"INV-{invoice.invoice_number}",
+                        "entry_date": invoice.invoice_date,
+                        "description": f"Invoice {invoice.invoice_number} - "
+                        f"{invoice.customer.company_name}",
+                        "lines": [
+                            {
+                                "account": receivable,
+                                "debit": invoice.total_amount,
+                                "description": f"Invoice {invoice.invoice_number}",
+                            },
+                            {
+                                "account": revenue,
+                                "credit": invoice.total_amount,
+                                "description": "Revenue from "
+                                f"{invoice.customer.company_name}",
+                            },
+                        ],
+                    }
+                    for invoice in invoices
+                    if f"INV-{invoice.invoice_number}" not in posted
+                ],
+                user=self.user,
+            )
+
+        queued = 0
+        if notify:
+            queued = enqueue(
+                self._message(
+                    invoice,
+                    OutboundMessage.Kind.INVOICE,
+                    f"Invoice {invoice.invoice_number} from {self.company.name}",
+                    "invoice.txt",
+                )
+                for invoice in invoices
+            )
+
+        self._finish(invoices, changes)
+        return {"invoices": len(invoices), "journal_entries": len(entries), "emails": queued}
+
+    @transaction.atomic
+    def void(self, invoices, notify=True):
+        """
+        Cancel unpaid invoices, reverse the entries of those already posted
+        and tell customers about the ones they were sent
+        """
+        invoices = self._load(invoices, ACTION_VOID)
+        was_sent = [invoice for invoice in invoices if invoice.status in OPEN_STATUSES]
+
+        def mutate(invoice):
+            invoice.status = Invoice.Status.CANCELLED
+
+        changes = self._update(invoices, mutate, status=Invoice.Status.CANCELLED)
+
+        entries = []
+        receivable, revenue = self._revenue_accounts()
+        if receivable and revenue:
+            posted = self._posted_numbers(
+                f"INV-{invoice.invoice_number}" for invoice in invoices
+            )
+            entries = post_journal_entries(
+                self.company,
+                [
+                    {
+                        "entry_number": f"VOID-{invoice.invoice_number}",
+                        "entry_date": self.today,
+                        "description": f"Void of invoice {invoice.invoice_number} - "
+                        f"{invoice.customer.company_name}",
+                        "lines": [
+                            {
+                                "account": revenue,
+                                "debit": invoice.total_amount,
+                                "description": f"Void invoice {invoice.invoice_number}",
+                            },
+                            {
+                                "account": receivable,
+                                "credit": invoice.total_amount,
+                                "description": f"Void invoice {invoice.invoice_number}",
+                            },
+                        ],
+                    }
+                    for invoice in invoices
+                    if f"INV-{invoice.invoice_number}" in posted
+                ],
+                user=self.user,
+            )
+
+        queued = 0
+        if notify:
+            queued = enqueue(
+                self._message(
+                    invoice,
+                    OutboundMessage.Kind.NOTICE,
+                    f"Invoice {invoice.invoice_number} cancelled",
+                    "invoice_void.txt",
+                )
+                for invoice in was_sent
+            )
+
+        self._finish(invoices, changes)
+        return {"invoices": len(invoices), "journal_entries": len(entries), "emails": queued}
+
+    @transaction.atomic
+    def mark_paid(self, invoices, payment_date=None,
+                  payment_method=Payment.PaymentMethod.BANK_TRANSFER, notify=True):
+        """
+        Settle open invoices in full: one payment and allocation per invoice,
+        one cash / AR entry per payment, receipts queued
+        """
+        payment_date = payment_date or self.today
+        invoices = self._load(invoices, ACTION_MARK_PAID)
+        open_amounts = {
+            invoice.pk: invoice.total_amount - invoice.paid_amount for invoice in invoices
+        }
+
+        numbers = next_payment_numbers(self.company, len(invoices))
+        payments = [
+            Payment(
+                company=self.company,
+                customer_id=invoice.customer_id,
+                invoice=invoice,
+                payment_number=number,
+                payment_date=payment_date,
+                amount=open_amounts[invoice.pk],
+                payment_method=payment_method,
+                created_by=self.user,
+            )
+            for number, invoice in zip(numbers, invoices)
+        ]
+        Payment.objects.bulk_create(payments, batch_size=BATCH_SIZE)
+        PaymentAllocation.objects.bulk_create(
+            [
+                PaymentAllocation(
+                    payment=payment, invoice=payment.invoice, amount=payment.amount
+                )
+                for payment in payments
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        def mutate(invoice):
+            invoice.paid_amount = invoice.total_amount
+            invoice.status = Invoice.Status.PAID
+
+        changes = self._update(
+            invoices, mutate, paid_amount=F("total_amount"), status=Invoice.Status.PAID
+        )
+
+        entries = []
+        cash, receivable = cash_account(self.company), receivable_account(self.company)
+        if cash and receivable:
+            entries = post_journal_entries(
+                self.company,
+                [
+                    {
+                        "entry_number": f"PAY-{payment.payment_number}",
+                        "entry_date": payment_date,
+                        "description": f"Payment {payment.payment_number} - "
+                        f"{payment.invoice.customer.company_name}",
+                        "lines": [
+                            {
+                                "account": cash,
+                                "debit": payment.amount,
+                                "description": f"Payment {payment.payment_number}",
+                            },
+                            {
+                                "account": receivable,
+                                "credit": payment.amount,
+                                "description": f"Invoice {payment.invoice.invoice_number}",
+                            },
+                        ],
+                    }
+                    for payment in payments
+                ],
+                user=self.user,
+            )
+
+        queued = 0
+        if notify:
+            queued = enqueue(
+                self._message(
+                    invoice,
+                    OutboundMessage.Kind.RECEIPT,
+                    f"Payment received for invoice {invoice.invoice_number}",
+                    "payment_receipt.txt",
+                    amount=open_amounts[invoice.pk],
+                )
+                for invoice in invoices
+            )
+
+        self._finish(invoices, changes, payment_date=payment_date)
+        return {
+            "invoices": len(invoices),
+            "payments": len(payments),
+            "journal_entries": len(entries),
+            "emails": queued,
+        }
+
+    @transaction.atomic
+    def remind(self, invoices):
+        """Queue a payment reminder for every past-due open invoice"""
+        invoices = self._load(invoices, ACTION_REMIND)
+        queued = enqueue(
+            self._message(
+                invoice,
+                OutboundMessage.Kind.REMINDER,
+                f"Reminder: invoice {invoice.invoice_number} is overdue",
+                "invoice_reminder.txt",
+                balance_due=invoice.total_amount - invoice.paid_amount,
+            )
+            for invoice in invoices
+        )
+        return {"invoices": len(invoices), "emails": queued}
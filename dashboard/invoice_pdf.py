@@ -0,0 +1,488 @@
+"""
+Invoice PDF Rendering
+Renders customer invoices to PDF one at a time or by the thousand
+- Layout (styles, column widths, table styles) is built once per process
+- Company logo and letterhead loaded once per company per process
+- Batches rendered in chunks across a process pool, in invoice order
+- Zip archives streamed entry by entry, never held whole in memory
+- Single renders cached by (invoice, updated_at, company updated_at)
+"""
+
+import multiprocessing
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal
+from functools import lru_cache
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.text import get_valid_filename
+
+from accounting.models import Invoice, InvoiceLine
+from dashboard.utils import discard_process_pool
+
+
+# Invoices fetched per query and pickled per worker task
+CHUNK_SIZE = 50
+
+# Logos are scaled to fit this box (points)
+LOGO_MAX_WIDTH = 160
+LOGO_MAX_HEIGHT = 60
+
+
+# ============================================================================
+# PAYLOADS
+# ============================================================================
+
+
+def _money(value):
+    return f"{(value or Decimal('0')):,.2f}"
+
+
+def version_key(timestamp):
+    return timestamp.strftime("%Y%m%d%H%M%S%f") if timestamp else "0"
+
+
+def invoice_filename(invoice_number):
+    return get_valid_filename(f"{invoice_number}.pdf")
+
+
+def invoice_payloads(company, invoice_ids):
+    """
+    Plain dicts describing each invoice, in the order of invoice_ids
+    Two queries per call (invoices with customers, then all their lines).
+    Payloads only hold strings so they can be pickled to a render worker.
+    """
+    invoices = (
+        Invoice.objects.filter(company=company, id__in=invoice_ids)
+        .select_related("customer")
+        .only(
+            "id", "invoice_number", "invoice_date", "due_date", "status",
+            "subtotal", "tax_amount", "discount_amount", "total_amount",
+            "paid_amount", "notes", "updated_at",
+            "customer__company_name", "customer__contact_name",
+            "customer__email", "customer__address", "customer__city",
+            "customer__country", "customer__tax_id",
+        )
+    )
+    lines = {}
+    for invoice_id, description, quantity, unit_price, line_total in (
+        InvoiceLine.objects.filter(invoice_id__in=invoice_ids)
+        .order_by("invoice_id", "line_number")
+        .values_list("invoice_id", "description", "quantity", "unit_price", "line_total")
+    ):
+        lines.setdefault(invoice_id, []).append(
+            [description, f"{quantity:,.2f}", _money(unit_price), _money(line_total)]
+        )
+
+    by_id = {}
+    asset_version = version_key(company.updated_at)
+    for invoice in invoices:
+        customer = invoice.customer
+        balance_due = invoice.total_amount - invoice.paid_amount
+        by_id[invoice.id] = {
+            "id": invoice.id,
+            "company_id": company.id,
+            "asset_version": asset_version,
+            "filename": invoice_filename(invoice.invoice_number),
+            "invoice_number": invoice.invoice_number,
+            "status": invoice.get_status_display(),
+            "invoice_date": invoice.invoice_date.strftime("%b %d, %Y"),
+            "due_date": invoice.due_date.strftime("%b %d, %Y"),
+            "customer_lines": [
+                line
+                for line in (
+                    customer.company_name,
+                    customer.contact_name,
+                    customer.address,
+                    ", ".join(part for part in (customer.city, customer.country) if part),
+                    customer.email,
+                    f"Tax ID: {customer.tax_id}" if customer.tax_id else "",
+                )
+                if line
+            ],
+            "lines": lines.get(invoice.id, []),
+            "totals": [
+                ["Subtotal", _money(invoice.subtotal)],
+                ["Tax", _money(invoice.tax_amount)],
+                ["Discount", f"-{_money(invoice.discount_amount)}"],
+                ["Total", _money(invoice.total_amount)],
+                ["Paid", _money(invoice.paid_amount)],
+                ["Balance Due", _money(balance_due)],
+            ],
+            "notes": invoice.notes or "",
+        }
+    return [by_id[invoice_id] for invoice_id in invoice_ids if invoice_id in by_id]
+
+
+# ============================================================================
+# LAYOUT AND ASSETS
+# ============================================================================
+
+
+class InvoiceLayout:
+    """Styles, table styles and column widths shared by invoice and statement PDFs"""
+
+    def __init__(self):
+        from reportlab.lib import colors
+        from reportlab.lib.enums import TA_RIGHT
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+        from reportlab.lib.units import inch
+        from reportlab.platypus import TableStyle
+
+        self.pagesize = A4
+        self.margin = 0.6 * inch
+        self.header_height = 1.2 * inch
+        self.width = self.pagesize[0] - 2 * self.margin
+
+        base = getSampleStyleSheet()
+        self.styles = {
+            "title": ParagraphStyle("InvoiceTitle", parent=base["Title"], alignment=TA_RIGHT, spaceAfter=4),
+            "meta": ParagraphStyle("InvoiceMeta", parent=base["Normal"], alignment=TA_RIGHT, fontSize=9, leading=12),
+            "heading": ParagraphStyle("InvoiceHeading", parent=base["Heading4"], spaceBefore=6, spaceAfter=2),
+            "normal": ParagraphStyle("InvoiceNormal", parent=base["Normal"], fontSize=9, leading=12),
+            "cell": ParagraphStyle("InvoiceCell", parent=base["Normal"], fontSize=9, leading=11),
+        }
+
+        self.line_widths = [self.width * 0.52, self.width * 0.12, self.width * 0.18, self.width * 0.18]
+        grid = [
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1F2937")),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE", (0, 0), (-1, -1), 9),
+            ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#F3F4F6")]),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ]
+        self.line_style = TableStyle(grid + [("ALIGN", (1, 0), (-1, -1), "RIGHT")])
+        self.statement_widths = [self.width * w for w in (0.13, 0.17, 0.28, 0.14, 0.14, 0.14)]
+        self.statement_style = TableStyle(grid + [("ALIGN", (3, 0), (-1, -1), "RIGHT")])
+        self.totals_widths = [self.width * 0.18, self.width * 0.18]
+        self.totals_style = TableStyle(
+            [
+                ("FONTSIZE", (0, 0), (-1, -1), 9),
+                ("ALIGN", (1, 0), (1, -1), "RIGHT"),
+                ("LINEABOVE", (0, 3), (-1, 3), 0.75, colors.black),
+                ("FONTNAME", (0, 3), (-1, 3), "Helvetica-Bold"),
+                ("LINEABOVE", (0, 5), (-1, 5), 0.75, colors.black),
+                ("FONTNAME", (0, 5), (-1, 5), "Helvetica-Bold"),
+            ]
+        )
+
+    def document(self, buffer, title, author):
+        from reportlab.platypus import SimpleDocTemplate
+
+        return SimpleDocTemplate(
+            buffer,
+            pagesize=self.pagesize,
+            title=title,
+            author=author,
+            leftMargin=self.margin,
+            rightMargin=self.margin,
+            topMargin=self.margin + self.header_height,
+            bottomMargin=self.margin + 10,
+        )
+
+    def page_decorators(self, assets, footer):
+        """First-page (letterhead and footer) and later-page (footer) callbacks"""
+
+        def draw_footer(canvas, document):
+            canvas.saveState()
+            canvas.setFont("Helvetica", 8)
+            canvas.drawString(document.leftMargin, self.margin, footer)
+            canvas.drawRightString(
+                document.pagesize[0] - document.rightMargin,
+                self.margin,
+                f"Page {document.page}",
+            )
+            canvas.restoreState()
+
+        def draw_header(canvas, document):
+            canvas.saveState()
+            top = document.pagesize[1] - self.margin
+            if assets["logo"]:
+                reader, width, height = assets["logo"]
+                canvas.drawImage(reader, self.margin, top - height, width, height, mask="auto")
+                text_top = top - height - 12
+            else:
+                canvas.setFont("Helvetica-Bold", 14)
+                canvas.drawString(self.margin, top - 14, assets["name"])
+                text_top = top - 28
+            canvas.setFont("Helvetica", 8)
+            for line in assets["letterhead"]:
+                if text_top < top - self.header_height:
+                    break
+                canvas.drawString(self.margin, text_top, line)
+                text_top -= 10
+            canvas.restoreState()
+            draw_footer(canvas, document)
+
+        return draw_header, draw_footer
+
+
+@lru_cache(maxsize=1)
+def get_layout():
+    return InvoiceLayout()
+
+
+@lru_cache(maxsize=256)
+def company_assets(company_id, asset_version):
+    """
+    Letterhead lines and decoded logo for a company
+    Cached per process; asset_version (the company's updated_at) changes
+    whenever the logo or details are edited, so stale entries just age out.
+    """
+    from companies.models import Company
+    from reportlab.lib.utils import ImageReader
+
+    company = Company.objects.get(pk=company_id)
+    letterhead = [
+        line
+        for line in (
+            company.address,
+            ", ".join(part for part in (company.city, company.country) if part),
+            company.phone,
+            company.email,
+            company.website,
+            f"Tax No: {company.tax_number}" if company.tax_number else "",
+        )
+        if line
+    ]
+
+    logo = None
+    if company.logo:
+        try:
+            with company.logo.open("rb") as image:
+                logo = ImageReader(BytesIO(image.read()))
+            width, height = logo.getSize()
+            scale = min(LOGO_MAX_WIDTH / width, LOGO_MAX_HEIGHT / height, 1)
+            logo = (logo, width * scale, height * scale)
+        except (OSError, ValueError):
+            # A missing or unreadable file falls back to the company name
+            logo = None
+
+    return {
+        "name": company.get_display_name(),
+        "currency": company.currency,
+        "letterhead": letterhead,
+        "logo": logo,
+    }
+
+
+# ============================================================================
+# RENDERING
+# ============================================================================
+
+
+def render_invoice_pdf(payload):
+    """
+    Render one invoice payload to PDF bytes
+    Only company assets touch the database, and those are cached per process.
+    """
+    from xml.sax.saxutils import escape
+
+    from reportlab.platypus import LongTable, Paragraph, Spacer, Table
+
+    layout = get_layout()
+    styles = layout.styles
+    assets = company_assets(payload["company_id"], payload["asset_version"])
+
+    buffer = BytesIO()
+    doc = layout.document(buffer, f"Invoice {payload['invoice_number']}", assets["name"])
+
+    meta = (
+        f"<b>{escape(payload['invoice_number'])}</b><br/>"
+        f"Date: {payload['invoice_date']}<br/>"
+        f"Due: {payload['due_date']}<br/>"
+        f"Status: {payload['status']}"
+    )
+    elements = [
+        Paragraph("INVOICE", styles["title"]),
+        Paragraph(meta, styles["meta"]),
+        Paragraph("Bill To", styles["heading"]),
+        Paragraph("<br/>".join(escape(line) for line in payload["customer_lines"]), styles["normal"]),
+        Spacer(1, 12),
+    ]
+
+    rows = [["Description", "Qty", "Unit Price", f"Amount ({assets['currency']})"]]
+    rows += [
+        [Paragraph(escape(description), styles["cell"]), quantity, unit_price, amount]
+        for description, quantity, unit_price, amount in payload["lines"]
+    ] or [["No line items", "", "", ""]]
+    # LongTable splits across pages and repeats the header row on each one
+    line_table = LongTable(rows, colWidths=layout.line_widths, repeatRows=1)
+    line_table.setStyle(layout.line_style)
+    elements += [line_table, Spacer(1, 8)]
+
+    totals = Table(payload["totals"], colWidths=layout.totals_widths, hAlign="RIGHT")
+    totals.setStyle(layout.totals_style)
+    elements.append(totals)
+
+    if payload["notes"]:
+        elements += [
+            Paragraph("Notes", styles["heading"]),
+            Paragraph(escape(payload["notes"]).replace("\n", "<br/>"), styles["normal"]),
+        ]
+
+    first_page, later_pages = layout.page_decorators(
+        assets, f"{assets['name']} - Invoice {payload['invoice_number']}"
+    )
+    doc.build(elements, onFirstPage=first_page, onLaterPages=later_pages)
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
+
+
+def render_invoice_batch(payloads):
+    """Worker task: [(filename, pdf bytes)] for a chunk of payloads"""
+    return [(payload["filename"], render_invoice_pdf(payload)) for payload in payloads]
+
+
+def _worker_count():
+    return getattr(settings, "INVOICE_PDF_WORKERS", 0) or multiprocessing.cpu_count()
+
+
+_invoice_pdf_pool = None
+_invoice_pdf_pool_lock = threading.Lock()
+
+
+def get_invoice_pdf_pool():
+    """
+    Lazily start the per-process invoice render pool
+    Workers are spawned so they never share the parent's database
+    connections; each sets Django up once and keeps its layout and logos.
+    """
+    global _invoice_pdf_pool
+    with _invoice_pdf_pool_lock:
+        if _invoice_pdf_pool is None:
+            _invoice_pdf_pool = ProcessPoolExecutor(
+                max_workers=_worker_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        return _invoice_pdf_pool
+
+
+def _payload_chunks(company, invoice_ids, chunk_size):
+    for start in range(0, len(invoice_ids), chunk_size):
+        yield invoice_payloads(company, invoice_ids[start:start + chunk_size])
+
+
+def render_chunks(task, chunks, pooled=True):
+    """
+    Yield task(chunk) for each chunk, in order
+    Pooled runs keep only a few chunks in flight, so memory stays flat
+    however many chunks there are, and the caller's generator prepares the
+    next chunk while workers render. Statements share this pool.
+    """
+    global _invoice_pdf_pool
+    if not pooled:
+        for chunk in chunks:
+            yield task(chunk)
+        return
+
+    pool = get_invoice_pdf_pool()
+    max_pending = 2 * _worker_count()
+    timeout = getattr(settings, "INVOICE_PDF_TIMEOUT", 60)
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(task, chunk)))
+            if len(pending) >= max_pending:
+                results = pending[0][1].result(timeout=timeout)
+                pending.popleft()
+                yield results
+        while pending:
+            results = pending[0][1].result(timeout=timeout)
+            pending.popleft()
+            yield results
+    except (BrokenProcessPool, FutureTimeoutError, CancelledError):
+        # A worker died or hung (or another caller hit that and discarded the
+        # pool); stop the pool, start a fresh one next time and finish here
+        with _invoice_pdf_pool_lock:
+            if _invoice_pdf_pool is pool:
+                _invoice_pdf_pool = None
+                discard_process_pool(pool)
+        for chunk, future in pending:
+            future.cancel()
+            yield task(chunk)
+        for chunk in chunks:
+            yield task(chunk)
+
+
+def iter_invoice_pdfs(company, invoices, chunk_size=CHUNK_SIZE):
+    """
+    Yield (filename, pdf bytes) for every invoice in the queryset, in order
+    Small selections render inline; larger ones go to the pool by chunk.
+    """
+    invoice_ids = list(invoices.order_by("invoice_number", "id").values_list("id", flat=True))
+    pooled = len(invoice_ids) >= getattr(settings, "INVOICE_PDF_POOL_THRESHOLD", 50)
+    for results in render_chunks(
+        render_invoice_batch, _payload_chunks(company, invoice_ids, chunk_size), pooled
+    ):
+        yield from results
+
+
+def get_invoice_pdf(invoice):
+    """PDF bytes for one invoice, cached until the invoice or company changes"""
+    company = invoice.company
+    key = (
+        f"invoice_pdf_{invoice.id}_{version_key(invoice.updated_at)}"
+        f"_{version_key(company.updated_at)}"
+    )
+    pdf = cache.get(key)
+    if pdf is None:
+        pdf = render_invoice_pdf(invoice_payloads(company, [invoice.id])[0])
+        cache.set(key, pdf, getattr(settings, "INVOICE_PDF_CACHE_TIMEOUT", 86400))
+    return pdf
+
+
+# ============================================================================
+# ZIP STREAMING
+# ============================================================================
+
+
+class _ZipStream:
+    """Write-only file object whose contents are handed out and dropped"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def stream_zip(entries):
+    """
+    Yield a zip archive of (filename, bytes) entries piece by piece
+    The stream is not seekable, so zipfile writes each entry as soon as it
+    is added; only one PDF is in memory at a time. PDF page streams are
+    already compressed, so entries are stored rather than deflated.
+    """
+    stream = _ZipStream()
+    seen = set()
+    with zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for filename, data in entries:
+            # Invoice numbers are unique per company, but keep the zip valid
+            name, suffix = filename, 1
+            while name in seen:
+                suffix += 1
+                name = f"{filename[:-4]}_{suffix}.pdf"
+            seen.add(name)
+            archive.writestr(name, data)
+            yield stream.drain()
+    yield stream.drain()
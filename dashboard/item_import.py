@@ -0,0 +1,368 @@
+"""
+Inventory Item Import
+Loads item catalogs of tens of thousands of rows from CSV
+- The file is decoded and parsed row by row, never read whole
+- Existing item codes, barcodes, categories and vendors are preloaded into
+  dicts, so a row costs no queries
+- Missing categories and vendors are created in one bulk insert per chunk
+- Items are written with bulk_create in chunks; in upsert mode existing
+  codes are updated by the same statement (INSERT ... ON CONFLICT)
+- Opening stock of new items is put at their location (StockLevel) and
+  opens a cost layer at the item's unit cost
+"""
+
+import csv
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounting.models import CostLayer, InventoryCategory, InventoryItem, StockLevel, Vendor
+
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+# Items per bulk insert
+CHUNK_SIZE = 1000
+
+# Errors returned to the caller; the rest are only counted
+MAX_ERRORS = 200
+
+MODE_CREATE = "create"
+MODE_UPSERT = "upsert"
+
+# Column -> model field for the decimal columns
+DECIMAL_COLUMNS = {
+    "unit_cost": "unit_cost",
+    "selling_price": "selling_price",
+    "current_stock": "current_stock",
+    "minimum_stock": "minimum_stock",
+    "maximum_stock": "maximum_stock",
+    "reorder_point": "reorder_point",
+}
+
+# Columns an upsert may change on existing items (stock and its cost move
+# through inventory transactions and cost layers, not imports)
+UPDATABLE_COLUMNS = {
+    "name": "name",
+    "description": "description",
+    "category": "category",
+    "vendor": "primary_vendor",
+    "vendor_item_code": "vendor_item_code",
+    "selling_price": "selling_price",
+    "minimum_stock": "minimum_stock",
+    "maximum_stock": "maximum_stock",
+    "reorder_point": "reorder_point",
+    "unit_of_measure": "unit_of_measure",
+    "location": "location",
+    "barcode": "barcode",
+}
+
+UNITS = {choice.lower(): choice for choice in InventoryItem.UnitOfMeasure.values}
+
+MAX_CODE = InventoryItem._meta.get_field("item_code").max_length
+MAX_NAME = InventoryItem._meta.get_field("name").max_length
+
+
+class _Skipped(ValueError):
+    """A row for an item that already exists, in create mode"""
+
+
+def _key(text):
+    return " ".join(str(text or "").lower().split())
+
+
+def _decimal(value, column):
+    value = (value or "").strip().replace(",", "")
+    if not value:
+        return None
+    try:
+        return Decimal(value).quantize(CENT)
+    except InvalidOperation:
+        raise ValueError(f"Invalid {column}: {value!r}")
+
+
+class ItemImporter:
+    """
+    Import inventory items from CSV rows
+    Columns: item_code, name, description, category, vendor (code or name),
+    vendor_item_code, unit_cost, selling_price, current_stock, minimum_stock,
+    maximum_stock, reorder_point, unit_of_measure, location, barcode.
+    In create mode existing item codes are reported and skipped; in upsert
+    mode the columns present in the file are updated on them, except for
+    blank cells, which keep the item's current value. Stock and unit cost
+    of existing items are never changed by an import.
+    Vendors are looked up among the company's vendors.
+    """
+
+    def __init__(self, company=None, user=None, mode=MODE_CREATE,
+                 chunk_size=CHUNK_SIZE, dry_run=False):
+        if mode not in (MODE_CREATE, MODE_UPSERT):
+            raise ValueError(f"Unknown import mode {mode!r}")
+        self.company = company
+        self.user = user
+        self.mode = mode
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self._load()
+
+    def _load(self):
+        """Item codes, barcodes, categories and vendors, four queries"""
+        self.codes = set(InventoryItem.objects.values_list("item_code", flat=True))
+        self.barcodes = dict(
+            InventoryItem.objects.filter(barcode__isnull=False).values_list("barcode", "item_code")
+        )
+        self.categories = {
+            _key(name): category_id
+            for category_id, name in InventoryCategory.objects.values_list("id", "name")
+        }
+        self.vendors = {}
+        if self.company is not None:
+            for vendor_id, code, name in Vendor.objects.filter(
+                company=self.company
+            ).values_list("id", "vendor_code", "company_name"):
+                self.vendors[_key(code)] = vendor_id
+                self.vendors.setdefault(_key(name), vendor_id)
+
+    # ------------------------------------------------------------------
+    # Rows
+    # ------------------------------------------------------------------
+
+    def _parse(self, row):
+        """Field values of one row; category and vendor still as names"""
+        item_code = (row.get("item_code") or "").strip()
+        name = (row.get("name") or "").strip()
+        if not item_code or not name:
+            raise ValueError("Missing item_code or name")
+        if len(item_code) > MAX_CODE:
+            raise ValueError(f"item_code is longer than {MAX_CODE} characters")
+        if len(name) > MAX_NAME:
+            raise ValueError(f"name is longer than {MAX_NAME} characters")
+        if item_code in self.seen:
+            raise ValueError(f"Item code {item_code} appears earlier in the file")
+        if item_code in self.codes and self.mode == MODE_CREATE:
+            raise _Skipped(f"Item code {item_code} already exists")
+
+        values = {"item_code": item_code, "name": name}
+        for column in ("description", "vendor_item_code", "location", "barcode"):
+            values[column] = (row.get(column) or "").strip() or None
+        for column, field in DECIMAL_COLUMNS.items():
+            values[field] = _decimal(row.get(column), column)
+
+        unit = (row.get("unit_of_measure") or "").strip()
+        if unit:
+            values["unit_of_measure"] = UNITS.get(unit.lower().replace(" ", "_"))
+            if values["unit_of_measure"] is None:
+                raise ValueError(f"Unknown unit_of_measure {unit!r}")
+
+        barcode = values["barcode"]
+        if barcode:
+            owner = self.barcodes.get(barcode)
+            if owner is not None and owner != item_code:
+                raise ValueError(f"Barcode {barcode} belongs to item {owner}")
+            self.barcodes[barcode] = item_code
+
+        vendor = (row.get("vendor") or "").strip()
+        values["primary_vendor"] = vendor or None
+        values["category"] = (row.get("category") or "").strip() or None
+        return values
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def _next_vendor_codes(self, count):
+        """count unused IMP-00001 style vendor codes"""
+        last = 0
+        latest = Vendor.objects.filter(vendor_code__startswith="IMP-").aggregate(
+            code=Max("vendor_code")
+        )["code"]
+        if latest and latest[4:].isdigit():
+            last = int(latest[4:])
+        return [f"IMP-{number:05d}" for number in range(last + 1, last + count + 1)]
+
+    def _create_missing(self, rows):
+        """Create the categories and vendors the chunk names that do not exist"""
+        categories, vendors = {}, {}
+        for values in rows:
+            if values["category"] and _key(values["category"]) not in self.categories:
+                categories.setdefault(_key(values["category"]), values["category"])
+            if values["primary_vendor"] and _key(values["primary_vendor"]) not in self.vendors:
+                vendors.setdefault(_key(values["primary_vendor"]), values["primary_vendor"])
+
+        if categories:
+            InventoryCategory.objects.bulk_create(
+                [InventoryCategory(name=name) for name in categories.values()],
+                ignore_conflicts=True,
+            )
+            self.categories.update(
+                (_key(name), category_id)
+                for category_id, name in InventoryCategory.objects.filter(
+                    name__in=list(categories.values())
+                ).values_list("id", "name")
+            )
+            self.counts["categories_created"] += len(categories)
+
+        if vendors and self.company is not None:
+            created = Vendor.objects.bulk_create([
+                Vendor(company=self.company, vendor_code=code, company_name=name, contact_name=name)
+                for code, name in zip(self._next_vendor_codes(len(vendors)), vendors.values())
+            ])
+            self.vendors.update((_key(vendor.company_name), vendor.id) for vendor in created)
+            self.counts["vendors_created"] += len(created)
+
+    def _flush(self):
+        rows, self.pending = self.pending, []
+        if not rows or self.dry_run:
+            return
+
+        with transaction.atomic():
+            self._create_missing(rows)
+            new, existing = [], []
+            for values in rows:
+                values["category_id"] = self.categories.get(_key(values.pop("category")))
+                vendor = values.pop("primary_vendor")
+                values["primary_vendor_id"] = self.vendors.get(_key(vendor)) if vendor else None
+                if values["item_code"] in self.codes:
+                    existing.append(values)
+                else:
+                    new.append(values)
+
+            if new:
+                for values in new:
+                    if (values["current_stock"] or ZERO) > 0 and values["unit_cost"]:
+                        values["total_value"] = (values["current_stock"] * values["unit_cost"]).quantize(CENT)
+                items = InventoryItem.objects.bulk_create(
+                    [
+                        InventoryItem(
+                            created_by=self.user,
+                            **{field: value for field, value in values.items() if value is not None},
+                        )
+                        for values in new
+                    ],
+                    batch_size=self.chunk_size,
+                )
+                StockLevel.objects.bulk_create(
+                    [
+                        StockLevel(item=item, location=item.location or "", quantity=item.current_stock)
+                        for item in items
+                        if item.current_stock
+                    ],
+                    batch_size=self.chunk_size,
+                )
+                now = timezone.now()
+                CostLayer.objects.bulk_create(
+                    [
+                        CostLayer(
+                            item=item,
+                            company=self.company,
+                            received_at=now,
+                            quantity=item.current_stock,
+                            remaining_quantity=item.current_stock,
+                            unit_cost=item.unit_cost,
+                        )
+                        for item in items
+                        if item.current_stock > 0
+                    ],
+                    batch_size=self.chunk_size,
+                )
+                self.codes.update(values["item_code"] for values in new)
+            if existing:
+                self._upsert(existing)
+        self.counts["created"] += len(new)
+        self.counts["updated"] += len(existing)
+
+    def _upsert(self, rows):
+        """
+        Update existing items with the columns the file has, one INSERT ...
+        ON CONFLICT (item_code) DO UPDATE per batch
+        Blank cells keep the current value, so rows are grouped by the
+        columns they fill; a file usually has only a few such groups.
+        """
+        fields = [
+            InventoryItem._meta.get_field(field)
+            for column, field in UPDATABLE_COLUMNS.items()
+            if column in self.columns
+        ]
+        groups = defaultdict(list)
+        for values in rows:
+            filled = tuple(field for field in fields if values.get(field.attname) is not None)
+            if filled:
+                groups[filled].append(values)
+
+        for filled, group in groups.items():
+            items = []
+            for values in group:
+                item = InventoryItem(item_code=values["item_code"], name=values["name"])
+                for field in filled:
+                    setattr(item, field.attname, values[field.attname])
+                items.append(item)
+            InventoryItem.objects.bulk_create(
+                items,
+                batch_size=self.chunk_size,
+                update_conflicts=True,
+                unique_fields=["item_code"],
+                update_fields=[field.name for field in filled] + ["updated_at"],
+            )
+
+    # ------------------------------------------------------------------
+    # Import
+    # ------------------------------------------------------------------
+
+    def run(self, stream, progress=None):
+        """
+        Import every row of a CSV text stream
+        progress(rows) is called after each chunk. Returns {"rows",
+        "created", "updated", "skipped", "failed", "categories_created",
+        "vendors_created", "seconds", "rows_per_second", "errors"}, errors
+        being the first MAX_ERRORS "Row n: message" strings.
+        """
+        started = time.monotonic()
+        self.counts = {
+            "rows": 0, "created": 0, "updated": 0, "skipped": 0, "failed": 0,
+            "categories_created": 0, "vendors_created": 0,
+        }
+        self.errors, self.pending, self.seen = [], [], set()
+
+        reader = csv.DictReader(stream)
+        reader.fieldnames = [_key(name).replace(" ", "_") for name in reader.fieldnames or []]
+        self.columns = set(reader.fieldnames)
+
+        for number, row in enumerate(reader, start=2):
+            self.counts["rows"] += 1
+            try:
+                values = self._parse(row)
+            except ValueError as exc:
+                self.counts["skipped" if isinstance(exc, _Skipped) else "failed"] += 1
+                if len(self.errors) < MAX_ERRORS:
+                    self.errors.append(f"Row {number}: {exc}")
+                continue
+            self.seen.add(values["item_code"])
+            self.pending.append(values)
+            if len(self.pending) >= self.chunk_size:
+                self._flush()
+                if progress:
+                    progress(self.counts["rows"])
+        self._flush()
+
+        if self.dry_run:
+            self.counts["created"] = sum(1 for code in self.seen if code not in self.codes)
+            self.counts["updated"] = len(self.seen) - self.counts["created"]
+
+        elapsed = time.monotonic() - started
+        return {
+            **self.counts,
+            "seconds": round(elapsed, 2),
+            "rows_per_second": round(self.counts["rows"] / max(elapsed, 0.001)),
+            "errors": self.errors,
+        }
+
+
+def import_items(stream, company=None, user=None, **kwargs):
+    """Import a CSV item catalog; see ItemImporter"""
+    progress = kwargs.pop("progress", None)
+    return ItemImporter(company, user=user, **kwargs).run(stream, progress=progress)
@@ -0,0 +1,162 @@
+"""
+Journal Posting
+Helpers for services that post system-generated journal entries
+- Lines are written with one bulk insert instead of a save (and a totals
+  recalculation) per line
+- The entry is posted with a single save, so ledger signals fire once
+- Batches of entries are inserted in bulk, with the ledger follow-up
+  (versions, snapshots, balance history, search) done once per batch
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from accounting.models import Account, AccountType, JournalEntry, JournalEntryLine
+
+
+ZERO = Decimal("0.00")
+
+
+def find_account(company, account_type, *name_hints):
+    """First active account of the type whose name contains one of the hints"""
+    match = Q()
+    for hint in name_hints:
+        match |= Q(name__icontains=hint)
+    return (
+        Account.objects.filter(company=company, account_type=account_type, is_active=True)
+        .filter(match)
+        .order_by("code")
+        .first()
+    )
+
+
+def cash_account(company):
+    return find_account(company, AccountType.ASSET, "cash", "bank")
+
+
+def receivable_account(company):
+    return find_account(company, AccountType.ASSET, "receivable")
+
+
+def payable_account(company):
+    return find_account(company, AccountType.LIABILITY, "payable")
+
+
+def _balanced_lines(entry_number, lines):
+    lines = [
+        line
+        for line in lines
+        if (line.get("debit") or ZERO) or (line.get("credit") or ZERO)
+    ]
+    total_debit = sum((line.get("debit") or ZERO for line in lines), ZERO)
+    total_credit = sum((line.get("credit") or ZERO for line in lines), ZERO)
+    if total_debit != total_credit:
+        raise ValueError(
+            f"Unbalanced entry {entry_number}: debit {total_debit}, credit {total_credit}"
+        )
+    return lines, total_debit
+
+
+@transaction.atomic
+def post_journal_entry(company, entry_number, entry_date, description, lines,
+                       user=None, reference=None, batch_size=1000):
+    """
+    Create and post a journal entry
+    lines: iterable of {"account", "debit", "credit", "description"} dicts;
+    zero lines are dropped. Raises ValueError if the entry does not balance.
+    """
+    lines, total = _balanced_lines(entry_number, lines)
+
+    entry = JournalEntry.objects.create(
+        company=company,
+        entry_number=entry_number,
+        entry_date=entry_date,
+        description=description,
+        reference=reference,
+        created_by=user,
+    )
+    JournalEntryLine.objects.bulk_create(
+        [
+            JournalEntryLine(
+                journal_entry=entry,
+                account=line["account"],
+                description=line.get("description") or "",
+                debit_amount=line.get("debit") or ZERO,
+                credit_amount=line.get("credit") or ZERO,
+                line_number=number,
+            )
+            for number, line in enumerate(lines, start=1)
+        ],
+        batch_size=batch_size,
+    )
+
+    entry.total_debit = total
+    entry.total_credit = total
+    entry.status = JournalEntry.Status.POSTED
+    entry.posted_at = timezone.now()
+    entry.posted_by = user
+    entry.save()
+    return entry
+
+
+@transaction.atomic
+def post_journal_entries(company, entries, user=None, batch_size=1000):
+    """
+    Create and post many journal entries at once
+    entries: iterable of {"entry_number", "entry_date", "description",
+    "reference", "lines"} dicts, lines as for post_journal_entry. Entries and
+    lines are bulk-inserted; no per-entry signals are sent, so the ledger
+    follow-up runs once for the batch. Returns the created entries.
+    """
+    from dashboard.cache_signals import ledger_changed
+    from dashboard.search import index_objects
+
+    now = timezone.now()
+    journal_entries, entry_lines = [], []
+    for data in entries:
+        lines, total = _balanced_lines(data["entry_number"], data["lines"])
+        if not lines:
+            continue
+        journal_entries.append(
+            JournalEntry(
+                company=company,
+                entry_number=data["entry_number"],
+                entry_date=data["entry_date"],
+                description=data["description"],
+                reference=data.get("reference"),
+                status=JournalEntry.Status.POSTED,
+                total_debit=total,
+                total_credit=total,
+                created_by=user,
+                posted_by=user,
+                posted_at=now,
+            )
+        )
+        entry_lines.append(lines)
+
+    if not journal_entries:
+        return []
+
+    JournalEntry.objects.bulk_create(journal_entries, batch_size=batch_size)
+    JournalEntryLine.objects.bulk_create(
+        [
+            JournalEntryLine(
+                journal_entry=entry,
+                account=line["account"],
+                description=line.get("description") or "",
+                debit_amount=line.get("debit") or ZERO,
+                credit_amount=line.get("credit") or ZERO,
+                line_number=number,
+            )
+            for entry, lines in zip(journal_entries, entry_lines)
+            for number, line in enumerate(lines, start=1)
+        ],
+        batch_size=batch_size,
+    )
+
+    ledger_changed(company, [entry.entry_date for entry in journal_entries])
+    index_objects(journal_entries)
+    return journal_entries
@@ -0,0 +1,196 @@
+"""
+General Ledger Detail
+Posted journal lines per account with opening and running balances
+"""
+
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Q, Sum, When, Window
+
+from accounting.models import AccountType, JournalEntry, JournalEntryLine
+from dashboard.pagination import sign_cursor, unsign_cursor
+
+
+# Assets and expenses increase with debits, everything else with credits
+DEBIT_NORMAL_TYPES = [AccountType.ASSET, AccountType.EXPENSE]
+
+LINE_ORDER = ["account__code", "journal_entry__entry_date", "id"]
+
+
+def signed_amount():
+    """Line amount in the direction that increases its account's balance"""
+    return Case(
+        When(
+            account__account_type__in=DEBIT_NORMAL_TYPES,
+            then=F("debit_amount") - F("credit_amount"),
+        ),
+        default=F("credit_amount") - F("debit_amount"),
+        output_field=DecimalField(max_digits=15, decimal_places=2),
+    )
+
+
+class GeneralLedgerDetail:
+    """
+    GL detail report for an account or account range over a date range
+    Pages are fetched by keyset (account code, entry date, line id). The
+    cursor carries the running balance of the last row, so later pages never
+    re-sum the lines before them.
+    """
+
+    PAGE_SIZE = 100
+    CURSOR_SALT = "dashboard.ledger.cursor"
+
+    def __init__(self, company, start_date, end_date, account_from=None, account_to=None):
+        self.company = company
+        self.start_date = start_date
+        self.end_date = end_date
+        self.account_from = account_from
+        self.account_to = account_to
+
+    def _account_lines(self):
+        lines = JournalEntryLine.objects.filter(
+            account__company=self.company,
+            journal_entry__status=JournalEntry.Status.POSTED,
+        )
+        if self.account_from:
+            lines = lines.filter(account__code__gte=self.account_from)
+        if self.account_to:
+            lines = lines.filter(account__code__lte=self.account_to)
+        return lines
+
+    def _period_lines(self):
+        return self._account_lines().filter(
+            journal_entry__entry_date__gte=self.start_date,
+            journal_entry__entry_date__lte=self.end_date,
+        )
+
+    def opening_balances(self, account_ids):
+        """Balance of each account before the start date, in one grouped query"""
+        rows = (
+            self._account_lines()
+            .filter(
+                account_id__in=account_ids,
+                journal_entry__entry_date__lt=self.start_date,
+            )
+            .values("account_id")
+            .annotate(balance=Sum(signed_amount()))
+            .order_by()
+        )
+        return {row["account_id"]: row["balance"] for row in rows}
+
+    def encode_cursor(self, row):
+        return sign_cursor(
+            [
+                row["account_id"],
+                row["account_code"],
+                row["entry_date"].isoformat(),
+                row["id"],
+                str(row["running_balance"]),
+            ],
+            self.CURSOR_SALT,
+        )
+
+    def decode_cursor(self, cursor):
+        """Return (account_id, account_code, entry_date, line_id, balance) or None"""
+        values = unsign_cursor(cursor, self.CURSOR_SALT)
+        try:
+            account_id, code, entry_date, line_id, balance = values
+            return account_id, code, date.fromisoformat(entry_date), line_id, Decimal(balance)
+        except (ValueError, TypeError, ArithmeticError):
+            return None
+
+    def page(self, cursor=None, page_size=None):
+        """
+        Return one page of lines with running balances
+        Two queries: the page itself (ids picked by keyset, balances by a
+        window over just those rows) and the opening balances it needs.
+        """
+        page_size = page_size or self.PAGE_SIZE
+        position = self.decode_cursor(cursor)
+
+        lines = self._period_lines()
+        if position:
+            _, code, entry_date, line_id, _ = position
+            lines = lines.filter(
+                Q(account__code__gt=code)
+                | Q(account__code=code, journal_entry__entry_date__gt=entry_date)
+                | Q(
+                    account__code=code,
+                    journal_entry__entry_date=entry_date,
+                    id__gt=line_id,
+                )
+            )
+        page_ids = lines.order_by(*LINE_ORDER).values("id")[: page_size + 1]
+
+        rows = list(
+            JournalEntryLine.objects.filter(id__in=page_ids)
+            .annotate(
+                entry_date=F("journal_entry__entry_date"),
+                entry_number=F("journal_entry__entry_number"),
+                entry_description=F("journal_entry__description"),
+                account_code=F("account__code"),
+                account_name=F("account__name"),
+                page_balance=Window(
+                    Sum(signed_amount()),
+                    partition_by=[F("account_id")],
+                    order_by=[F("journal_entry__entry_date").asc(), F("id").asc()],
+                ),
+            )
+            .order_by(*LINE_ORDER)
+            .values(
+                "id",
+                "account_id",
+                "account_code",
+                "account_name",
+                "entry_date",
+                "entry_number",
+                "entry_description",
+                "description",
+                "debit_amount",
+                "credit_amount",
+                "page_balance",
+            )
+        )
+
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        # Balance carried into this page for every account on it
+        carried = {}
+        if position:
+            carried[position[0]] = position[4]
+        new_accounts = {row["account_id"] for row in rows} - set(carried)
+        opening = self.opening_balances(new_accounts) if new_accounts else {}
+        for account_id in new_accounts:
+            carried[account_id] = opening.get(account_id) or Decimal("0.00")
+
+        started = set()
+        for row in rows:
+            account_id = row["account_id"]
+            row["running_balance"] = carried[account_id] + row.pop("page_balance")
+            # Opening balance is shown on the first line of each account
+            row["opening_balance"] = None
+            if account_id in new_accounts and account_id not in started:
+                row["opening_balance"] = carried[account_id]
+                started.add(account_id)
+
+        return {
+            "lines": rows,
+            "opening_balances": {
+                account_id: balance
+                for account_id, balance in carried.items()
+                if account_id in new_accounts
+            },
+            "next_cursor": self.encode_cursor(rows[-1]) if has_more else None,
+        }
+
+    def iter_lines(self, page_size=1000):
+        """Yield every line of the report, one keyset page at a time"""
+        cursor = None
+        while True:
+            page = self.page(cursor, page_size)
+            yield from page["lines"]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
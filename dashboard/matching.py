@@ -0,0 +1,386 @@
+"""
+Three-Way Match
+Matches bill lines to purchase order lines and the goods received for them
+- Open PO lines loaded once and indexed by (vendor, item) in hash maps
+- Receipts and bill lines allocated in a single pass, oldest first
+- Links, PO receipt totals and match results written in bulk
+- Anything outside tolerance is kept as an exception to review
+- One bill can be re-matched on its own when it arrives
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Concat
+
+from accounting.models import (
+    Bill,
+    BillLine,
+    InventoryTransaction,
+    PurchaseOrder,
+    PurchaseOrderLine,
+    ThreeWayMatch,
+)
+
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+# Rows per bulk write
+BATCH_SIZE = 1000
+
+# Orders whose lines can still be received or billed
+OPEN_PO_STATUSES = [
+    PurchaseOrder.Status.APPROVED,
+    PurchaseOrder.Status.ORDERED,
+    PurchaseOrder.Status.PARTIALLY_RECEIVED,
+    PurchaseOrder.Status.RECEIVED,
+]
+
+
+def _normalize(text):
+    return " ".join((text or "").lower().split())
+
+
+def _chunks(values, size=BATCH_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+class _OpenLine:
+    """In-memory state of one open PO line during a matching pass"""
+
+    __slots__ = (
+        "id", "purchase_order_id", "vendor_id", "item_id", "ordered",
+        "received", "billed", "unit_price", "received_changed",
+    )
+
+    def __init__(self, line_id, purchase_order_id, vendor_id, item_id, ordered,
+                 received, unit_price):
+        self.id = line_id
+        self.purchase_order_id = purchase_order_id
+        self.vendor_id = vendor_id
+        self.item_id = item_id
+        self.ordered = ordered
+        self.received = received
+        self.billed = ZERO
+        self.unit_price = unit_price
+        self.received_changed = False
+
+
+class ThreeWayMatcher:
+    """
+    Matching state for a company (optionally narrowed to some vendors)
+    Build one per pass: it loads every open PO line up front, then matches
+    receipts and bill lines against the in-memory index.
+    """
+
+    def __init__(self, company, vendor_ids=None, quantity_tolerance=None,
+                 price_tolerance=None):
+        self.company = company
+        self.vendor_ids = vendor_ids
+        self.quantity_tolerance = Decimal(str(
+            quantity_tolerance if quantity_tolerance is not None
+            else getattr(settings, "THREE_WAY_MATCH_QUANTITY_TOLERANCE", "0.02")
+        ))
+        self.price_tolerance = Decimal(str(
+            price_tolerance if price_tolerance is not None
+            else getattr(settings, "THREE_WAY_MATCH_PRICE_TOLERANCE", "0.01")
+        ))
+        self._load()
+
+    def _open_orders(self):
+        orders = PurchaseOrder.objects.filter(
+            vendor__company=self.company, status__in=OPEN_PO_STATUSES
+        )
+        if self.vendor_ids is not None:
+            orders = orders.filter(vendor_id__in=self.vendor_ids)
+        return orders
+
+    def _load(self):
+        """Index open PO lines by (vendor, item) and by PO number, one query"""
+        self.lines = {}
+        self.index = defaultdict(list)
+        self.by_po_number = defaultdict(list)
+        self.aliases = {}
+        self.po_status = {}
+
+        rows = (
+            PurchaseOrderLine.objects.filter(purchase_order__in=self._open_orders())
+            .order_by("purchase_order__order_date", "purchase_order_id", "id")
+            .values_list(
+                "id", "purchase_order_id", "purchase_order__po_number",
+                "purchase_order__status", "purchase_order__vendor_id",
+                "inventory_item_id", "item_description", "inventory_item__item_code",
+                "inventory_item__name", "inventory_item__vendor_item_code",
+                "quantity_ordered", "quantity_received", "unit_price",
+            )
+        )
+        for (line_id, order_id, po_number, po_status, vendor_id, item_id,
+             description, item_code, item_name, vendor_item_code, ordered,
+             received, unit_price) in rows:
+            line = _OpenLine(line_id, order_id, vendor_id, item_id, ordered, received, unit_price)
+            self.lines[line_id] = line
+            self.po_status[order_id] = po_status
+            self.by_po_number[po_number].append(line)
+            if item_id:
+                self.index[(vendor_id, item_id)].append(line)
+                # Bill lines without an item are resolved by these names
+                for alias in (description, item_code, item_name, vendor_item_code):
+                    if alias:
+                        self.aliases.setdefault((vendor_id, _normalize(alias)), item_id)
+            else:
+                self.index[(vendor_id, ("description", _normalize(description)))].append(line)
+
+        billed = ThreeWayMatch.objects.filter(
+            po_line__purchase_order__in=self._open_orders()
+        ).values("po_line_id").annotate(total=Sum("billed_quantity")).order_by()
+        for row in billed:
+            self.lines[row["po_line_id"]].billed = row["total"] or ZERO
+
+    # ------------------------------------------------------------------
+    # Receipts
+    # ------------------------------------------------------------------
+
+    def _receipt_candidates(self, item_id, reference, primary_vendor_id):
+        reference = (reference or "").strip()
+        for po_number in (reference, reference[3:] if reference.upper().startswith("PO-") else None):
+            if po_number and po_number in self.by_po_number:
+                return [line for line in self.by_po_number[po_number] if line.item_id == item_id]
+        return self.index.get((primary_vendor_id, item_id), [])
+
+    def match_receipts(self):
+        """
+        Link unmatched stock receipts to open PO lines and update received totals
+        A receipt goes to the PO named in its reference, else to the oldest
+        open line for the item's primary vendor. Returns receipts linked.
+        """
+        orders = self._open_orders()
+        vendor_items = Q(item__primary_vendor__company=self.company)
+        if self.vendor_ids is not None:
+            vendor_items = Q(item__primary_vendor_id__in=self.vendor_ids)
+        receipts = (
+            InventoryTransaction.objects.filter(
+                transaction_type=InventoryTransaction.TransactionType.RECEIPT,
+                po_line__isnull=True,
+            )
+            .filter(
+                Q(reference_number__in=orders.values("po_number"))
+                | Q(reference_number__in=orders.annotate(
+                    reference=Concat(Value("PO-"), "po_number")
+                ).values("reference"))
+                | vendor_items
+            )
+            .order_by("created_at", "id")
+            .values_list("id", "item_id", "quantity", "reference_number", "item__primary_vendor_id")
+        )
+
+        links = []
+        for receipt_id, item_id, quantity, reference, vendor_id in receipts:
+            candidates = self._receipt_candidates(item_id, reference, vendor_id)
+            if not candidates:
+                continue
+            line = next((c for c in candidates if c.received < c.ordered), candidates[-1])
+            line.received += quantity
+            line.received_changed = True
+            links.append(InventoryTransaction(id=receipt_id, po_line_id=line.id))
+
+        if not links:
+            return 0
+
+        changed = [line for line in self.lines.values() if line.received_changed]
+        orders_touched = {line.purchase_order_id for line in changed}
+        order_lines = defaultdict(list)
+        for line in self.lines.values():
+            if line.purchase_order_id in orders_touched:
+                order_lines[line.purchase_order_id].append(line)
+        order_updates = []
+        for order_id, lines in order_lines.items():
+            status = (
+                PurchaseOrder.Status.RECEIVED
+                if all(line.received >= line.ordered for line in lines)
+                else PurchaseOrder.Status.PARTIALLY_RECEIVED
+            )
+            if status != self.po_status[order_id]:
+                self.po_status[order_id] = status
+                order_updates.append(PurchaseOrder(id=order_id, status=status))
+
+        with transaction.atomic():
+            InventoryTransaction.objects.bulk_update(links, ["po_line"], batch_size=BATCH_SIZE)
+            PurchaseOrderLine.objects.bulk_update(
+                [PurchaseOrderLine(id=line.id, quantity_received=line.received) for line in changed],
+                ["quantity_received"],
+                batch_size=BATCH_SIZE,
+            )
+            PurchaseOrder.objects.bulk_update(order_updates, ["status"], batch_size=BATCH_SIZE)
+        for line in changed:
+            line.received_changed = False
+        return len(links)
+
+    # ------------------------------------------------------------------
+    # Bill lines
+    # ------------------------------------------------------------------
+
+    def _match_line(self, line_id, vendor_id, item_id, description, quantity, unit_price):
+        if not item_id:
+            item_id = self.aliases.get((vendor_id, _normalize(description)))
+        key = item_id if item_id else ("description", _normalize(description))
+        candidates = self.index.get((vendor_id, key), [])
+
+        result = ThreeWayMatch(
+            company=self.company,
+            bill_line_id=line_id,
+            billed_quantity=quantity,
+            bill_unit_price=unit_price,
+        )
+        if not candidates:
+            result.status = ThreeWayMatch.Status.NO_PURCHASE_ORDER
+            return result, item_id
+
+        po_line = (
+            next((c for c in candidates if c.received > c.billed), None)
+            or next((c for c in candidates if c.ordered > c.billed), None)
+            or candidates[0]
+        )
+        available = po_line.received - po_line.billed
+        po_line.billed += quantity
+
+        result.po_line_id = po_line.id
+        result.ordered_quantity = po_line.ordered
+        result.received_quantity = max(available, ZERO)
+        result.po_unit_price = po_line.unit_price
+        result.quantity_variance = quantity - max(available, ZERO)
+        result.price_variance = unit_price - po_line.unit_price
+
+        if available <= 0:
+            result.status = ThreeWayMatch.Status.NOT_RECEIVED
+        elif quantity > available * (1 + self.quantity_tolerance):
+            result.status = ThreeWayMatch.Status.QUANTITY_VARIANCE
+        elif abs(result.price_variance) > max(po_line.unit_price * self.price_tolerance, CENT):
+            result.status = ThreeWayMatch.Status.PRICE_VARIANCE
+        else:
+            result.status = ThreeWayMatch.Status.MATCHED
+        return result, item_id
+
+    def match_bill_lines(self, bill_lines):
+        """
+        (Re-)match the given bill lines, oldest bill first
+        Earlier results for these lines are replaced, and what they had
+        billed is released first. Returns {status: count}.
+        """
+        rows = list(
+            bill_lines.order_by("bill__bill_date", "bill_id", "id").values_list(
+                "id", "bill__vendor_id", "inventory_item_id", "description",
+                "quantity", "unit_price",
+            )
+        )
+        line_ids = [row[0] for row in rows]
+
+        previous = []
+        for chunk in _chunks(line_ids):
+            previous += ThreeWayMatch.objects.filter(bill_line_id__in=chunk).values_list(
+                "po_line_id", "billed_quantity"
+            )
+        for po_line_id, billed in previous:
+            if po_line_id in self.lines:
+                self.lines[po_line_id].billed -= billed
+
+        # Lines whose item was resolved by name, grouped by item so each
+        # item costs one UPDATE however many lines it has
+        results, resolved = [], defaultdict(list)
+        for row in rows:
+            result, item_id = self._match_line(*row)
+            results.append(result)
+            if item_id and not row[2]:
+                resolved[item_id].append(row[0])
+
+        with transaction.atomic():
+            for chunk in _chunks(line_ids):
+                ThreeWayMatch.objects.filter(bill_line_id__in=chunk).delete()
+            ThreeWayMatch.objects.bulk_create(results, batch_size=BATCH_SIZE)
+            for item_id, ids in resolved.items():
+                for chunk in _chunks(ids):
+                    BillLine.objects.filter(id__in=chunk).update(inventory_item_id=item_id)
+
+        counts = defaultdict(int)
+        for result in results:
+            counts[str(result.status)] += 1
+        return dict(counts)
+
+
+def _billable_lines(company):
+    return BillLine.objects.filter(bill__company=company).exclude(
+        bill__status=Bill.Status.CANCELLED
+    )
+
+
+def run_three_way_match(company, rematch=False):
+    """
+    Match every waiting receipt and bill line of a company in one pass
+    Bill lines without a result, or whose result is an exception, are
+    (re-)matched; rematch=True redoes every line.
+    Returns {"receipts": linked, "bill_lines": matched, "statuses": {..}}.
+    """
+    matcher = ThreeWayMatcher(company)
+    receipts = matcher.match_receipts()
+
+    bill_lines = _billable_lines(company)
+    if not rematch:
+        bill_lines = bill_lines.exclude(match__status=ThreeWayMatch.Status.MATCHED)
+    statuses = matcher.match_bill_lines(bill_lines)
+    return {
+        "receipts": receipts,
+        "bill_lines": sum(statuses.values()),
+        "statuses": statuses,
+    }
+
+
+def match_bill(bill):
+    """Incrementally match one bill, e.g. right after it is entered"""
+    company = bill.company or bill.vendor.company
+    matcher = ThreeWayMatcher(company, vendor_ids=[bill.vendor_id])
+    receipts = matcher.match_receipts()
+    statuses = matcher.match_bill_lines(bill.lines.all())
+    return {"receipts": receipts, "bill_lines": sum(statuses.values()), "statuses": statuses}
+
+
+def match_summary(company):
+    """{status: count} of the company's current match results"""
+    return dict(
+        ThreeWayMatch.objects.filter(company=company)
+        .values_list("status")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+
+
+def match_exceptions(company, limit=200):
+    """Latest results that need review, as plain dicts"""
+    rows = (
+        ThreeWayMatch.objects.filter(company=company)
+        .exclude(status=ThreeWayMatch.Status.MATCHED)
+        .select_related("bill_line__bill__vendor", "po_line__purchase_order")
+        .order_by("-matched_at", "id")[:limit]
+    )
+    return [
+        {
+            "id": match.id,
+            "status": match.status,
+            "status_display": match.get_status_display(),
+            "bill_number": match.bill_line.bill.bill_number,
+            "vendor": match.bill_line.bill.vendor.company_name,
+            "description": match.bill_line.description,
+            "po_number": match.po_line.purchase_order.po_number if match.po_line else None,
+            "billed_quantity": float(match.billed_quantity),
+            "received_quantity": float(match.received_quantity),
+            "bill_unit_price": float(match.bill_unit_price),
+            "po_unit_price": float(match.po_unit_price) if match.po_unit_price is not None else None,
+            "quantity_variance": float(match.quantity_variance),
+            "price_variance": float(match.price_variance),
+        }
+        for match in rows
+    ]
@@ -0,0 +1,54 @@
+"""
+Three-Way Match Signals
+Re-match a bill once its lines are saved, after the transaction commits
+- One on_commit callback per bill, however many of its lines are saved
+- Queued callbacks are tracked per thread and database by weak reference:
+  one that Django drops, run or rolled back, leaves the map with it
+"""
+
+import threading
+import weakref
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from accounting.models import Bill, BillLine
+from dashboard.matching import match_bill
+
+
+_local = threading.local()
+
+
+def _queued(using):
+    """{bill id: its waiting on_commit callback} on this thread and database"""
+    queued = getattr(_local, "callbacks", None)
+    if queued is None:
+        queued = _local.callbacks = {}
+    return queued.setdefault(using, weakref.WeakValueDictionary())
+
+
+def _rematch(using, bill_id):
+    _queued(using).pop(bill_id, None)
+    bill = (
+        Bill.objects.using(using)
+        .select_related("company", "vendor")
+        .filter(pk=bill_id)
+        .first()
+    )
+    if bill is not None and bill.status != Bill.Status.CANCELLED:
+        match_bill(bill)
+
+
+@receiver(post_save, sender=BillLine)
+def bill_line_saved(sender, instance, using, **kwargs):
+    """Queue one incremental match per bill, however many lines are saved"""
+    queued = _queued(using)
+    # A callback rolled back with a savepoint is released by Django, so it
+    # is no longer here and the bill is queued again
+    if instance.bill_id in queued:
+        return
+    callback = partial(_rematch, using, instance.bill_id)
+    queued[instance.bill_id] = callback
+    transaction.on_commit(callback, using=using)
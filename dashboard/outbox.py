@@ -0,0 +1,244 @@
+"""
+Email Outbox
+Queue outgoing email as OutboundMessage rows instead of sending inline
+- Callers enqueue inside their own transaction, so a rolled-back change
+  never sends mail
+- Many messages are written with one bulk insert
+- A dispatcher claims due rows with SKIP LOCKED, so several can run at once
+- Sends over a few long-lived SMTP connections, within a global rate limit
+- Failed sends retry with exponential backoff
+"""
+
+import os
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import get_template
+from django.utils import timezone
+
+from accounting.models import OutboundMessage
+
+
+def build_message(company, kind, to_email, subject, template, context,
+                  related=None, attachment=""):
+    """Unsaved OutboundMessage with its body rendered from templates/emails/"""
+    body = get_template(f"emails/{template}").render({"company": company, **context})
+    return OutboundMessage(
+        company=company,
+        kind=kind,
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        attachment=attachment,
+        object_type=related._meta.model_name if related is not None else "",
+        object_id=related.pk if related is not None else None,
+    )
+
+
+def enqueue(messages, batch_size=1000):
+    """Queue many messages with one bulk insert; returns the number queued"""
+    messages = [message for message in messages if message.to_email]
+    OutboundMessage.objects.bulk_create(messages, batch_size=batch_size)
+    return len(messages)
+
+
+# ============================================================================
+# DISPATCH
+# ============================================================================
+
+
+def claim_messages(limit, lease_seconds):
+    """
+    Claim up to `limit` due messages for this dispatcher
+    Rows locked by another dispatcher are skipped rather than waited on.
+    Claimed rows stay SENDING until the lease runs out, after which a
+    crashed dispatcher's messages become due again.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundMessage.objects.select_for_update(skip_locked=True)
+            .filter(
+                status__in=[OutboundMessage.Status.PENDING, OutboundMessage.Status.SENDING],
+                next_attempt_at__lte=now,
+            )
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        OutboundMessage.objects.filter(id__in=ids).update(
+            status=OutboundMessage.Status.SENDING,
+            attempts=F("attempts") + 1,
+            next_attempt_at=now + timedelta(seconds=lease_seconds),
+        )
+    return list(
+        OutboundMessage.objects.filter(id__in=ids).select_related("company").order_by("id")
+    )
+
+
+class RateLimiter:
+    """Spaces calls from any number of threads at least 1/rate seconds apart"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_at, now)
+            self.next_at = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def is_permanent_failure(exc):
+    """Rejected recipients and 5xx replies will not succeed on retry"""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(exc, smtplib.SMTPResponseException) and 500 <= exc.smtp_code < 600
+
+
+class OutboxDispatcher:
+    """
+    Sends due outbox messages until none are left (or `limit` were tried)
+    Each sender thread keeps one SMTP connection open across messages and
+    batches; the rate limit applies to all threads together.
+    """
+
+    def __init__(self, concurrency=None, rate=None, batch_size=None):
+        self.concurrency = concurrency or getattr(settings, "OUTBOX_CONCURRENCY", 4)
+        self.batch_size = batch_size or getattr(settings, "OUTBOX_BATCH_SIZE", 200)
+        self.limiter = RateLimiter(
+            getattr(settings, "OUTBOX_RATE_LIMIT", 10) if rate is None else rate
+        )
+        self.max_attempts = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 6)
+        self.retry_delay = getattr(settings, "OUTBOX_RETRY_DELAY", 60)
+        self.lease = getattr(settings, "OUTBOX_SENDING_TIMEOUT", 600)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _reconnect(self):
+        connection = self._local.connection
+        connection.close()
+        connection.open()
+        return connection
+
+    def close(self):
+        with self._connections_lock:
+            for connection in self._connections:
+                try:
+                    connection.close()
+                except (OSError, smtplib.SMTPException):
+                    pass
+            self._connections = []
+
+    def email(self, message, connection):
+        company = message.company
+        email = EmailMultiAlternatives(
+            subject=message.subject,
+            body=message.body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[message.to_email],
+            reply_to=[company.email] if company is not None and company.email else None,
+            connection=connection,
+        )
+        if message.html_body:
+            email.attach_alternative(message.html_body, "text/html")
+        if message.attachment:
+            with default_storage.open(message.attachment, "rb") as attachment:
+                email.attach(os.path.basename(message.attachment), attachment.read())
+        return email
+
+    def send(self, message):
+        """Send one message; returns None or the exception that stopped it"""
+        self.limiter.wait()
+        try:
+            connection = self._connection()
+            try:
+                self.email(message, connection).send()
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # The server dropped an idle pooled connection; retry once on a new one
+                self.email(message, self._reconnect()).send()
+        except Exception as exc:
+            return exc
+        return None
+
+    def record(self, messages, errors):
+        """Mark sent messages, and schedule retries or give up on the rest"""
+        now = timezone.now()
+        sent_ids = [message.id for message, error in zip(messages, errors) if error is None]
+        OutboundMessage.objects.filter(id__in=sent_ids).update(
+            status=OutboundMessage.Status.SENT, sent_at=now, last_error=""
+        )
+
+        failed = []
+        for message, error in zip(messages, errors):
+            if error is None:
+                continue
+            message.last_error = f"{type(error).__name__}: {error}"[:2000]
+            if is_permanent_failure(error) or message.attempts >= self.max_attempts:
+                message.status = OutboundMessage.Status.FAILED
+            else:
+                message.status = OutboundMessage.Status.PENDING
+                message.next_attempt_at = now + timedelta(
+                    seconds=self.retry_delay * 2 ** (message.attempts - 1)
+                )
+            failed.append(message)
+        OutboundMessage.objects.bulk_update(
+            failed, ["status", "next_attempt_at", "last_error"], batch_size=500
+        )
+        return len(sent_ids), failed
+
+    def dispatch(self, limit=None):
+        """
+        Claim and send batches until the outbox has nothing due
+        Returns {"sent", "retrying", "failed"}.
+        """
+        summary = {"sent": 0, "retrying": 0, "failed": 0}
+        tried = 0
+        try:
+            with ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix="outbox"
+            ) as senders:
+                while limit is None or tried < limit:
+                    batch_size = self.batch_size if limit is None else min(self.batch_size, limit - tried)
+                    messages = claim_messages(batch_size, self.lease)
+                    if not messages:
+                        break
+                    tried += len(messages)
+
+                    errors = list(senders.map(self.send, messages))
+                    sent, failed = self.record(messages, errors)
+                    summary["sent"] += sent
+                    for message in failed:
+                        if message.status == OutboundMessage.Status.FAILED:
+                            summary["failed"] += 1
+                        else:
+                            summary["retrying"] += 1
+        finally:
+            self.close()
+        return summary
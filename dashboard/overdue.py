@@ -0,0 +1,149 @@
+"""
+Overdue Sweep
+Moves past-due invoices and bills to OVERDUE for every company at once
+- One grouped count and one set-based UPDATE per chunk of companies
+- Search entries follow with the same UPDATE, no per-row re-index
+- One cache/data version bump for all affected companies
+- One notification per company user, created in bulk
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.urls import reverse
+from django.utils import timezone
+
+from accounting.models import Bill, Invoice, Notification, SearchEntry
+from companies.models import UserCompany
+from dashboard.utils import claim_scheduled_run
+
+
+# Companies per UPDATE statement
+COMPANY_CHUNK_SIZE = 500
+
+# ScheduledRun row of the periodic sweep
+SWEEP_RUN_NAME = "overdue_sweep"
+
+# Status a document is in while it can fall overdue
+SWEEPS = [
+    (Invoice, "invoices", Invoice.Status.SENT, Invoice.Status.OVERDUE),
+    (Bill, "bills", Bill.Status.APPROVED, Bill.Status.OVERDUE),
+]
+
+
+def _past_due(model, open_status, today, company_ids=None):
+    documents = model.objects.filter(
+        status=open_status, due_date__lt=today, company__isnull=False
+    )
+    if company_ids is not None:
+        documents = documents.filter(company_id__in=company_ids)
+    return documents
+
+
+def _company_chunks(company_ids, chunk_size):
+    for start in range(0, len(company_ids), chunk_size):
+        yield company_ids[start:start + chunk_size]
+
+
+def sweep_overdue(today=None, company_ids=None, notify=True, dry_run=False,
+                  chunk_size=COMPANY_CHUNK_SIZE):
+    """
+    Mark every SENT invoice and APPROVED bill due before `today` as OVERDUE
+    Returns {company_id: {"invoices": n, "invoice_total": x, "bills": n,
+    "bill_total": x}} for the companies that had any.
+    """
+    today = today or timezone.now().date()
+    affected = {}
+
+    for model, label, open_status, overdue_status in SWEEPS:
+        # Companies with something to move, and how much, in one grouped query
+        rows = (
+            _past_due(model, open_status, today, company_ids)
+            .values("company_id")
+            .annotate(count=Count("id"), total=Sum("total_amount"))
+            .order_by("company_id")
+        )
+        counts = {row["company_id"]: row for row in rows}
+        if not counts:
+            continue
+
+        for row in counts.values():
+            summary = affected.setdefault(
+                row["company_id"],
+                {"invoices": 0, "invoice_total": 0, "bills": 0, "bill_total": 0},
+            )
+            summary[label] = row["count"]
+            summary[f"{label[:-1]}_total"] = row["total"] or 0
+
+        if dry_run:
+            continue
+
+        now = timezone.now()
+        for chunk in _company_chunks(list(counts), chunk_size):
+            with transaction.atomic():
+                documents = _past_due(model, open_status, today, chunk)
+                if model is Invoice:
+                    SearchEntry.objects.filter(
+                        company_id__in=chunk,
+                        object_type=SearchEntry.ObjectType.INVOICE,
+                        object_id__in=documents.values("id"),
+                    ).update(status=overdue_status)
+                documents.update(status=overdue_status, updated_at=now)
+
+    if affected and not dry_run:
+        from dashboard.cache_signals import invalidate_companies_cache
+
+        invalidate_companies_cache(list(affected))
+        if notify:
+            notify_overdue(affected)
+
+    return affected
+
+
+def notify_overdue(affected):
+    """One notification per user of each affected company, in bulk"""
+    members = UserCompany.objects.filter(company_id__in=list(affected)).values_list(
+        "company_id", "user_id"
+    )
+    action_url = reverse("accounting:invoice_list")
+
+    notifications = []
+    for company_id, user_id in members:
+        summary = affected[company_id]
+        parts = []
+        if summary["invoices"]:
+            parts.append(
+                f"{summary['invoices']} invoice(s) totalling "
+                f"{summary['invoice_total']:,.2f}"
+            )
+        if summary["bills"]:
+            parts.append(
+                f"{summary['bills']} bill(s) totalling {summary['bill_total']:,.2f}"
+            )
+        notifications.append(
+            Notification(
+                company_id=company_id,
+                user_id=user_id,
+                title="Documents overdue",
+                message=f"Now overdue: {' and '.join(parts)}.",
+                notification_type=Notification.NotificationType.WARNING,
+                action_url=action_url,
+                action_text="View invoices",
+            )
+        )
+
+    Notification.objects.bulk_create(notifications, batch_size=1000)
+    return len(notifications)
+
+
+def run_scheduled_sweep(**kwargs):
+    """
+    Scheduler entry point: sweep at most once per OVERDUE_SWEEP_INTERVAL
+    The run is claimed in the database, so several servers or schedulers
+    never sweep together. Returns the sweep result, or None when another
+    sweep ran recently.
+    """
+    interval = getattr(settings, "OVERDUE_SWEEP_INTERVAL", 3600)
+    if not claim_scheduled_run(SWEEP_RUN_NAME, interval):
+        return None
+    return sweep_overdue(**kwargs)
@@ -0,0 +1,289 @@
+"""
+Keyset Pagination
+Cursor pagination over indexed orderings for list views and JSON endpoints
+- Pages are fetched with a keyset filter and LIMIT n + 1, never OFFSET
+- Cursors are signed, so they are stable and tamper-proof in URLs
+- Counts are capped, with a planner estimate for large PostgreSQL tables
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+
+
+CURSOR_PARAM = "cursor"
+COUNT_LIMIT = 10000
+
+
+def sign_cursor(values, salt):
+    """Signed, URL-safe token for a list of JSON-serialisable values"""
+    return signing.dumps(values, salt=salt, compress=True)
+
+
+def unsign_cursor(cursor, salt):
+    """Values of a cursor made by sign_cursor, or None if missing or tampered"""
+    if not cursor:
+        return None
+    try:
+        return signing.loads(cursor, salt=salt)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+
+
+def planner_estimate(queryset):
+    """Row estimate from the PostgreSQL planner, without running the query"""
+    connection = connections[queryset.db]
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def bounded_count(queryset, limit=COUNT_LIMIT):
+    """
+    Return (count, exact)
+    Counts at most limit + 1 rows; past that the planner estimate is used on
+    PostgreSQL and the limit itself elsewhere.
+    """
+    count = queryset.order_by()[: limit + 1].count()
+    if count <= limit:
+        return count, True
+    if connections[queryset.db].vendor == "postgresql":
+        return max(planner_estimate(queryset), limit), False
+    return limit, False
+
+
+def _model_field(model, path):
+    field = None
+    for name in path.split("__"):
+        field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+        if field.is_relation:
+            model = field.related_model
+    if field.is_relation:
+        field = field.target_field
+    return field
+
+
+def _item_value(item, path):
+    if isinstance(item, dict):
+        if path == "pk" and "pk" not in item:
+            return item["id"]
+        return item[path]
+    for name in path.split("__"):
+        item = getattr(item, name)
+        if item is None:
+            break
+    return item
+
+
+def _dump_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator, iterable like a list of its rows"""
+
+    def __init__(self, paginator, object_list, next_cursor, previous_cursor, params=None):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.params = params
+        self._count = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def _query(self, cursor):
+        params = self.params.copy() if self.params is not None else {}
+        params[self.paginator.cursor_param] = cursor
+        return params.urlencode() if hasattr(params, "urlencode") else ""
+
+    @property
+    def next_query(self):
+        """Query string for the next page, keeping the current filters"""
+        return self._query(self.next_cursor) if self.has_next else ""
+
+    @property
+    def previous_query(self):
+        return self._query(self.previous_cursor) if self.has_previous else ""
+
+    def _load_count(self):
+        if self._count is None:
+            self._count = self.paginator.count()
+        return self._count
+
+    @property
+    def count(self):
+        """Total rows across all pages (capped; see count_is_exact)"""
+        return self._load_count()[0]
+
+    @property
+    def count_is_exact(self):
+        return self._load_count()[1]
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by keyset on a unique ordering, e.g.
+    ("-invoice_date", "-id"). The last field must be unique and no field
+    may be null. Querysets may yield model instances or values() dicts.
+    """
+
+    def __init__(self, queryset, ordering, page_size=25, cursor_param=CURSOR_PARAM,
+                 count_limit=COUNT_LIMIT):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.page_size = page_size
+        self.cursor_param = cursor_param
+        self.count_limit = count_limit
+        self.fields = [name.lstrip("-") for name in self.ordering]
+        self.descending = [name.startswith("-") for name in self.ordering]
+        self.salt = "dashboard.pagination.{}.{}".format(
+            queryset.model._meta.label_lower, ",".join(self.ordering)
+        )
+
+    # ------------------------------------------------------------------
+    # Keyset helpers
+    # ------------------------------------------------------------------
+
+    def _values(self, item):
+        return [_item_value(item, field) for field in self.fields]
+
+    def _encode(self, item, direction):
+        return sign_cursor(
+            [direction, [_dump_value(v) for v in self._values(item)]], self.salt
+        )
+
+    def _decode(self, cursor):
+        """Return (direction, values) or None for a missing or invalid cursor"""
+        state = unsign_cursor(cursor, self.salt)
+        try:
+            direction, raw = state
+            if direction not in ("n", "p") or len(raw) != len(self.fields):
+                return None
+            values = [
+                _model_field(self.queryset.model, field).to_python(value)
+                for field, value in zip(self.fields, raw)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            return None
+        return direction, values
+
+    def _after(self, values, forward=True):
+        """
+        Rows strictly after `values` in the ordering (before, if not forward)
+        Expanded as (a < x) OR (a = x AND b < y) ..., with a leading range
+        on the first field so an index on the ordering bounds the scan.
+        """
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            descending = self.descending[i] == forward
+            clause = Q(**{f"{field}__{'lt' if descending else 'gt'}": values[i]})
+            for j in range(i):
+                clause &= Q(**{self.fields[j]: values[j]})
+            condition |= clause
+
+        descending = self.descending[0] == forward
+        leading = Q(**{f"{self.fields[0]}__{'lte' if descending else 'gte'}": values[0]})
+        return leading & condition
+
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith("-") else f"-{name}" for name in self.ordering]
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def page(self, cursor=None, params=None):
+        """
+        Return the page at `cursor` (the first page if empty or invalid)
+        One query: the page rows plus one row to tell whether more follow.
+        """
+        position = self._decode(cursor) if cursor else None
+        forward = position is None or position[0] == "n"
+
+        rows = self.queryset
+        if position:
+            rows = rows.filter(self._after(position[1], forward))
+        ordering = self.ordering if forward else self._reversed_ordering()
+        rows = list(rows.order_by(*ordering)[: self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if not forward:
+            rows.reverse()
+
+        has_next = has_more if forward else True
+        has_previous = position is not None if forward else has_more
+
+        return KeysetPage(
+            self,
+            rows,
+            self._encode(rows[-1], "n") if rows and has_next else None,
+            self._encode(rows[0], "p") if rows and has_previous else None,
+            params,
+        )
+
+    def page_from_request(self, request):
+        """Page named by the request's cursor parameter; links keep its other filters"""
+        return self.page(request.GET.get(self.cursor_param), params=request.GET)
+
+    def count(self):
+        return bounded_count(self.queryset, self.count_limit)
+
+    def chunks(self):
+        """Yield every row as lists of page_size, walking the keyset forward"""
+        values = None
+        while True:
+            rows = self.queryset
+            if values is not None:
+                rows = rows.filter(self._after(values))
+            rows = list(rows.order_by(*self.ordering)[: self.page_size])
+            if not rows:
+                return
+            yield rows
+            if len(rows) < self.page_size:
+                return
+            values = self._values(rows[-1])
+
+
+def page_as_json(page=None):
+    """Pagination fields shared by the JSON list endpoints; None for a single page"""
+    if page is None:
+        return {"next_cursor": None, "previous_cursor": None, "has_next": False}
+    return {
+        "next_cursor": page.next_cursor,
+        "previous_cursor": page.previous_cursor,
+        "has_next": page.has_next,
+    }
@@ -0,0 +1,438 @@
+"""
+Payment Runs
+Picks the approved bills to pay in one batch and pays them together
+- Every open bill is loaded with one query and scored in memory
+- Bills due by the cutoff are paid, plus bills whose early payment discount
+  would be gone by the next run
+- Under a cash limit, bills are picked greedily by value (discount earned
+  plus late fee avoided) per unit of cash, a knapsack heuristic
+- Drafts are written in bulk; approval settles the bills with one UPDATE
+  per batch and posts one journal entry per bank account
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounting.models import (
+    Account,
+    AccountType,
+    Bill,
+    PaymentRun,
+    PaymentRunLine,
+    Vendor,
+    VendorPayment,
+)
+from dashboard.journal import cash_account, find_account, payable_account, post_journal_entries
+from dashboard.rollups import VENDORS, add_change, apply_deltas, document_state
+
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+HUNDRED = Decimal("100")
+
+# Bills per bulk insert / UPDATE statement
+BATCH_SIZE = 1000
+
+# Bills a payment run can pay
+PAYABLE_STATUSES = [Bill.Status.APPROVED, Bill.Status.OVERDUE]
+
+
+def _amount(value, name="amount"):
+    if value in (None, ""):
+        return None
+    try:
+        amount = Decimal(str(value).strip().replace(",", "")).quantize(CENT)
+    except InvalidOperation:
+        amount = None
+    if amount is None or not amount.is_finite():
+        raise ValueError(f"Invalid {name}: {value!r}")
+    return amount
+
+
+def next_run_number(company):
+    """PR-0001 style number following the company's latest run"""
+    last = PaymentRun.objects.filter(company=company).order_by("-id").first()
+    if last and last.run_number.rsplit("-", 1)[-1].isdigit():
+        return f"PR-{int(last.run_number.rsplit('-', 1)[-1]) + 1:04d}"
+    return "PR-0001"
+
+
+class _Candidate:
+    """An open bill scored for a payment run"""
+
+    __slots__ = (
+        "bill_id", "vendor_id", "due_date", "open_amount", "discount",
+        "penalty", "cash", "value", "reason",
+    )
+
+    def __init__(self, bill_id, vendor_id, due_date, open_amount, discount, penalty, reason):
+        self.bill_id = bill_id
+        self.vendor_id = vendor_id
+        self.due_date = due_date
+        self.open_amount = open_amount
+        self.discount = discount
+        self.penalty = penalty
+        self.cash = open_amount - discount
+        self.value = discount + penalty
+        self.reason = reason
+
+
+class PaymentRunPlanner:
+    """
+    Plan a payment run for a company
+    next_run_date is when unpaid bills get their next chance (default
+    payment_date + PAYMENT_RUN_INTERVAL_DAYS): a discount is only worth
+    taking now if it expires before then, and a late fee is avoided by
+    paying now if the bill falls due before then.
+    """
+
+    def __init__(self, company, payment_date, cutoff_date, cash_limit=None,
+                 bank_account=None, next_run_date=None, user=None):
+        self.company = company
+        self.payment_date = payment_date
+        self.cutoff_date = cutoff_date
+        self.cash_limit = _amount(cash_limit, "cash limit")
+        if self.cash_limit is not None and self.cash_limit < ZERO:
+            raise ValueError("The cash limit cannot be negative.")
+        self.bank_account = bank_account or cash_account(company)
+        if self.bank_account is None:
+            raise ValueError("No bank account to pay from.")
+        self.next_run_date = next_run_date or payment_date + timedelta(
+            days=getattr(settings, "PAYMENT_RUN_INTERVAL_DAYS", 7)
+        )
+        self.user = user
+
+    def candidates(self):
+        """Score every open bill of the company, one query"""
+        rows = (
+            Bill.objects.filter(
+                company=self.company,
+                status__in=PAYABLE_STATUSES,
+                paid_amount__lt=F("total_amount"),
+            )
+            .order_by("due_date", "id")
+            .values_list(
+                "id", "vendor_id", "bill_date", "due_date", "total_amount", "paid_amount",
+                "vendor__early_payment_discount_percent",
+                "vendor__early_payment_discount_days", "vendor__late_fee_percent",
+            )
+        )
+        candidates = []
+        for (bill_id, vendor_id, bill_date, due_date, total, paid, discount_percent,
+             discount_days, late_fee_percent) in rows:
+            open_amount = total - paid
+            discount = penalty = ZERO
+            if discount_percent and not paid:
+                deadline = bill_date + timedelta(days=discount_days)
+                if self.payment_date <= deadline < self.next_run_date:
+                    discount = (open_amount * discount_percent / HUNDRED).quantize(CENT)
+            if late_fee_percent and due_date < self.next_run_date:
+                penalty = (open_amount * late_fee_percent / HUNDRED).quantize(CENT)
+
+            if discount:
+                reason = PaymentRunLine.Reason.DISCOUNT
+            elif due_date < self.payment_date:
+                reason = PaymentRunLine.Reason.OVERDUE
+            elif due_date <= self.cutoff_date:
+                reason = PaymentRunLine.Reason.DUE
+            else:
+                continue
+            candidates.append(
+                _Candidate(bill_id, vendor_id, due_date, open_amount, discount, penalty, reason)
+            )
+        return candidates
+
+    def select(self, candidates):
+        """
+        The bills to pay: all of them, or under a cash limit the greedy
+        knapsack pick by value per unit of cash (most overdue first among
+        equals), or the single most valuable bill if that is worth more.
+        Returns (selected, deferred).
+        """
+        if self.cash_limit is None:
+            return candidates, []
+
+        ranked = sorted(
+            candidates,
+            key=lambda c: (-(c.value / c.cash) if c.cash > ZERO else -HUNDRED, c.due_date, c.bill_id),
+        )
+        selected, deferred = [], []
+        remaining = self.cash_limit
+        for candidate in ranked:
+            if candidate.cash <= remaining:
+                selected.append(candidate)
+                remaining -= candidate.cash
+            else:
+                deferred.append(candidate)
+
+        best = max(
+            (c for c in deferred if c.cash <= self.cash_limit),
+            key=lambda c: c.value,
+            default=None,
+        )
+        if best is not None and best.value > sum((c.value for c in selected), ZERO):
+            deferred = [c for c in candidates if c is not best]
+            selected = [best]
+        return selected, deferred
+
+    @transaction.atomic
+    def create(self):
+        """Save the plan as a draft run with its vendor payments and lines"""
+        selected, deferred = self.select(self.candidates())
+
+        run = PaymentRun.objects.create(
+            company=self.company,
+            run_number=next_run_number(self.company),
+            payment_date=self.payment_date,
+            cutoff_date=self.cutoff_date,
+            cash_limit=self.cash_limit,
+            bank_account=self.bank_account,
+            bill_count=len(selected),
+            total_amount=sum((c.cash for c in selected), ZERO),
+            total_discount=sum((c.discount for c in selected), ZERO),
+            penalties_avoided=sum((c.penalty for c in selected), ZERO),
+            deferred_count=sum(1 for c in deferred if c.due_date <= self.cutoff_date),
+            created_by=self.user,
+        )
+
+        # One payment per vendor and bank account
+        vendor_accounts = dict(
+            Vendor.objects.filter(
+                id__in={c.vendor_id for c in selected}, payment_account__isnull=False
+            ).values_list("id", "payment_account_id")
+        )
+        groups = defaultdict(list)
+        for candidate in selected:
+            account_id = vendor_accounts.get(candidate.vendor_id, self.bank_account.id)
+            groups[(candidate.vendor_id, account_id)].append(candidate)
+
+        payments = [
+            VendorPayment(
+                company=self.company,
+                payment_run=run,
+                payment_number=f"{run.run_number}-{number:05d}",
+                vendor_id=vendor_id,
+                bank_account_id=account_id,
+                payment_date=self.payment_date,
+                amount=sum((c.cash for c in bills), ZERO),
+                discount_amount=sum((c.discount for c in bills), ZERO),
+            )
+            for number, ((vendor_id, account_id), bills) in enumerate(groups.items(), start=1)
+        ]
+        VendorPayment.objects.bulk_create(payments, batch_size=BATCH_SIZE)
+        PaymentRunLine.objects.bulk_create(
+            [
+                PaymentRunLine(
+                    payment_run=run,
+                    vendor_payment=payment,
+                    bill_id=c.bill_id,
+                    open_amount=c.open_amount,
+                    discount_amount=c.discount,
+                    amount=c.cash,
+                    penalty_avoided=c.penalty,
+                    reason=c.reason,
+                )
+                for payment, bills in zip(payments, groups.values())
+                for c in bills
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        return run
+
+
+def plan_payment_run(company, payment_date, cutoff_date, **kwargs):
+    """Plan and save a draft payment run; see PaymentRunPlanner"""
+    return PaymentRunPlanner(company, payment_date, cutoff_date, **kwargs).create()
+
+
+def _discount_account(company):
+    """
+    Account early payment discounts are credited to: a revenue (other
+    income) or expense (contra purchases) account for discounts received,
+    never sales revenue or the discounts given to customers
+    """
+    for account_type in (AccountType.REVENUE, AccountType.EXPENSE):
+        account = find_account(
+            company, account_type, "discount received", "discounts received", "purchase discount"
+        )
+        if account is not None:
+            return account
+    return None
+
+
+@transaction.atomic
+def approve_payment_run(run, user=None):
+    """
+    Pay a draft run: settle its bills, post one journal entry per bank
+    account (debit payables per vendor, credit the bank and any discounts
+    taken) and refresh the vendor rollups. Raises ValueError if a bill
+    changed since the run was planned. Returns a summary dict.
+    """
+    from dashboard.cache_signals import invalidate_company_cache
+    from dashboard.search import index_objects
+
+    run = PaymentRun.objects.select_for_update().get(pk=run.pk)
+    if run.status != PaymentRun.Status.DRAFT:
+        raise ValueError(f"Payment run {run.run_number} is {run.get_status_display()}.")
+
+    company = run.company
+    payable = payable_account(company)
+    if payable is None:
+        raise ValueError("No accounts payable account to post the payments to.")
+    discount_account = _discount_account(company) if run.total_discount else None
+    if run.total_discount and discount_account is None:
+        raise ValueError(
+            "Set up a discounts received account (e.g. \"Purchase Discounts\") "
+            "to post the early payment discounts to."
+        )
+
+    lines = list(run.lines.values_list("bill_id", "open_amount"))
+    expected = dict(lines)
+    deltas, now = {}, timezone.now()
+    bill_ids = [bill_id for bill_id, _ in lines]
+    for start in range(0, len(bill_ids), BATCH_SIZE):
+        batch = bill_ids[start:start + BATCH_SIZE]
+        bills = list(
+            Bill.objects.filter(id__in=batch, status__in=PAYABLE_STATUSES)
+            .select_for_update()
+            .values_list("id", "vendor_id", "bill_date", "status", "total_amount", "paid_amount")
+        )
+        changed = len(batch) - sum(
+            1 for bill_id, _, _, _, total, paid in bills if total - paid == expected[bill_id]
+        )
+        if changed:
+            raise ValueError(
+                f"{changed} of the bills in run {run.run_number} were paid or "
+                "changed since it was planned; plan a new run."
+            )
+        for bill_id, vendor_id, bill_date, status, total, paid in bills:
+            bill = SimpleNamespace(
+                vendor_id=vendor_id, bill_date=bill_date, status=status,
+                total_amount=total, paid_amount=paid,
+            )
+            old_state = document_state(VENDORS, bill)
+            bill.status, bill.paid_amount = Bill.Status.PAID, total
+            add_change(deltas, old_state, document_state(VENDORS, bill))
+        Bill.objects.filter(id__in=batch).update(
+            paid_amount=F("total_amount"), status=Bill.Status.PAID, updated_at=now
+        )
+    apply_deltas(VENDORS, deltas, payment_date=run.payment_date)
+
+    # One entry per bank account, one payables line per vendor
+    vendor_names = dict(
+        Vendor.objects.filter(payments__payment_run=run).values_list("id", "company_name")
+    )
+    accounts = Account.objects.in_bulk(
+        set(run.payments.values_list("bank_account_id", flat=True))
+    )
+    by_account = defaultdict(list)
+    for vendor_id, account_id, amount, discount in run.payments.values_list(
+        "vendor_id", "bank_account_id", "amount", "discount_amount"
+    ):
+        by_account[account_id].append((vendor_id, amount, discount))
+
+    entries = []
+    for account_id, payments in by_account.items():
+        account = accounts[account_id]
+        entry_lines = [
+            {
+                "account": payable,
+                "debit": amount + discount,
+                "description": f"Payment to {vendor_names[vendor_id]}",
+            }
+            for vendor_id, amount, discount in payments
+        ]
+        entry_lines.append({
+            "account": account,
+            "credit": sum((amount for _, amount, _ in payments), ZERO),
+            "description": f"Payment run {run.run_number}",
+        })
+        discount = sum((discount for _, _, discount in payments), ZERO)
+        if discount:
+            entry_lines.append({
+                "account": discount_account,
+                "credit": discount,
+                "description": "Early payment discounts taken",
+            })
+        entries.append({
+            "entry_number": f"{run.run_number}-{account.code}",
+            "entry_date": run.payment_date,
+            "description": f"Payment run {run.run_number} - {account.name}",
+            "reference": run.run_number,
+            "lines": entry_lines,
+        })
+    posted = post_journal_entries(company, entries, user=user)
+    for entry, account_id in zip(posted, by_account):
+        run.payments.filter(bank_account_id=account_id).update(journal_entry=entry)
+
+    run.status = PaymentRun.Status.APPROVED
+    run.approved_at = now
+    run.approved_by = user
+    run.save(update_fields=["status", "approved_at", "approved_by"])
+
+    index_objects(Vendor.objects.filter(id__in=vendor_names))
+    invalidate_company_cache(company)
+    return {
+        "run": run.run_number,
+        "bills_paid": len(lines),
+        "payments": sum(len(payments) for payments in by_account.values()),
+        "total_amount": run.total_amount,
+        "total_discount": run.total_discount,
+        "journal_entries": [entry.entry_number for entry in posted],
+    }
+
+
+@transaction.atomic
+def cancel_payment_run(run):
+    """Drop a draft run; its bills stay open for the next run"""
+    run = PaymentRun.objects.select_for_update().get(pk=run.pk)
+    if run.status != PaymentRun.Status.DRAFT:
+        raise ValueError(f"Payment run {run.run_number} is {run.get_status_display()}.")
+    run.lines.all().delete()
+    run.payments.all().delete()
+    run.status = PaymentRun.Status.CANCELLED
+    run.save(update_fields=["status"])
+    return run
+
+
+def run_summary(run, limit=500):
+    """A run and its first lines as plain dicts"""
+    lines = (
+        run.lines.select_related("bill__vendor")
+        .order_by("bill__vendor__company_name", "bill__due_date", "id")[:limit]
+    )
+    return {
+        "id": run.id,
+        "run_number": run.run_number,
+        "status": run.status,
+        "payment_date": run.payment_date.isoformat(),
+        "cutoff_date": run.cutoff_date.isoformat(),
+        "cash_limit": float(run.cash_limit) if run.cash_limit is not None else None,
+        "bank_account": run.bank_account_id,
+        "bill_count": run.bill_count,
+        "deferred_count": run.deferred_count,
+        "total_amount": float(run.total_amount),
+        "total_discount": float(run.total_discount),
+        "penalties_avoided": float(run.penalties_avoided),
+        "lines": [
+            {
+                "bill_id": line.bill_id,
+                "bill_number": line.bill.bill_number,
+                "vendor": line.bill.vendor.company_name,
+                "due_date": line.bill.due_date.isoformat(),
+                "open_amount": float(line.open_amount),
+                "discount_amount": float(line.discount_amount),
+                "amount": float(line.amount),
+                "penalty_avoided": float(line.penalty_avoided),
+                "reason": line.reason,
+            }
+            for line in lines
+        ],
+    }
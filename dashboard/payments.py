@@ -0,0 +1,369 @@
+"""
+Payment Application
+Applies customer payments to invoices
+- One payment is split across many invoices, oldest first or as remitted
+- paid_amount and status move with F() expressions, one UPDATE per batch
+- One multi-line cash / accounts receivable journal entry per payment
+- Balance rollups, search entries and caches are refreshed once per call
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.utils import timezone
+
+from accounting.models import Invoice, JournalEntry, Payment, PaymentAllocation
+from dashboard.journal import cash_account, post_journal_entry, receivable_account
+from dashboard.rollups import CUSTOMERS, apply_document_changes, document_state
+
+
+ZERO = Decimal("0.00")
+
+# Invoices a payment can be applied to
+OPEN_STATUSES = [Invoice.Status.SENT, Invoice.Status.OVERDUE]
+
+# Allocations per UPDATE statement / per invoice lookup query
+BATCH_SIZE = 500
+
+STRATEGY_OLDEST = "oldest"
+STRATEGY_EXPLICIT = "explicit"
+
+
+def _money():
+    return DecimalField(max_digits=15, decimal_places=2)
+
+
+def _amount(value):
+    if value in (None, ""):
+        return None
+    return Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+def next_payment_numbers(company, count=1):
+    """
+    The next `count` payment numbers of the company, PAY-<company id>-0001
+    style; payment numbers are unique across companies, so each company
+    numbers under its own prefix
+    Call it in the transaction that saves the payments: the company row stays
+    locked until it commits, so concurrent callers get the following numbers.
+    """
+    from companies.models import Company
+
+    Company.objects.select_for_update().filter(pk=company.pk).first()
+    prefix = f"PAY-{company.pk}-"
+    last = (
+        Payment.objects.filter(payment_number__startswith=prefix)
+        .order_by("-id")
+        .values_list("payment_number", flat=True)
+        .first()
+    )
+    sequence = int(last[len(prefix):]) if last and last[len(prefix):].isdigit() else 0
+    return [f"{prefix}{sequence + offset:04d}" for offset in range(1, count + 1)]
+
+
+def next_payment_number(company):
+    """The number following the company's latest payment"""
+    return next_payment_numbers(company)[0]
+
+
+class PaymentAllocator:
+    """Apply payments of a company's customers to their open invoices"""
+
+    def __init__(self, company, user=None):
+        self.company = company
+        self.user = user
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+
+    def open_invoices(self, customer):
+        """The customer's open invoices, oldest due first"""
+        return Invoice.objects.filter(
+            company=self.company,
+            customer=customer,
+            status__in=OPEN_STATUSES,
+            paid_amount__lt=F("total_amount"),
+        ).order_by("due_date", "invoice_date", "id")
+
+    def plan_oldest_first(self, payment):
+        """Fill the oldest open invoices until the payment is used up"""
+        remaining = payment.amount
+        plan = []
+        for invoice in self.open_invoices(payment.customer).select_for_update():
+            if remaining <= ZERO:
+                break
+            amount = min(invoice.total_amount - invoice.paid_amount, remaining)
+            plan.append((invoice, amount))
+            remaining -= amount
+        return plan
+
+    def plan_explicit(self, payment, remittance):
+        """
+        Allocate as remitted: [{"invoice": id or invoice number, "amount": x}]
+        A missing amount pays the invoice's open balance and takes precedence
+        over any amounts given for the same invoice; otherwise lines for the
+        same invoice are added together.
+        """
+        lines = []
+        for line in remittance:
+            reference = str(line.get("invoice") or "").strip()
+            if not reference:
+                raise ValueError("Remittance line without an invoice")
+            amount = _amount(line.get("amount"))
+            if amount is not None and amount <= ZERO:
+                raise ValueError(f"Invalid amount for invoice {reference}")
+            lines.append((reference, amount))
+
+        references = list(dict.fromkeys(reference for reference, _ in lines))
+        invoices = {}
+        for start in range(0, len(references), BATCH_SIZE):
+            chunk = references[start:start + BATCH_SIZE]
+            ids = [int(ref) for ref in chunk if ref.isdigit()]
+            rows = (
+                Invoice.objects.filter(company=self.company, customer=payment.customer)
+                .filter(Q(invoice_number__in=chunk) | Q(pk__in=ids))
+                .select_for_update()
+            )
+            for invoice in rows:
+                invoices[invoice.invoice_number] = invoice
+                invoices[str(invoice.pk)] = invoice
+
+        missing = [ref for ref in references if ref not in invoices]
+        if missing:
+            raise ValueError(f"Unknown invoices for this customer: {', '.join(missing[:10])}")
+
+        # {invoice id: (invoice, amount or None for the open balance)}
+        requested = {}
+        for reference, amount in lines:
+            invoice = invoices[reference]
+            previous = requested.get(invoice.pk, (invoice, ZERO))[1]
+            total = None if None in (previous, amount) else previous + amount
+            requested[invoice.pk] = (invoice, total)
+
+        plan = []
+        for invoice, amount in requested.values():
+            if invoice.status not in OPEN_STATUSES:
+                raise ValueError(
+                    f"Invoice {invoice.invoice_number} is {invoice.get_status_display()}"
+                )
+            open_amount = invoice.total_amount - invoice.paid_amount
+            amount = open_amount if amount is None else amount
+            if amount > open_amount:
+                raise ValueError(
+                    f"{amount} exceeds the open balance of invoice "
+                    f"{invoice.invoice_number} ({open_amount})"
+                )
+            if amount > ZERO:
+                plan.append((invoice, amount))
+
+        applied = sum((amount for _, amount in plan), ZERO)
+        if applied > payment.amount:
+            raise ValueError(
+                f"Allocations ({applied}) exceed the payment amount ({payment.amount})"
+            )
+        return plan
+
+    # ------------------------------------------------------------------
+    # Applying
+    # ------------------------------------------------------------------
+
+    @transaction.atomic
+    def apply(self, payment, remittance=None):
+        """
+        Apply a saved payment: oldest first, or as remitted when remittance
+        lines are given. Returns a summary dict; the part of the payment not
+        applied stays on account.
+        """
+        if payment.allocations.exists():
+            raise ValueError(f"Payment {payment.payment_number} is already applied")
+
+        strategy = STRATEGY_EXPLICIT if remittance else STRATEGY_OLDEST
+        if strategy == STRATEGY_EXPLICIT:
+            plan = self.plan_explicit(payment, remittance)
+        else:
+            plan = self.plan_oldest_first(payment)
+
+        PaymentAllocation.objects.bulk_create(
+            [
+                PaymentAllocation(payment=payment, invoice=invoice, amount=amount)
+                for invoice, amount in plan
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        paid = self._update_invoices(plan)
+
+        applied = sum((amount for _, amount in plan), ZERO)
+        unapplied = payment.amount - applied
+        entry = self._post_entry(payment, plan, unapplied)
+
+        self._refresh([invoice.pk for invoice, _ in plan])
+
+        return {
+            "payment": payment.payment_number,
+            "strategy": strategy,
+            "applied": applied,
+            "unapplied": unapplied,
+            "invoices": len(plan),
+            "invoices_paid": paid,
+            "journal_entry": entry.entry_number if entry else None,
+        }
+
+    def _update_invoices(self, plan, sign=1):
+        """
+        Move paid_amount by the allocations with one UPDATE per batch
+        Status follows from the locked rows: fully paid invoices become PAID,
+        reversed PAID invoices go back to SENT. Returns the number paid.
+        """
+        changes = []
+        paid = 0
+        now = timezone.now()
+        for start in range(0, len(plan), BATCH_SIZE):
+            batch = plan[start:start + BATCH_SIZE]
+            paid_ids, reopened_ids = [], []
+            for invoice, amount in batch:
+                old_state = document_state(CUSTOMERS, invoice)
+                invoice.paid_amount += sign * amount
+                if invoice.paid_amount >= invoice.total_amount:
+                    invoice.status = Invoice.Status.PAID
+                    paid_ids.append(invoice.pk)
+                elif invoice.status == Invoice.Status.PAID:
+                    invoice.status = Invoice.Status.SENT
+                    reopened_ids.append(invoice.pk)
+                changes.append((old_state, document_state(CUSTOMERS, invoice)))
+            paid += len(paid_ids)
+
+            status = F("status")
+            if paid_ids or reopened_ids:
+                status = Case(
+                    When(pk__in=paid_ids, then=Value(Invoice.Status.PAID)),
+                    When(pk__in=reopened_ids, then=Value(Invoice.Status.SENT)),
+                    default=F("status"),
+                )
+            Invoice.objects.filter(pk__in=[invoice.pk for invoice, _ in batch]).update(
+                paid_amount=F("paid_amount")
+                + Case(
+                    *[
+                        When(pk=invoice.pk, then=Value(sign * amount))
+                        for invoice, amount in batch
+                    ],
+                    default=Value(ZERO),
+                    output_field=_money(),
+                ),
+                status=status,
+                updated_at=now,
+            )
+
+        apply_document_changes(CUSTOMERS, changes)
+        return paid
+
+    def _post_entry(self, payment, plan, unapplied, reverse=False):
+        """Debit cash, credit receivable per invoice (and for any unapplied rest)"""
+        cash = cash_account(self.company)
+        receivable = receivable_account(self.company)
+        if not cash or not receivable:
+            return None
+
+        debit, credit = ("credit", "debit") if reverse else ("debit", "credit")
+        lines = [
+            {
+                "account": cash,
+                debit: payment.amount,
+                "description": f"Payment {payment.payment_number}",
+            }
+        ]
+        lines += [
+            {
+                "account": receivable,
+                credit: amount,
+                "description": f"Invoice {invoice.invoice_number}",
+            }
+            for invoice, amount in plan
+        ]
+        if unapplied > ZERO:
+            lines.append(
+                {
+                    "account": receivable,
+                    credit: unapplied,
+                    "description": "Unapplied payment on account",
+                }
+            )
+
+        prefix = "REV-PAY" if reverse else "PAY"
+        return post_journal_entry(
+            self.company,
+            f"{prefix}-{payment.payment_number}",
+            payment.payment_date,
+            f"{'Reversal of payment' if reverse else 'Payment'} "
+            f"{payment.payment_number} - {payment.customer.company_name}",
+            lines,
+            user=self.user,
+            reference=payment.reference,
+        )
+
+    def _refresh(self, invoice_ids):
+        """Search entries and dashboard caches, once for the whole call"""
+        from dashboard.cache_signals import invalidate_company_cache
+        from dashboard.search import reindex_invoices
+
+        if invoice_ids:
+            reindex_invoices(invoice_ids)
+        invalidate_company_cache(self.company)
+
+    def is_applied(self, payment):
+        """
+        Whether the payment has been applied and not reversed since: it has
+        allocations, or its entry (e.g. all of it on account) is posted
+        """
+        if payment.allocations.exists():
+            return True
+        number = f"PAY-{payment.payment_number}"
+        entries = set(
+            JournalEntry.objects.filter(
+                company=self.company, entry_number__in=[number, f"REV-{number}"]
+            ).values_list("entry_number", flat=True)
+        )
+        return entries == {number}
+
+    @transaction.atomic
+    def reverse(self, payment):
+        """Take a payment's allocations back off its invoices and reverse its entry"""
+        allocations = list(payment.allocations.values_list("invoice_id", "amount"))
+        invoices = Invoice.objects.select_for_update().in_bulk(
+            [invoice_id for invoice_id, _ in allocations]
+        )
+        plan = [(invoices[invoice_id], amount) for invoice_id, amount in allocations]
+
+        self._update_invoices(plan, sign=-1)
+        payment.allocations.all().delete()
+
+        applied = sum((amount for _, amount in plan), ZERO)
+        entry = self._post_entry(payment, plan, payment.amount - applied, reverse=True)
+        self._refresh([invoice.pk for invoice, _ in plan])
+        return {"invoices": len(plan), "journal_entry": entry.entry_number if entry else None}
+
+
+@transaction.atomic
+def record_payment(company, customer, amount, payment_date, payment_method,
+                   remittance=None, payment_number=None, reference=None, notes=None,
+                   user=None):
+    """Create a customer payment and apply it; returns (payment, summary)"""
+    amount = _amount(amount)
+    if amount is None or amount <= ZERO:
+        raise ValueError("Payment amount must be positive")
+
+    payment = Payment(
+        company=company,
+        customer=customer,
+        payment_number=payment_number or next_payment_number(company),
+        payment_date=payment_date,
+        amount=amount,
+        payment_method=payment_method,
+        reference=reference,
+        notes=notes,
+        created_by=user,
+    )
+    payment._allocated = True
+    payment.save()
+    return payment, PaymentAllocator(company, user).apply(payment, remittance)
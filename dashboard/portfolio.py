@@ -0,0 +1,212 @@
+"""
+Portfolio KPIs
+Compact KPI set for many companies at once (accounting firm overview)
+- Every KPI is one query grouped by company over all requested companies
+- Results cached per company and data version, so only changed companies
+  are recomputed
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import (
+    Count,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Q,
+    Sum,
+)
+from django.utils import timezone
+
+from accounting.models import AccountType, Bill, Invoice, JournalEntry, JournalEntryLine
+from companies.models import Company
+
+
+ZERO = Decimal("0.00")
+
+PORTFOLIO_CACHE_TIMEOUT = 900  # 15 minutes
+
+# Bills count as "AP due" when unpaid and due within this many days
+AP_DUE_WINDOW_DAYS = 7
+
+KPI_FIELDS = [
+    "cash",
+    "ar_overdue",
+    "ar_overdue_count",
+    "ap_due",
+    "ap_due_count",
+    "month_revenue",
+    "month_expense",
+    "unposted_drafts",
+]
+
+
+def _money():
+    return DecimalField(max_digits=15, decimal_places=2)
+
+
+def _empty_kpis():
+    return {
+        field: 0 if field.endswith("_count") or field == "unposted_drafts" else ZERO
+        for field in KPI_FIELDS
+    }
+
+
+class PortfolioKPIs:
+    """KPIs for a list of companies as of a date"""
+
+    def __init__(self, companies, as_of=None):
+        self.companies = list(companies)
+        self.as_of = as_of or timezone.now().date()
+        self.month_start = self.as_of.replace(day=1)
+
+    def cache_key(self, company_id, data_version):
+        return f"portfolio_kpis_{company_id}_{self.as_of.isoformat()}_v{data_version}"
+
+    def calculate(self):
+        """
+        Return {company_id: kpis}
+        One read for the version stamps, one cache get_many, and four grouped
+        queries covering every company whose entry was missing.
+        """
+        ids = [company.id for company in self.companies]
+        versions = dict(
+            Company.objects.filter(id__in=ids).values_list("id", "data_version")
+        )
+        keys = {
+            company_id: self.cache_key(company_id, versions.get(company_id, 0))
+            for company_id in ids
+        }
+
+        cached = cache.get_many(list(keys.values()))
+        results = {
+            company_id: cached[key] for company_id, key in keys.items() if key in cached
+        }
+
+        missing = [company_id for company_id in ids if company_id not in results]
+        if missing:
+            computed = self.compute(missing)
+            cache.set_many(
+                {keys[company_id]: computed[company_id] for company_id in missing},
+                PORTFOLIO_CACHE_TIMEOUT,
+            )
+            results.update(computed)
+
+        return results
+
+    def compute(self, company_ids):
+        """Grouped queries over all of company_ids"""
+        results = {company_id: _empty_kpis() for company_id in company_ids}
+
+        # Cash balance and month revenue/expense from posted lines
+        lines = (
+            JournalEntryLine.objects.filter(
+                journal_entry__company_id__in=company_ids,
+                journal_entry__status=JournalEntry.Status.POSTED,
+                journal_entry__entry_date__lte=self.as_of,
+            )
+            .values("journal_entry__company_id")
+            .annotate(
+                cash=Sum(
+                    F("debit_amount") - F("credit_amount"),
+                    filter=Q(account__account_type=AccountType.ASSET)
+                    & (
+                        Q(account__name__icontains="cash")
+                        | Q(account__name__icontains="bank")
+                    ),
+                    output_field=_money(),
+                ),
+                month_revenue=Sum(
+                    F("credit_amount") - F("debit_amount"),
+                    filter=Q(
+                        account__account_type=AccountType.REVENUE,
+                        journal_entry__entry_date__gte=self.month_start,
+                    ),
+                    output_field=_money(),
+                ),
+                month_expense=Sum(
+                    F("debit_amount") - F("credit_amount"),
+                    filter=Q(
+                        account__account_type=AccountType.EXPENSE,
+                        journal_entry__entry_date__gte=self.month_start,
+                    ),
+                    output_field=_money(),
+                ),
+            )
+            .order_by()
+        )
+        for row in lines:
+            kpis = results[row["journal_entry__company_id"]]
+            kpis["cash"] = row["cash"] or ZERO
+            kpis["month_revenue"] = row["month_revenue"] or ZERO
+            kpis["month_expense"] = row["month_expense"] or ZERO
+
+        open_amount = ExpressionWrapper(
+            F("total_amount") - F("paid_amount"), output_field=_money()
+        )
+
+        # Receivables past due
+        overdue = (
+            Invoice.objects.filter(
+                company_id__in=company_ids,
+                status__in=[Invoice.Status.SENT, Invoice.Status.OVERDUE],
+                due_date__lt=self.as_of,
+            )
+            .values("company_id")
+            .annotate(total=Sum(open_amount), count=Count("id"))
+            .order_by()
+        )
+        for row in overdue:
+            results[row["company_id"]]["ar_overdue"] = row["total"] or ZERO
+            results[row["company_id"]]["ar_overdue_count"] = row["count"]
+
+        # Payables overdue or due within the window
+        due = (
+            Bill.objects.filter(
+                company_id__in=company_ids,
+                status__in=[Bill.Status.APPROVED, Bill.Status.OVERDUE],
+                due_date__lte=self.as_of + timedelta(days=AP_DUE_WINDOW_DAYS),
+            )
+            .values("company_id")
+            .annotate(total=Sum(open_amount), count=Count("id"))
+            .order_by()
+        )
+        for row in due:
+            results[row["company_id"]]["ap_due"] = row["total"] or ZERO
+            results[row["company_id"]]["ap_due_count"] = row["count"]
+
+        # Draft journal entries waiting to be posted
+        drafts = (
+            JournalEntry.objects.filter(
+                company_id__in=company_ids, status=JournalEntry.Status.DRAFT
+            )
+            .values("company_id")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for row in drafts:
+            results[row["company_id"]]["unposted_drafts"] = row["count"]
+
+        return results
+
+
+def portfolio_rows(companies, as_of=None):
+    """One row per company, in the given order, with its KPIs"""
+    companies = list(companies)
+    kpis = PortfolioKPIs(companies, as_of).calculate()
+    return [{"company": company, **kpis[company.id]} for company in companies]
+
+
+def portfolio_row_as_json(row):
+    company = row["company"]
+    return {
+        "company_id": company.id,
+        "company_name": company.name,
+        "currency": company.currency,
+        **{
+            field: row[field] if isinstance(row[field], int) else float(row[field])
+            for field in KPI_FIELDS
+        },
+    }
@@ -0,0 +1,370 @@
+"""
+Financial Ratio Engine
+Computes every financial ratio for a company from one trial-balance pass
+- Balance sheet figures as of a date, income figures over the trailing 12 months
+- Results cached per company, date and ledger version
+- Monthly history read from the AccountMonthlyBalance table
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from accounting.models import (
+    AccountMonthlyBalance,
+    AccountType,
+    JournalEntry,
+    JournalEntryLine,
+)
+from dashboard.balance_history import add_months, month_start
+from dashboard.utils import get_ledger_version
+
+
+ZERO = Decimal("0.00")
+
+# Chart-of-accounts conventions used across the app
+CURRENT_ASSET_CODE_LIMIT = "1400"
+CURRENT_LIABILITY_CODE_LIMIT = "2300"
+
+RATIO_CACHE_TIMEOUT = 900  # 15 minutes
+
+DEFAULT_TREND_RATIOS = [
+    "current_ratio",
+    "profit_margin",
+    "asset_turnover",
+    "debt_to_equity",
+    "net_margin",
+    "return_on_assets",
+]
+
+
+def _div(numerator, denominator, scale=1):
+    """Safe ratio: 0 when the denominator is not positive"""
+    if not denominator or denominator <= 0:
+        return ZERO
+    return numerator / denominator * scale
+
+
+def _name_has(account, *words):
+    name = account["name"].lower()
+    return any(word in name for word in words)
+
+
+class FinancialRatioEngine:
+    """
+    Financial ratios for one company as of a date
+    All balances come from a single grouped query over posted journal lines.
+    """
+
+    def __init__(self, company, as_of=None):
+        self.company = company
+        self.as_of = as_of or timezone.now().date()
+        # The 12 calendar months ending with as_of's month, as in ratio_history
+        self.period_start = add_months(month_start(self.as_of), -11)
+
+    def cache_key(self):
+        return (
+            f"financial_ratio_engine_{self.company.id}_{self.as_of.isoformat()}"
+            f"_v{get_ledger_version(self.company)}"
+        )
+
+    def calculate(self):
+        """Return the cached ratio result, computing it on a miss"""
+        key = self.cache_key()
+        result = cache.get(key)
+        if result is None:
+            result = self._calculate()
+            cache.set(key, result, RATIO_CACHE_TIMEOUT)
+        return result
+
+    def trial_balance(self):
+        """
+        Per-account balance as of the date and activity over the trailing
+        12 months, signed so that a normal balance is positive
+        """
+        rows = (
+            JournalEntryLine.objects.filter(
+                account__company=self.company,
+                journal_entry__status=JournalEntry.Status.POSTED,
+                journal_entry__entry_date__lte=self.as_of,
+            )
+            .values("account_id", "account__code", "account__name", "account__account_type")
+            .annotate(
+                debit=Sum("debit_amount"),
+                credit=Sum("credit_amount"),
+                period_debit=Sum(
+                    "debit_amount",
+                    filter=Q(journal_entry__entry_date__gte=self.period_start),
+                ),
+                period_credit=Sum(
+                    "credit_amount",
+                    filter=Q(journal_entry__entry_date__gte=self.period_start),
+                ),
+            )
+            .order_by()
+        )
+
+        accounts = []
+        for row in rows:
+            debit_normal = row["account__account_type"] in [
+                AccountType.ASSET,
+                AccountType.EXPENSE,
+            ]
+            sign = 1 if debit_normal else -1
+            accounts.append(
+                {
+                    "id": row["account_id"],
+                    "code": row["account__code"],
+                    "name": row["account__name"],
+                    "type": row["account__account_type"],
+                    "balance": sign * ((row["debit"] or ZERO) - (row["credit"] or ZERO)),
+                    "period": sign
+                    * ((row["period_debit"] or ZERO) - (row["period_credit"] or ZERO)),
+                }
+            )
+        return accounts
+
+    def _calculate(self):
+        return self.ratios_from_balances(self.trial_balance())
+
+    def ratios_from_balances(self, accounts):
+        """
+        Compute all ratios from trial-balance rows
+        (id, code, name, type, balance as of date, trailing 12 month activity)
+        """
+
+        def total(account_type, key="balance", test=None):
+            return sum(
+                (
+                    a[key]
+                    for a in accounts
+                    if a["type"] == account_type and (test is None or test(a))
+                ),
+                ZERO,
+            )
+
+        # Balance sheet (as of date)
+        total_assets = total(AccountType.ASSET)
+        total_liabilities = total(AccountType.LIABILITY)
+        total_equity = total(AccountType.EQUITY)
+
+        current_assets = total(
+            AccountType.ASSET, test=lambda a: a["code"] < CURRENT_ASSET_CODE_LIMIT
+        )
+        current_liabilities = total(
+            AccountType.LIABILITY, test=lambda a: a["code"] < CURRENT_LIABILITY_CODE_LIMIT
+        )
+        cash = total(AccountType.ASSET, test=lambda a: _name_has(a, "cash", "bank"))
+        receivables = total(AccountType.ASSET, test=lambda a: _name_has(a, "receivable"))
+        inventory = total(AccountType.ASSET, test=lambda a: _name_has(a, "inventory"))
+        payables = total(AccountType.LIABILITY, test=lambda a: _name_has(a, "payable"))
+
+        # Income statement (trailing 12 months)
+        revenue = total(AccountType.REVENUE, "period")
+        expenses = total(AccountType.EXPENSE, "period")
+        cost_of_sales = total(
+            AccountType.EXPENSE,
+            "period",
+            test=lambda a: _name_has(a, "cost of", "cogs"),
+        )
+        interest_expense = total(
+            AccountType.EXPENSE, "period", test=lambda a: _name_has(a, "interest")
+        )
+        net_income = revenue - expenses
+        operating_income = net_income + interest_expense
+
+        receivables_turnover = _div(revenue, receivables)
+        payables_turnover = _div(expenses, payables)
+        inventory_turnover = _div(cost_of_sales, inventory)
+
+        ratios = {
+            # Liquidity
+            "current_ratio": _div(current_assets, current_liabilities),
+            "quick_ratio": _div(current_assets - inventory, current_liabilities),
+            "cash_ratio": _div(cash, current_liabilities),
+            "working_capital": current_assets - current_liabilities,
+            # Profitability
+            "gross_margin": _div(revenue - cost_of_sales, revenue, 100),
+            "operating_margin": _div(operating_income, revenue, 100),
+            "net_margin": _div(net_income, revenue, 100),
+            "return_on_assets": _div(net_income, total_assets, 100),
+            "return_on_equity": _div(net_income, total_equity, 100),
+            # Efficiency
+            "asset_turnover": _div(revenue, total_assets),
+            "inventory_turnover": inventory_turnover,
+            "receivables_turnover": receivables_turnover,
+            "payables_turnover": payables_turnover,
+            "days_sales_outstanding": _div(Decimal("365"), receivables_turnover),
+            "days_payables_outstanding": _div(Decimal("365"), payables_turnover),
+            "days_inventory_outstanding": _div(Decimal("365"), inventory_turnover),
+            # Leverage
+            "debt_to_equity": _div(total_liabilities, total_equity),
+            "debt_ratio": _div(total_liabilities, total_assets, 100),
+            "equity_ratio": _div(total_equity, total_assets, 100),
+            "interest_coverage": _div(operating_income, interest_expense),
+        }
+
+        return {
+            "as_of": self.as_of,
+            "ratios": ratios,
+            "financial_data": {
+                "total_assets": total_assets,
+                "total_liabilities": total_liabilities,
+                "total_equity": total_equity,
+                "current_assets": current_assets,
+                "current_liabilities": current_liabilities,
+                "cash": cash,
+                "receivables": receivables,
+                "payables": payables,
+                "inventory": inventory,
+                "total_revenue": revenue,
+                "total_expenses": expenses,
+                "cost_of_sales": cost_of_sales,
+                "net_income": net_income,
+            },
+        }
+
+
+def ratio_history(company, months=6, end=None):
+    """
+    Month-end ratios for the last `months` months, oldest first
+    Built from one indexed read of AccountMonthlyBalance (company, month):
+    balances are running sums of monthly activity, income figures the sum
+    of the trailing 12 months.
+    """
+    end_month = month_start(end or timezone.now().date())
+    key = (
+        f"ratio_history_{company.id}_{end_month.isoformat()}_{months}"
+        f"_v{get_ledger_version(company)}"
+    )
+    history = cache.get(key)
+    if history is not None:
+        return history
+
+    window = [add_months(end_month, offset) for offset in range(1 - months, 1)]
+
+    rows = (
+        AccountMonthlyBalance.objects.filter(company=company, month__lte=end_month)
+        .values(
+            "account_id",
+            "account__code",
+            "account__name",
+            "account__account_type",
+            "month",
+            "debit_total",
+            "credit_total",
+        )
+        .order_by("month")
+    )
+
+    accounts = {}
+    activity = defaultdict(dict)  # account id -> {month: signed activity}
+    for row in rows:
+        debit_normal = row["account__account_type"] in [
+            AccountType.ASSET,
+            AccountType.EXPENSE,
+        ]
+        sign = 1 if debit_normal else -1
+        accounts[row["account_id"]] = {
+            "id": row["account_id"],
+            "code": row["account__code"],
+            "name": row["account__name"],
+            "type": row["account__account_type"],
+        }
+        activity[row["account_id"]][row["month"]] = sign * (
+            row["debit_total"] - row["credit_total"]
+        )
+
+    history = []
+    for month in window:
+        trailing_start = add_months(month, -11)
+        balances = []
+        for account_id, account in accounts.items():
+            by_month = activity[account_id]
+            balances.append(
+                {
+                    **account,
+                    "balance": sum((v for m, v in by_month.items() if m <= month), ZERO),
+                    "period": sum(
+                        (v for m, v in by_month.items() if trailing_start <= m <= month),
+                        ZERO,
+                    ),
+                }
+            )
+        as_of = add_months(month, 1) - timedelta(days=1)
+        result = FinancialRatioEngine(company, as_of).ratios_from_balances(balances)
+        history.append({"month": month, "ratios": result["ratios"]})
+
+    cache.set(key, history, RATIO_CACHE_TIMEOUT)
+    return history
+
+
+def ratios_as_json(result):
+    """Float copy of an engine result for JsonResponse"""
+    return {
+        "success": True,
+        "as_of": result["as_of"].isoformat(),
+        "ratios": {key: float(value) for key, value in result["ratios"].items()},
+        "financial_data": {
+            key: float(value) for key, value in result["financial_data"].items()
+        },
+    }
+
+
+def trends_as_json(history, names=None):
+    """Trend payload for trend_analysis_api: one series per requested ratio"""
+    names = names or DEFAULT_TREND_RATIOS
+    available = history[0]["ratios"] if history else {}
+
+    trends = {}
+    for name in names:
+        # "profit_margin" is the name the ratio charts use for net margin
+        source = "net_margin" if name == "profit_margin" else name
+        if source in available:
+            trends[name] = [round(float(h["ratios"][source]), 2) for h in history]
+
+    return {
+        "success": True,
+        "trends": trends,
+        "months": [h["month"].strftime("%b") for h in history],
+    }
+
+
+def ratio_export_rows(result):
+    """Rows of the financial ratios CSV export"""
+    r = result["ratios"]
+    return [
+        ["Financial Ratios Report", ""],
+        ["Generated on", timezone.now().date().isoformat()],
+        ["As of", result["as_of"].isoformat()],
+        ["", ""],
+        ["Liquidity Ratios", ""],
+        ["Current Ratio", f"{r['current_ratio']:.2f}:1"],
+        ["Quick Ratio", f"{r['quick_ratio']:.2f}:1"],
+        ["Cash Ratio", f"{r['cash_ratio']:.2f}:1"],
+        ["Working Capital", f"{r['working_capital']:,.2f}"],
+        ["", ""],
+        ["Profitability Ratios", ""],
+        ["Gross Margin", f"{r['gross_margin']:.1f}%"],
+        ["Operating Margin", f"{r['operating_margin']:.1f}%"],
+        ["Net Margin", f"{r['net_margin']:.1f}%"],
+        ["Return on Assets", f"{r['return_on_assets']:.1f}%"],
+        ["Return on Equity", f"{r['return_on_equity']:.1f}%"],
+        ["", ""],
+        ["Efficiency Ratios", ""],
+        ["Asset Turnover", f"{r['asset_turnover']:.1f}x"],
+        ["Receivables Turnover", f"{r['receivables_turnover']:.1f}x"],
+        ["Payables Turnover", f"{r['payables_turnover']:.1f}x"],
+        ["Inventory Turnover", f"{r['inventory_turnover']:.1f}x"],
+        ["Days Sales Outstanding", f"{r['days_sales_outstanding']:.0f}"],
+        ["", ""],
+        ["Solvency Ratios", ""],
+        ["Debt-to-Equity", f"{r['debt_to_equity']:.2f}:1"],
+        ["Debt Ratio", f"{r['debt_ratio']:.1f}%"],
+        ["Equity Ratio", f"{r['equity_ratio']:.1f}%"],
+        ["Interest Coverage", f"{r['interest_coverage']:.1f}x"],
+    ]
@@ -0,0 +1,346 @@
+"""
+Report Rendering
+Turns FinancialReports results into paginated PDF/CSV output
+- Plain-table intermediate form shared by every export format
+- Rendered PDFs cached by (company, report, period, ledger version)
+- Large reports rendered in a process pool, concurrent requests render once
+- A render that outlasts REPORT_RENDER_TIMEOUT raises ReportRenderTimeout,
+  so the view can ask the client to retry before the worker is killed
+"""
+
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from dashboard.utils import discard_process_pool
+
+
+# Keys that describe the report rather than hold its figures
+META_KEYS = {
+    "report_type",
+    "company",
+    "start_date",
+    "end_date",
+    "as_of_date",
+    "forecast_date",
+    "days_ahead",
+}
+
+ARTIFACT_LOCK_TIMEOUT = 60  # seconds
+ARTIFACT_POLL_INTERVAL = 0.2  # seconds
+ARTIFACT_LOCK_STRIPES = 64
+
+
+class ReportRenderTimeout(Exception):
+    """A report could not be rendered in time; the request can be retried"""
+
+
+# ============================================================================
+# TABLE BUILDING
+# ============================================================================
+
+
+def _label(key):
+    return str(key).replace("_", " ").title()
+
+
+def _format_value(value):
+    if isinstance(value, Decimal):
+        return f"{value:,.2f}"
+    if isinstance(value, float):
+        return f"{value:,.2f}"
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if value is None:
+        return ""
+    return str(value)
+
+
+def _item_row(item):
+    """Flatten one report line item into (columns, values)"""
+    if "account" in item:
+        account = item["account"]
+        return ["Code", "Account", "Amount"], [
+            account.code,
+            account.name,
+            _format_value(item.get("amount")),
+        ]
+    if "invoice" in item:
+        invoice = item["invoice"]
+        return ["Invoice", "Customer", "Due Date", "Days Overdue", "Balance Due"], [
+            invoice.invoice_number,
+            invoice.customer.company_name,
+            _format_value(invoice.due_date),
+            _format_value(item.get("days_overdue")),
+            _format_value(item.get("balance_due")),
+        ]
+    return [_label(key) for key in item], [_format_value(v) for v in item.values()]
+
+
+def build_report_tables(report):
+    """
+    Convert a report dict into a list of plain tables:
+    {"title": str, "columns": [str], "rows": [[str]], "footer": [[str]]}
+    Tables only hold strings so they can be pickled to a render worker.
+    """
+    tables = []
+    summary_rows = []
+
+    for key, value in report.items():
+        if key in META_KEYS:
+            continue
+
+        if isinstance(value, dict) and "items" in value:
+            columns, rows = ["Description", "Amount"], []
+            for item in value["items"]:
+                columns, row = _item_row(item)
+                rows.append(row)
+            footer = [
+                [_label(extra)] + [""] * (len(columns) - 2) + [_format_value(amount)]
+                for extra, amount in value.items()
+                if extra not in ("items", "total")
+            ]
+            footer.append(
+                ["Total"] + [""] * (len(columns) - 2) + [_format_value(value.get("total"))]
+            )
+            tables.append(
+                {"title": _label(key), "columns": columns, "rows": rows, "footer": footer}
+            )
+
+        elif isinstance(value, dict):
+            tables.append(
+                {
+                    "title": _label(key),
+                    "columns": ["Line", "Amount"],
+                    "rows": [[_label(k), _format_value(v)] for k, v in value.items()],
+                    "footer": [],
+                }
+            )
+
+        elif isinstance(value, list) and value and isinstance(value[0], dict):
+            tables.append(
+                {
+                    "title": _label(key),
+                    "columns": [_label(k) for k in value[0]],
+                    "rows": [[_format_value(v) for v in row.values()] for row in value],
+                    "footer": [],
+                }
+            )
+
+        else:
+            summary_rows.append([_label(key), _format_value(value)])
+
+    if summary_rows:
+        tables.append(
+            {"title": "Summary", "columns": ["", ""], "rows": summary_rows, "footer": []}
+        )
+
+    return tables
+
+
+def count_table_rows(tables):
+    return sum(len(t["rows"]) + len(t["footer"]) for t in tables)
+
+
+# ============================================================================
+# PDF RENDERING
+# ============================================================================
+
+
+def render_tables_pdf(title, subtitle_lines, tables):
+    """
+    Render plain tables to PDF bytes with ReportLab
+    Pure function (no database access) so it can run in a worker process
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, Spacer, TableStyle
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        title=title,
+        leftMargin=0.6 * inch,
+        rightMargin=0.6 * inch,
+        topMargin=0.6 * inch,
+        bottomMargin=0.7 * inch,
+    )
+    styles = getSampleStyleSheet()
+
+    elements = [Paragraph(title, styles["Title"])]
+    for line in subtitle_lines:
+        elements.append(Paragraph(line, styles["Normal"]))
+    elements.append(Spacer(1, 16))
+
+    for table in tables:
+        elements.append(Paragraph(table["title"], styles["Heading3"]))
+
+        data = [table["columns"]] + table["rows"] + table["footer"]
+        if len(data) == 1:
+            data.append(["No activity"] + [""] * (len(table["columns"]) - 1))
+
+        col_count = len(table["columns"])
+        first_width = doc.width * (0.4 if col_count > 2 else 0.6)
+        other_width = (doc.width - first_width) / max(col_count - 1, 1)
+        col_widths = [first_width] + [other_width] * (col_count - 1)
+
+        style = [
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1F2937")),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE", (0, 0), (-1, -1), 9),
+            ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
+            ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#F3F4F6")]),
+            ("LINEBELOW", (0, 0), (-1, 0), 0.75, colors.HexColor("#111827")),
+            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ]
+        if table["footer"]:
+            first_footer = len(data) - len(table["footer"])
+            style += [
+                ("FONTNAME", (0, first_footer), (-1, -1), "Helvetica-Bold"),
+                ("LINEABOVE", (0, first_footer), (-1, first_footer), 0.75, colors.black),
+            ]
+
+        # LongTable splits across pages and repeats the header row on each one
+        pdf_table = LongTable(data, colWidths=col_widths, repeatRows=1)
+        pdf_table.setStyle(TableStyle(style))
+        elements.append(pdf_table)
+        elements.append(Spacer(1, 14))
+
+    def draw_footer(canvas, document):
+        canvas.saveState()
+        canvas.setFont("Helvetica", 8)
+        canvas.drawString(document.leftMargin, 0.4 * inch, title)
+        canvas.drawRightString(
+            document.pagesize[0] - document.rightMargin,
+            0.4 * inch,
+            f"Page {document.page}",
+        )
+        canvas.restoreState()
+
+    doc.build(elements, onFirstPage=draw_footer, onLaterPages=draw_footer)
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
+
+
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+    """Lazily start the per-process PDF render pool"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, "REPORT_RENDER_WORKERS", 2)
+            )
+        return _render_pool
+
+
+def render_pdf(title, subtitle_lines, tables):
+    """
+    Render tables to PDF, offloading large reports to the worker pool
+    Small reports are cheaper to render inline than to pickle across processes
+    """
+    global _render_pool
+    threshold = getattr(settings, "REPORT_RENDER_POOL_THRESHOLD", 200)
+    if count_table_rows(tables) < threshold:
+        return render_tables_pdf(title, subtitle_lines, tables)
+
+    pool = get_render_pool()
+    timeout = getattr(settings, "REPORT_RENDER_TIMEOUT", 15)
+    try:
+        future = pool.submit(render_tables_pdf, title, subtitle_lines, tables)
+        return future.result(timeout=timeout)
+    except (BrokenProcessPool, FutureTimeoutError, CancelledError) as exc:
+        # A worker died or hung (or another request hit that and discarded
+        # the pool); stop the pool and start a fresh one next time. Rendering
+        # here instead would outlast the web worker's own timeout.
+        with _render_pool_lock:
+            if _render_pool is pool:
+                _render_pool = None
+                discard_process_pool(pool)
+        raise ReportRenderTimeout(f"{title} took longer than {timeout}s to render") from exc
+
+
+# ============================================================================
+# ARTIFACT CACHE
+# ============================================================================
+
+
+# A fixed set of locks shared by all paths, so the set never grows
+_artifact_locks = [threading.Lock() for _ in range(ARTIFACT_LOCK_STRIPES)]
+
+
+def _local_lock(key):
+    return _artifact_locks[hash(key) % ARTIFACT_LOCK_STRIPES]
+
+
+def artifact_path(company, report_name, period, ledger_version, extension="pdf"):
+    """Storage path of a rendered report (local media or S3)"""
+    period_key = "_".join(str(part) for part in period)
+    return (
+        f"report_artifacts/{company.id}/"
+        f"{report_name}_{period_key}_v{ledger_version}.{extension}"
+    )
+
+
+def _read_artifact(path):
+    with default_storage.open(path, "rb") as artifact:
+        return artifact.read()
+
+
+def get_or_render_artifact(path, render):
+    """
+    Return cached artifact bytes, rendering and storing them on a miss
+    Concurrent requests for the same path wait for the first render:
+    a thread lock covers this process, a cache lock covers other workers.
+    Raises ReportRenderTimeout if another worker's render does not finish
+    within REPORT_RENDER_TIMEOUT.
+    """
+    if default_storage.exists(path):
+        return _read_artifact(path)
+
+    with _local_lock(path):
+        if default_storage.exists(path):
+            return _read_artifact(path)
+
+        lock_key = f"artifact_lock_{path}"
+        acquired = cache.add(lock_key, True, ARTIFACT_LOCK_TIMEOUT)
+        if not acquired:
+            deadline = time.monotonic() + getattr(settings, "REPORT_RENDER_TIMEOUT", 15)
+            while time.monotonic() < deadline:
+                time.sleep(ARTIFACT_POLL_INTERVAL)
+                if default_storage.exists(path):
+                    return _read_artifact(path)
+                if cache.add(lock_key, True, ARTIFACT_LOCK_TIMEOUT):
+                    acquired = True
+                    break
+            else:
+                raise ReportRenderTimeout(f"{path} is still being rendered")
+
+        try:
+            data = render()
+            if not default_storage.exists(path):
+                default_storage.save(path, ContentFile(data))
+            return data
+        finally:
+            if acquired:
+                cache.delete(lock_key)
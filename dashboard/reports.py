@@ -17,7 +17,9 @@ from accounting.models import (
     Payment,
     Expense,
     FixedAsset,
+    ReportSnapshot,
 )
+from dashboard.snapshots import get_or_build_snapshot
 
 
 class FinancialReports:
@@ -29,6 +31,30 @@ class FinancialReports:
         self.end_date = end_date or datetime.now().date()
 
     def profit_and_loss(self) -> Dict:
+        """
+        Profit & Loss Statement, served from a snapshot for closed periods
+        """
+        return get_or_build_snapshot(
+            self.company,
+            ReportSnapshot.ReportType.PROFIT_AND_LOSS,
+            self.start_date,
+            self.end_date,
+            self._build_profit_and_loss,
+        )
+
+    def balance_sheet(self) -> Dict:
+        """
+        Balance Sheet, served from a snapshot for closed periods
+        """
+        return get_or_build_snapshot(
+            self.company,
+            ReportSnapshot.ReportType.BALANCE_SHEET,
+            self.start_date,
+            self.end_date,
+            self._build_balance_sheet,
+        )
+
+    def _build_profit_and_loss(self) -> Dict:
         """
         Generate Profit & Loss Statement (Income Statement)
         Revenue - Expenses = Net Income
@@ -117,7 +143,7 @@ class FinancialReports:
             ),
         }
 
-    def balance_sheet(self) -> Dict:
+    def _build_balance_sheet(self) -> Dict:
         """
         Generate Balance Sheet
         Assets = Liabilities + Equity
@@ -315,7 +341,7 @@ class FinancialReports:
         # Get all unpaid invoices
         unpaid_invoices = Invoice.objects.filter(
             company=self.company, status__in=["SENT", "OVERDUE"]
-        )
+        ).select_related("customer")
 
         # Categorize by age
         current = []  # 0-30 days
@@ -5,12 +5,28 @@ Generate and display comprehensive financial reports
 
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from datetime import datetime, timedelta
 from decimal import Decimal
 
+from django.utils.html import escape
+
+from dashboard.conditional import company_conditional
+from dashboard.consolidation import ConsolidationEngine, consolidation_as_json
+from dashboard.ledger import GeneralLedgerDetail
 from dashboard.reports import FinancialReports
-from accounting.models import Invoice, Bill
+from dashboard.rendering import (
+    ReportRenderTimeout,
+    artifact_path,
+    build_report_tables,
+    get_or_render_artifact,
+    render_pdf,
+)
+from dashboard.utils import get_ledger_version
+from accounting.models import ConsolidationGroup, Invoice, Bill
+
+# PDF exports that depend only on posted ledger data (see Company.ledger_version)
+LEDGER_REPORTS = ("pnl", "balance_sheet")
 
 
 @login_required
@@ -174,6 +190,130 @@ def cash_flow_forecast_view(request):
     return render(request, "dashboard/reports/cash_flow_forecast.html", context)
 
 
+@login_required
+def general_ledger_detail_report(request):
+    """Generate General Ledger Detail (account activity) Report"""
+    active_company = request.active_company
+
+    # Get date range from request or default to current month
+    start_date_str = request.GET.get("start_date")
+    end_date_str = request.GET.get("end_date")
+
+    if start_date_str and end_date_str:
+        start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+        end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+    else:
+        today = datetime.now().date()
+        start_date = today.replace(day=1)
+        end_date = today
+
+    # Single account (account=) or range (account_from= / account_to=)
+    account_from = request.GET.get("account") or request.GET.get("account_from")
+    account_to = request.GET.get("account") or request.GET.get("account_to")
+
+    ledger = GeneralLedgerDetail(
+        active_company, start_date, end_date, account_from, account_to
+    )
+
+    # Handle export requests
+    export_format = request.GET.get("export")
+    if export_format == "csv":
+        return export_ledger_csv(ledger)
+
+    page = ledger.page(request.GET.get("cursor"))
+
+    if export_format == "json":
+        return JsonResponse(
+            {
+                "success": True,
+                "lines": [
+                    {
+                        **line,
+                        "entry_date": line["entry_date"].isoformat(),
+                        "debit_amount": float(line["debit_amount"]),
+                        "credit_amount": float(line["credit_amount"]),
+                        "running_balance": float(line["running_balance"]),
+                    }
+                    for line in page["lines"]
+                ],
+                "opening_balances": {
+                    account_id: float(balance)
+                    for account_id, balance in page["opening_balances"].items()
+                },
+                "next_cursor": page["next_cursor"],
+            }
+        )
+
+    context = {
+        "title": "General Ledger Detail",
+        "lines": page["lines"],
+        "opening_balances": page["opening_balances"],
+        "next_cursor": page["next_cursor"],
+        "start_date": start_date,
+        "end_date": end_date,
+        "account_from": account_from or "",
+        "account_to": account_to or "",
+    }
+    return render(request, "dashboard/reports/general_ledger_detail.html", context)
+
+
+@login_required
+def consolidation_report(request):
+    """Consolidated balance sheet and P&L for a group of companies"""
+    groups = ConsolidationGroup.objects.filter(
+        company_id__in=request.user_company_ids
+    ).order_by("name")
+
+    group_id = request.GET.get("group")
+    group = None
+    if group_id and group_id.isdigit():
+        group = groups.filter(id=group_id).first()
+    elif request.active_company:
+        group = groups.filter(company=request.active_company).first()
+
+    as_of_str = request.GET.get("as_of")
+    start_date_str = request.GET.get("start_date")
+    as_of = (
+        datetime.strptime(as_of_str, "%Y-%m-%d").date()
+        if as_of_str
+        else datetime.now().date()
+    )
+    period_start = (
+        datetime.strptime(start_date_str, "%Y-%m-%d").date()
+        if start_date_str
+        else as_of.replace(month=1, day=1)
+    )
+
+    export_format = request.GET.get("export")
+    error = None
+    report = None
+    if group is None:
+        error = "Consolidation group not found"
+    elif group.members.exclude(id__in=request.user_company_ids).exists():
+        # Every subsidiary's figures are shown, so the user must belong to all of them
+        error = "You do not have access to every company in this group"
+    else:
+        report = ConsolidationEngine(group, as_of, period_start).consolidate()
+
+    if export_format == "json":
+        if error:
+            return JsonResponse({"success": False, "error": error}, status=404)
+        return JsonResponse(consolidation_as_json(report))
+    if export_format == "csv" and report:
+        return export_consolidation_csv(report)
+
+    context = {
+        "title": "Consolidated Report",
+        "groups": groups,
+        "group": group,
+        "report": report,
+        "error": error,
+        "as_of": as_of,
+        "start_date": period_start,
+    }
+    return render(request, "dashboard/reports/consolidation.html", context)
+
+
 # ============================================================================
 # EXPORT FUNCTIONS
 # ============================================================================
@@ -193,75 +333,93 @@ def export_report_csv(report_data, report_name):
     csv_buffer = StringIO()
     writer = csv.writer(csv_buffer)
 
-    # Write report data based on type
-    if report_name == "profit_loss":
-        writer.writerow(["Profit & Loss Statement"])
-        writer.writerow(
-            ["Period:", f"{report_data['start_date']} to {report_data['end_date']}"]
-        )
-        writer.writerow([])
-        writer.writerow(["Revenue"])
-        for item in report_data["revenue"]["items"]:
-            writer.writerow([item["account"].name, f"${item['amount']:,.2f}"])
-        writer.writerow(["Total Revenue", f"${report_data['revenue']['total']:,.2f}"])
-        writer.writerow([])
-        writer.writerow(["Expenses"])
-        for item in report_data["expenses"]["items"]:
-            writer.writerow([item["account"].name, f"${item['amount']:,.2f}"])
-        writer.writerow(["Total Expenses", f"${report_data['expenses']['total']:,.2f}"])
+    # Same section tables as the PDF export, so every report type is covered
+    writer.writerow([report_name.replace("_", " ").title()])
+    period = _report_period_text(report_data)
+    if period:
+        writer.writerow([period])
+
+    for table in build_report_tables(report_data):
         writer.writerow([])
-        writer.writerow(["Net Income", f"${report_data['net_income']:,.2f}"])
+        writer.writerow([table["title"]])
+        if any(table["columns"]):
+            writer.writerow(table["columns"])
+        writer.writerows(table["rows"])
+        writer.writerows(table["footer"])
 
     response.write(csv_buffer.getvalue())
     return response
 
 
-def export_report_pdf(context, report_type):
-    """Export report to PDF using ReportLab"""
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.platypus import (
-        SimpleDocTemplate,
-        Table,
-        TableStyle,
-        Paragraph,
-        Spacer,
+def export_consolidation_csv(report):
+    """Export a consolidated report to CSV, one column per subsidiary"""
+    import csv
+    from io import StringIO
+
+    response = HttpResponse(content_type="text/csv")
+    response["Content-Disposition"] = (
+        f'attachment; filename="consolidation_{report["as_of"].strftime("%Y%m%d")}.csv"'
     )
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.lib import colors
-    from io import BytesIO
-
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-    styles = getSampleStyleSheet()
-
-    # Title
-    title = Paragraph(context["title"], styles["Title"])
-    elements.append(title)
-    elements.append(Spacer(1, 12))
-
-    # Company name
-    company_name = Paragraph(
-        f"<b>{context['report'].get('company', 'Company')}</b>", styles["Normal"]
+
+    csv_buffer = StringIO()
+    writer = csv.writer(csv_buffer)
+    writer.writerow([f"Consolidated Report - {report['group'].name}"])
+    writer.writerow([f"Period: {report['period_start']} to {report['as_of']}"])
+    writer.writerow([])
+    writer.writerow(
+        ["Code", "Account", "Type"]
+        + [company["name"] for company in report["companies"]]
+        + ["Eliminations", "Consolidated"]
     )
-    elements.append(company_name)
-    elements.append(Spacer(1, 12))
-
-    # Date range
-    if "start_date" in context:
-        date_range = Paragraph(
-            f"Period: {context['start_date']} to {context['end_date']}",
-            styles["Normal"],
+    for row in report["rows"]:
+        writer.writerow(
+            [row["code"], row["name"], row["type"]]
+            + list(row["companies"].values())
+            + [row["elimination"], row["consolidated"]]
         )
-        elements.append(date_range)
-        elements.append(Spacer(1, 20))
+    writer.writerow([])
+    for key, value in report["totals"].items():
+        writer.writerow([key.replace("_", " ").title(), value])
 
-    # Build PDF
-    doc.build(elements)
+    response.write(csv_buffer.getvalue())
+    return response
 
-    # Get PDF data
-    pdf = buffer.getvalue()
-    buffer.close()
+
+def export_report_pdf(context, report_type):
+    """Export report to PDF using ReportLab"""
+    report = context["report"]
+    company = report.get("company")
+    tables = build_report_tables(report)
+
+    subtitle_lines = [f"<b>{escape(company or 'Company')}</b>"]
+    period = _report_period_text(context)
+    if period:
+        subtitle_lines.append(period)
+
+    def render():
+        return render_pdf(context["title"], subtitle_lines, tables)
+
+    try:
+        # Ledger-derived reports are cached until the company's ledger changes
+        if report_type in LEDGER_REPORTS and company is not None:
+            period_key = (
+                context.get("start_date") or "",
+                context.get("end_date") or context.get("as_of_date"),
+            )
+            path = artifact_path(
+                company, report_type, period_key, get_ledger_version(company)
+            )
+            pdf = get_or_render_artifact(path, render)
+        else:
+            pdf = render()
+    except ReportRenderTimeout:
+        response = HttpResponse(
+            "The report is taking longer than usual to render. Please try again shortly.",
+            content_type="text/plain",
+            status=503,
+        )
+        response["Retry-After"] = "30"
+        return response
 
     # Create response
     response = HttpResponse(content_type="application/pdf")
@@ -273,12 +431,66 @@ def export_report_pdf(context, report_type):
     return response
 
 
+def export_ledger_csv(ledger):
+    """Stream the GL detail report as CSV, one keyset page at a time"""
+    import csv
+
+    class Echo:
+        def write(self, value):
+            return value
+
+    writer = csv.writer(Echo())
+
+    def rows():
+        yield writer.writerow(
+            [
+                "Account",
+                "Account Name",
+                "Date",
+                "Entry",
+                "Description",
+                "Debit",
+                "Credit",
+                "Balance",
+            ]
+        )
+        for line in ledger.iter_lines():
+            yield writer.writerow(
+                [
+                    line["account_code"],
+                    line["account_name"],
+                    line["entry_date"].isoformat(),
+                    line["entry_number"],
+                    line["description"] or line["entry_description"],
+                    line["debit_amount"],
+                    line["credit_amount"],
+                    line["running_balance"],
+                ]
+            )
+
+    response = StreamingHttpResponse(rows(), content_type="text/csv")
+    response["Content-Disposition"] = (
+        f'attachment; filename="general_ledger_{datetime.now().strftime("%Y%m%d")}.csv"'
+    )
+    return response
+
+
+def _report_period_text(data):
+    """Human readable period of a report or view context"""
+    if data.get("start_date") and data.get("end_date"):
+        return f"Period: {data['start_date']} to {data['end_date']}"
+    if data.get("as_of_date"):
+        return f"As of: {data['as_of_date']}"
+    return ""
+
+
 # ============================================================================
 # API ENDPOINTS FOR CHARTS
 # ============================================================================
 
 
 @login_required
+@company_conditional
 def revenue_expense_chart_data(request):
     """
     API endpoint for income vs expenses chart data
@@ -322,6 +534,7 @@ def revenue_expense_chart_data(request):
 
 
 @login_required
+@company_conditional
 def expense_breakdown_chart_data(request):
     """
     API endpoint for expense breakdown by category
@@ -375,20 +588,21 @@ def expense_breakdown_chart_data(request):
 
 
 @login_required
+@company_conditional
 def top_customers_chart_data(request):
     """
     API endpoint for top customers by invoice value
     """
     active_company = request.active_company
 
-    from django.db.models import Sum
+    from django.db.models import F
     from accounting.models import Customer
 
-    # Get top 10 customers by total invoice value
+    # Get top 10 customers by total invoice value, from the balance rollup
     top_customers = (
         Customer.objects.filter(company=active_company, is_active=True)
-        .annotate(total_invoiced=Sum("invoices__total_amount"))
-        .order_by("-total_invoiced")[:10]
+        .annotate(total_invoiced=F("balance__total_invoiced"))
+        .order_by(F("balance__total_invoiced").desc(nulls_last=True))[:10]
     )
 
     return JsonResponse(
@@ -0,0 +1,104 @@
+"""
+Balance Rollup Signals
+Keep CustomerBalance / VendorBalance in step with invoices, bills and payments
+"""
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounting.models import (
+    Bill,
+    Customer,
+    CustomerBalance,
+    Invoice,
+    Payment,
+    Vendor,
+    VendorBalance,
+)
+from dashboard.rollups import (
+    CUSTOMERS,
+    VENDORS,
+    apply_document_changes,
+    apply_deltas,
+    document_state,
+    rebuild_balances,
+    refresh_last_payment_date,
+)
+
+UNKNOWN = object()
+
+
+@receiver(post_init, sender=Invoice)
+@receiver(post_init, sender=Bill)
+def remember_rollup_state(sender, instance, **kwargs):
+    """Keep what the loaded document contributes so a save can apply the delta"""
+    spec = CUSTOMERS if sender is Invoice else VENDORS
+    state = document_state(spec, instance)
+    instance._rollup_state = UNKNOWN if state is None else state
+
+
+@receiver(post_save, sender=Invoice)
+@receiver(post_save, sender=Bill)
+def document_saved(sender, instance, created, **kwargs):
+    spec = CUSTOMERS if sender is Invoice else VENDORS
+    old_state = None if created else getattr(instance, "_rollup_state", UNKNOWN)
+    new_state = document_state(spec, instance)
+    instance._rollup_state = UNKNOWN if new_state is None else new_state
+
+    if old_state is UNKNOWN or new_state is None:
+        # Partially loaded document: recount the party from its documents
+        rebuild_balances(spec, party_ids=[getattr(instance, spec.party_attr)])
+        return
+
+    apply_document_changes(
+        spec,
+        [(old_state, new_state)],
+        payment_date=timezone.now().date() if spec is VENDORS else None,
+    )
+
+
+@receiver(post_delete, sender=Invoice)
+@receiver(post_delete, sender=Bill)
+def document_deleted(sender, instance, **kwargs):
+    """
+    Take the document out of its party's totals
+    Rows are never created here: the party may be going in the same cascade.
+    """
+    spec = CUSTOMERS if sender is Invoice else VENDORS
+    old_state = getattr(instance, "_rollup_state", UNKNOWN)
+    if old_state is UNKNOWN:
+        rebuild_balances(
+            spec, party_ids=[getattr(instance, spec.party_attr)], existing_only=True
+        )
+        return
+    apply_document_changes(spec, [(old_state, None)], create_missing=False)
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, **kwargs):
+    apply_deltas(
+        CUSTOMERS, {instance.customer_id: {"last_payment_date": instance.payment_date}}
+    )
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    refresh_last_payment_date(instance.customer_id)
+
+
+@receiver(post_save, sender=Customer)
+def customer_created(sender, instance, created, **kwargs):
+    """Every customer has a balance row, so lists can rank by it"""
+    if created:
+        CustomerBalance.objects.get_or_create(
+            customer=instance, defaults={"company_id": instance.company_id}
+        )
+
+
+@receiver(post_save, sender=Vendor)
+def vendor_created(sender, instance, created, **kwargs):
+    if created:
+        VendorBalance.objects.get_or_create(
+            vendor=instance, defaults={"company_id": instance.company_id}
+        )
@@ -0,0 +1,301 @@
+"""
+Balance Rollups
+Maintains CustomerBalance / VendorBalance, the per-party AR and AP totals
+- A saved invoice or bill applies the change in what it contributes as a delta
+- Deltas for many parties are applied with one UPDATE (a CASE per field)
+- Parties without a row are rebuilt from their documents
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Case,
+    DecimalField,
+    ExpressionWrapper,
+    F,
+    Max,
+    Min,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+from accounting.models import (
+    Bill,
+    Customer,
+    CustomerBalance,
+    Invoice,
+    Payment,
+    Vendor,
+    VendorBalance,
+)
+
+
+ZERO = Decimal("0.00")
+
+# Invoice and Bill share these status values
+UNCOUNTED_STATUSES = ["DRAFT", "CANCELLED"]
+SETTLED_STATUS = "PAID"
+
+MONEY_FIELDS = ["total_invoiced", "outstanding", "total_paid"]
+
+
+def _money():
+    return DecimalField(max_digits=15, decimal_places=2)
+
+
+class RollupSpec:
+    """How one kind of party (customer or vendor) is rolled up"""
+
+    def __init__(self, balance_model, party_model, document_model, party_field,
+                 date_field):
+        self.balance_model = balance_model
+        self.party_model = party_model
+        self.document_model = document_model
+        self.party_field = party_field
+        self.party_attr = f"{party_field}_id"
+        self.date_field = date_field
+
+
+CUSTOMERS = RollupSpec(CustomerBalance, Customer, Invoice, "customer", "invoice_date")
+VENDORS = RollupSpec(VendorBalance, Vendor, Bill, "vendor", "bill_date")
+
+
+# ============================================================================
+# DELTAS
+# ============================================================================
+
+
+def document_state(spec, document):
+    """
+    (party id, contribution) of an invoice or bill, or None when unknown
+    The contribution is None for uncounted documents, otherwise
+    {total_invoiced, outstanding, total_paid, date}. Deferred fields are not
+    loaded, so a partially loaded document reports an unknown state.
+    """
+    values = document.__dict__
+    fields = [spec.party_attr, spec.date_field, "status", "total_amount", "paid_amount"]
+    if any(field not in values for field in fields):
+        return None
+
+    status = values["status"]
+    if status in UNCOUNTED_STATUSES:
+        return values[spec.party_attr], None
+
+    total = Decimal(values["total_amount"] or 0)
+    paid = Decimal(values["paid_amount"] or 0)
+    return values[spec.party_attr], {
+        "total_invoiced": total,
+        "outstanding": ZERO if status == SETTLED_STATUS else total - paid,
+        "total_paid": paid,
+        "date": values[spec.date_field],
+    }
+
+
+def add_change(deltas, old_state, new_state):
+    """
+    Accumulate the move from old_state to new_state (document_state results,
+    None for "did not exist") into deltas: {party_id: {field: delta, ...}}
+    """
+    for state, sign in ((old_state, -1), (new_state, 1)):
+        if state is None or state[1] is None:
+            continue
+        party_id, contribution = state
+        delta = deltas.setdefault(party_id, {})
+        for field in MONEY_FIELDS:
+            delta[field] = delta.get(field, ZERO) + sign * contribution[field]
+        if sign > 0 and contribution["date"]:
+            first = delta.get("first_invoice_date")
+            if first is None or contribution["date"] < first:
+                delta["first_invoice_date"] = contribution["date"]
+    return deltas
+
+
+def apply_deltas(spec, deltas, payment_date=None, create_missing=True):
+    """
+    Apply {party_id: {field: delta}} with one UPDATE for every party that has
+    a balance row; parties without one are rebuilt from their documents
+    unless create_missing is False (deletions, which may be cascading).
+    `last_payment_date` entries move the date forward, never back.
+    payment_date, if given, is used as the last payment date of every party
+    whose total_paid rose (vendors, whose bills carry no payment records).
+    """
+    deltas = {party_id: delta for party_id, delta in deltas.items() if party_id}
+    if not deltas:
+        return
+
+    if payment_date:
+        for delta in deltas.values():
+            if delta.get("total_paid", ZERO) > ZERO:
+                delta["last_payment_date"] = payment_date
+
+    model = spec.balance_model
+    existing = set(model.objects.filter(pk__in=deltas).values_list("pk", flat=True))
+    ids = [party_id for party_id in deltas if party_id in existing]
+
+    updates = {}
+    for field in MONEY_FIELDS:
+        whens = [
+            When(pk=party_id, then=Value(deltas[party_id][field]))
+            for party_id in ids
+            if deltas[party_id].get(field)
+        ]
+        if whens:
+            updates[field] = F(field) + Case(
+                *whens, default=Value(ZERO), output_field=_money()
+            )
+
+    first = [
+        When(
+            Q(pk=party_id)
+            & (
+                Q(first_invoice_date__isnull=True)
+                | Q(first_invoice_date__gt=deltas[party_id]["first_invoice_date"])
+            ),
+            then=Value(deltas[party_id]["first_invoice_date"]),
+        )
+        for party_id in ids
+        if deltas[party_id].get("first_invoice_date")
+    ]
+    if first:
+        updates["first_invoice_date"] = Case(*first, default=F("first_invoice_date"))
+
+    last = [
+        When(
+            Q(pk=party_id)
+            & (
+                Q(last_payment_date__isnull=True)
+                | Q(last_payment_date__lt=deltas[party_id]["last_payment_date"])
+            ),
+            then=Value(deltas[party_id]["last_payment_date"]),
+        )
+        for party_id in ids
+        if deltas[party_id].get("last_payment_date")
+    ]
+    if last:
+        updates["last_payment_date"] = Case(*last, default=F("last_payment_date"))
+
+    if updates:
+        updates["updated_at"] = timezone.now()
+        model.objects.filter(pk__in=ids).update(**updates)
+
+    missing = [party_id for party_id in deltas if party_id not in existing]
+    if missing and create_missing:
+        rebuild_balances(spec, party_ids=missing)
+
+
+def apply_document_changes(spec, changes, payment_date=None, create_missing=True):
+    """Apply (old_state, new_state) pairs of many documents as one batch"""
+    deltas = {}
+    for old_state, new_state in changes:
+        add_change(deltas, old_state, new_state)
+    apply_deltas(
+        spec, deltas, payment_date=payment_date, create_missing=create_missing
+    )
+
+
+def refresh_last_payment_date(customer_id):
+    """Wind a customer's last payment date back after a payment is deleted"""
+    CustomerBalance.objects.filter(pk=customer_id).update(
+        last_payment_date=Subquery(
+            Payment.objects.filter(customer_id=customer_id)
+            .order_by("-payment_date")
+            .values("payment_date")[:1]
+        )
+    )
+
+
+# ============================================================================
+# REBUILD
+# ============================================================================
+
+
+def _last_payment_dates(spec, party_ids):
+    if spec is CUSTOMERS:
+        rows = (
+            Payment.objects.filter(customer_id__in=party_ids)
+            .values("customer_id")
+            .annotate(last=Max("payment_date"))
+            .order_by()
+        )
+        return {row["customer_id"]: row["last"] for row in rows}
+
+    # Bills have no payment records; the last change of a paid bill stands in
+    rows = (
+        Bill.objects.filter(vendor_id__in=party_ids, paid_amount__gt=0)
+        .exclude(status__in=UNCOUNTED_STATUSES)
+        .values("vendor_id")
+        .annotate(last=Max("updated_at"))
+        .order_by()
+    )
+    return {row["vendor_id"]: row["last"].date() for row in rows}
+
+
+def rebuild_balances(spec, company=None, party_ids=None, existing_only=False,
+                     batch_size=1000):
+    """
+    Recompute balance rows from the documents, for a company's parties or
+    for the given party ids. existing_only recounts rows without creating
+    any. Returns the number of rows written.
+    """
+    parties = spec.party_model.objects.all()
+    if company is not None:
+        parties = parties.filter(company=company)
+    if party_ids is not None:
+        parties = parties.filter(id__in=party_ids)
+    if existing_only:
+        parties = parties.filter(balance__isnull=False)
+    parties = list(parties.values_list("id", "company_id"))
+    ids = [party_id for party_id, _ in parties]
+
+    counted = ~Q(status__in=UNCOUNTED_STATUSES)
+    open_amount = ExpressionWrapper(
+        F("total_amount") - F("paid_amount"), output_field=_money()
+    )
+    totals = {
+        row[spec.party_attr]: row
+        for row in spec.document_model.objects.filter(
+            **{f"{spec.party_attr}__in": ids}
+        )
+        .values(spec.party_attr)
+        .annotate(
+            total_invoiced=Sum("total_amount", filter=counted),
+            outstanding=Sum(open_amount, filter=counted & ~Q(status=SETTLED_STATUS)),
+            total_paid=Sum("paid_amount", filter=counted),
+            first_invoice_date=Min(spec.date_field, filter=counted),
+        )
+        .order_by()
+    }
+    last_payments = _last_payment_dates(spec, ids)
+
+    balances = []
+    for party_id, company_id in parties:
+        row = totals.get(party_id, {})
+        balances.append(
+            spec.balance_model(
+                pk=party_id,
+                company_id=company_id,
+                total_invoiced=row.get("total_invoiced") or ZERO,
+                outstanding=row.get("outstanding") or ZERO,
+                total_paid=row.get("total_paid") or ZERO,
+                first_invoice_date=row.get("first_invoice_date"),
+                last_payment_date=last_payments.get(party_id),
+            )
+        )
+
+    with transaction.atomic():
+        spec.balance_model.objects.filter(pk__in=ids).delete()
+        spec.balance_model.objects.bulk_create(balances, batch_size=batch_size)
+
+    return len(balances)
+
+
+def rebuild_company_balances(company):
+    """Rebuild every customer and vendor rollup of a company"""
+    return rebuild_balances(CUSTOMERS, company=company) + rebuild_balances(
+        VENDORS, company=company
+    )
@@ -0,0 +1,520 @@
+"""
+Search Index
+Per-company search over customers, vendors, invoices, journal entries and documents
+- SQLite FTS5 or PostgreSQL tsvector + trigram, ORM fallback elsewhere
+- Entries carry display fields and balances, so typeahead is a single query
+"""
+
+import re
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from accounting.models import (
+    Customer,
+    CustomerBalance,
+    Document,
+    Invoice,
+    JournalEntry,
+    SearchEntry,
+    Vendor,
+    VendorBalance,
+)
+
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERMS = 8
+
+RESULT_FIELDS = [
+    "id",
+    "object_type",
+    "object_id",
+    "parent_id",
+    "code",
+    "title",
+    "subtitle",
+    "status",
+    "balance",
+]
+
+_fts_available = {}
+
+
+def company_token(company_id):
+    """Token written into every entry so full-text matches stay per company"""
+    return f"cmp{company_id}"
+
+
+def _content(company_id, *parts):
+    return " ".join([company_token(company_id)] + [str(p) for p in parts if p])
+
+
+def _terms(query):
+    return [term.lower() for term in TERM_RE.findall(query or "")][:MAX_TERMS]
+
+
+# ============================================================================
+# ENTRY BUILDERS
+# ============================================================================
+
+
+def customer_balances(customers):
+    """Outstanding receivable per customer, from the balance rollup"""
+    return dict(
+        CustomerBalance.objects.filter(customer__in=customers).values_list(
+            "customer_id", "outstanding"
+        )
+    )
+
+
+def vendor_balances(vendors):
+    """Unpaid payable per vendor, from the balance rollup"""
+    return dict(
+        VendorBalance.objects.filter(vendor__in=vendors).values_list(
+            "vendor_id", "outstanding"
+        )
+    )
+
+
+def customer_entry(customer, balance):
+    return {
+        "company_id": customer.company_id,
+        "parent_id": None,
+        "code": customer.customer_code,
+        "title": customer.company_name,
+        "subtitle": customer.contact_name or "",
+        "status": "ACTIVE" if customer.is_active else "INACTIVE",
+        "balance": balance or Decimal("0.00"),
+        "content": _content(
+            customer.company_id,
+            customer.customer_code,
+            customer.company_name,
+            customer.contact_name,
+            customer.email,
+            customer.phone,
+            customer.city,
+        ),
+    }
+
+
+def vendor_entry(vendor, balance):
+    return {
+        "company_id": vendor.company_id,
+        "parent_id": None,
+        "code": vendor.vendor_code,
+        "title": vendor.company_name,
+        "subtitle": vendor.contact_name or "",
+        "status": "ACTIVE" if vendor.is_active else "INACTIVE",
+        "balance": balance or Decimal("0.00"),
+        "content": _content(
+            vendor.company_id,
+            vendor.vendor_code,
+            vendor.company_name,
+            vendor.contact_name,
+            vendor.email,
+            vendor.phone,
+            vendor.city,
+        ),
+    }
+
+
+def invoice_entry(invoice, customer_name):
+    return {
+        "company_id": invoice.company_id,
+        "parent_id": invoice.customer_id,
+        "code": invoice.invoice_number,
+        "title": customer_name,
+        "subtitle": f"Due {invoice.due_date}" if invoice.due_date else "",
+        "status": invoice.status,
+        "balance": invoice.total_amount - invoice.paid_amount,
+        "content": _content(
+            invoice.company_id, invoice.invoice_number, customer_name, invoice.notes
+        ),
+    }
+
+
+def journal_entry_entry(entry):
+    return {
+        "company_id": entry.company_id,
+        "parent_id": None,
+        "code": entry.entry_number,
+        "title": (entry.description or "")[:255],
+        "subtitle": str(entry.entry_date),
+        "status": entry.status,
+        "balance": entry.total_debit,
+        "content": _content(
+            entry.company_id, entry.entry_number, entry.reference, entry.description
+        ),
+    }
+
+
+DOCUMENT_OWNERS = (
+    "category",
+    "related_invoice",
+    "related_bill",
+    "related_customer",
+    "related_vendor",
+    "related_account",
+)
+
+
+def document_company_id(document):
+    """Documents have no company field; use the record they are attached to"""
+    for related in DOCUMENT_OWNERS:
+        obj = getattr(document, related, None)
+        if obj is not None and obj.company_id:
+            return obj.company_id
+    return None
+
+
+def document_entry(document):
+    company_id = document_company_id(document)
+    if company_id is None:
+        return None
+    return {
+        "company_id": company_id,
+        "parent_id": None,
+        "code": document.document_id,
+        "title": document.title,
+        "subtitle": document.file_name,
+        "status": document.status,
+        "balance": None,
+        "content": _content(
+            company_id,
+            document.document_id,
+            document.title,
+            document.description,
+            document.tags,
+            document.file_name,
+        ),
+    }
+
+
+def build_entry(instance):
+    """Index fields for one saved object, or None if it cannot be indexed"""
+    if isinstance(instance, Customer):
+        return customer_entry(instance, customer_balances([instance]).get(instance.pk))
+    if isinstance(instance, Vendor):
+        return vendor_entry(instance, vendor_balances([instance]).get(instance.pk))
+    if isinstance(instance, Invoice):
+        return invoice_entry(instance, instance.customer.company_name)
+    if isinstance(instance, JournalEntry):
+        return journal_entry_entry(instance)
+    if isinstance(instance, Document):
+        return document_entry(instance)
+    return None
+
+
+OBJECT_TYPES = {
+    Customer: SearchEntry.ObjectType.CUSTOMER,
+    Vendor: SearchEntry.ObjectType.VENDOR,
+    Invoice: SearchEntry.ObjectType.INVOICE,
+    JournalEntry: SearchEntry.ObjectType.JOURNAL_ENTRY,
+    Document: SearchEntry.ObjectType.DOCUMENT,
+}
+
+
+# ============================================================================
+# INDEX MAINTENANCE
+# ============================================================================
+
+
+def index_object(instance):
+    """Insert or refresh the search entry of a saved object"""
+    object_type = OBJECT_TYPES[type(instance)]
+    data = build_entry(instance)
+    if data is None or not data["company_id"]:
+        remove_object(instance)
+        return
+    SearchEntry.objects.update_or_create(
+        object_type=object_type, object_id=instance.pk, defaults=data
+    )
+
+
+def index_objects(instances, batch_size=1000):
+    """
+    Insert or refresh the entries of many saved objects of one model after a
+    bulk insert or update (which send no signals)
+    """
+    instances = list(instances)
+    if not instances:
+        return
+    object_type = OBJECT_TYPES[type(instances[0])]
+    entries = []
+    for instance in instances:
+        data = build_entry(instance)
+        if data is not None and data["company_id"]:
+            entries.append(
+                SearchEntry(object_type=object_type, object_id=instance.pk, **data)
+            )
+
+    with transaction.atomic():
+        SearchEntry.objects.filter(
+            object_type=object_type,
+            object_id__in=[instance.pk for instance in instances],
+        ).delete()
+        SearchEntry.objects.bulk_create(entries, batch_size=batch_size)
+
+
+def refresh_customer_invoices(customer):
+    """Re-index a customer's invoices when the name shown on them is stale"""
+    stale = SearchEntry.objects.filter(
+        object_type=SearchEntry.ObjectType.INVOICE, parent_id=customer.pk
+    ).exclude(title=customer.company_name)
+    if not stale.exists():
+        return
+
+    entries = [
+        SearchEntry(
+            object_type=SearchEntry.ObjectType.INVOICE,
+            object_id=invoice.pk,
+            **invoice_entry(invoice, customer.company_name),
+        )
+        for invoice in customer.invoices.all()
+    ]
+    with transaction.atomic():
+        SearchEntry.objects.filter(
+            object_type=SearchEntry.ObjectType.INVOICE, parent_id=customer.pk
+        ).delete()
+        SearchEntry.objects.bulk_create(entries)
+
+
+def remove_object(instance):
+    SearchEntry.objects.filter(
+        object_type=OBJECT_TYPES[type(instance)], object_id=instance.pk
+    ).delete()
+
+
+def reindex_invoices(invoice_ids, batch_size=1000):
+    """
+    Refresh the entries of many invoices, and of their customers' balances,
+    after a bulk UPDATE (which sends no signals)
+    """
+    invoices = list(
+        Invoice.objects.filter(pk__in=invoice_ids, company__isnull=False).annotate(
+            customer_name=F("customer__company_name")
+        )
+    )
+    customers = list(
+        Customer.objects.filter(
+            pk__in={invoice.customer_id for invoice in invoices}, company__isnull=False
+        )
+    )
+    balances = customer_balances(customers)
+
+    entries = [
+        SearchEntry(
+            object_type=SearchEntry.ObjectType.INVOICE,
+            object_id=invoice.pk,
+            **invoice_entry(invoice, invoice.customer_name),
+        )
+        for invoice in invoices
+    ] + [
+        SearchEntry(
+            object_type=SearchEntry.ObjectType.CUSTOMER,
+            object_id=customer.pk,
+            **customer_entry(customer, balances.get(customer.pk)),
+        )
+        for customer in customers
+    ]
+
+    with transaction.atomic():
+        SearchEntry.objects.filter(
+            object_type=SearchEntry.ObjectType.INVOICE,
+            object_id__in=[invoice.pk for invoice in invoices],
+        ).delete()
+        SearchEntry.objects.filter(
+            object_type=SearchEntry.ObjectType.CUSTOMER,
+            object_id__in=[customer.pk for customer in customers],
+        ).delete()
+        SearchEntry.objects.bulk_create(entries, batch_size=batch_size)
+
+
+def rebuild_company_index(company, batch_size=1000):
+    """
+    Rebuild every search entry of a company with one query per object type
+    Returns the number of entries written.
+    """
+    customers = list(Customer.objects.filter(company=company))
+    vendors = list(Vendor.objects.filter(company=company))
+    customer_balance = customer_balances(customers)
+    vendor_balance = vendor_balances(vendors)
+
+    entries = []
+
+    def add(object_type, obj, data):
+        if data is not None:
+            entries.append(SearchEntry(object_type=object_type, object_id=obj.pk, **data))
+
+    for customer in customers:
+        add(
+            SearchEntry.ObjectType.CUSTOMER,
+            customer,
+            customer_entry(customer, customer_balance.get(customer.pk)),
+        )
+    for vendor in vendors:
+        add(
+            SearchEntry.ObjectType.VENDOR,
+            vendor,
+            vendor_entry(vendor, vendor_balance.get(vendor.pk)),
+        )
+    invoices = Invoice.objects.filter(company=company).annotate(
+        customer_name=F("customer__company_name")
+    )
+    for invoice in invoices.iterator():
+        add(
+            SearchEntry.ObjectType.INVOICE,
+            invoice,
+            invoice_entry(invoice, invoice.customer_name),
+        )
+    for entry in JournalEntry.objects.filter(company=company).iterator():
+        add(SearchEntry.ObjectType.JOURNAL_ENTRY, entry, journal_entry_entry(entry))
+
+    owner_filter = Q()
+    for related in DOCUMENT_OWNERS:
+        owner_filter |= Q(**{f"{related}__company": company})
+    documents = Document.objects.filter(owner_filter).select_related(*DOCUMENT_OWNERS)
+    for document in documents.distinct():
+        add(SearchEntry.ObjectType.DOCUMENT, document, document_entry(document))
+
+    with transaction.atomic():
+        SearchEntry.objects.filter(company=company).delete()
+        SearchEntry.objects.bulk_create(entries, batch_size=batch_size)
+
+    return len(entries)
+
+
+# ============================================================================
+# QUERYING
+# ============================================================================
+
+
+def _has_fts():
+    """Whether the SQLite FTS5 table from the migration exists"""
+    alias = connection.alias
+    if alias not in _fts_available:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'accounting_searchentry_fts'"
+            )
+            _fts_available[alias] = cursor.fetchone() is not None
+    return _fts_available[alias]
+
+
+def _filter_sql(types, statuses, parent_id):
+    clauses, params = [], []
+    if types:
+        clauses.append(f"e.object_type IN ({', '.join(['%s'] * len(types))})")
+        params += list(types)
+    if statuses:
+        clauses.append(f"e.status IN ({', '.join(['%s'] * len(statuses))})")
+        params += list(statuses)
+    if parent_id:
+        clauses.append("e.parent_id = %s")
+        params.append(parent_id)
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+
+def _fetch(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        results = [dict(zip(RESULT_FIELDS, row)) for row in cursor.fetchall()]
+    # Raw SQLite rows return numerics as int/float
+    for result in results:
+        if result["balance"] is not None:
+            result["balance"] = Decimal(str(result["balance"])).quantize(Decimal("0.01"))
+    return results
+
+
+def _columns():
+    return ", ".join(f"e.{field}" for field in RESULT_FIELDS)
+
+
+def _search_sqlite(company, terms, types, statuses, parent_id, limit):
+    match = " AND ".join(
+        [f'"{company_token(company.id)}"'] + [f'"{term}"*' for term in terms]
+    )
+    where, params = _filter_sql(types, statuses, parent_id)
+    sql = (
+        f"SELECT {_columns()} FROM accounting_searchentry_fts f "
+        "JOIN accounting_searchentry e ON e.id = f.rowid "
+        "WHERE accounting_searchentry_fts MATCH %s AND e.company_id = %s"
+        f"{where} ORDER BY f.rank, e.title"
+    )
+    params = [match, company.id] + params
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return _fetch(sql, params)
+
+
+def _search_postgres(company, terms, types, statuses, parent_id, limit):
+    tsquery = " & ".join([company_token(company.id)] + [f"{term}:*" for term in terms])
+    text = " ".join(terms)
+    where, params = _filter_sql(types, statuses, parent_id)
+    sql = (
+        f"SELECT {_columns()} FROM accounting_searchentry e, "
+        "to_tsquery('simple', %s) q "
+        "WHERE e.company_id = %s AND (e.search_vector @@ q OR e.content %% %s)"
+        f"{where} "
+        "ORDER BY ts_rank(e.search_vector, q) + similarity(e.content, %s) DESC, e.title"
+    )
+    params = [tsquery, company.id, text] + params + [text]
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    return _fetch(sql, params)
+
+
+def _search_fallback(company, terms, types, statuses, parent_id, limit):
+    """Substring match on the single content column, ranked in Python"""
+    entries = SearchEntry.objects.filter(company=company)
+    for term in terms:
+        entries = entries.filter(content__icontains=term)
+    if types:
+        entries = entries.filter(object_type__in=types)
+    if statuses:
+        entries = entries.filter(status__in=statuses)
+    if parent_id:
+        entries = entries.filter(parent_id=parent_id)
+
+    results = list(entries.values(*RESULT_FIELDS)[: limit * 5 if limit else None])
+
+    first = terms[0]
+
+    def score(result):
+        if result["code"].lower().startswith(first):
+            return 0
+        if result["title"].lower().startswith(first):
+            return 1
+        return 2
+
+    results.sort(key=lambda r: (score(r), r["title"]))
+    return results[:limit] if limit else results
+
+
+def search(company, query, types=None, statuses=None, parent_id=None, limit=10):
+    """
+    Ranked search results for a company, as dicts of RESULT_FIELDS
+    types/statuses restrict the entry kind and status; limit=None returns all.
+    """
+    terms = _terms(query)
+    if not company or not terms:
+        return []
+
+    args = (company, terms, types, statuses, parent_id, limit)
+    if connection.vendor == "sqlite" and _has_fts():
+        return _search_sqlite(*args)
+    if connection.vendor == "postgresql":
+        return _search_postgres(*args)
+    return _search_fallback(*args)
+
+
+def search_ids(company, query, object_type, **kwargs):
+    """Object ids of matching entries of one type, best match first"""
+    kwargs.setdefault("limit", None)
+    return [
+        result["object_id"]
+        for result in search(company, query, types=[object_type], **kwargs)
+    ]
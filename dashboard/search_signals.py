@@ -0,0 +1,57 @@
+"""
+Search Index Signals
+Keep SearchEntry rows in step with the records they describe
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounting.models import Bill, Customer, Document, Invoice, JournalEntry, Vendor
+from dashboard.search import index_object, refresh_customer_invoices, remove_object
+
+
+@receiver(post_save, sender=Vendor)
+@receiver(post_save, sender=JournalEntry)
+@receiver(post_save, sender=Document)
+def searchable_saved(sender, instance, **kwargs):
+    """Index the saved record"""
+    index_object(instance)
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, created, **kwargs):
+    """Index the customer; a rename also changes its invoices' entries"""
+    index_object(instance)
+    if not created:
+        refresh_customer_invoices(instance)
+
+
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Vendor)
+@receiver(post_delete, sender=JournalEntry)
+@receiver(post_delete, sender=Document)
+def searchable_deleted(sender, instance, **kwargs):
+    """Drop the deleted record from the index"""
+    remove_object(instance)
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_saved(sender, instance, **kwargs):
+    """Index the invoice and refresh its customer's outstanding balance"""
+    index_object(instance)
+    index_object(instance.customer)
+
+
+@receiver(post_delete, sender=Invoice)
+def invoice_deleted(sender, instance, **kwargs):
+    remove_object(instance)
+    if Customer.objects.filter(pk=instance.customer_id).exists():
+        index_object(instance.customer)
+
+
+@receiver(post_save, sender=Bill)
+@receiver(post_delete, sender=Bill)
+def bill_changed(sender, instance, **kwargs):
+    """Refresh the vendor's open balance"""
+    if Vendor.objects.filter(pk=instance.vendor_id).exists():
+        index_object(instance.vendor)
@@ -12,8 +12,9 @@ from django.db.models import Sum
 
 from accounting.models import (
     Customer, Invoice, Payment, Vendor, Bill, JournalEntry, JournalEntryLine,
-    Account, AccountType, Budget, BudgetLine, FixedAsset, Expense, ExpenseCategory
+    AccountType, Budget, BudgetLine, FixedAsset, Expense, ExpenseCategory
 )
+from dashboard.journal import cash_account, find_account, post_journal_entry, receivable_account
 
 
 class DashboardSyncService:
@@ -47,13 +48,11 @@ class DashboardSyncService:
     def sync_invoice_creation(self, invoice):
         """
         Sync actions when a new invoice is created
-        - Update customer balance
         - Create automatic journal entries
         - Update dashboard metrics
+        The customer balance rollup is kept current by dashboard.rollup_signals.
         """
-        # Update customer outstanding balance (this happens via signal)
         customer = invoice.customer
-        customer.save()  # Triggers balance recalculation
 
         # Create automatic journal entries for invoice
         self._create_invoice_journal_entries(invoice)
@@ -74,19 +73,20 @@ class DashboardSyncService:
         """
         Sync actions when a payment is recorded
         - Update invoice status
-        - Update customer balance
         - Create journal entries
         - Update cash flow
+        The customer balance rollup is kept current by dashboard.rollup_signals.
         """
-        # Update invoice (handled by signal)
-        if payment.invoice:
-            payment.invoice.save()
+        # Apply the payment and post its entry, unless it already was
+        if not payment.allocations.exists():
+            from dashboard.payments import PaymentAllocator
 
-        # Update customer balance
-        payment.customer.save()
-
-        # Create automatic journal entries
-        self._create_payment_journal_entries(payment)
+            remittance = None
+            if payment.invoice:
+                amount = min(payment.amount, payment.invoice.get_balance_due())
+                if amount > 0:
+                    remittance = [{"invoice": payment.invoice.pk, "amount": amount}]
+            PaymentAllocator(self.company).apply(payment, remittance)
 
         # Clear caches
         cache_keys = [
@@ -129,48 +129,37 @@ class DashboardSyncService:
         Create automatic journal entries for invoice
         Debit: Accounts Receivable
         Credit: Revenue
+        Drafts are posted when they are sent (dashboard.invoice_actions);
+        lines are bulk-inserted and the entry posted once.
         """
-        # Find AR account
-        ar_account = Account.objects.filter(
-            company=self.company,
-            account_type=AccountType.ASSET,
-            name__icontains="receivable"
-        ).first()
-
-        # Find revenue account
-        revenue_account = Account.objects.filter(
-            company=self.company,
-            account_type=AccountType.REVENUE
-        ).first()
-
-        if ar_account and revenue_account:
-            # Create journal entry
-            je = JournalEntry.objects.create(
-                company=self.company,
-                entry_number=f"INV-{invoice.invoice_number}",
-                entry_date=invoice.invoice_date,
-                description=f"Invoice {invoice.invoice_number} - {invoice.customer.company_name}",
-                status="POSTED"
-            )
-
-            # Debit AR
-            JournalEntryLine.objects.create(
-                journal_entry=je,
-                account=ar_account,
-                description=f"Invoice {invoice.invoice_number}",
-                debit_amount=invoice.total_amount,
-                credit_amount=Decimal("0.00"),
-                line_number=1
-            )
-
-            # Credit Revenue
-            JournalEntryLine.objects.create(
-                journal_entry=je,
-                account=revenue_account,
-                description=f"Revenue from {invoice.customer.company_name}",
-                debit_amount=Decimal("0.00"),
-                credit_amount=invoice.total_amount,
-                line_number=2
+        if invoice.status in (Invoice.Status.DRAFT, Invoice.Status.CANCELLED):
+            return None
+
+        ar_account = receivable_account(self.company)
+        revenue_account = find_account(self.company, AccountType.REVENUE)
+        entry_number = f"INV-{invoice.invoice_number}"
+        already_posted = JournalEntry.objects.filter(
+            company=self.company, entry_number=entry_number
+        ).exists()
+
+        if ar_account and revenue_account and not already_posted:
+            return post_journal_entry(
+                self.company,
+                entry_number,
+                invoice.invoice_date,
+                f"Invoice {invoice.invoice_number} - {invoice.customer.company_name}",
+                [
+                    {
+                        "account": ar_account,
+                        "debit": invoice.total_amount,
+                        "description": f"Invoice {invoice.invoice_number}",
+                    },
+                    {
+                        "account": revenue_account,
+                        "credit": invoice.total_amount,
+                        "description": f"Revenue from {invoice.customer.company_name}",
+                    },
+                ],
             )
 
     def _create_payment_journal_entries(self, payment):
@@ -178,53 +167,29 @@ class DashboardSyncService:
         Create automatic journal entries for payment
         Debit: Cash/Bank
         Credit: Accounts Receivable
+        Lines are bulk-inserted and the entry posted once.
         """
-        # Find cash/bank account
-        cash_account = Account.objects.filter(
-            company=self.company,
-            account_type=AccountType.ASSET,
-            name__icontains="cash"
-        ).first() or Account.objects.filter(
-            company=self.company,
-            account_type=AccountType.ASSET,
-            name__icontains="bank"
-        ).first()
-
-        # Find AR account
-        ar_account = Account.objects.filter(
-            company=self.company,
-            account_type=AccountType.ASSET,
-            name__icontains="receivable"
-        ).first()
-
-        if cash_account and ar_account:
-            # Create journal entry
-            je = JournalEntry.objects.create(
-                company=self.company,
-                entry_number=f"PAY-{payment.payment_number}",
-                entry_date=payment.payment_date,
-                description=f"Payment {payment.payment_number} - {payment.customer.company_name}",
-                status="POSTED"
-            )
-
-            # Debit Cash
-            JournalEntryLine.objects.create(
-                journal_entry=je,
-                account=cash_account,
-                description=f"Payment received from {payment.customer.company_name}",
-                debit_amount=payment.amount,
-                credit_amount=Decimal("0.00"),
-                line_number=1
-            )
-
-            # Credit AR
-            JournalEntryLine.objects.create(
-                journal_entry=je,
-                account=ar_account,
-                description=f"Payment for invoice {payment.invoice.invoice_number if payment.invoice else 'N/A'}",
-                debit_amount=Decimal("0.00"),
-                credit_amount=payment.amount,
-                line_number=2
+        cash = cash_account(self.company)
+        ar_account = receivable_account(self.company)
+
+        if cash and ar_account:
+            return post_journal_entry(
+                self.company,
+                f"PAY-{payment.payment_number}",
+                payment.payment_date,
+                f"Payment {payment.payment_number} - {payment.customer.company_name}",
+                [
+                    {
+                        "account": cash,
+                        "debit": payment.amount,
+                        "description": f"Payment received from {payment.customer.company_name}",
+                    },
+                    {
+                        "account": ar_account,
+                        "credit": payment.amount,
+                        "description": f"Payment for invoice {payment.invoice.invoice_number if payment.invoice else 'N/A'}",
+                    },
+                ],
             )
 
     def _update_budget_actuals(self, journal_entry):
@@ -0,0 +1,137 @@
+"""
+Report Snapshots
+Immutable copies of financial reports for past periods
+"""
+
+import hashlib
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError
+from django.utils import timezone
+
+from accounting.models import Account, ReportSnapshot
+from dashboard.utils import get_ledger_version
+
+
+def params_hash(params):
+    """Stable hash of the report parameters"""
+    encoded = json.dumps(params or {}, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+
+def is_closed_period(end_date):
+    """Only periods that ended before today can be snapshotted"""
+    return end_date < timezone.now().date()
+
+
+def serialize_report(value):
+    """
+    Convert a report dict into compact JSON-safe data
+    Model instances are reduced to the fields the report output needs
+    """
+    if isinstance(value, dict):
+        return {key: serialize_report(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [serialize_report(item) for item in value]
+    if isinstance(value, Account):
+        return {"$a": [value.id, value.code, value.name, value.account_type]}
+    if isinstance(value, Decimal):
+        return {"$d": str(value)}
+    if isinstance(value, date):
+        return {"$t": value.isoformat()}
+    if hasattr(value, "_meta"):
+        # The company is re-attached on load
+        return {"$c": value.pk}
+    return value
+
+
+def deserialize_report(value, company):
+    """Rebuild a report dict from its serialized payload"""
+    if isinstance(value, list):
+        return [deserialize_report(item, company) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "$d" in value:
+        return Decimal(value["$d"])
+    if "$t" in value:
+        return date.fromisoformat(value["$t"])
+    if "$a" in value:
+        account_id, code, name, account_type = value["$a"]
+        return Account(id=account_id, code=code, name=name, account_type=account_type)
+    if "$c" in value:
+        return company
+    return {key: deserialize_report(item, company) for key, item in value.items()}
+
+
+def get_snapshot(company, report_type, start_date, end_date, params=None):
+    """
+    Return the stored report for a closed period, or None
+    A snapshot taken at an older ledger version is ignored
+    """
+    snapshot = (
+        ReportSnapshot.objects.filter(
+            company=company,
+            report_type=report_type,
+            period_start=start_date,
+            period_end=end_date,
+            params_hash=params_hash(params),
+        )
+        .only("payload", "ledger_version")
+        .first()
+    )
+    if snapshot is None or snapshot.ledger_version != get_ledger_version(company):
+        return None
+    return deserialize_report(snapshot.payload, company)
+
+
+def save_snapshot(company, report_type, start_date, end_date, report, ledger_version,
+                  params=None):
+    """
+    Persist a report for a closed period, replacing any older copy
+    ledger_version is the version read before the report was built; if the
+    ledger has moved on since, the report may be stale and is not stored.
+    Returns whether it was stored.
+    """
+    if get_ledger_version(company) != ledger_version:
+        return False
+    try:
+        ReportSnapshot.objects.update_or_create(
+            company=company,
+            report_type=report_type,
+            period_start=start_date,
+            period_end=end_date,
+            params_hash=params_hash(params),
+            defaults={"payload": serialize_report(report), "ledger_version": ledger_version},
+        )
+    except IntegrityError:
+        # A concurrent request stored the same snapshot first
+        return False
+    return True
+
+
+def get_or_build_snapshot(company, report_type, start_date, end_date, builder, params=None):
+    """
+    Serve a closed-period report from its snapshot, building it on first use
+    Open periods are always computed live
+    """
+    if not is_closed_period(end_date):
+        return builder()
+
+    report = get_snapshot(company, report_type, start_date, end_date, params)
+    if report is None:
+        ledger_version = get_ledger_version(company)
+        report = builder()
+        save_snapshot(company, report_type, start_date, end_date, report, ledger_version, params)
+    return report
+
+
+def invalidate_snapshots(company, from_date):
+    """Drop snapshots whose period includes a back-dated posting"""
+    if not company or from_date is None:
+        return 0
+    deleted, _ = ReportSnapshot.objects.filter(
+        company=company, period_end__gte=from_date
+    ).delete()
+    return deleted
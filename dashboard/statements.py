@@ -0,0 +1,453 @@
+"""
+Customer Statements
+Builds, renders and emails period statements for many customers at once
+- Opening balances, transactions and closing balances from five grouped
+  queries per chunk of customers, never per customer
+- PDFs rendered in the invoice PDF pool and written straight to storage
+- Emails queued in the outbox with the PDF as attachment
+- Progress reported per chunk; runs requested from the web are queued as
+  StatementJob rows and worked by `manage.py send_statements --queued`
+"""
+
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from accounting.models import Customer, Invoice, OutboundMessage, Payment, StatementJob
+from dashboard.invoice_pdf import company_assets, get_layout, render_chunks, version_key
+from dashboard.outbox import build_message, enqueue
+
+
+ZERO = Decimal("0.00")
+
+# Customers per set of queries
+CUSTOMER_CHUNK_SIZE = 500
+
+# Statements pickled per worker task
+RENDER_CHUNK_SIZE = 50
+
+# Statuses that never reach a customer's account
+EXCLUDED_STATUSES = [Invoice.Status.DRAFT, Invoice.Status.CANCELLED]
+
+# Payload fields a worker hands back for the email
+SUMMARY_KEYS = [
+    "customer_id", "customer_name", "contact_name", "email",
+    "opening", "closing", "attachment",
+]
+
+# Seconds a running job may go without progress before another runner
+# takes it over
+RUN_STALE_AFTER = 15 * 60
+
+
+def _money(value):
+    return f"{value:,.2f}"
+
+
+def statement_dir(company_id, period_start, period_end):
+    return f"statements/{company_id}/{period_start.isoformat()}_{period_end.isoformat()}/"
+
+
+def statement_path(company_id, period_start, period_end, customer_code):
+    return (
+        f"{statement_dir(company_id, period_start, period_end)}"
+        f"{get_valid_filename(customer_code)}.pdf"
+    )
+
+
+# ============================================================================
+# RENDERING
+# ============================================================================
+
+
+def render_statement_pdf(payload):
+    """Render one statement payload to PDF bytes"""
+    from xml.sax.saxutils import escape
+
+    from reportlab.platypus import LongTable, Paragraph, Spacer
+
+    layout = get_layout()
+    styles = layout.styles
+    assets = company_assets(payload["company_id"], payload["asset_version"])
+
+    buffer = BytesIO()
+    doc = layout.document(buffer, f"Statement {payload['customer_code']}", assets["name"])
+
+    meta = (
+        f"Period: {payload['period_start']} to {payload['period_end']}<br/>"
+        f"Account: {escape(payload['customer_code'])}<br/>"
+        f"<b>Amount due: {payload['closing']} {assets['currency']}</b>"
+    )
+    elements = [
+        Paragraph("STATEMENT", styles["title"]),
+        Paragraph(meta, styles["meta"]),
+        Paragraph("Statement For", styles["heading"]),
+        Paragraph(
+            "<br/>".join(escape(line) for line in payload["customer_lines"]),
+            styles["normal"],
+        ),
+        Spacer(1, 12),
+    ]
+
+    rows = [["Date", "Reference", "Description", "Charges", "Payments", "Balance"]]
+    rows.append([payload["period_start"], "", "Opening balance", "", "", payload["opening"]])
+    rows += payload["lines"]
+    rows.append([payload["period_end"], "", "Closing balance", payload["invoiced"], payload["paid"], payload["closing"]])
+    table = LongTable(rows, colWidths=layout.statement_widths, repeatRows=1)
+    table.setStyle(layout.statement_style)
+    elements.append(table)
+
+    first_page, later_pages = layout.page_decorators(
+        assets, f"{assets['name']} - Statement {payload['customer_code']}"
+    )
+    doc.build(elements, onFirstPage=first_page, onLaterPages=later_pages)
+    pdf = buffer.getvalue()
+    buffer.close()
+    return pdf
+
+
+def render_statement_batch(payloads):
+    """
+    Worker task: render and store a chunk of statements
+    The parent gets a short summary per statement back, not the PDF bytes.
+    """
+    summaries = []
+    for payload in payloads:
+        path = payload["attachment"]
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        default_storage.save(path, ContentFile(render_statement_pdf(payload)))
+        summaries.append({key: payload[key] for key in SUMMARY_KEYS})
+    return summaries
+
+
+# ============================================================================
+# STATEMENT RUN
+# ============================================================================
+
+
+class StatementRun:
+    """
+    Statements for a company's active customers (or some of them) over a period
+    Customers with no opening balance and no activity are skipped unless
+    include_zero is set; with resume_since, so are customers whose statement
+    for the period was queued since then.
+    """
+
+    def __init__(self, company, period_start, period_end, customer_ids=None,
+                 include_zero=False, send=True, resume_since=None):
+        if period_start > period_end:
+            raise ValueError("Statement period starts after it ends.")
+        self.company = company
+        self.period_start = period_start
+        self.period_end = period_end
+        self.customer_ids = customer_ids
+        self.include_zero = include_zero
+        self.send = send
+        self.resume_since = resume_since
+
+    def customers(self):
+        customers = Customer.objects.filter(company=self.company, is_active=True)
+        if self.customer_ids:
+            customers = customers.filter(id__in=self.customer_ids)
+        if self.resume_since and self.send:
+            customers = customers.exclude(
+                id__in=OutboundMessage.objects.filter(
+                    company=self.company,
+                    kind=OutboundMessage.Kind.STATEMENT,
+                    object_type="customer",
+                    created_at__gte=self.resume_since,
+                    attachment__startswith=statement_dir(
+                        self.company.id, self.period_start, self.period_end
+                    ),
+                ).values("object_id")
+            )
+        return customers.order_by("company_name", "id")
+
+    def build(self, customer_ids):
+        """Statement payloads for a chunk of customers, five queries in all"""
+        customers = (
+            Customer.objects.filter(id__in=customer_ids)
+            .order_by("company_name", "id")
+            .values("id", "customer_code", "company_name", "contact_name",
+                    "email", "address", "city", "country")
+        )
+        invoices = Invoice.objects.filter(
+            company=self.company, customer_id__in=customer_ids
+        ).exclude(status__in=EXCLUDED_STATUSES)
+        payments = Payment.objects.filter(
+            company=self.company, customer_id__in=customer_ids
+        )
+
+        opening = {}
+        for row in (
+            invoices.filter(invoice_date__lt=self.period_start)
+            .values("customer_id").annotate(total=Sum("total_amount")).order_by()
+        ):
+            opening[row["customer_id"]] = row["total"] or ZERO
+        for row in (
+            payments.filter(payment_date__lt=self.period_start)
+            .values("customer_id").annotate(total=Sum("amount")).order_by()
+        ):
+            opening[row["customer_id"]] = opening.get(row["customer_id"], ZERO) - (row["total"] or ZERO)
+
+        # (date, kind order, reference, description, charge, payment) per customer
+        activity = {}
+        for row in (
+            invoices.filter(invoice_date__range=(self.period_start, self.period_end))
+            .values_list("customer_id", "invoice_date", "invoice_number", "due_date", "total_amount")
+        ):
+            customer_id, day, number, due_date, amount = row
+            activity.setdefault(customer_id, []).append(
+                (day, 0, number, f"Invoice, due {due_date.strftime('%b %d, %Y')}", amount, ZERO)
+            )
+        for row in (
+            payments.filter(payment_date__range=(self.period_start, self.period_end))
+            .values_list("customer_id", "payment_date", "payment_number", "payment_method", "amount")
+        ):
+            customer_id, day, number, method, amount = row
+            activity.setdefault(customer_id, []).append(
+                (day, 1, number, f"Payment - {method.replace('_', ' ').title()}", ZERO, amount)
+            )
+
+        asset_version = version_key(self.company.updated_at)
+        payloads = []
+        for customer in customers:
+            balance = opening_balance = opening.get(customer["id"], ZERO)
+            entries = sorted(activity.get(customer["id"], []))
+            if not entries and not opening_balance and not self.include_zero:
+                continue
+
+            lines, invoiced, paid = [], ZERO, ZERO
+            for day, _, reference, description, charge, payment in entries:
+                balance += charge - payment
+                invoiced += charge
+                paid += payment
+                lines.append([
+                    day.strftime("%b %d, %Y"),
+                    reference,
+                    description,
+                    _money(charge) if charge else "",
+                    _money(payment) if payment else "",
+                    _money(balance),
+                ])
+
+            payloads.append({
+                "company_id": self.company.id,
+                "asset_version": asset_version,
+                "customer_id": customer["id"],
+                "customer_code": customer["customer_code"],
+                "customer_name": customer["company_name"],
+                "contact_name": customer["contact_name"],
+                "email": customer["email"],
+                "customer_lines": [
+                    line
+                    for line in (
+                        customer["company_name"],
+                        customer["contact_name"],
+                        customer["address"],
+                        ", ".join(part for part in (customer["city"], customer["country"]) if part),
+                        customer["email"],
+                    )
+                    if line
+                ],
+                "period_start": self.period_start.strftime("%b %d, %Y"),
+                "period_end": self.period_end.strftime("%b %d, %Y"),
+                "opening": _money(opening_balance),
+                "invoiced": _money(invoiced),
+                "paid": _money(paid),
+                "closing": _money(balance),
+                "lines": lines,
+                "attachment": statement_path(
+                    self.company.id, self.period_start, self.period_end, customer["customer_code"]
+                ),
+            })
+        return payloads
+
+    def _render_chunks(self, customer_ids, counts):
+        for start in range(0, len(customer_ids), CUSTOMER_CHUNK_SIZE):
+            chunk = customer_ids[start:start + CUSTOMER_CHUNK_SIZE]
+            payloads = self.build(chunk)
+            counts["skipped"] += len(chunk) - len(payloads)
+            for offset in range(0, len(payloads), RENDER_CHUNK_SIZE):
+                yield payloads[offset:offset + RENDER_CHUNK_SIZE]
+
+    def _message(self, summary):
+        message = build_message(
+            self.company,
+            OutboundMessage.Kind.STATEMENT,
+            summary["email"],
+            f"Statement from {self.company.name} to {self.period_end.strftime('%b %d, %Y')}",
+            "statement.txt",
+            {
+                "customer_name": summary["contact_name"] or summary["customer_name"],
+                "period_start": self.period_start,
+                "period_end": self.period_end,
+                "opening": summary["opening"],
+                "closing": summary["closing"],
+            },
+            attachment=summary["attachment"],
+        )
+        message.object_type, message.object_id = "customer", summary["customer_id"]
+        return message
+
+    def run(self, progress=None):
+        """
+        Render every statement and queue the emails
+        progress(done, total) is called after each rendered chunk.
+        Returns {"customers", "statements", "skipped", "emails"}.
+        """
+        customer_ids = list(self.customers().values_list("id", flat=True))
+        counts = {"customers": len(customer_ids), "statements": 0, "skipped": 0, "emails": 0}
+        pooled = len(customer_ids) >= getattr(settings, "INVOICE_PDF_POOL_THRESHOLD", 50)
+
+        messages = []
+        for summaries in render_chunks(
+            render_statement_batch, self._render_chunks(customer_ids, counts), pooled
+        ):
+            counts["statements"] += len(summaries)
+            if self.send:
+                messages += [self._message(summary) for summary in summaries]
+                if len(messages) >= CUSTOMER_CHUNK_SIZE:
+                    counts["emails"] += enqueue(messages)
+                    messages = []
+            if progress:
+                progress(counts["statements"] + counts["skipped"], counts["customers"])
+
+        if messages:
+            counts["emails"] += enqueue(messages)
+        if progress:
+            progress(counts["customers"], counts["customers"])
+        return counts
+
+
+# ============================================================================
+# QUEUED RUNS
+# ============================================================================
+
+
+def statement_run_status(company):
+    """Progress of the company's latest queued run, or None"""
+    job = StatementJob.objects.filter(company=company).order_by("-id").first()
+    if job is None:
+        return None
+    return {
+        "id": job.id,
+        "status": job.status.lower(),
+        "period_start": job.period_start.isoformat(),
+        "period_end": job.period_end.isoformat(),
+        "done": job.done,
+        "total": job.total,
+        "statements": job.statements,
+        "skipped": job.skipped,
+        "emails": job.emails,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def start_statement_run(company, period_start, period_end, user=None,
+                        customer_ids=None, include_zero=False, send=True):
+    """
+    Queue a statement run for `send_statements --queued` to work
+    Returns the StatementJob, or None when the company already has a run
+    queued or in progress.
+    """
+    if period_start > period_end:
+        raise ValueError("Statement period starts after it ends.")
+    try:
+        with transaction.atomic():
+            return StatementJob.objects.create(
+                company=company,
+                period_start=period_start,
+                period_end=period_end,
+                customer_ids=list(customer_ids or []),
+                include_zero=include_zero,
+                send=send,
+                created_by=user,
+            )
+    except IntegrityError:
+        return None
+
+
+def claim_statement_job(stale_after=RUN_STALE_AFTER):
+    """
+    Claim the oldest queued run, or a running one whose process has made no
+    progress for stale_after seconds (it was killed)
+    Rows locked by another runner are skipped; the conditional UPDATE also
+    keeps two runners on a database without row locks from both claiming.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            StatementJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=StatementJob.Status.QUEUED)
+                | Q(
+                    status=StatementJob.Status.RUNNING,
+                    heartbeat_at__lt=now - timedelta(seconds=stale_after),
+                )
+            )
+            .order_by("id")
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = StatementJob.objects.filter(
+            pk=job.pk, status=job.status, heartbeat_at=job.heartbeat_at
+        ).update(
+            status=StatementJob.Status.RUNNING,
+            started_at=job.started_at or now,
+            heartbeat_at=now,
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def run_statement_job(job):
+    """
+    Work a claimed run, recording progress on its row
+    A run picked up again after its process died skips the customers whose
+    statement email it already queued.
+    """
+    jobs = StatementJob.objects.filter(pk=job.pk)
+
+    def progress(done, total):
+        jobs.update(done=done, total=total, heartbeat_at=timezone.now())
+
+    try:
+        counts = StatementRun(
+            job.company,
+            job.period_start,
+            job.period_end,
+            customer_ids=job.customer_ids or None,
+            include_zero=job.include_zero,
+            send=job.send,
+            resume_since=job.started_at,
+        ).run(progress=progress)
+    except Exception as exc:
+        jobs.update(
+            status=StatementJob.Status.FAILED, error=str(exc), finished_at=timezone.now()
+        )
+        raise
+    jobs.update(
+        status=StatementJob.Status.FINISHED,
+        statements=counts["statements"],
+        skipped=counts["skipped"],
+        emails=counts["emails"],
+        finished_at=timezone.now(),
+    )
+    job.refresh_from_db()
+    return job
@@ -0,0 +1,365 @@
+"""
+Stock Posting
+Posts inventory movements (receipts, issues, adjustments, transfers) in batches
+- A batch is one transaction: every movement posts, or none does
+- On-hand quantities change by UPDATE ... SET current_stock = current_stock
+  + delta, never by a read-modify-write, so concurrent scans cannot lose
+  updates
+- Items are row-locked in id order first, so overlapping batches queue up
+  instead of deadlocking
+- Movements of a batch are netted per item and per location, and items with
+  the same net change share one UPDATE
+- StockLevel keeps the on-hand quantity per item and location
+- Stock is costed FIFO: receipts open CostLayer rows for the receiving
+  company, issues consume the oldest open layers, the company's own first,
+  and carry the cost they consumed
+"""
+
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounting.models import CostLayer, InventoryItem, InventoryTransaction, StockLevel
+
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+# Movements per bulk insert
+BATCH_SIZE = 1000
+
+TYPES = InventoryTransaction.TransactionType
+
+# Types whose quantity is added to / taken from stock; adjustments carry
+# their own sign and transfers move stock between locations of one item
+INBOUND = {TYPES.RECEIPT, TYPES.RETURN}
+OUTBOUND = {TYPES.ISSUE, TYPES.DAMAGE}
+
+
+def _quantity(value):
+    try:
+        return Decimal(str(value)).quantize(CENT)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Invalid quantity: {value!r}")
+
+
+def _resolve_items(movements):
+    """
+    Item of every movement, by "item" (instance or id), "item_code" or
+    "barcode"; one query for the whole batch
+    """
+    ids, codes, barcodes = set(), set(), set()
+    for movement in movements:
+        item = movement.get("item")
+        if item is not None:
+            ids.add(item.pk if isinstance(item, InventoryItem) else int(item))
+        elif movement.get("item_code"):
+            codes.add(str(movement["item_code"]).strip())
+        elif movement.get("barcode"):
+            barcodes.add(str(movement["barcode"]).strip())
+
+    by_id, by_code, by_barcode = {}, {}, {}
+    for row in InventoryItem.objects.filter(
+        Q(id__in=ids) | Q(item_code__in=codes) | Q(barcode__in=barcodes)
+    ).values("id", "item_code", "barcode", "location", "unit_cost"):
+        by_id[row["id"]] = by_code[row["item_code"]] = row
+        if row["barcode"]:
+            by_barcode[row["barcode"]] = row
+
+    items = []
+    for number, movement in enumerate(movements, start=1):
+        item = movement.get("item")
+        if item is not None:
+            row = by_id.get(item.pk if isinstance(item, InventoryItem) else int(item))
+        elif movement.get("item_code"):
+            row = by_code.get(str(movement["item_code"]).strip())
+        elif movement.get("barcode"):
+            row = by_barcode.get(str(movement["barcode"]).strip())
+        else:
+            raise ValueError(f"Movement {number}: no item, item_code or barcode")
+        if row is None:
+            raise ValueError(f"Movement {number}: unknown item")
+        items.append(row)
+    return items
+
+
+def _group_by_delta(deltas):
+    """{net change: [keys]} for the non-zero changes, so equal ones share an UPDATE"""
+    groups = defaultdict(list)
+    for key, delta in deltas.items():
+        if delta:
+            groups[delta].append(key)
+    return groups
+
+
+def _lock_items(item_ids):
+    """
+    Row-lock the items in id order. SQLite has no row locks; its writers
+    are serialized by the database lock taken on the first write.
+    """
+    if connection.features.has_select_for_update:
+        list(
+            InventoryItem.objects.select_for_update()
+            .filter(id__in=item_ids)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+
+def _cost_movements(transactions, items):
+    """
+    FIFO-cost the batch in memory
+    Inbound movements open layers of their company at their unit cost
+    (default the item's unit cost); outbound ones consume the oldest open
+    layers of their company, then opening stock without a company. Other
+    companies' layers are never touched, since nothing is posted to their
+    books; stock beyond the layers is costed at the item's unit cost. Sets
+    unit_cost and cost_amount on the transactions. Returns the new layers (receipt still
+    to be set) and the existing layers whose remaining quantity changed.
+    """
+    unit_costs = {item["id"]: item["unit_cost"] for item in items}
+    costed = [txn for txn in transactions if txn.transaction_type != TYPES.TRANSFER]
+    consuming = {txn.item_id for txn in costed if txn.quantity < 0}
+    companies = {txn.company_id for txn in costed if txn.quantity < 0} - {None}
+    layers = defaultdict(list)
+    for layer in CostLayer.objects.filter(
+        Q(company__isnull=True) | Q(company_id__in=companies),
+        item_id__in=consuming,
+        remaining_quantity__gt=0,
+    ).order_by("received_at", "id"):
+        layers[layer.item_id].append(layer)
+
+    # Stock received in the batch counts as arriving before the batch's issues
+    now = timezone.now()
+    new_layers = []
+    for txn in costed:
+        if txn.quantity > 0:
+            if txn.unit_cost is None:
+                txn.unit_cost = unit_costs[txn.item_id]
+            txn.cost_amount = (txn.quantity * txn.unit_cost).quantize(CENT)
+            layer = CostLayer(
+                item_id=txn.item_id,
+                company_id=txn.company_id,
+                received_at=now,
+                quantity=txn.quantity,
+                remaining_quantity=txn.quantity,
+                unit_cost=txn.unit_cost,
+            )
+            new_layers.append((layer, txn))
+            layers[txn.item_id].append(layer)
+
+    changed = set()
+    for txn in costed:
+        if txn.quantity > 0:
+            continue
+        needed, cost = -txn.quantity, ZERO
+        # Stable sort: oldest first within own, then unowned layers
+        ordered = sorted(
+            (
+                layer for layer in layers[txn.item_id]
+                if layer.company_id in (txn.company_id, None)
+            ),
+            key=lambda layer: layer.company_id is None,
+        )
+        for layer in ordered:
+            if not needed:
+                break
+            taken = min(needed, layer.remaining_quantity)
+            if not taken:
+                continue
+            layer.remaining_quantity -= taken
+            needed -= taken
+            cost += taken * layer.unit_cost
+            if layer.pk:
+                changed.add(layer)
+        cost += needed * unit_costs[txn.item_id]
+        txn.cost_amount = -cost.quantize(CENT)
+        txn.unit_cost = (cost / -txn.quantity).quantize(CENT)
+    return new_layers, changed
+
+
+def _revalue_items(item_ids):
+    """Set the items' value to the cost of their open layers, and unit cost to its average"""
+    layer_value = (
+        CostLayer.objects.filter(item=OuterRef("pk"), remaining_quantity__gt=0)
+        .values("item")
+        .annotate(value=Sum(F("remaining_quantity") * F("unit_cost")))
+        .values("value")
+    )
+    InventoryItem.objects.filter(id__in=item_ids).update(
+        total_value=Coalesce(
+            Subquery(layer_value, output_field=DecimalField(max_digits=15, decimal_places=2)),
+            ZERO,
+        )
+    )
+    # Divided here rather than in SQL: SQLite stores whole decimals as
+    # INTEGER and would truncate total_value / current_stock
+    unit_costs = defaultdict(list)
+    for item_id, value, stock in InventoryItem.objects.filter(
+        id__in=item_ids, current_stock__gt=0
+    ).values_list("id", "total_value", "current_stock"):
+        unit_costs[(value / stock).quantize(CENT)].append(item_id)
+    for unit_cost, ids in unit_costs.items():
+        InventoryItem.objects.filter(id__in=ids).update(unit_cost=unit_cost)
+
+
+def post_movements(movements, user=None, company=None, allow_negative=None):
+    """
+    Post a batch of stock movements in one transaction
+    Each movement is a dict with the item ("item", "item_code" or
+    "barcode"), "type" (an InventoryTransaction.TransactionType, default
+    RECEIPT), "quantity" (positive; signed for adjustments), "location"
+    (default the item's location; the source of a transfer), "to_location"
+    for transfers, and optional "unit_cost", "reference_number", "notes",
+    "related_bill", "related_invoice" and "po_line" ids. Movements are
+    costed FIFO and their cost is posted to company's books by
+    dashboard.inventory_costing.post_cogs.
+    Unless allow_negative (default INVENTORY_ALLOW_NEGATIVE_STOCK), a batch
+    that would take any location below zero raises ValueError and posts
+    nothing. Returns {"transactions", "items", "stock", "seconds"}, stock
+    being the new on-hand quantity of every item the batch touched.
+    """
+    started = time.monotonic()
+    if allow_negative is None:
+        allow_negative = settings.INVENTORY_ALLOW_NEGATIVE_STOCK
+    movements = list(movements)
+    if not movements:
+        return {"transactions": 0, "items": 0, "stock": {}, "seconds": 0.0}
+
+    items = _resolve_items(movements)
+    item_deltas = defaultdict(lambda: ZERO)
+    level_deltas = defaultdict(lambda: ZERO)
+    transactions = []
+    for number, (movement, item) in enumerate(zip(movements, items), start=1):
+        kind = movement.get("type") or TYPES.RECEIPT
+        if kind not in TYPES.values:
+            raise ValueError(f"Movement {number}: unknown type {kind!r}")
+        quantity = _quantity(movement.get("quantity"))
+        if quantity == 0 or (quantity < 0 and kind != TYPES.ADJUSTMENT):
+            raise ValueError(f"Movement {number}: quantity must be positive")
+        location = (movement.get("location") or item["location"] or "").strip()
+        from_location = to_location = None
+
+        if kind == TYPES.TRANSFER:
+            to_location = (movement.get("to_location") or "").strip()
+            if to_location == location:
+                raise ValueError(f"Movement {number}: transfer to the same location")
+            from_location = location
+            level_deltas[item["id"], location] -= quantity
+            level_deltas[item["id"], to_location] += quantity
+        else:
+            if kind in OUTBOUND:
+                quantity = -quantity
+            if quantity > 0:
+                to_location = location
+            else:
+                from_location = location
+            item_deltas[item["id"]] += quantity
+            level_deltas[item["id"], location] += quantity
+
+        unit_cost = movement.get("unit_cost")
+        transactions.append(
+            InventoryTransaction(
+                item_id=item["id"],
+                transaction_type=kind,
+                quantity=quantity,
+                unit_cost=_quantity(unit_cost) if unit_cost not in (None, "") else None,
+                reference_number=movement.get("reference_number") or None,
+                related_bill_id=movement.get("related_bill"),
+                related_invoice_id=movement.get("related_invoice"),
+                po_line_id=movement.get("po_line"),
+                from_location=from_location or None,
+                to_location=to_location or None,
+                notes=movement.get("notes") or None,
+                company=company,
+                created_by=user,
+            )
+        )
+
+    item_ids = sorted({item["id"] for item in items})
+    with transaction.atomic():
+        _lock_items(item_ids)
+
+        for delta, ids in _group_by_delta(item_deltas).items():
+            InventoryItem.objects.filter(id__in=ids).update(
+                current_stock=F("current_stock") + delta
+            )
+
+        StockLevel.objects.bulk_create(
+            [StockLevel(item_id=item_id, location=location) for item_id, location in level_deltas],
+            ignore_conflicts=True,
+        )
+        levels = {
+            (item_id, location): level_id
+            for level_id, item_id, location in StockLevel.objects.filter(
+                item_id__in=item_ids
+            ).values_list("id", "item_id", "location")
+        }
+        for delta, keys in _group_by_delta(level_deltas).items():
+            StockLevel.objects.filter(id__in=[levels[key] for key in keys]).update(
+                quantity=F("quantity") + delta
+            )
+
+        if not allow_negative:
+            taken = [levels[key] for key, delta in level_deltas.items() if delta < 0]
+            short = list(
+                StockLevel.objects.filter(id__in=taken, quantity__lt=0).values_list(
+                    "item__item_code", "location", "quantity"
+                )[:10]
+            )
+            if short:
+                raise ValueError(
+                    "Not enough stock: "
+                    + ", ".join(
+                        f"{code} at {location or 'default location'} short by {-quantity}"
+                        for code, location, quantity in short
+                    )
+                )
+
+        new_layers, changed = _cost_movements(transactions, items)
+        InventoryTransaction.objects.bulk_create(transactions, batch_size=BATCH_SIZE)
+        for layer, txn in new_layers:
+            layer.receipt_id = txn.id
+        CostLayer.objects.bulk_create([layer for layer, _ in new_layers], batch_size=BATCH_SIZE)
+        remaining = defaultdict(list)
+        for layer in changed:
+            remaining[layer.remaining_quantity].append(layer.id)
+        for quantity, ids in remaining.items():
+            CostLayer.objects.filter(id__in=ids).update(remaining_quantity=quantity)
+        _revalue_items(item_ids)
+
+        stock = dict(
+            InventoryItem.objects.filter(id__in=item_ids).values_list("id", "current_stock")
+        )
+
+    return {
+        "transactions": len(transactions),
+        "items": len(item_ids),
+        "stock": stock,
+        "seconds": round(time.monotonic() - started, 3),
+    }
+
+
+def post_movement(item, quantity, kind=TYPES.RECEIPT, user=None, company=None, **fields):
+    """Post one movement; returns the item's new on-hand quantity"""
+    result = post_movements(
+        [{"item": item, "type": kind, "quantity": quantity, **fields}],
+        user=user,
+        company=company,
+    )
+    return result["stock"][item.pk if isinstance(item, InventoryItem) else int(item)]
+
+
+def on_hand(item):
+    """{location: quantity} of an item, without empty locations"""
+    return dict(
+        StockLevel.objects.filter(item=item)
+        .exclude(quantity=0)
+        .values_list("location", "quantity")
+    )
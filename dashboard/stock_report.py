@@ -0,0 +1,209 @@
+"""
+Stock Movement Report
+Opening, receipts, issues, adjustments and closing quantity per item for a period
+- One grouped query: items LEFT JOIN their movements since the period start,
+  summed with conditional aggregates
+- Quantities are rolled back from current stock, so items whose opening
+  stock was never recorded as a movement still report correctly
+- Stock status is computed in SQL, so it can be filtered on
+- Pages are fetched by keyset on the item code; CSV exports stream through
+  the same pages
+"""
+
+import csv
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import (
+    Case,
+    CharField,
+    Count,
+    DecimalField,
+    F,
+    FilteredRelation,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounting.models import InventoryItem, InventoryTransaction
+from dashboard.inventory_costing import inventory_value
+from dashboard.pagination import KeysetPaginator
+
+
+ZERO = Decimal("0.00")
+
+TYPES = InventoryTransaction.TransactionType
+
+# Report column -> movement types it sums; transfers only move stock
+# between locations and are left out
+RECEIPT_TYPES = [TYPES.RECEIPT, TYPES.RETURN]
+ISSUE_TYPES = [TYPES.ISSUE]
+ADJUSTMENT_TYPES = [TYPES.ADJUSTMENT, TYPES.DAMAGE]
+
+# Status filter value -> label, as InventoryItem.get_stock_status
+STATUSES = {
+    "out_of_stock": "Out of Stock",
+    "low_stock": "Low Stock",
+    "overstock": "Overstock",
+    "in_stock": "In Stock",
+}
+
+COLUMNS = [
+    ("item_code", "Item Code"),
+    ("name", "Name"),
+    ("category_name", "Category"),
+    ("unit_of_measure", "Unit"),
+    ("opening", "Opening"),
+    ("receipts", "Receipts"),
+    ("issues", "Issues"),
+    ("adjustments", "Adjustments"),
+    ("closing", "Closing"),
+    ("unit_cost", "Unit Cost"),
+    ("total_value", "Value"),
+    ("status", "Status"),
+]
+
+
+def _quantity(expression):
+    return Coalesce(
+        expression, ZERO, output_field=DecimalField(max_digits=15, decimal_places=2)
+    )
+
+
+class _Echo:
+    """File-like object whose write returns the line, for streaming csv.writer output"""
+
+    def write(self, value):
+        return value
+
+
+def _start_of(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class StockMovementReport:
+    """
+    Stock movement report for active items over a date range
+    Items and their stock are shared by all companies, so opening and
+    closing quantities account for every company's movements; company
+    limits the receipts, issues and adjustments columns to those posted for
+    it (and those recorded before movements carried a company). category
+    and status (a STATUSES key, judged on the closing quantity) limit the
+    items.
+    """
+
+    PAGE_SIZE = 100
+
+    def __init__(self, company, start_date, end_date, category=None, status=None):
+        if start_date > end_date:
+            raise ValueError("The start date is after the end date.")
+        if status and status not in STATUSES:
+            raise ValueError(f"Unknown status {status!r}")
+        self.company = company
+        self.start_date = start_date
+        self.end_date = end_date
+        self.category = category
+        self.status = status
+
+    def rows(self):
+        """Grouped queryset of report rows (dicts), one per item"""
+        start = _start_of(self.start_date)
+        end = _start_of(self.end_date + timedelta(days=1))
+
+        moves = Q(transactions__created_at__gte=start) & ~Q(
+            transactions__transaction_type=TYPES.TRANSFER
+        )
+
+        # Stock is shared: every company's movements are rolled back from
+        # current_stock, only the company's own fill the movement columns
+        in_period = Q(moves__created_at__lt=end)
+        counted = in_period
+        if self.company is not None:
+            counted &= Q(moves__company=self.company) | Q(moves__company__isnull=True)
+        items = InventoryItem.objects.filter(is_active=True)
+        if self.category:
+            items = items.filter(category=self.category)
+
+        rows = (
+            items.annotate(moves=FilteredRelation("transactions", condition=moves))
+            .values(
+                "id",
+                "item_code",
+                "name",
+                "unit_of_measure",
+                "current_stock",
+                "reorder_point",
+                "maximum_stock",
+                "unit_cost",
+                "total_value",
+                category_name=Coalesce(F("category__name"), Value("Uncategorized")),
+            )
+            .annotate(
+                after=_quantity(Sum("moves__quantity", filter=Q(moves__created_at__gte=end))),
+                period=_quantity(Sum("moves__quantity", filter=in_period)),
+                receipts=_quantity(
+                    Sum("moves__quantity", filter=counted & Q(moves__transaction_type__in=RECEIPT_TYPES))
+                ),
+                issues=-_quantity(
+                    Sum("moves__quantity", filter=counted & Q(moves__transaction_type__in=ISSUE_TYPES))
+                ),
+                adjustments=_quantity(
+                    Sum("moves__quantity", filter=counted & Q(moves__transaction_type__in=ADJUSTMENT_TYPES))
+                ),
+            )
+            .annotate(
+                closing=F("current_stock") - F("after"),
+                opening=F("current_stock") - F("after") - F("period"),
+            )
+            .annotate(
+                status=Case(
+                    When(closing__lte=0, then=Value(STATUSES["out_of_stock"])),
+                    When(closing__lte=F("reorder_point"), then=Value(STATUSES["low_stock"])),
+                    When(
+                        maximum_stock__isnull=False,
+                        closing__gte=F("maximum_stock"),
+                        then=Value(STATUSES["overstock"]),
+                    ),
+                    default=Value(STATUSES["in_stock"]),
+                    output_field=CharField(),
+                )
+            )
+        )
+        if self.status:
+            rows = rows.filter(status=STATUSES[self.status])
+        return rows
+
+    def paginator(self, page_size=None):
+        return KeysetPaginator(self.rows(), ["item_code"], page_size=page_size or self.PAGE_SIZE)
+
+    def iter_rows(self, page_size=1000):
+        """Yield every row of the report, one keyset page at a time"""
+        for rows in self.paginator(page_size).chunks():
+            yield from rows
+
+    def summary(self):
+        """
+        Current item count and low / out of stock counts, plus the value of
+        the company's own stock at cost (see inventory_value)
+        """
+        items = InventoryItem.objects.filter(is_active=True)
+        if self.category:
+            items = items.filter(category=self.category)
+        totals = items.aggregate(
+            items=Count("id"),
+            low_stock=Count("id", filter=Q(current_stock__gt=0, current_stock__lte=F("reorder_point"))),
+            out_of_stock=Count("id", filter=Q(current_stock__lte=0)),
+        )
+        totals["value"] = inventory_value(self.company, self.category)["value"]
+        return totals
+
+    def csv_lines(self):
+        """Yield the report as CSV lines, header first, for a StreamingHttpResponse"""
+        writer = csv.writer(_Echo())
+        yield writer.writerow([label for _, label in COLUMNS])
+        for row in self.iter_rows():
+            yield writer.writerow([row[key] for key, _ in COLUMNS])
@@ -1,3 +1,1374 @@
-from django.test import TestCase
+import shutil
+import smtplib
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounting.models import Account, AccountType, Customer, Invoice, Payment
+from companies.models import Company, UserCompany
+
+
+def render_slowly_in_worker(chunk):
+    """Render task that hangs in a pool worker and is instant inline"""
+    import multiprocessing
+    import time
+
+    if multiprocessing.parent_process() is not None:
+        time.sleep(30)
+    return chunk
+
+
+class RejectingEmailBackend(BaseEmailBackend):
+    """Refuses bad@ recipients for good and defers later@ ones"""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.to[0].startswith("bad@"):
+                raise smtplib.SMTPRecipientsRefused({message.to[0]: (550, b"No such user")})
+            if message.to[0].startswith("later@"):
+                raise smtplib.SMTPDataError(451, b"Try again later")
+        return len(messages)
+
+
+CHART = [
+    ("1000", "Cash", AccountType.ASSET),
+    ("1100", "Accounts Receivable", AccountType.ASSET),
+    ("1200", "Inventory", AccountType.ASSET),
+    ("2000", "Accounts Payable", AccountType.LIABILITY),
+    ("4000", "Sales Revenue", AccountType.REVENUE),
+    ("5000", "Cost of Goods Sold", AccountType.EXPENSE),
+]
+
+
+class CompanyTestCase(TestCase):
+    """Two companies with the same chart of accounts"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("accountant", password="pw")
+        cls.acme = cls.make_company("Acme")
+        cls.beta = cls.make_company("Beta")
+
+    @classmethod
+    def make_company(cls, name):
+        company = Company.objects.create(name=name)
+        for code, account_name, account_type in CHART:
+            Account.objects.create(
+                company=company, code=code, name=account_name, account_type=account_type
+            )
+        return company
+
+    @staticmethod
+    def account(company, code):
+        return Account.objects.get(company=company, code=code)
+
+    def post_entry(self, company, number, entry_date, debit_code, credit_code, amount):
+        from dashboard.journal import post_journal_entry
+
+        return post_journal_entry(
+            company,
+            number,
+            entry_date,
+            number,
+            [
+                {"account": self.account(company, debit_code), "debit": Decimal(amount)},
+                {"account": self.account(company, credit_code), "credit": Decimal(amount)},
+            ],
+        )
+
+    def make_customer(self, company, code="C001", name="Customer"):
+        return Customer.objects.create(
+            company=company,
+            customer_code=code,
+            company_name=name,
+            contact_name=name,
+            email=f"{code.lower()}@example.com",
+        )
+
+    def make_invoice(self, customer, number, amount, status=Invoice.Status.SENT, days_due=30):
+        today = timezone.now().date()
+        due_date = today + timedelta(days=days_due)
+        return Invoice.objects.create(
+            company=customer.company,
+            customer=customer,
+            invoice_number=number,
+            invoice_date=min(today, due_date),
+            due_date=due_date,
+            status=status,
+            subtotal=Decimal(amount),
+            total_amount=Decimal(amount),
+        )
+
+
+class InvoiceBulkActionsTests(CompanyTestCase):
+    def test_mark_paid_numbers_payments_per_company(self):
+        from dashboard.invoice_actions import InvoiceBulkActions
+
+        for company in (self.acme, self.beta):
+            customer = self.make_customer(company)
+            invoices = [
+                self.make_invoice(customer, f"INV-{n}", "100.00") for n in (1, 2)
+            ]
+            result = InvoiceBulkActions(company, self.user).mark_paid(
+                Invoice.objects.filter(pk__in=[invoice.pk for invoice in invoices]),
+                notify=False,
+            )
+            self.assertEqual(result["payments"], 2)
+
+        self.assertEqual(
+            sorted(Payment.objects.values_list("payment_number", flat=True)),
+            [
+                f"PAY-{self.acme.pk}-0001",
+                f"PAY-{self.acme.pk}-0002",
+                f"PAY-{self.beta.pk}-0001",
+                f"PAY-{self.beta.pk}-0002",
+            ],
+        )
+        self.assertFalse(
+            Invoice.objects.exclude(status=Invoice.Status.PAID).exists()
+        )
+
+    def test_plain_text_emails_are_not_html_escaped(self):
+        from accounting.models import OutboundMessage
+        from dashboard.invoice_actions import InvoiceBulkActions
+
+        customer = self.make_customer(self.acme, name="O'Brien & Sons")
+        invoice = self.make_invoice(customer, "INV-1", "100.00", status=Invoice.Status.DRAFT)
+        InvoiceBulkActions(self.acme, self.user).send(Invoice.objects.filter(pk=invoice.pk))
+
+        body = OutboundMessage.objects.get(kind=OutboundMessage.Kind.INVOICE).body
+        self.assertIn("Dear O'Brien & Sons,", body)
+
+
+class InventoryCostingTests(CompanyTestCase):
+    def setUp(self):
+        from accounting.models import InventoryItem
+
+        self.item = InventoryItem.objects.create(item_code="W-1", name="Widget")
+
+    def post(self, *movements, company=None):
+        from dashboard.stock import post_movements
+
+        return post_movements(
+            [{"item": self.item, **movement} for movement in movements],
+            company=company or self.acme,
+        )
+
+    def test_issues_are_costed_fifo(self):
+        from accounting.models import InventoryTransaction
+
+        self.post(
+            {"type": "RECEIPT", "quantity": 10, "unit_cost": "2.00"},
+            {"type": "RECEIPT", "quantity": 10, "unit_cost": "4.00"},
+        )
+        self.post({"type": "ISSUE", "quantity": 15})
+
+        issue = InventoryTransaction.objects.get(transaction_type="ISSUE")
+        self.assertEqual(issue.cost_amount, Decimal("-40.00"))
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.total_value, Decimal("20.00"))
+        self.assertEqual(self.item.unit_cost, Decimal("4.00"))
+
+    def test_unit_cost_keeps_its_fraction(self):
+        self.post(
+            {"type": "RECEIPT", "quantity": 100, "unit_cost": "6.00"},
+            {"type": "RECEIPT", "quantity": 7, "unit_cost": "4.00"},
+        )
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.total_value, Decimal("628.00"))
+        self.assertEqual(self.item.unit_cost, Decimal("5.87"))
+
+    def test_companies_value_and_consume_their_own_layers(self):
+        from accounting.models import InventoryTransaction
+        from dashboard.inventory_costing import inventory_value
+
+        self.post({"type": "RECEIPT", "quantity": 10, "unit_cost": "2.00"})
+        self.post({"type": "RECEIPT", "quantity": 10, "unit_cost": "5.00"}, company=self.beta)
+        self.post({"type": "ISSUE", "quantity": 5}, company=self.beta)
+
+        issue = InventoryTransaction.objects.get(transaction_type="ISSUE")
+        self.assertEqual(issue.cost_amount, Decimal("-25.00"))
+        self.assertEqual(inventory_value(self.acme)["value"], Decimal("20.00"))
+        self.assertEqual(inventory_value(self.beta)["value"], Decimal("25.00"))
+        self.assertEqual(inventory_value(self.beta)["units"], Decimal("5.00"))
+
+    def test_day_that_nets_to_zero_is_settled_without_an_entry(self):
+        from dashboard.inventory_costing import pending_movements, post_cogs
+
+        Account.objects.create(
+            company=self.acme, code="2100", name="Goods Received Not Invoiced",
+            account_type=AccountType.LIABILITY,
+        )
+        self.post({"type": "RECEIPT", "quantity": 10, "unit_cost": "2.00"})
+        post_cogs(self.acme)
+        self.post({"type": "ISSUE", "quantity": 4}, {"type": "RETURN", "quantity": 4})
+
+        result = post_cogs(self.acme)
+        self.assertEqual((result["movements"], result["journal_entries"]), (0, []))
+        self.assertFalse(pending_movements(self.acme).exists())
+        self.assertEqual(post_cogs(self.acme)["movements"], 0)
+
+    def test_issues_never_consume_other_companies_layers(self):
+        from accounting.models import InventoryTransaction
+        from dashboard.inventory_costing import inventory_value
+
+        self.post({"type": "RECEIPT", "quantity": 10, "unit_cost": "2.00"})
+        self.post({"type": "ISSUE", "quantity": 4}, company=self.beta)
+
+        issue = InventoryTransaction.objects.get(transaction_type="ISSUE")
+        self.assertEqual(issue.cost_amount, Decimal("-8.00"))
+        self.assertEqual(inventory_value(self.acme)["value"], Decimal("20.00"))
+        self.assertEqual(inventory_value(self.beta)["value"], Decimal("0"))
+
+    def test_post_cogs_books_receipts_to_inventory(self):
+        from accounting.models import JournalEntryLine
+        from dashboard.inventory_costing import post_cogs
+
+        Account.objects.create(
+            company=self.acme, code="2100", name="Goods Received Not Invoiced",
+            account_type=AccountType.LIABILITY,
+        )
+        self.post({"type": "RECEIPT", "quantity": 10, "unit_cost": "2.00"})
+        self.post({"type": "ISSUE", "quantity": 4})
+        self.post({"type": "RECEIPT", "quantity": 3, "unit_cost": "2.00"}, company=self.beta)
+
+        result = post_cogs(self.acme)
+        self.assertEqual((result["received"], result["amount"]), (Decimal("20.00"), Decimal("8.00")))
+        inventory = JournalEntryLine.objects.filter(account=self.account(self.acme, "1200")).aggregate(
+            debit=Sum("debit_amount"), credit=Sum("credit_amount")
+        )
+        self.assertEqual(inventory["debit"] - inventory["credit"], Decimal("12.00"))
+
+        with self.assertRaisesMessage(ValueError, "goods received not invoiced"):
+            post_cogs(self.beta)
+
+
+class StockMovementReportTests(CompanyTestCase):
+    def setUp(self):
+        from accounting.models import InventoryItem
+
+        self.item = InventoryItem.objects.create(item_code="W-1", name="Widget")
+        self.today = timezone.now().date()
+
+    def post(self, company, kind, quantity, days_ago=0):
+        from accounting.models import InventoryTransaction
+        from dashboard.stock import post_movements
+
+        post_movements(
+            [{"item": self.item, "type": kind, "quantity": quantity}], company=company
+        )
+        InventoryTransaction.objects.filter(pk=InventoryTransaction.objects.latest("id").pk).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def report(self, company, **kwargs):
+        from dashboard.stock_report import StockMovementReport
+
+        start = self.today - timedelta(days=7)
+        return {
+            row["item_code"]: row
+            for row in StockMovementReport(company, start, self.today, **kwargs).rows()
+        }
+
+    def test_period_movements_and_rollback(self):
+        self.post(self.acme, "RECEIPT", 20, days_ago=30)
+        self.post(self.acme, "ISSUE", 3, days_ago=2)
+        self.post(self.acme, "ADJUSTMENT", -2, days_ago=1)
+        self.post(self.acme, "RECEIPT", 5, days_ago=-1)
+
+        row = self.report(self.acme)["W-1"]
+        self.assertEqual(
+            [row[key] for key in ("opening", "receipts", "issues", "adjustments", "closing")],
+            [20, 0, 3, -2, 15],
+        )
+        self.assertEqual(row["status"], "In Stock")
+
+    def test_other_companies_movements_are_not_opening_stock(self):
+        self.post(self.beta, "RECEIPT", 100, days_ago=2)
+        self.post(self.acme, "RECEIPT", 10, days_ago=1)
+
+        row = self.report(self.acme)["W-1"]
+        self.assertEqual((row["opening"], row["receipts"], row["closing"]), (0, 10, 110))
+        row = self.report(self.beta)["W-1"]
+        self.assertEqual((row["opening"], row["receipts"], row["closing"]), (0, 100, 110))
+
+    def test_summary_values_only_the_companys_stock(self):
+        from dashboard.stock import post_movements
+        from dashboard.stock_report import StockMovementReport
+
+        post_movements([{"item": self.item, "quantity": 10, "unit_cost": "2.00"}], company=self.acme)
+        post_movements([{"item": self.item, "quantity": 5, "unit_cost": "3.00"}], company=self.beta)
+
+        summary = StockMovementReport(self.acme, self.today, self.today).summary()
+        self.assertEqual((summary["items"], summary["value"]), (1, Decimal("20.00")))
+        summary = StockMovementReport(self.beta, self.today, self.today).summary()
+        self.assertEqual(summary["value"], Decimal("15.00"))
+
+    def test_status_filter_and_csv(self):
+        self.post(self.acme, "RECEIPT", 1, days_ago=1)
+        self.post(self.acme, "ISSUE", 1, days_ago=1)
+
+        self.assertEqual(list(self.report(self.acme, status="in_stock")), [])
+        self.assertEqual(list(self.report(self.acme, status="out_of_stock")), ["W-1"])
+
+        from dashboard.stock_report import StockMovementReport
+
+        lines = list(StockMovementReport(self.acme, self.today, self.today).csv_lines())
+        self.assertTrue(lines[0].startswith("Item Code,Name"))
+        self.assertTrue(lines[1].startswith("W-1,Widget"))
+
+
+class StatementJobTests(CompanyTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.period = (date(2026, 9, 1), date(2026, 9, 30))
+        customer = self.make_customer(self.acme)
+        invoice = self.make_invoice(customer, "INV-1", "250.00")
+        Invoice.objects.filter(pk=invoice.pk).update(invoice_date=date(2026, 9, 10))
+
+    def test_one_active_run_per_company(self):
+        from dashboard.statements import start_statement_run
+
+        self.assertIsNotNone(start_statement_run(self.acme, *self.period))
+        self.assertIsNone(start_statement_run(self.acme, *self.period))
+        self.assertIsNotNone(start_statement_run(self.beta, *self.period))
+
+    def test_queued_run_is_claimed_once_and_sends(self):
+        from accounting.models import OutboundMessage, StatementJob
+        from dashboard.statements import claim_statement_job, run_statement_job, start_statement_run
+
+        start_statement_run(self.acme, *self.period, user=self.user)
+        job = claim_statement_job()
+        self.assertEqual(job.status, StatementJob.Status.RUNNING)
+        self.assertIsNone(claim_statement_job())
+
+        job = run_statement_job(job)
+        self.assertEqual(job.status, StatementJob.Status.FINISHED)
+        self.assertEqual((job.statements, job.emails), (1, 1))
+        message = OutboundMessage.objects.get(kind=OutboundMessage.Kind.STATEMENT)
+        self.assertIn("2026-09-01_2026-09-30", message.attachment)
+
+    def test_abandoned_run_resumes_without_resending(self):
+        from accounting.models import OutboundMessage, StatementJob
+        from dashboard.statements import claim_statement_job, run_statement_job, start_statement_run
+
+        start_statement_run(self.acme, *self.period)
+        job = run_statement_job(claim_statement_job())
+        # The process died after queueing the email, before finishing
+        StatementJob.objects.filter(pk=job.pk).update(
+            status=StatementJob.Status.RUNNING,
+            heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+
+        job = run_statement_job(claim_statement_job())
+        self.assertEqual(job.status, StatementJob.Status.FINISHED)
+        self.assertEqual(job.emails, 0)
+        self.assertEqual(OutboundMessage.objects.count(), 1)
+
+
+class ItemImportTests(CompanyTestCase):
+    def run_import(self, text, **kwargs):
+        import io
+
+        from dashboard.item_import import import_items
+
+        return import_items(io.StringIO(text), company=self.acme, **kwargs)
+
+    def test_new_items_open_stock_and_cost_layers(self):
+        from accounting.models import InventoryItem
+
+        summary = self.run_import(
+            "item_code,name,category,vendor,unit_cost,current_stock,location\n"
+            "W-1,Widget,Parts,Acme Supply,2.50,10,A1\n"
+            "W-2,Gadget,Parts,,1.00,,\n"
+            "W-1,Duplicate,,,,,\n"
+        )
+        self.assertEqual((summary["created"], summary["failed"]), (2, 1))
+        self.assertEqual((summary["categories_created"], summary["vendors_created"]), (1, 1))
+
+        item = InventoryItem.objects.get(item_code="W-1")
+        self.assertEqual(item.total_value, Decimal("25.00"))
+        self.assertEqual(item.stock_levels.get().location, "A1")
+        self.assertEqual(item.cost_layers.get().remaining_quantity, Decimal("10.00"))
+        self.assertEqual(item.primary_vendor.company, self.acme)
+
+    def test_upsert_keeps_blank_cells_and_cost(self):
+        from accounting.models import InventoryItem
+        from dashboard.item_import import MODE_UPSERT
+
+        self.run_import(
+            "item_code,name,description,unit_cost,selling_price,current_stock\n"
+            "W-1,Widget,Old,2.50,4.00,10\n"
+            "W-2,Gadget,Old,1.00,2.00,\n"
+        )
+        summary = self.run_import(
+            "item_code,name,description,unit_cost,selling_price,current_stock\n"
+            "W-1,Widget v2,,9.99,,99\n"
+            "W-2,Gadget,New,,3.00,\n",
+            mode=MODE_UPSERT,
+        )
+        self.assertEqual(summary["updated"], 2)
+
+        widget = InventoryItem.objects.get(item_code="W-1")
+        self.assertEqual(widget.name, "Widget v2")
+        self.assertEqual(widget.description, "Old")
+        self.assertEqual(
+            (widget.unit_cost, widget.selling_price, widget.current_stock, widget.total_value),
+            (Decimal("2.50"), Decimal("4.00"), Decimal("10.00"), Decimal("25.00")),
+        )
+        gadget = InventoryItem.objects.get(item_code="W-2")
+        self.assertEqual((gadget.description, gadget.selling_price), ("New", Decimal("3.00")))
+
+
+class ConditionalGetTests(CompanyTestCase):
+    def setUp(self):
+        UserCompany.objects.create(user=self.user, company=self.acme, is_active=True)
+        self.client.force_login(self.user)
+        self.customer = self.make_customer(self.acme)
+
+    def test_customer_changes_invalidate_validators(self):
+        url = reverse("dashboard:top_customers_chart")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.customer.company_name = "Renamed"
+        self.customer.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        self.customer.delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_vendor_changes_bump_data_version(self):
+        from accounting.models import Vendor
+
+        versions = dict(Company.objects.values_list("pk", "data_version"))
+        Vendor.objects.create(
+            company=self.acme, vendor_code="V001", company_name="Supplier",
+            contact_name="Supplier", email="v@example.com",
+        )
+        self.assertEqual(
+            dict(Company.objects.values_list("pk", "data_version")),
+            {self.acme.pk: versions[self.acme.pk] + 1, self.beta.pk: versions[self.beta.pk]},
+        )
+
+
+class OverdueSweepTests(CompanyTestCase):
+    def test_sweep_marks_each_companys_past_due_invoices(self):
+        from accounting.models import Notification
+        from dashboard.overdue import sweep_overdue
+
+        UserCompany.objects.create(user=self.user, company=self.acme, is_active=True)
+        late = self.make_invoice(self.make_customer(self.acme), "INV-1", "50.00", days_due=-3)
+        current = self.make_invoice(self.make_customer(self.acme, "C002"), "INV-2", "10.00")
+        other = self.make_invoice(self.make_customer(self.beta), "INV-1", "70.00", days_due=-1)
+
+        affected = sweep_overdue()
+        self.assertEqual(set(affected), {self.acme.pk, self.beta.pk})
+        self.assertEqual(affected[self.acme.pk]["invoices"], 1)
+        self.assertEqual(
+            {invoice.pk: invoice.status for invoice in Invoice.objects.all()},
+            {
+                late.pk: Invoice.Status.OVERDUE,
+                current.pk: Invoice.Status.SENT,
+                other.pk: Invoice.Status.OVERDUE,
+            },
+        )
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 1)
+
+    def test_scheduled_sweep_runs_once_per_interval(self):
+        from accounting.models import ScheduledRun
+        from dashboard.overdue import SWEEP_RUN_NAME, run_scheduled_sweep
+
+        self.assertEqual(run_scheduled_sweep(), {})
+        self.assertIsNone(run_scheduled_sweep())
+
+        ScheduledRun.objects.filter(name=SWEEP_RUN_NAME).update(
+            last_started_at=timezone.now() - timedelta(hours=2)
+        )
+        self.assertEqual(run_scheduled_sweep(), {})
+
+
+class PaymentRunTests(CompanyTestCase):
+    def setUp(self):
+        from accounting.models import Bill, Vendor
+
+        today = timezone.now().date()
+        vendor = Vendor.objects.create(
+            company=self.acme, vendor_code="V001", company_name="Supplier",
+            contact_name="Supplier", email="v@example.com",
+            early_payment_discount_percent=Decimal("2.00"),
+            early_payment_discount_days=5,
+        )
+        self.bill = Bill.objects.create(
+            bill_number="B-1", vendor=vendor, company=self.acme,
+            bill_date=today, due_date=today + timedelta(days=30),
+            status=Bill.Status.APPROVED, subtotal=Decimal("1000.00"),
+            total_amount=Decimal("1000.00"),
+        )
+        self.today = today
+
+    def test_discounts_need_a_discounts_received_account(self):
+        from accounting.models import Bill, JournalEntryLine
+        from dashboard.payment_runs import approve_payment_run, plan_payment_run
+
+        run = plan_payment_run(self.acme, self.today, self.today)
+        self.assertEqual((run.total_amount, run.total_discount), (Decimal("980.00"), Decimal("20.00")))
+        with self.assertRaisesMessage(ValueError, "discounts received account"):
+            approve_payment_run(run, user=self.user)
+        self.assertEqual(Bill.objects.get(pk=self.bill.pk).status, Bill.Status.APPROVED)
+
+        Account.objects.create(
+            company=self.acme, code="4900", name="Purchase Discounts",
+            account_type=AccountType.REVENUE,
+        )
+        approve_payment_run(run, user=self.user)
+        self.assertEqual(Bill.objects.get(pk=self.bill.pk).status, Bill.Status.PAID)
+        credits = dict(
+            JournalEntryLine.objects.filter(credit_amount__gt=0).values_list(
+                "account__code", "credit_amount"
+            )
+        )
+        self.assertEqual(credits, {"1000": Decimal("980.00"), "4900": Decimal("20.00")})
+
+    def test_invalid_cash_limit_is_a_bad_request(self):
+        UserCompany.objects.create(user=self.user, company=self.acme, is_active=True)
+        self.client.force_login(self.user)
+
+        response = self.client.post(reverse("accounting:payment_runs"), {"cash_limit": "lots"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cash_limit must be an amount", response.json()["error"])
+
+
+class PaymentAllocationTests(CompanyTestCase):
+    def test_lump_sum_is_applied_oldest_first_with_one_entry(self):
+        from accounting.models import JournalEntry
+        from dashboard.payments import record_payment
+
+        customer = self.make_customer(self.acme)
+        older = self.make_invoice(customer, "INV-1", "100.00", days_due=5)
+        newer = self.make_invoice(customer, "INV-2", "100.00", days_due=20)
+
+        payment, summary = record_payment(
+            self.acme, customer, "150.00", date.today(), Payment.PaymentMethod.BANK_TRANSFER
+        )
+
+        older.refresh_from_db()
+        newer.refresh_from_db()
+        self.assertEqual((older.status, older.paid_amount), (Invoice.Status.PAID, Decimal("100.00")))
+        self.assertEqual((newer.status, newer.paid_amount), (Invoice.Status.SENT, Decimal("50.00")))
+        self.assertEqual(summary["unapplied"], Decimal("0.00"))
+        entry = JournalEntry.objects.get(entry_number=f"PAY-{payment.payment_number}")
+        self.assertEqual(entry.lines.count(), 3)
+
+    def test_remittance_without_an_amount_pays_the_balance_in_any_order(self):
+        from dashboard.payments import PaymentAllocator
+
+        customer = self.make_customer(self.acme)
+        invoice = self.make_invoice(customer, "INV-1", "100.00")
+        other = self.make_invoice(customer, "INV-2", "100.00")
+        payment = Payment(company=self.acme, customer=customer, amount=Decimal("300.00"))
+        allocator = PaymentAllocator(self.acme)
+
+        for remittance in (
+            [{"invoice": "INV-1", "amount": "30"}, {"invoice": str(invoice.pk)}],
+            [{"invoice": "INV-1"}, {"invoice": "INV-1", "amount": "30"}],
+        ):
+            plan = allocator.plan_explicit(payment, remittance + [
+                {"invoice": "INV-2", "amount": "10"}, {"invoice": str(other.pk), "amount": "15"},
+            ])
+            self.assertEqual(
+                [(row.invoice_number, amount) for row, amount in plan],
+                [("INV-1", Decimal("100.00")), ("INV-2", Decimal("25.00"))],
+            )
+
+    def test_invoice_sync_posts_sent_invoices_once(self):
+        from accounting.models import JournalEntry
+        from dashboard.services.sync import DashboardSyncService
+
+        customer = self.make_customer(self.acme)
+        sync = DashboardSyncService(self.acme)
+        for invoice in (
+            self.make_invoice(customer, "INV-1", "100.00"),
+            self.make_invoice(customer, "INV-2", "100.00", status=Invoice.Status.DRAFT),
+        ):
+            sync.sync_invoice_creation(invoice)
+            sync.sync_invoice_creation(invoice)
+
+        entry = JournalEntry.objects.get(company=self.acme)
+        self.assertEqual(entry.entry_number, "INV-INV-1")
+        self.assertEqual(entry.status, JournalEntry.Status.POSTED)
+        self.assertEqual((entry.total_debit, entry.total_credit), (Decimal("100.00"), Decimal("100.00")))
+
+    def test_deleting_an_unapplied_payment_reverses_its_entry(self):
+        from accounting.models import JournalEntryLine
+        from dashboard.payments import record_payment
+
+        customer = self.make_customer(self.acme)
+        payment, summary = record_payment(
+            self.acme, customer, "80.00", date.today(), Payment.PaymentMethod.BANK_TRANSFER
+        )
+        self.assertEqual(summary["unapplied"], Decimal("80.00"))
+
+        payment.delete()
+
+        cash = JournalEntryLine.objects.filter(account=self.account(self.acme, "1000")).aggregate(
+            debit=Sum("debit_amount"), credit=Sum("credit_amount")
+        )
+        self.assertEqual(cash["debit"] - cash["credit"], Decimal("0.00"))
+
+
+class AccountingSignalTests(CompanyTestCase):
+    """Only the payment receivers are connected; these flows stay as they were"""
+
+    def test_invoice_save_keeps_its_total_and_posts_nothing(self):
+        from accounting.models import JournalEntry
+
+        today = timezone.now().date()
+        invoice = Invoice.objects.create(
+            company=self.acme, customer=self.make_customer(self.acme), invoice_number="INV-1",
+            invoice_date=today, due_date=today - timedelta(days=1), total_amount=Decimal("100.00"),
+        )
+        invoice.refresh_from_db()
+        self.assertEqual(invoice.total_amount, Decimal("100.00"))
+        self.assertFalse(JournalEntry.objects.exists())
+
+    def test_future_expense_is_saved(self):
+        from accounting.models import Expense, ExpenseCategory
+
+        category = ExpenseCategory.objects.create(
+            company=self.acme, name="Supplies", account=self.account(self.acme, "5000")
+        )
+        expense = Expense.objects.create(
+            company=self.acme, expense_number="EXP-1", category=category,
+            expense_date=timezone.now().date() + timedelta(days=3),
+            amount=Decimal("12.00"), description="Paper",
+        )
+        self.assertTrue(Expense.objects.filter(pk=expense.pk).exists())
+
+    def test_posting_leaves_budget_lines_alone(self):
+        from accounting.models import Budget, BudgetLine
+
+        today = timezone.now().date()
+        budget = Budget.objects.create(
+            company=self.acme, name="Plan", fiscal_year=today.year, period=Budget.Period.ANNUAL,
+            start_date=today.replace(month=1, day=1), end_date=today.replace(month=12, day=31),
+        )
+        line = BudgetLine.objects.create(
+            budget=budget, account=self.account(self.acme, "4000"), budgeted_amount=Decimal("500.00")
+        )
+        self.post_entry(self.acme, "JE-1", today, "1000", "4000", "80.00")
+
+        line.refresh_from_db()
+        self.assertEqual(line.actual_amount, Decimal("0.00"))
+
+
+class RenderPoolTests(TestCase):
+    @override_settings(REPORT_RENDER_POOL_THRESHOLD=0, REPORT_RENDER_TIMEOUT=0.001)
+    def test_report_render_timeout_asks_the_client_to_retry(self):
+        from dashboard import rendering
+        from dashboard.reports_views import export_report_pdf
+
+        tables = [
+            {"title": "Cash", "columns": ["Description", "Amount"], "rows": [["Cash", "1.00"]], "footer": []}
+        ]
+        with self.assertRaises(rendering.ReportRenderTimeout):
+            rendering.render_pdf("Balance Sheet", ["Acme"], tables)
+        self.assertIsNone(rendering._render_pool)
+
+        response = export_report_pdf(
+            {"title": "Cash Flow", "report": {"operating": Decimal("1.00")}}, "cash_flow"
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "30")
+
+    @override_settings(INVOICE_PDF_WORKERS=1, INVOICE_PDF_TIMEOUT=5)
+    def test_hung_invoice_pool_is_shut_down_and_rendered_inline(self):
+        import multiprocessing
+
+        from dashboard import invoice_pdf
+
+        results = list(invoice_pdf.render_chunks(render_slowly_in_worker, iter([[1], [2]])))
+
+        self.assertEqual(results, [[1], [2]])
+        self.assertIsNone(invoice_pdf._invoice_pdf_pool)
+        for process in multiprocessing.active_children():
+            process.join(timeout=5)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+
+class BillMatchSignalTests(CompanyTestCase):
+    def setUp(self):
+        from accounting.models import Bill, Vendor
+
+        vendor = Vendor.objects.create(
+            company=self.acme, vendor_code="V001", company_name="Supplier",
+            contact_name="Supplier", email="v001@example.com",
+        )
+        today = timezone.now().date()
+        self.bills = [
+            Bill.objects.create(
+                company=self.acme, vendor=vendor, bill_number=f"BILL-{n}",
+                bill_date=today, due_date=today, status=Bill.Status.APPROVED,
+            )
+            for n in (1, 2)
+        ]
+
+    def add_line(self, bill):
+        from accounting.models import BillLine
+
+        BillLine.objects.create(
+            bill=bill, description="Widget", unit_price=Decimal("10.00"),
+            line_total=Decimal("10.00"), account=self.account(self.acme, "5000"),
+        )
+
+    def rematches(self, callbacks):
+        from dashboard.matching_signals import _rematch
+
+        return [callback.args[1] for callback in callbacks if getattr(callback, "func", None) is _rematch]
+
+    def test_saving_many_lines_queues_one_match_per_bill(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for bill in self.bills:
+                for _ in range(3):
+                    self.add_line(bill)
+
+        self.assertEqual(self.rematches(callbacks), [bill.pk for bill in self.bills])
+        from dashboard.matching_signals import _queued
+
+        self.assertEqual(len(_queued("default")), 0)
+
+    def test_match_is_queued_again_after_a_rolled_back_savepoint(self):
+        from django.db import transaction
+
+        bill = self.bills[0]
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                self.add_line(bill)
+                transaction.set_rollback(True)
+            self.add_line(bill)
+            self.add_line(bill)
+
+        self.assertEqual(self.rematches(callbacks), [bill.pk])
+
+
+class ReportSnapshotTests(CompanyTestCase):
+    def setUp(self):
+        today = timezone.now().date()
+        self.end = today.replace(day=1) - timedelta(days=1)
+        self.start = self.end.replace(day=1)
+
+    def net_income(self, company):
+        from dashboard.reports import FinancialReports
+
+        return FinancialReports(company, self.start, self.end).profit_and_loss()["net_income"]
+
+    def test_closed_period_is_served_from_its_snapshot_until_back_dated(self):
+        from accounting.models import ReportSnapshot
+
+        self.post_entry(self.acme, "JE-1", self.start, "1000", "4000", "100.00")
+        self.post_entry(self.beta, "JE-1", self.start, "1000", "4000", "70.00")
+        self.assertEqual(self.net_income(self.acme), Decimal("100.00"))
+        self.assertEqual(self.net_income(self.beta), Decimal("70.00"))
+        self.assertEqual(ReportSnapshot.objects.count(), 2)
+
+        # Postings after the period leave its snapshot alone
+        self.post_entry(self.acme, "JE-2", self.end + timedelta(days=1), "1000", "4000", "5.00")
+        self.assertEqual(ReportSnapshot.objects.filter(company=self.acme).count(), 1)
+
+        # A back-dated posting drops only this company's snapshot
+        self.post_entry(self.acme, "JE-3", self.end, "1000", "4000", "25.00")
+        self.assertFalse(ReportSnapshot.objects.filter(company=self.acme).exists())
+        self.assertTrue(ReportSnapshot.objects.filter(company=self.beta).exists())
+        self.assertEqual(self.net_income(self.acme), Decimal("125.00"))
+
+
+    def test_report_built_while_the_ledger_moved_is_not_kept(self):
+        from accounting.models import ReportSnapshot
+        from dashboard.snapshots import get_or_build_snapshot
+
+        def build():
+            report = {"net_income": Decimal("0.00")}
+            self.post_entry(self.acme, "JE-1", self.start, "1000", "4000", "10.00")
+            return report
+
+        args = (self.acme, ReportSnapshot.ReportType.PROFIT_AND_LOSS, self.start, self.end)
+        get_or_build_snapshot(*args, build)
+        self.assertFalse(ReportSnapshot.objects.exists())
+        self.assertEqual(self.net_income(self.acme), Decimal("10.00"))
+
+        # A snapshot stamped with an older ledger version is rebuilt
+        ReportSnapshot.objects.update(ledger_version=0)
+        self.assertEqual(get_or_build_snapshot(*args, lambda: {"net_income": 1}), {"net_income": 1})
+
+class GeneralLedgerDetailTests(CompanyTestCase):
+    def test_running_balance_carries_across_pages(self):
+        from dashboard.ledger import GeneralLedgerDetail
+
+        start = date(2025, 3, 1)
+        self.post_entry(self.acme, "JE-0", start - timedelta(days=1), "1000", "4000", "50.00")
+        self.post_entry(self.acme, "JE-1", start, "1000", "4000", "10.00")
+        self.post_entry(self.acme, "JE-2", start + timedelta(days=1), "5000", "1000", "5.00")
+        self.post_entry(self.acme, "JE-3", start + timedelta(days=2), "1000", "4000", "20.00")
+        self.post_entry(self.beta, "JE-1", start, "1000", "4000", "999.00")
+
+        report = GeneralLedgerDetail(self.acme, start, start + timedelta(days=30), "1000", "1000")
+        first = report.page(page_size=2)
+        second = report.page(first["next_cursor"], page_size=2)
+
+        self.assertEqual(first["lines"][0]["opening_balance"], Decimal("50.00"))
+        self.assertEqual(
+            [line["running_balance"] for line in first["lines"] + second["lines"]],
+            [Decimal("60.00"), Decimal("55.00"), Decimal("75.00")],
+        )
+        self.assertIsNone(second["next_cursor"])
+
+
+class FinancialRatioTests(CompanyTestCase):
+    def test_ratios_are_per_company_and_follow_new_postings(self):
+        from django.core.cache import cache
+
+        from dashboard.ratios import FinancialRatioEngine
+
+        cache.clear()
+        today = timezone.now().date()
+        self.post_entry(self.acme, "JE-1", today, "1000", "4000", "400.00")
+        self.post_entry(self.acme, "JE-2", today, "1200", "2000", "100.00")
+        self.post_entry(self.beta, "JE-1", today, "1000", "4000", "50.00")
+
+        ratios = FinancialRatioEngine(self.acme, today).calculate()
+        self.assertEqual(ratios["financial_data"]["total_revenue"], Decimal("400.00"))
+        self.assertEqual(ratios["ratios"]["current_ratio"], Decimal("5.00"))
+
+        self.post_entry(self.acme, "JE-3", today, "5000", "1000", "100.00")
+        ratios = FinancialRatioEngine(self.acme, today).calculate()
+        self.assertEqual(ratios["financial_data"]["net_income"], Decimal("300.00"))
+        self.assertEqual(ratios["ratios"]["current_ratio"], Decimal("4.00"))
+        beta = FinancialRatioEngine(self.beta, today).calculate()
+        self.assertEqual(beta["financial_data"]["total_assets"], Decimal("50.00"))
+
+    def test_monthly_history_matches_the_engine_at_each_month_end(self):
+        from django.core.cache import cache
+
+        from dashboard.balance_history import add_months, month_start
+        from dashboard.ratios import FinancialRatioEngine, ratio_history
+
+        cache.clear()
+        this_month = month_start(timezone.now().date())
+        last_month = add_months(this_month, -1)
+        self.post_entry(self.acme, "JE-1", last_month, "1000", "4000", "200.00")
+        self.post_entry(self.acme, "JE-2", last_month, "1200", "2000", "100.00")
+        self.post_entry(self.acme, "JE-3", this_month, "5000", "1000", "50.00")
+        self.post_entry(self.beta, "JE-1", last_month, "1000", "2000", "75.00")
+
+        history = ratio_history(self.acme, months=2, end=this_month)
+
+        self.assertEqual([point["month"] for point in history], [last_month, this_month])
+        for point in history:
+            month_end = add_months(point["month"], 1) - timedelta(days=1)
+            expected = FinancialRatioEngine(self.acme, month_end)._calculate()["ratios"]
+            self.assertEqual(point["ratios"], expected)
+        self.assertEqual(history[0]["ratios"]["current_ratio"], Decimal("3.00"))
+        self.assertEqual(history[1]["ratios"]["current_ratio"], Decimal("2.50"))
+
+
+    def test_income_covers_the_twelve_calendar_months_in_a_leap_year(self):
+        from django.core.cache import cache
+
+        from dashboard.ratios import FinancialRatioEngine, ratio_history
+
+        cache.clear()
+        self.post_entry(self.acme, "JE-1", date(2023, 12, 31), "1000", "4000", "5.00")
+        self.post_entry(self.acme, "JE-2", date(2024, 1, 1), "1000", "4000", "100.00")
+        self.post_entry(self.acme, "JE-3", date(2024, 12, 31), "5000", "1000", "20.00")
+
+        engine = FinancialRatioEngine(self.acme, date(2024, 12, 31))
+        ratios = engine._calculate()
+        self.assertEqual(ratios["financial_data"]["total_revenue"], Decimal("100.00"))
+        self.assertEqual(ratios["financial_data"]["net_income"], Decimal("80.00"))
+        history = ratio_history(self.acme, months=1, end=date(2024, 12, 1))
+        self.assertEqual(history[0]["ratios"], ratios["ratios"])
+
+class KeysetPaginationTests(CompanyTestCase):
+    def test_pages_walk_forward_and_back_over_ties(self):
+        from dashboard.pagination import KeysetPaginator
+
+        customer = self.make_customer(self.acme)
+        invoices = [self.make_invoice(customer, f"INV-{n}", "10.00") for n in range(5)]
+        Invoice.objects.filter(pk__in=[invoices[0].pk, invoices[1].pk]).update(
+            invoice_date=timezone.now().date() - timedelta(days=1)
+        )
+        self.make_invoice(self.make_customer(self.beta), "INV-9", "10.00")
+        paginator = KeysetPaginator(
+            Invoice.objects.filter(company=self.acme), ("-invoice_date", "-id"), page_size=2
+        )
+
+        numbers, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            numbers += [invoice.invoice_number for invoice in page]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(numbers, ["INV-4", "INV-3", "INV-2", "INV-1", "INV-0"])
+
+        second = paginator.page(paginator.page().next_cursor)
+        previous = paginator.page(second.previous_cursor)
+        self.assertEqual([invoice.invoice_number for invoice in previous], ["INV-4", "INV-3"])
+        self.assertFalse(previous.has_previous)
+        self.assertEqual(
+            [invoice.invoice_number for invoice in paginator.page(cursor + "x")], ["INV-4", "INV-3"]
+        )
+
+
+class PortfolioKPITests(CompanyTestCase):
+    def test_endpoint_lists_only_the_users_companies_with_fresh_kpis(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        gamma = self.make_company("Gamma")
+        for company in (self.acme, self.beta):
+            UserCompany.objects.create(user=self.user, company=company, is_active=company == self.acme)
+        today = timezone.now().date()
+        self.post_entry(self.acme, "JE-1", today, "1000", "4000", "300.00")
+        self.post_entry(gamma, "JE-1", today, "1000", "4000", "900.00")
+        self.make_invoice(self.make_customer(self.beta), "INV-1", "40.00", days_due=-5)
+        self.client.force_login(self.user)
+
+        def kpis():
+            response = self.client.get(reverse("dashboard:portfolio_kpis_api"))
+            return {row["company_name"]: row for row in response.json()["companies"]}
+
+        rows = kpis()
+        self.assertEqual(sorted(rows), ["Acme", "Beta"])
+        self.assertEqual(rows["Acme"]["cash"], 300.0)
+        self.assertEqual(rows["Acme"]["month_revenue"], 300.0)
+        self.assertEqual((rows["Beta"]["ar_overdue"], rows["Beta"]["ar_overdue_count"]), (40.0, 1))
+
+        self.make_invoice(self.make_customer(self.beta, "C002"), "INV-2", "10.00", days_due=-1)
+        self.assertEqual(kpis()["Beta"]["ar_overdue"], 50.0)
+
+
+class ConsolidationTests(CompanyTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        from accounting.models import ConsolidationGroup
+
+        cache.clear()
+        self.today = timezone.now().date()
+        self.group = ConsolidationGroup.objects.create(company=self.acme, name="Acme Group")
+        self.group.members.add(self.acme, self.beta)
+        self.post_entry(self.acme, "JE-1", self.today, "1000", "4000", "500.00")
+        # Acme lends Beta 100
+        self.intercompany(self.acme, "IC-1", "1100", "1000", "100.00", self.beta, "1100")
+
+    def intercompany(self, company, number, debit_code, credit_code, amount, counterparty, tagged_code):
+        from accounting.models import JournalEntryLine
+
+        entry = self.post_entry(company, number, self.today, debit_code, credit_code, amount)
+        JournalEntryLine.objects.filter(
+            journal_entry=entry, account=self.account(company, tagged_code)
+        ).update(intercompany_company=counterparty)
+
+    def consolidate(self):
+        from dashboard.consolidation import ConsolidationEngine
+
+        report = ConsolidationEngine(self.group, self.today).consolidate()
+        return report, {row["code"]: row for row in report["rows"]}
+
+    def test_intercompany_balances_are_eliminated(self):
+        self.intercompany(self.beta, "IC-1", "1000", "2000", "100.00", self.acme, "2000")
+
+        report, rows = self.consolidate()
+        self.assertEqual(rows["1100"]["gross"], Decimal("100.00"))
+        self.assertEqual(rows["1100"]["consolidated"], Decimal("0.00"))
+        self.assertEqual(rows["2000"]["consolidated"], Decimal("0.00"))
+        self.assertEqual(rows["1000"]["consolidated"], Decimal("500.00"))
+        self.assertEqual(report["totals"]["net_income"], Decimal("500.00"))
+        self.assertEqual(report["differences"], [])
+
+    def test_unmatched_intercompany_sides_are_reported(self):
+        self.intercompany(self.beta, "IC-1", "1000", "2000", "80.00", self.acme, "2000")
+
+        report, _ = self.consolidate()
+        self.assertEqual(
+            report["differences"], [{"companies": ["Acme", "Beta"], "difference": Decimal("20.00")}]
+        )
+
+    @override_settings(CONSOLIDATION_POOL_THRESHOLD=1, CONSOLIDATION_TIMEOUT=0.001)
+    def test_hung_pool_is_discarded_and_members_computed_inline(self):
+        import multiprocessing
+
+        from dashboard import consolidation
+
+        report, rows = self.consolidate()
+
+        self.assertEqual(rows["1000"]["consolidated"], Decimal("400.00"))
+        self.assertIsNone(consolidation._consolidation_pool)
+        for process in multiprocessing.active_children():
+            process.join(timeout=5)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+
+class BalanceRollupTests(CompanyTestCase):
+    def balances(self, company):
+        from accounting.models import CustomerBalance
+
+        return list(
+            CustomerBalance.objects.filter(company=company)
+            .order_by("pk")
+            .values_list("pk", "total_invoiced", "outstanding", "total_paid", "last_payment_date")
+        )
+
+    def test_deltas_match_a_rebuild_from_documents(self):
+        from dashboard.payments import record_payment
+        from dashboard.rollups import CUSTOMERS, rebuild_balances
+
+        customer = self.make_customer(self.acme)
+        self.make_invoice(customer, "INV-1", "100.00", days_due=5)
+        cancelled = self.make_invoice(customer, "INV-2", "50.00", days_due=10)
+        self.make_invoice(customer, "INV-3", "30.00", status=Invoice.Status.DRAFT)
+        record_payment(self.acme, customer, "60.00", date.today(), Payment.PaymentMethod.CASH)
+        cancelled.status = Invoice.Status.CANCELLED
+        cancelled.save()
+        other = self.make_customer(self.beta)
+        self.make_invoice(other, "INV-1", "999.00")
+
+        incremental = self.balances(self.acme)
+        self.assertEqual(
+            incremental,
+            [(customer.pk, Decimal("100.00"), Decimal("40.00"), Decimal("60.00"), date.today())],
+        )
+        rebuild_balances(CUSTOMERS, company=self.acme)
+        self.assertEqual(self.balances(self.acme), incremental)
+        self.assertEqual(self.balances(self.beta)[0][2], Decimal("999.00"))
+
+
+class OutboxDispatchTests(CompanyTestCase):
+    def queue(self, company, *addresses):
+        from accounting.models import OutboundMessage
+        from dashboard.outbox import enqueue
+
+        return enqueue(
+            OutboundMessage(
+                company=company, kind=OutboundMessage.Kind.NOTICE, to_email=address,
+                subject="Notice", body="Hello",
+            )
+            for address in addresses
+        )
+
+    def test_due_messages_of_every_company_are_sent_once(self):
+        from django.core import mail
+
+        from accounting.models import OutboundMessage
+        from dashboard.outbox import OutboxDispatcher
+
+        Company.objects.filter(pk=self.acme.pk).update(email="billing@acme.example")
+        self.assertEqual(self.queue(self.acme, "a@example.com", "b@example.com", ""), 2)
+        self.queue(self.beta, "c@example.com")
+
+        summary = OutboxDispatcher(concurrency=2, rate=0).dispatch()
+
+        self.assertEqual(summary, {"sent": 3, "retrying": 0, "failed": 0})
+        self.assertEqual(
+            sorted(email.to[0] for email in mail.outbox),
+            ["a@example.com", "b@example.com", "c@example.com"],
+        )
+        self.assertEqual(
+            [email.reply_to for email in mail.outbox if email.to[0] == "a@example.com"],
+            [["billing@acme.example"]],
+        )
+        self.assertFalse(OutboundMessage.objects.exclude(status=OutboundMessage.Status.SENT).exists())
+        self.assertEqual(OutboxDispatcher(rate=0).dispatch()["sent"], 0)
+
+    @override_settings(
+        EMAIL_BACKEND="dashboard.tests.RejectingEmailBackend", OUTBOX_RETRY_DELAY=60
+    )
+    def test_rejected_recipients_fail_and_deferred_ones_retry_later(self):
+        from accounting.models import OutboundMessage
+        from dashboard.outbox import OutboxDispatcher
+
+        self.queue(self.acme, "bad@example.com", "later@example.com")
+        before = timezone.now()
+
+        summary = OutboxDispatcher(concurrency=1, rate=0).dispatch()
+
+        self.assertEqual(summary, {"sent": 0, "retrying": 1, "failed": 1})
+        failed = OutboundMessage.objects.get(to_email="bad@example.com")
+        self.assertEqual(failed.status, OutboundMessage.Status.FAILED)
+        self.assertIn("SMTPRecipientsRefused", failed.last_error)
+        retrying = OutboundMessage.objects.get(to_email="later@example.com")
+        self.assertEqual((retrying.status, retrying.attempts), (OutboundMessage.Status.PENDING, 1))
+        self.assertGreaterEqual(retrying.next_attempt_at, before + timedelta(seconds=60))
+
+
+class BillImportTests(CompanyTestCase):
+    def setUp(self):
+        from accounting.models import Bill, Vendor
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.vendor = Vendor.objects.create(
+            company=self.acme, vendor_code="V001", company_name="Supplier",
+            contact_name="Supplier", email="v001@example.com",
+        )
+        Vendor.objects.create(
+            company=self.beta, vendor_code="V002", company_name="Beta Supplier",
+            contact_name="Beta Supplier", email="v002@example.com",
+        )
+        Bill.objects.create(
+            company=self.acme, vendor=self.vendor, bill_number="B-OLD",
+            bill_date=date(2026, 9, 1), due_date=date(2026, 9, 30),
+        )
+
+    def test_bills_are_written_whole_and_rejects_reported(self):
+        import io
+
+        from django.core.files.storage import default_storage
+
+        from accounting.models import Bill, VendorBalance
+        from dashboard.bill_import import error_report_path, import_bills
+
+        rows = [
+            "vendor,bill_number,bill_date,description,quantity,unit_price,account,tax_amount",
+            "V001,B-1,2026-09-10,Paper,2,10.00,5000,1.00",
+            "Supplier,B-1,2026-09-10,Toner,1,30.00,5000,",
+            "V001,B-2,2026-09-11,Desk,1,100.00,5000,",
+            "V001,B-2,2026-09-11,Chair,1,50.00,9999,",
+            "V001,B-OLD,2026-09-12,Pens,1,5.00,5000,",
+            "V002,B-3,2026-09-12,Pens,1,5.00,5000,",
+        ]
+        result = import_bills(
+            self.acme, io.StringIO("\n".join(rows)), status=Bill.Status.APPROVED, match=False
+        )
+
+        self.assertEqual((result["rows"], result["bills"], result["lines"]), (6, 1, 2))
+        self.assertEqual((result["errors"], result["duplicates"]), (4, 1))
+        bill = Bill.objects.get(bill_number="B-1")
+        self.assertEqual((bill.company, bill.total_amount), (self.acme, Decimal("51.00")))
+        self.assertEqual(VendorBalance.objects.get(pk=self.vendor.pk).outstanding, Decimal("51.00"))
+        self.assertFalse(Bill.objects.filter(bill_number__in=["B-2", "B-3"]).exists())
+
+        with default_storage.open(error_report_path(self.acme.id, result["error_report"])) as report:
+            errors = report.read().decode()
+        self.assertIn("Unknown account '9999'", errors)
+        self.assertIn("Unknown vendor 'V002'", errors)
+        self.assertIn("Skipped: row 5 of this bill was rejected", errors)
+
+
+class StockPostingTests(CompanyTestCase):
+    def setUp(self):
+        from accounting.models import InventoryItem
+
+        self.item = InventoryItem.objects.create(
+            item_code="W-1", name="Widget", barcode="0001", location="Main"
+        )
+        self.other = InventoryItem.objects.create(item_code="G-1", name="Gadget", location="Main")
+
+    def levels(self, item):
+        return dict(item.stock_levels.values_list("location", "quantity"))
+
+    def test_short_batch_posts_nothing(self):
+        from accounting.models import CostLayer, InventoryTransaction
+        from dashboard.stock import post_movements
+
+        post_movements([{"item": self.item, "quantity": 5, "unit_cost": "2.00"}], company=self.acme)
+        with self.assertRaisesMessage(ValueError, "W-1 at Main short by 5"):
+            post_movements(
+                [
+                    {"item": self.other, "quantity": 3, "unit_cost": "1.00"},
+                    {"item_code": "W-1", "type": "ISSUE", "quantity": 10},
+                ],
+                company=self.acme,
+                allow_negative=False,
+            )
+
+        self.item.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.item.current_stock, self.other.current_stock), (5, 0))
+        self.assertEqual(self.levels(self.item), {"Main": 5})
+        self.assertEqual(InventoryTransaction.objects.count(), 1)
+        self.assertEqual(CostLayer.objects.get().remaining_quantity, 5)
+
+    def test_negative_stock_when_allowed(self):
+        from dashboard.stock import post_movements
+
+        result = post_movements(
+            [{"barcode": "0001", "type": "ISSUE", "quantity": 2}],
+            company=self.acme,
+            allow_negative=True,
+        )
+        self.assertEqual(result["stock"], {self.item.pk: Decimal("-2.00")})
+        self.assertEqual(self.levels(self.item), {"Main": -2})
+
+    def test_transfers_move_stock_between_locations(self):
+        from dashboard.stock import post_movements
+
+        post_movements([{"item": self.item, "quantity": 10, "unit_cost": "1.00"}], company=self.acme)
+        post_movements(
+            [{"item": self.item, "type": "TRANSFER", "quantity": 4, "to_location": "Store"}],
+            company=self.acme,
+            allow_negative=False,
+        )
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.current_stock, 10)
+        self.assertEqual(self.levels(self.item), {"Main": 6, "Store": 4})
+
+        with self.assertRaisesMessage(ValueError, "W-1 at Store short by 1"):
+            post_movements(
+                [{"item": self.item, "type": "ISSUE", "quantity": 5, "location": "Store"}],
+                company=self.acme,
+                allow_negative=False,
+            )
+
+    def test_invalid_movements(self):
+        from dashboard.stock import post_movements
+
+        for movement, message in (
+            ({"item_code": "NOPE", "quantity": 1}, "Movement 1: unknown item"),
+            ({"item": self.item, "quantity": -1}, "quantity must be positive"),
+            ({"item": self.item, "type": "LOST", "quantity": 1}, "unknown type"),
+            ({"item": self.item, "type": "TRANSFER", "quantity": 1, "to_location": "Main"},
+             "transfer to the same location"),
+        ):
+            with self.subTest(movement=movement), self.assertRaisesMessage(ValueError, message):
+                post_movements([movement], company=self.acme)
+
+
+class ThreeWayMatchTests(CompanyTestCase):
+    def setUp(self):
+        from accounting.models import Bill, InventoryItem, PurchaseOrder, PurchaseOrderLine, Vendor
+
+        self.today = timezone.now().date()
+        self.vendors, self.bills = {}, {}
+        for company in (self.acme, self.beta):
+            vendor = self.vendors[company] = Vendor.objects.create(
+                company=company, vendor_code=f"V{company.pk:03}", company_name="Supplier",
+                contact_name="Supplier", email=f"v{company.pk}@example.com",
+            )
+            self.bills[company] = Bill.objects.create(
+                company=company, vendor=vendor, bill_number=f"BILL-{company.pk}",
+                bill_date=self.today, due_date=self.today, status=Bill.Status.APPROVED,
+            )
+        self.item = InventoryItem.objects.create(
+            item_code="W-1", name="Widget", primary_vendor=self.vendors[self.acme]
+        )
+        self.order = PurchaseOrder.objects.create(
+            po_number="1001", vendor=self.vendors[self.acme], order_date=self.today,
+            status=PurchaseOrder.Status.ORDERED,
+        )
+        self.po_line = PurchaseOrderLine.objects.create(
+            purchase_order=self.order, item_description="Widget", inventory_item=self.item,
+            quantity_ordered=Decimal("10.00"), unit_price=Decimal("5.00"),
+            line_total=Decimal("50.00"),
+        )
+
+    def receive(self, quantity, reference="PO-1001"):
+        from dashboard.stock import post_movements
+
+        post_movements(
+            [{"item": self.item, "quantity": quantity, "unit_cost": "5.00",
+              "reference_number": reference}],
+            company=self.acme,
+        )
+
+    def bill_line(self, company, quantity, unit_price="5.00", item=None):
+        from accounting.models import BillLine
+
+        return BillLine.objects.create(
+            bill=self.bills[company], description="Widget", inventory_item=item,
+            quantity=Decimal(quantity), unit_price=Decimal(unit_price),
+            line_total=Decimal(quantity) * Decimal(unit_price),
+            account=self.account(company, "5000"),
+        )
+
+    def test_receipts_and_bill_lines_are_matched_to_the_order(self):
+        from accounting.models import PurchaseOrder
+        from dashboard.matching import run_three_way_match
+
+        self.receive(6)
+        matched = self.bill_line(self.acme, 6)
+        unreceived = self.bill_line(self.acme, 4, item=self.item)
+        result = run_three_way_match(self.acme)
+
+        self.assertEqual(result["receipts"], 1)
+        self.assertEqual(result["statuses"], {"MATCHED": 1, "NOT_RECEIVED": 1})
+        matched.refresh_from_db()
+        self.assertEqual(matched.inventory_item, self.item)
+        self.assertEqual(unreceived.match.po_line, self.po_line)
+        self.order.refresh_from_db()
+        self.po_line.refresh_from_db()
+        self.assertEqual(self.order.status, PurchaseOrder.Status.PARTIALLY_RECEIVED)
+        self.assertEqual(self.po_line.quantity_received, 6)
+
+    def test_variances_are_exceptions(self):
+        from dashboard.matching import match_bill, match_exceptions
+
+        self.receive(5)
+        self.bill_line(self.acme, 8, item=self.item)
+        self.assertEqual(match_bill(self.bills[self.acme])["statuses"], {"QUANTITY_VARIANCE": 1})
+
+        self.bills[self.acme].lines.all().delete()
+        self.bill_line(self.acme, 5, unit_price="5.50", item=self.item)
+        result = match_bill(self.bills[self.acme])
+        self.assertEqual((result["receipts"], result["statuses"]), (0, {"PRICE_VARIANCE": 1}))
+        self.assertEqual(
+            [row["status"] for row in match_exceptions(self.acme)], ["PRICE_VARIANCE"]
+        )
+
+    def test_other_companies_orders_are_not_matched(self):
+        from dashboard.matching import match_summary, run_three_way_match
+
+        self.receive(10)
+        self.bill_line(self.beta, 10, item=self.item)
+
+        self.assertEqual(run_three_way_match(self.beta)["statuses"], {"NO_PURCHASE_ORDER": 1})
+        self.assertEqual(match_summary(self.acme), {})
+        self.po_line.refresh_from_db()
+        self.assertEqual(self.po_line.quantity_received, 0)
+
+
+class InvoicePdfTests(CompanyTestCase):
+    def test_company_invoices_render_in_order(self):
+        from dashboard.invoice_pdf import iter_invoice_pdfs
+
+        for company in (self.acme, self.beta):
+            customer = self.make_customer(company, code=f"C{company.pk:03}")
+            for number in ("INV-2", "INV-1") if company == self.acme else ("INV-3",):
+                self.make_invoice(customer, number, "10.00")
+
+        pdfs = list(iter_invoice_pdfs(self.acme, Invoice.objects.filter(company=self.acme)))
+        self.assertEqual([name for name, _ in pdfs], ["INV-1.pdf", "INV-2.pdf"])
+        self.assertTrue(all(pdf.startswith(b"%PDF") for _, pdf in pdfs))
+
+    def test_stream_zip_keeps_duplicate_names_apart(self):
+        import zipfile
+        from io import BytesIO
+
+        from dashboard.invoice_pdf import stream_zip
+
+        entries = [("INV-1.pdf", b"one"), ("INV-1.pdf", b"two"), ("INV-2.pdf", b"three")]
+        archive = zipfile.ZipFile(BytesIO(b"".join(stream_zip(iter(entries)))))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual(
+            [(name, archive.read(name)) for name in archive.namelist()],
+            [("INV-1.pdf", b"one"), ("INV-1_2.pdf", b"two"), ("INV-2.pdf", b"three")],
+        )
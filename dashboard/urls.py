@@ -18,11 +18,21 @@ urlpatterns = [
     ),
     path("reports/cash-flow/", reports_views.cash_flow_report, name="cash_flow_report"),
     path("reports/aging/", reports_views.aging_report, name="aging_report"),
+    path(
+        "reports/general-ledger/",
+        reports_views.general_ledger_detail_report,
+        name="general_ledger_detail",
+    ),
     path(
         "reports/cash-forecast/",
         reports_views.cash_flow_forecast_view,
         name="cash_flow_forecast",
     ),
+    path(
+        "reports/consolidation/",
+        reports_views.consolidation_report,
+        name="consolidation_report",
+    ),
     # Chart Data APIs (NEW)
     path(
         "api/charts/revenue-expense/",
@@ -59,4 +69,7 @@ urlpatterns = [
     path("ai-insights/", views.ai_insights_view, name="ai_insights"),
     path("settings/", views.settings_view, name="settings"),
     path("notifications/", views.notifications_view, name="notifications"),
+    path("portfolio/", views.portfolio_view, name="portfolio"),
+    path("api/portfolio/", views.portfolio_kpis_api, name="portfolio_kpis_api"),
+    path("api/payments/record/", views.record_payment_api, name="record_payment_api"),
 ]
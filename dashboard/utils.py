@@ -45,6 +45,113 @@ def invalidate_dashboard_cache(company):
         cache.delete(key)
 
 
+def claim_scheduled_run(name, interval, slack=60):
+    """
+    Claim this interval's run of a periodic job; True if the caller should run it
+    The claim is one conditional UPDATE of the job's ScheduledRun row, so
+    only one of several servers starting the job at once wins. slack
+    (seconds) keeps a scheduler that fires slightly early from skipping a
+    whole interval.
+    """
+    from accounting.models import ScheduledRun
+    from django.db import IntegrityError, transaction
+    from django.db.models import Q
+    from django.utils import timezone
+
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            ScheduledRun.objects.get_or_create(name=name)
+    except IntegrityError:
+        # Another server created the row first
+        pass
+    return bool(
+        ScheduledRun.objects.filter(name=name)
+        .filter(
+            Q(last_started_at__isnull=True)
+            | Q(last_started_at__lte=now - timedelta(seconds=max(interval - slack, 0)))
+        )
+        .update(last_started_at=now)
+    )
+
+
+def discard_process_pool(pool):
+    """
+    Shut down a broken or hung process pool without waiting for it
+    Queued tasks are cancelled and the workers terminated: a hung worker
+    never reads the shutdown request, so it would otherwise live on.
+    """
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def get_ledger_version(company):
+    """
+    Read the company's current ledger version straight from the database
+    The in-memory company instance may be stale, so it is never trusted here
+    """
+    from companies.models import Company
+
+    version = (
+        Company.objects.filter(pk=company.pk)
+        .values_list("ledger_version", flat=True)
+        .first()
+    )
+    return version or 0
+
+
+def bump_ledger_version(company):
+    """
+    Increment the company's ledger version after posted ledger data changes
+    Uses an F() expression so concurrent postings never lose an increment
+    A ledger change is also a data change, so data_version moves with it
+    """
+    from companies.models import Company
+    from django.db.models import F
+    from django.utils import timezone
+
+    Company.objects.filter(pk=company.pk).update(
+        ledger_version=F("ledger_version") + 1,
+        data_version=F("data_version") + 1,
+        data_updated_at=timezone.now(),
+    )
+
+
+def bump_data_version(company):
+    """
+    Increment the company's data version after any financial record changes
+    (invoices, bills, payments, expenses, accounts, journal entries)
+    """
+    bump_data_versions([company.pk])
+
+
+def bump_data_versions(company_ids):
+    """Increment the data version of many companies with one UPDATE"""
+    from companies.models import Company
+    from django.db.models import F
+    from django.utils import timezone
+
+    Company.objects.filter(pk__in=company_ids).update(
+        data_version=F("data_version") + 1,
+        data_updated_at=timezone.now(),
+    )
+
+
+def get_company_versions(company):
+    """Return (ledger_version, data_version, data_updated_at) in one read"""
+    from companies.models import Company
+
+    versions = (
+        Company.objects.filter(pk=company.pk)
+        .values_list("ledger_version", "data_version", "data_updated_at")
+        .first()
+    )
+    return versions or (0, 0, None)
+
+
 def format_currency(amount, currency_symbol="$"):
     """Format decimal amount as currency"""
     if amount is None:
@@ -111,14 +218,15 @@ def get_date_range_for_period(period="current_month"):
     return start_date, end_date
 
 
-def chunk_queryset(queryset, chunk_size=100):
+def chunk_queryset(queryset, chunk_size=100, ordering=("pk",)):
     """
     Iterate over queryset in chunks to avoid memory issues
-    Useful for processing large datasets
+    Each chunk is a list fetched by keyset on `ordering`, so late chunks cost
+    the same as early ones (no COUNT, no OFFSET)
     """
-    count = queryset.count()
-    for i in range(0, count, chunk_size):
-        yield queryset[i : i + chunk_size]
+    from dashboard.pagination import KeysetPaginator
+
+    yield from KeysetPaginator(queryset, ordering, chunk_size).chunks()
 
 
 def sanitize_amount(value):
@@ -9,8 +9,8 @@ Optimized Dashboard Views
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.core.cache import cache
-from django.core.paginator import Paginator
-from django.db.models import Sum, Count, Q, F, Prefetch
+from django.db.models import Sum, Count, Q, F, Prefetch, Value
+from django.db.models.functions import Coalesce
 from django.http import JsonResponse
 from decimal import Decimal
 from datetime import datetime, timedelta
@@ -31,10 +31,21 @@ from accounting.models import (
     BudgetLine,
     ExpenseCategory,
     Notification,
+    Payment,
+    SearchEntry,
 )
+from companies.models import Company
+from .pagination import KeysetPaginator, page_as_json
+from .portfolio import portfolio_row_as_json, portfolio_rows
+from .ratios import FinancialRatioEngine
+from .search import search_ids
 from .services import FinancialMetricsService
 
 
+# Companies per portfolio page
+PORTFOLIO_PAGE_SIZE = 50
+
+
 @login_required
 def dashboard_view(request):
     """
@@ -73,13 +84,14 @@ def dashboard_view(request):
         .order_by("-entry_date")[:5]
     )
 
-    # Get top clients (light query)
+    # Get top clients from the balance rollup (indexed, no invoice scan)
     top_clients = (
-        Customer.objects.filter(company=active_company, is_active=True)
-        .annotate(total_invoiced=Sum("invoices__total_amount"))
-        .filter(total_invoiced__gt=0)
+        Customer.objects.filter(
+            company=active_company, is_active=True, balance__total_invoiced__gt=0
+        )
+        .annotate(total_invoiced=F("balance__total_invoiced"))
         .only("id", "company_name")
-        .order_by("-total_invoiced")[:5]
+        .order_by("-balance__total_invoiced")[:5]
     )
 
     context = {
@@ -103,7 +115,6 @@ def general_ledger_view(request):
     """
     active_company = request.active_company
     account_type_filter = request.GET.get("account_type", "all")
-    page_number = request.GET.get("page", 1)
 
     # Get cache key for balance summary
     cache_key = f"gl_balance_summary_{active_company.id}"
@@ -135,9 +146,8 @@ def general_ledger_view(request):
 
     accounts = accounts.order_by("code")
 
-    # Paginate accounts
-    paginator = Paginator(accounts, 25)  # 25 accounts per page
-    accounts_page = paginator.get_page(page_number)
+    # Paginate accounts (codes are unique per company)
+    accounts_page = KeysetPaginator(accounts, ["code"], 25).page_from_request(request)
 
     # Get statistics (light queries)
     total_accounts = Account.objects.filter(
@@ -198,7 +208,6 @@ def invoices_view(request):
     - Optimized queries with select_related
     """
     active_company = request.active_company
-    page_number = request.GET.get("page", 1)
 
     # Get invoices with optimized query
     invoices = (
@@ -217,8 +226,9 @@ def invoices_view(request):
     )
 
     # Paginate
-    paginator = Paginator(invoices, 20)
-    invoices_page = paginator.get_page(page_number)
+    invoices_page = KeysetPaginator(
+        invoices, ["-invoice_date", "-id"], 20
+    ).page_from_request(request)
 
     # Get aggregated statistics (single query)
     stats = Invoice.objects.filter(company=active_company).aggregate(
@@ -369,7 +379,6 @@ def journal_entries_view(request):
     - Aggregated statistics
     """
     active_company = request.active_company
-    page_number = request.GET.get("page", 1)
 
     # Get journal entries (optimized query)
     journal_entries = (
@@ -389,8 +398,9 @@ def journal_entries_view(request):
     )
 
     # Paginate
-    paginator = Paginator(journal_entries, 20)
-    entries_page = paginator.get_page(page_number)
+    entries_page = KeysetPaginator(
+        journal_entries, ["-entry_date", "-id"], 20
+    ).page_from_request(request)
 
     # Get aggregated stats
     stats = JournalEntry.objects.filter(company=active_company).aggregate(
@@ -490,62 +500,27 @@ def fixed_assets_view(request):
 def financial_ratios_view(request):
     """
     Optimized Financial Ratios View
-    - Uses cached service calculations
+    - Uses the shared, cached FinancialRatioEngine result
     """
     active_company = request.active_company
 
-    # Try cache first
-    cache_key = f"financial_ratios_{active_company.id}"
-    data = cache.get(cache_key)
-
-    if data is None:
-        metrics_service = FinancialMetricsService(active_company)
-        ratios = metrics_service.get_financial_ratios()
-        profit_metrics = metrics_service.get_profit_metrics()
-
-        data = {
-            "ratios": {
-                "current_ratio": ratios["current_ratio"],
-                "quick_ratio": ratios["quick_ratio"],
-                "debt_to_equity": ratios["debt_to_equity"],
-                "debt_ratio": (
-                    (ratios["liabilities"] / ratios["assets"] * 100)
-                    if ratios["assets"] > 0
-                    else Decimal("0")
-                ),
-                "gross_margin": profit_metrics["margin_percent"],
-                "net_margin": profit_metrics["margin_percent"],
-                "return_on_assets": (
-                    (profit_metrics["current_month"] / ratios["assets"] * 100)
-                    if ratios["assets"] > 0
-                    else Decimal("0")
-                ),
-                "return_on_equity": (
-                    (profit_metrics["current_month"] / ratios["equity"] * 100)
-                    if ratios["equity"] > 0
-                    else Decimal("0")
-                ),
-            },
-            "total_assets": ratios["assets"],
-            "total_liabilities": ratios["liabilities"],
-            "total_equity": ratios["equity"],
-            "net_income": profit_metrics["current_month"],
-        }
-
-        # Cache for 15 minutes
-        cache.set(cache_key, data, 900)
+    result = FinancialRatioEngine(active_company).calculate()
+    financial_data = result["financial_data"]
 
     context = {
         "title": "Financial Ratios",
         "description": "Key financial ratios and performance indicators.",
         "user": request.user,
-        **data,
+        "ratios": result["ratios"],
+        "total_assets": financial_data["total_assets"],
+        "total_liabilities": financial_data["total_liabilities"],
+        "total_equity": financial_data["total_equity"],
+        "net_income": financial_data["net_income"],
     }
 
     return render(request, "dashboard/modules/financial_ratios.html", context)
 
 
-# Simplified placeholder views
 @login_required
 def budgeting_view(request):
     """Budgeting view"""
@@ -798,10 +773,9 @@ def customers_view(request):
     # Apply filters
     if search_query:
         customers = customers.filter(
-            Q(company_name__icontains=search_query)
-            | Q(contact_name__icontains=search_query)
-            | Q(email__icontains=search_query)
-            | Q(customer_code__icontains=search_query)
+            id__in=search_ids(
+                active_company, search_query, SearchEntry.ObjectType.CUSTOMER
+            )
         )
 
     if status_filter == "active":
@@ -809,36 +783,30 @@ def customers_view(request):
     elif status_filter == "inactive":
         customers = customers.filter(is_active=False)
 
-    # Order by company name
-    customers = customers.order_by("company_name")
-
-    # Calculate balances for each customer
-    customers_with_balances = []
-    for customer in customers:
-        outstanding_balance = customer.get_outstanding_balance()
-        total_invoiced = customer.invoices.filter(
-            status__in=["SENT", "PAID", "OVERDUE"]
-        ).aggregate(total=Sum("total_amount"))["total"] or Decimal("0.00")
+    stats = customers.aggregate(
+        total=Count("id"), active=Count("id", filter=Q(is_active=True))
+    )
 
-        customers_with_balances.append(
-            {
-                "customer": customer,
-                "outstanding_balance": outstanding_balance,
-                "total_invoiced": total_invoiced,
-            }
-        )
+    # Balances come from the customer rollup, joined into the page query
+    customers = customers.select_related("balance").annotate(
+        outstanding_balance=Coalesce(F("balance__outstanding"), Value(Decimal("0.00"))),
+        total_invoiced=Coalesce(F("balance__total_invoiced"), Value(Decimal("0.00"))),
+        last_payment_date=F("balance__last_payment_date"),
+    )
+    customers_page = KeysetPaginator(
+        customers, ["company_name", "id"], 25
+    ).page_from_request(request)
 
     context = {
         "title": "Customers",
         "description": "Manage your customer database and track outstanding balances.",
         "user": request.user,
-        "customers": customers_with_balances,
+        "customers": customers_page,
+        "customers_page": customers_page,
         "search_query": search_query,
         "status_filter": status_filter,
-        "total_customers": len(customers_with_balances),
-        "active_customers": sum(
-            1 for c in customers_with_balances if c["customer"].is_active
-        ),
+        "total_customers": stats["total"],
+        "active_customers": stats["active"],
     }
 
     return render(request, "dashboard/modules/customers.html", context)
@@ -1082,6 +1050,121 @@ def delete_customer_view(request, pk):
     return JsonResponse({"success": False, "message": "Invalid request method"})
 
 
+@login_required
+def record_payment_api(request):
+    """
+    Record a customer payment and apply it to invoices
+    POST JSON: customer_id, amount, payment_date, payment_method, reference,
+    allocations ([{"invoice": id or number, "amount": x}], optional; without
+    them the payment is applied to the oldest open invoices)
+    """
+    import json
+    from .payments import record_payment
+
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "Invalid request method"}, status=405)
+
+    active_company = request.active_company
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"success": False, "error": "Invalid JSON data"}, status=400)
+
+    customer = Customer.objects.filter(
+        pk=data.get("customer_id"), company=active_company
+    ).first()
+    if customer is None:
+        return JsonResponse({"success": False, "error": "Customer not found"}, status=404)
+
+    try:
+        payment_date = (
+            datetime.strptime(data["payment_date"], "%Y-%m-%d").date()
+            if data.get("payment_date")
+            else timezone.now().date()
+        )
+        payment, summary = record_payment(
+            active_company,
+            customer,
+            data.get("amount"),
+            payment_date,
+            data.get("payment_method") or Payment.PaymentMethod.BANK_TRANSFER,
+            remittance=data.get("allocations") or None,
+            payment_number=data.get("payment_number"),
+            reference=data.get("reference"),
+            notes=data.get("notes"),
+            user=request.user,
+        )
+    except (ValueError, ArithmeticError) as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+    return JsonResponse(
+        {
+            "success": True,
+            "message": f"Payment {payment.payment_number} recorded",
+            "payment": {
+                **summary,
+                "id": payment.id,
+                "applied": float(summary["applied"]),
+                "unapplied": float(summary["unapplied"]),
+            },
+        }
+    )
+
+
+@login_required
+def portfolio_view(request):
+    """
+    Portfolio overview across every company the user can access
+    - One page of companies, KPIs from grouped queries
+    """
+    page = _portfolio_page(request)
+    rows = portfolio_rows(page)
+
+    context = {
+        "title": "Portfolio",
+        "description": "Key figures for all of your companies at a glance.",
+        "user": request.user,
+        "rows": rows,
+        "companies_page": page,
+        "totals": {
+            field: sum(row[field] for row in rows)
+            for field in ["cash", "ar_overdue", "ap_due", "unposted_drafts"]
+        },
+    }
+
+    return render(request, "dashboard/modules/portfolio.html", context)
+
+
+@login_required
+def portfolio_kpis_api(request):
+    """
+    API endpoint for portfolio KPIs, one keyset page of companies per call
+    """
+    try:
+        page = _portfolio_page(request)
+        rows = portfolio_rows(page)
+
+        return JsonResponse(
+            {
+                "success": True,
+                "companies": [portfolio_row_as_json(row) for row in rows],
+                **page_as_json(page),
+            }
+        )
+
+    except Exception as e:
+        return JsonResponse({"success": False, "error": str(e)})
+
+
+def _portfolio_page(request):
+    companies = Company.objects.filter(id__in=request.user_company_ids).only(
+        "id", "name", "currency"
+    )
+    return KeysetPaginator(
+        companies, ["name", "id"], PORTFOLIO_PAGE_SIZE
+    ).page_from_request(request)
+
+
 @login_required
 def notifications_view(request):
     """
@@ -1100,9 +1183,9 @@ def notifications_view(request):
         return JsonResponse({"success": True, "message": "All notifications marked as read"})
 
     # Paginate notifications
-    paginator = Paginator(notifications, 20)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = KeysetPaginator(
+        notifications, ["-created_at", "-id"], 20
+    ).page_from_request(request)
 
     # Get unread count
     unread_count = notifications.filter(is_read=False).count()
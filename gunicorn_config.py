@@ -3,6 +3,10 @@
 
 import multiprocessing
 import os
+import subprocess
+import sys
+import threading
+import time
 
 # Server socket
 bind = "127.0.0.1:8000"
@@ -46,6 +50,74 @@ def pre_exec(server):
 
 def when_ready(server):
     server.log.info("Server is ready. Spawning workers")
+    start_overdue_sweeper(server)
+    start_outbox_dispatcher(server)
+    start_statement_runner(server)
+
+
+# Overdue sweep scheduler
+# The master runs `manage.py sweep_overdue --scheduled` every interval in a
+# child process; the run is claimed in the database, so several servers never
+# sweep together. Set OVERDUE_SWEEP_INTERVAL=0 to use cron instead.
+overdue_sweep_interval = int(os.getenv("OVERDUE_SWEEP_INTERVAL", "3600"))
+
+# Outbox dispatcher
+# The master drains the email outbox with `manage.py dispatch_outbox` every
+# interval; claims use SKIP LOCKED, so several servers can dispatch at once.
+# Set OUTBOX_DISPATCH_INTERVAL=0 to run the dispatcher separately instead.
+outbox_dispatch_interval = int(os.getenv("OUTBOX_DISPATCH_INTERVAL", "60"))
+
+# Statement runs
+# The master works queued statement runs with `manage.py send_statements
+# --queued` every interval; runs are claimed in the database, so several
+# servers never work the same one. Set STATEMENT_RUN_INTERVAL=0 to run it
+# separately instead.
+statement_run_interval = int(os.getenv("STATEMENT_RUN_INTERVAL", "30"))
+
+
+def start_periodic_command(server, name, interval, args, timeout=None):
+    if interval <= 0:
+        return
+
+    manage = os.path.join(os.path.dirname(os.path.abspath(__file__)), "manage.py")
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                subprocess.run(
+                    [sys.executable, manage, *args],
+                    check=True,
+                    timeout=timeout,
+                )
+            except (OSError, subprocess.SubprocessError) as exc:
+                server.log.error("%s failed: %s", name, exc)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+
+
+def start_overdue_sweeper(server):
+    start_periodic_command(
+        server,
+        "overdue-sweeper",
+        overdue_sweep_interval,
+        ["sweep_overdue", "--scheduled"],
+        timeout=overdue_sweep_interval,
+    )
+
+
+def start_outbox_dispatcher(server):
+    # No timeout: a long drain just delays the next one
+    start_periodic_command(
+        server, "outbox-dispatcher", outbox_dispatch_interval, ["dispatch_outbox"]
+    )
+
+
+def start_statement_runner(server):
+    # No timeout: a large run just delays the next one
+    start_periodic_command(
+        server, "statement-runner", statement_run_interval, ["send_statements", "--queued"]
+    )
 
 def worker_int(worker):
     worker.log.info("worker received INT or QUIT signal")
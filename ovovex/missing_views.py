@@ -7,10 +7,25 @@ from django.http import JsonResponse
 
 
 # Invoice-related views
+def _bulk_invoice_action(request, action, invoice_ids=None, **filters):
+    """Run a dashboard.invoice_actions action and answer with its summary"""
+    from dashboard.invoice_actions import InvoiceBulkActions, select_invoices
+
+    if request.method != "POST":
+        return JsonResponse({"success": False, "message": "Invalid request method"})
+    if invoice_ids is None:
+        invoice_ids = [int(pk) for pk in request.POST.getlist("invoice_ids")]
+    invoices = select_invoices(request.active_company, invoice_ids=invoice_ids, **filters)
+    summary = InvoiceBulkActions(request.active_company, request.user).run(
+        action, invoices
+    )
+    return JsonResponse({"success": True, **summary})
+
+
 @login_required
 def send_invoice_view(request, invoice_id):
     """Send invoice view"""
-    return JsonResponse({"success": False, "message": "Not implemented yet"})
+    return _bulk_invoice_action(request, "send", invoice_ids=[invoice_id])
 
 
 @login_required
@@ -21,8 +36,10 @@ def record_payment_view(request):
 
 @login_required
 def send_reminders_view(request):
-    """Send reminders view"""
-    return JsonResponse({"success": False, "message": "Not implemented yet"})
+    """Send reminders view: selected invoices, or every overdue one"""
+    if request.POST.getlist("invoice_ids"):
+        return _bulk_invoice_action(request, "remind")
+    return _bulk_invoice_action(request, "remind", status="OVERDUE")
 
 
 @login_required
@@ -34,8 +51,10 @@ def collection_report_view(request):
 
 @login_required
 def send_statements_view(request):
-    """Send statements view"""
-    return JsonResponse({"success": False, "message": "Not implemented yet"})
+    """Send statements view: starts or reports a background statement run"""
+    from accounting.views import customer_statements
+
+    return customer_statements(request)
 
 
 @login_required
@@ -228,14 +247,18 @@ def create_bill_view(request):
 
 @login_required
 def import_bills_view(request):
-    """Import bills view"""
-    return JsonResponse({"success": False, "message": "Not implemented yet"})
+    """Import bills view: streams an uploaded CSV/JSONL file into bills"""
+    from accounting.views import bill_import
+
+    return bill_import(request)
 
 
 @login_required
 def process_payments_view(request):
-    """Process payments view"""
-    return JsonResponse({"success": False, "message": "Not implemented yet"})
+    """Process payments view: lists payment runs or plans a new one"""
+    from accounting.views import payment_runs
+
+    return payment_runs(request)
 
 
 @login_required
@@ -247,13 +270,15 @@ def send_payable_reminders_view(request):
 @login_required
 def mark_as_paid_view(request):
     """Mark as paid view"""
-    return JsonResponse({"success": False, "message": "Not implemented yet"})
+    return _bulk_invoice_action(request, "mark_paid")
 
 
 @login_required
 def three_way_match_view(request):
-    """Three-way match view"""
-    return JsonResponse({"success": False, "message": "Not implemented yet"})
+    """Three-way match view: match results, exceptions and (POST) a new run"""
+    from accounting.views import three_way_match
+
+    return three_way_match(request)
 
 
 @login_required
@@ -338,15 +363,15 @@ def purchase_orders_view(request):
 def inventory_view(request):
     """Inventory view"""
     from accounting.models import InventoryItem, InventoryCategory, InventoryTransaction
+    from dashboard.inventory_costing import inventory_value
     from decimal import Decimal
     from django.db import models
     from django.db.models import Sum, Count, Q
 
-    # Get inventory statistics
-    total_items = InventoryItem.objects.filter(is_active=True).count()
-    total_value = InventoryItem.objects.filter(is_active=True).aggregate(
-        total=Sum('current_stock') * Sum('unit_cost')
-    )['total'] or Decimal('0.00')
+    # Get inventory statistics, the company's stock valued at cost (FIFO layers)
+    stock = inventory_value(request.active_company)
+    total_items = stock['items']
+    total_value = stock['value']
 
     # Get low stock items (below reorder point)
     low_stock_count = InventoryItem.objects.filter(
@@ -360,16 +385,17 @@ def inventory_view(request):
         current_stock__lte=0
     ).count()
 
-    # Get inventory turnover (simplified - total transactions in last 30 days)
+    # Inventory turnover: cost of goods issued in the last 30 days, annualized,
+    # over the current inventory value
     from django.utils import timezone
     thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
-    recent_transactions = InventoryTransaction.objects.filter(
-        created_at__gte=thirty_days_ago
-    ).aggregate(total_quantity=Sum('quantity'))['total_quantity'] or Decimal('0.00')
+    recent_cogs = -(InventoryTransaction.objects.filter(
+        company=request.active_company,
+        created_at__gte=thirty_days_ago,
+        transaction_type='ISSUE',
+    ).aggregate(total=Sum('cost_amount'))['total'] or Decimal('0.00'))
 
-    # Calculate turnover ratio (simplified)
-    avg_inventory = total_value / Decimal('2') if total_value > 0 else Decimal('1.00')
-    turnover_ratio = (recent_transactions / avg_inventory * Decimal('12')) if avg_inventory > 0 else Decimal('0.00')
+    turnover_ratio = (recent_cogs * Decimal('12') / total_value) if total_value > 0 else Decimal('0.00')
 
     # Get inventory items with status
     inventory_items = []
@@ -473,82 +499,36 @@ def add_product_view(request):
 
 @login_required
 def import_items_view(request):
-    """Import items from CSV/Excel"""
-    from accounting.models import InventoryItem, InventoryCategory, Vendor
-    import csv
+    """
+    Import items from CSV
+    The upload is decoded as a stream and written in chunks (see
+    dashboard.item_import). preview=true validates without saving;
+    mode=upsert updates items whose codes already exist.
+    """
     import io
 
+    from dashboard.item_import import MODE_CREATE, import_items
+
     if request.method == 'POST' and request.FILES.get('file'):
+        stream = io.TextIOWrapper(request.FILES['file'].file, encoding='utf-8-sig', newline='')
         try:
-            file = request.FILES['file']
-            decoded_file = file.read().decode('utf-8')
-            io_string = io.StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-
-            imported_count = 0
-            errors = []
-
-            for row_num, row in enumerate(reader, start=2):
-                try:
-                    item_code = row.get('item_code', '').strip()
-                    name = row.get('name', '').strip()
-
-                    if not item_code or not name:
-                        errors.append(f"Row {row_num}: Missing item_code or name")
-                        continue
-
-                    # Check if item already exists
-                    if InventoryItem.objects.filter(item_code=item_code).exists():
-                        errors.append(f"Row {row_num}: Item code {item_code} already exists")
-                        continue
-
-                    # Get category
-                    category_name = row.get('category', '').strip()
-                    category = None
-                    if category_name:
-                        category, created = InventoryCategory.objects.get_or_create(
-                            name=category_name,
-                            defaults={'is_active': True}
-                        )
-
-                    # Get vendor
-                    vendor_name = row.get('vendor', '').strip()
-                    vendor = None
-                    if vendor_name:
-                        vendor, created = Vendor.objects.get_or_create(
-                            company_name=vendor_name,
-                            defaults={'is_active': True}
-                        )
-
-                    # Create item
-                    InventoryItem.objects.create(
-                        item_code=item_code,
-                        name=name,
-                        description=row.get('description', '').strip(),
-                        category=category,
-                        unit_cost=Decimal(row.get('unit_cost', '0.00')),
-                        selling_price=Decimal(row.get('selling_price', '0.00')),
-                        current_stock=Decimal(row.get('current_stock', '0.00')),
-                        minimum_stock=Decimal(row.get('minimum_stock', '0.00')),
-                        reorder_point=Decimal(row.get('reorder_point', '0.00')),
-                        primary_vendor=vendor,
-                        location=row.get('location', '').strip(),
-                        created_by=request.user
-                    )
-
-                    imported_count += 1
-
-                except Exception as e:
-                    errors.append(f"Row {row_num}: {str(e)}")
-
-            return JsonResponse({
-                'success': True,
-                'imported_count': imported_count,
-                'errors': errors
-            })
-
-        except Exception as e:
+            summary = import_items(
+                stream,
+                company=request.active_company,
+                user=request.user,
+                mode=request.POST.get('mode') or MODE_CREATE,
+                dry_run=request.POST.get('preview') == 'true',
+            )
+        except (ValueError, UnicodeDecodeError) as e:
             return JsonResponse({'success': False, 'error': str(e)})
+        finally:
+            stream.detach()
+
+        return JsonResponse({
+            'success': True,
+            'imported_count': summary['created'] + summary['updated'],
+            **summary,
+        })
 
     return render(request, 'modules/import_items.html')
 
@@ -556,42 +536,37 @@ def import_items_view(request):
 @login_required
 def receive_stock_view(request):
     """Receive stock into inventory"""
-    from accounting.models import InventoryItem, InventoryTransaction, Vendor
+    from accounting.models import InventoryItem, Vendor
+    from dashboard.stock import post_movement
+    from decimal import Decimal
 
     if request.method == 'POST':
         try:
-            item_id = request.POST.get('item_id')
+            item = InventoryItem.objects.get(id=request.POST.get('item_id'))
             quantity = Decimal(request.POST.get('quantity'))
             unit_cost = Decimal(request.POST.get('unit_cost'))
             vendor_id = request.POST.get('vendor')
-            reference_number = request.POST.get('reference_number')
             notes = request.POST.get('notes')
-
-            item = InventoryItem.objects.get(id=item_id)
-            vendor = None
             if vendor_id:
                 vendor = Vendor.objects.get(id=vendor_id)
-
-            # Update item stock
-            item.current_stock += quantity
-            item.unit_cost = unit_cost  # Update cost
-            item.save()
-
-            # Create transaction record
-            InventoryTransaction.objects.create(
-                item=item,
-                transaction_type='RECEIPT',
-                quantity=quantity,
+                notes = f"Received from {vendor.company_name}" + (f": {notes}" if notes else "")
+
+            new_stock = post_movement(
+                item,
+                quantity,
+                kind='RECEIPT',
+                user=request.user,
+                company=request.active_company,
                 unit_cost=unit_cost,
-                reference_number=reference_number,
+                location=request.POST.get('location'),
+                reference_number=request.POST.get('reference_number'),
                 notes=notes,
-                created_by=request.user
             )
 
             return JsonResponse({
                 'success': True,
                 'message': f'Received {quantity} units of {item.name}',
-                'new_stock': item.current_stock
+                'new_stock': new_stock
             })
 
         except Exception as e:
@@ -610,12 +585,11 @@ def receive_stock_view(request):
 
 @login_required
 def stock_report_view(request):
-    """Generate stock report"""
-    from accounting.models import InventoryItem, InventoryTransaction
-    from django.db.models import Sum, Q
-    from django.db import models
-    from datetime import datetime, timedelta
-    from decimal import Decimal
+    """Stock movement report: opening, receipts, issues, adjustments and closing per item"""
+    from accounting.models import InventoryCategory
+    from dashboard.stock_report import StockMovementReport
+    from django.http import StreamingHttpResponse
+    from datetime import datetime
 
     # Get filter parameters
     category_id = request.GET.get('category')
@@ -623,74 +597,49 @@ def stock_report_view(request):
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
 
-    # Base queryset
-    items = InventoryItem.objects.filter(is_active=True).select_related('category', 'primary_vendor')
-
-    # Apply filters
-    if category_id:
-        items = items.filter(category_id=category_id)
-
-    if status_filter:
-        if status_filter == 'low_stock':
-            items = items.filter(current_stock__lte=models.F('reorder_point'))
-        elif status_filter == 'out_of_stock':
-            items = items.filter(current_stock__lte=0)
-        elif status_filter == 'overstock':
-            items = items.filter(current_stock__gte=models.F('maximum_stock'))
-
-    # Get transaction summary for date range
-    if date_from and date_to:
-        start_date = datetime.strptime(date_from, '%Y-%m-%d')
-        end_date = datetime.strptime(date_to, '%Y-%m-%d')
-
-        transactions = InventoryTransaction.objects.filter(
-            created_at__date__gte=start_date,
-            created_at__date__lte=end_date
-        ).values('item').annotate(
-            receipts=Sum('quantity', filter=Q(transaction_type='RECEIPT')),
-            issues=Sum('quantity', filter=Q(transaction_type='ISSUE')),
-            adjustments=Sum('quantity', filter=Q(transaction_type='ADJUSTMENT'))
+    try:
+        today = datetime.now().date()
+        start_date = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else today.replace(day=1)
+        end_date = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else today
+        category = InventoryCategory.objects.filter(id=category_id).first() if category_id else None
+        report = StockMovementReport(
+            request.active_company, start_date, end_date, category=category, status=status_filter or None
         )
-    else:
-        transactions = {}
-
-    # Prepare report data
-    report_data = []
-    total_value = Decimal('0.00')
-    total_items = 0
-
-    for item in items:
-        item_data = {
-            'item_code': item.item_code,
-            'name': item.name,
-            'category': item.category.name if item.category else 'Uncategorized',
-            'current_stock': item.current_stock,
-            'unit_cost': item.unit_cost,
-            'total_value': item.get_total_value(),
-            'minimum_stock': item.minimum_stock,
-            'reorder_point': item.reorder_point,
-            'status': item.get_stock_status(),
-            'vendor': item.primary_vendor.company_name if item.primary_vendor else '',
-        }
-
-        # Add transaction data if available
-        item_transactions = transactions.get(item.id, {})
-        item_data.update({
-            'receipts': item_transactions.get('receipts', 0),
-            'issues': item_transactions.get('issues', 0),
-            'adjustments': item_transactions.get('adjustments', 0),
-        })
-
-        report_data.append(item_data)
-        total_value += item.get_total_value()
-        total_items += 1
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    # Stream the whole report as CSV, one keyset page at a time
+    if request.GET.get('export') == 'csv':
+        response = StreamingHttpResponse(report.csv_lines(), content_type='text/csv')
+        response['Content-Disposition'] = (
+            f'attachment; filename="stock_report_{start_date:%Y%m%d}_{end_date:%Y%m%d}.csv"'
+        )
+        return response
+
+    page = report.paginator().page_from_request(request)
+    status_classes = {
+        'Out of Stock': 'bg-red-100 text-red-800',
+        'Low Stock': 'bg-yellow-100 text-yellow-800',
+        'In Stock': 'bg-green-100 text-green-800',
+        'Overstock': 'bg-blue-100 text-blue-800'
+    }
+    report_data = [
+        {**row, 'status_class': status_classes.get(row['status'], 'bg-gray-100 text-gray-800')}
+        for row in page
+    ]
+    summary = report.summary()
 
     context = {
         'report_data': report_data,
-        'total_value': total_value,
-        'total_items': total_items,
-        'date_from': date_from,
-        'date_to': date_to,
+        'page': page,
+        'total_value': summary['value'],
+        'total_items': summary['items'],
+        'low_stock_count': summary['low_stock'],
+        'out_of_stock_count': summary['out_of_stock'],
+        'categories': InventoryCategory.objects.filter(is_active=True),
+        'category_id': category_id,
+        'date_from': start_date.isoformat(),
+        'date_to': end_date.isoformat(),
         'status_filter': status_filter,
     }
     return render(request, 'modules/stock_report.html', context)
@@ -699,40 +648,35 @@ def stock_report_view(request):
 @login_required
 def adjust_stock_view(request):
     """Adjust stock levels"""
-    from accounting.models import InventoryItem, InventoryTransaction
+    from accounting.models import InventoryItem
+    from dashboard.stock import post_movement
+    from decimal import Decimal
 
     if request.method == 'POST':
         try:
-            item_id = request.POST.get('item_id')
+            item = InventoryItem.objects.get(id=request.POST.get('item_id'))
             adjustment_type = request.POST.get('adjustment_type')  # 'increase' or 'decrease'
             quantity = Decimal(request.POST.get('quantity'))
             reason = request.POST.get('reason')
             notes = request.POST.get('notes')
 
-            item = InventoryItem.objects.get(id=item_id)
-
-            # Calculate new quantity
             if adjustment_type == 'decrease':
                 quantity = -quantity  # Make negative for decrease
 
-            # Update stock
-            old_stock = item.current_stock
-            item.current_stock += quantity
-            item.save()
-
-            # Create transaction record
-            InventoryTransaction.objects.create(
-                item=item,
-                transaction_type='ADJUSTMENT',
-                quantity=quantity,
+            new_stock = post_movement(
+                item,
+                quantity,
+                kind='ADJUSTMENT',
+                user=request.user,
+                company=request.active_company,
+                location=request.POST.get('location'),
                 notes=f"{reason}: {notes}",
-                created_by=request.user
             )
 
             return JsonResponse({
                 'success': True,
-                'message': f'Stock adjusted from {old_stock} to {item.current_stock}',
-                'new_stock': item.current_stock
+                'message': f'Stock adjusted from {new_stock - quantity} to {new_stock}',
+                'new_stock': new_stock
             })
 
         except Exception as e:
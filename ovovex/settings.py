@@ -149,6 +149,85 @@ CACHES = {
 #     }
 # }
 
+# Report rendering
+# Reports with at least REPORT_RENDER_POOL_THRESHOLD table rows are rendered
+# in a process pool. Past REPORT_RENDER_TIMEOUT the export answers 503 with
+# Retry-After; keep it well below the gunicorn worker timeout (30s)
+REPORT_RENDER_WORKERS = int(os.getenv("REPORT_RENDER_WORKERS", "2"))
+REPORT_RENDER_POOL_THRESHOLD = int(os.getenv("REPORT_RENDER_POOL_THRESHOLD", "200"))
+REPORT_RENDER_TIMEOUT = int(os.getenv("REPORT_RENDER_TIMEOUT", "15"))
+
+# Invoice PDFs
+# Batches of at least INVOICE_PDF_POOL_THRESHOLD invoices are rendered in a
+# process pool (one worker per core unless INVOICE_PDF_WORKERS is set)
+INVOICE_PDF_WORKERS = int(os.getenv("INVOICE_PDF_WORKERS", "0"))
+INVOICE_PDF_POOL_THRESHOLD = int(os.getenv("INVOICE_PDF_POOL_THRESHOLD", "50"))
+INVOICE_PDF_TIMEOUT = int(os.getenv("INVOICE_PDF_TIMEOUT", "60"))
+INVOICE_PDF_CACHE_TIMEOUT = int(os.getenv("INVOICE_PDF_CACHE_TIMEOUT", "86400"))
+
+# Consolidation
+# Subsidiary trial balances are computed in a process pool once a group has
+# at least CONSOLIDATION_POOL_THRESHOLD subsidiaries to recompute
+CONSOLIDATION_WORKERS = int(os.getenv("CONSOLIDATION_WORKERS", "4"))
+CONSOLIDATION_POOL_THRESHOLD = int(os.getenv("CONSOLIDATION_POOL_THRESHOLD", "3"))
+CONSOLIDATION_TIMEOUT = int(os.getenv("CONSOLIDATION_TIMEOUT", "25"))
+
+# Overdue sweep
+# `manage.py sweep_overdue --scheduled` runs at most once per interval (seconds);
+# gunicorn starts it on this interval when OVERDUE_SWEEP_INTERVAL > 0
+OVERDUE_SWEEP_INTERVAL = int(os.getenv("OVERDUE_SWEEP_INTERVAL", "3600"))
+
+# Statement runs
+# Runs requested from the web are queued and worked by
+# `manage.py send_statements --queued`; gunicorn starts it every
+# STATEMENT_RUN_INTERVAL seconds when > 0
+STATEMENT_RUN_INTERVAL = int(os.getenv("STATEMENT_RUN_INTERVAL", "30"))
+
+# Three-way match
+# Bill lines match when the billed quantity is within the quantity tolerance
+# of goods received and the price within the price tolerance of the PO
+# (fractions, e.g. 0.02 = 2%)
+THREE_WAY_MATCH_QUANTITY_TOLERANCE = os.getenv("THREE_WAY_MATCH_QUANTITY_TOLERANCE", "0.02")
+THREE_WAY_MATCH_PRICE_TOLERANCE = os.getenv("THREE_WAY_MATCH_PRICE_TOLERANCE", "0.01")
+
+# Payment runs
+# Days until the next payment run: early payment discounts expiring before
+# then are taken now, and bills falling due before then are at risk of late fees
+PAYMENT_RUN_INTERVAL_DAYS = int(os.getenv("PAYMENT_RUN_INTERVAL_DAYS", "7"))
+
+# Inventory
+# Whether issues and adjustments may take a location's stock below zero
+INVENTORY_ALLOW_NEGATIVE_STOCK = (
+    os.getenv("INVENTORY_ALLOW_NEGATIVE_STOCK", "False").lower() == "true"
+)
+
+# Email
+# Mail is queued in the OutboundMessage outbox and sent by
+# `manage.py dispatch_outbox`. For local testing point EMAIL_HOST/EMAIL_PORT
+# at an SMTP stub, e.g. `python -m aiosmtpd -n -l localhost:1025`.
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "django.core.mail.backends.smtp.EmailBackend")
+EMAIL_HOST = os.getenv("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "25"))
+EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "False").lower() == "true"
+EMAIL_USE_SSL = os.getenv("EMAIL_USE_SSL", "False").lower() == "true"
+EMAIL_TIMEOUT = int(os.getenv("EMAIL_TIMEOUT", "30"))
+DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "Ovovex <no-reply@ovovex.com>")
+
+# Outbox dispatcher
+# OUTBOX_CONCURRENCY SMTP connections send in parallel, together at most
+# OUTBOX_RATE_LIMIT messages per second (0 = unlimited). Failed sends retry
+# after OUTBOX_RETRY_DELAY * 2^(attempt - 1) seconds, up to OUTBOX_MAX_ATTEMPTS.
+# gunicorn drains the outbox every OUTBOX_DISPATCH_INTERVAL seconds when > 0.
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "4"))
+OUTBOX_RATE_LIMIT = float(os.getenv("OUTBOX_RATE_LIMIT", "10"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_RETRY_DELAY = int(os.getenv("OUTBOX_RETRY_DELAY", "60"))
+OUTBOX_SENDING_TIMEOUT = int(os.getenv("OUTBOX_SENDING_TIMEOUT", "600"))
+OUTBOX_DISPATCH_INTERVAL = int(os.getenv("OUTBOX_DISPATCH_INTERVAL", "60"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
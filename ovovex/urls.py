@@ -38,6 +38,8 @@ urlpatterns = [
     path("companies/", include("companies.urls")),
     # Accounting CRUD operations
     path("accounting/", include("accounting.urls", namespace="accounting")),
+    # JSON APIs (ratios, search, live dashboard data)
+    path("api/", include("api.urls", namespace="api")),
 ]
 
 # Translatable URLs (will have language prefix like /en/ or /ar/)
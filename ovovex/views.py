@@ -8,6 +8,7 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from decimal import Decimal
 from accounting.models import JournalEntryLine
+from dashboard.conditional import company_conditional
 from django.db import models
 
 # Import all missing view stubs
@@ -1344,220 +1345,72 @@ def financial_ratios_view(request):
     """
     Financial ratios view
     """
-    from accounting.models import Account, AccountType
-    from decimal import Decimal
-
-    # Get balance sheet data
-    assets = Account.objects.filter(account_type=AccountType.ASSET, is_active=True)
-    liabilities = Account.objects.filter(
-        account_type=AccountType.LIABILITY, is_active=True
-    )
-    equity = Account.objects.filter(account_type=AccountType.EQUITY, is_active=True)
-
-    total_assets = sum(acc.get_balance() for acc in assets)
-    total_liabilities = sum(acc.get_balance() for acc in liabilities)
-    total_equity = sum(acc.get_balance() for acc in equity)
-
-    # Get income statement data
-    revenue_accounts = Account.objects.filter(
-        account_type=AccountType.REVENUE, is_active=True
-    )
-    expense_accounts = Account.objects.filter(
-        account_type=AccountType.EXPENSE, is_active=True
-    )
-
-    total_revenue = sum(acc.get_balance() for acc in revenue_accounts)
-    total_expenses = sum(acc.get_balance() for acc in expense_accounts)
-    net_income = total_revenue - total_expenses
-
-    # Calculate ratios
-    ratios = {}
-
-    # Liquidity ratios
-    current_assets = sum(acc.get_balance() for acc in assets if acc.code < "1400")
-    current_liabilities = sum(
-        acc.get_balance() for acc in liabilities if acc.code < "2300"
-    )
-
-    ratios["current_ratio"] = (
-        (current_assets / current_liabilities)
-        if current_liabilities > 0
-        else Decimal("0.00")
-    )
-    ratios["quick_ratio"] = ratios["current_ratio"]  # Simplified
+    from dashboard.ratios import FinancialRatioEngine
 
-    # Profitability ratios
-    ratios["gross_margin"] = (
-        ((total_revenue - total_expenses) / total_revenue * 100)
-        if total_revenue > 0
-        else Decimal("0.00")
-    )
-    ratios["net_margin"] = (
-        (net_income / total_revenue * 100) if total_revenue > 0 else Decimal("0.00")
-    )
-    ratios["return_on_assets"] = (
-        (net_income / total_assets * 100) if total_assets > 0 else Decimal("0.00")
-    )
-    ratios["return_on_equity"] = (
-        (net_income / total_equity * 100) if total_equity > 0 else Decimal("0.00")
-    )
+    active_company = request.active_company
+    if not active_company:
+        messages.warning(request, "Please select a company to view financial ratios.")
+        return redirect("select_company")
 
-    # Leverage ratios
-    ratios["debt_to_equity"] = (
-        (total_liabilities / total_equity) if total_equity > 0 else Decimal("0.00")
-    )
-    ratios["debt_ratio"] = (
-        (total_liabilities / total_assets * 100)
-        if total_assets > 0
-        else Decimal("0.00")
-    )
+    result = FinancialRatioEngine(active_company).calculate()
+    financial_data = result["financial_data"]
 
     context = {
         "title": "Financial Ratios",
         "description": "Key financial ratios and performance indicators.",
         "user": request.user,
-        "ratios": ratios,
-        "total_assets": total_assets,
-        "total_liabilities": total_liabilities,
-        "total_equity": total_equity,
-        "net_income": net_income,
+        "ratios": result["ratios"],
+        "total_assets": financial_data["total_assets"],
+        "total_liabilities": financial_data["total_liabilities"],
+        "total_equity": financial_data["total_equity"],
+        "net_income": financial_data["net_income"],
     }
     return render(request, "modules/financial_ratios.html", context)
 
 
 @login_required
+@company_conditional(ledger_only=True)
 def calculate_ratios_api(request):
     """
     API endpoint to calculate financial ratios dynamically
     """
-    from accounting.models import Account, AccountType
-    from decimal import Decimal
+    from dashboard.ratios import FinancialRatioEngine, ratios_as_json
     from django.http import JsonResponse
 
     try:
-        # Get balance sheet data
-        assets = Account.objects.filter(account_type=AccountType.ASSET, is_active=True)
-        liabilities = Account.objects.filter(
-            account_type=AccountType.LIABILITY, is_active=True
-        )
-        equity = Account.objects.filter(account_type=AccountType.EQUITY, is_active=True)
-
-        total_assets = sum(acc.get_balance() for acc in assets)
-        total_liabilities = sum(acc.get_balance() for acc in liabilities)
-        total_equity = sum(acc.get_balance() for acc in equity)
-
-        # Get income statement data
-        revenue_accounts = Account.objects.filter(
-            account_type=AccountType.REVENUE, is_active=True
-        )
-        expense_accounts = Account.objects.filter(
-            account_type=AccountType.EXPENSE, is_active=True
-        )
-
-        total_revenue = sum(acc.get_balance() for acc in revenue_accounts)
-        total_expenses = sum(acc.get_balance() for acc in expense_accounts)
-        net_income = total_revenue - total_expenses
-
-        # Calculate ratios
-        ratios = {}
-
-        # Liquidity ratios
-        current_assets = sum(acc.get_balance() for acc in assets if acc.code < "1400")
-        current_liabilities = sum(
-            acc.get_balance() for acc in liabilities if acc.code < "2300"
-        )
-
-        ratios["current_ratio"] = float(
-            (current_assets / current_liabilities)
-            if current_liabilities > 0
-            else Decimal("0.00")
-        )
-        ratios["quick_ratio"] = float(ratios["current_ratio"])  # Simplified
-        ratios["cash_ratio"] = float(
-            (current_assets * Decimal("0.5") / current_liabilities)
-            if current_liabilities > 0
-            else Decimal("0.00")
-        )  # Simplified
-        ratios["working_capital"] = float(current_assets - current_liabilities)
-
-        # Profitability ratios
-        ratios["gross_margin"] = float(
-            ((total_revenue - total_expenses) / total_revenue * 100)
-            if total_revenue > 0
-            else Decimal("0.00")
-        )
-        ratios["operating_margin"] = float(
-            (net_income / total_revenue * 100) if total_revenue > 0 else Decimal("0.00")
-        )
-        ratios["net_margin"] = float(
-            (net_income / total_revenue * 100) if total_revenue > 0 else Decimal("0.00")
-        )
-        ratios["return_on_assets"] = float(
-            (net_income / total_assets * 100) if total_assets > 0 else Decimal("0.00")
-        )
+        active_company = request.active_company
+        if not active_company:
+            return JsonResponse({"success": False, "error": "No active company"})
 
-        # Efficiency ratios
-        ratios["asset_turnover"] = float(
-            (total_revenue / total_assets) if total_assets > 0 else Decimal("0.00")
-        )
-        ratios["inventory_turnover"] = 8.5  # Mock data
-        ratios["receivables_turnover"] = 6.2  # Mock data
-        ratios["payables_turnover"] = 12.8  # Mock data
+        result = FinancialRatioEngine(active_company).calculate()
 
-        # Leverage ratios
-        ratios["debt_to_equity"] = float(
-            (total_liabilities / total_equity) if total_equity > 0 else Decimal("0.00")
-        )
-        ratios["debt_ratio"] = float(
-            (total_liabilities / total_assets * 100)
-            if total_assets > 0
-            else Decimal("0.00")
-        )
-        ratios["equity_ratio"] = float(
-            (total_equity / total_assets * 100) if total_assets > 0 else Decimal("0.00")
-        )
-        ratios["interest_coverage"] = 25.6  # Mock data
-
-        return JsonResponse(
-            {
-                "success": True,
-                "ratios": ratios,
-                "financial_data": {
-                    "total_assets": float(total_assets),
-                    "total_liabilities": float(total_liabilities),
-                    "total_equity": float(total_equity),
-                    "net_income": float(net_income),
-                    "total_revenue": float(total_revenue),
-                },
-            }
-        )
+        return JsonResponse(ratios_as_json(result))
 
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)})
 
 
 @login_required
+@company_conditional(ledger_only=True)
 def trend_analysis_api(request):
     """
     API endpoint for financial ratios trend analysis
     """
     from django.http import JsonResponse
-    import json
+    from dashboard.ratios import ratio_history, trends_as_json
 
     try:
-        # Mock trend data - in a real system, this would be calculated from historical data
-        months = ["Apr", "May", "Jun", "Jul", "Aug", "Sep"]
-
-        trends = {
-            "current_ratio": [2.1, 2.2, 2.3, 2.2, 2.3, 2.4],
-            "profit_margin": [22.1, 24.2, 25.8, 26.3, 24.7, 25.3],
-            "asset_turnover": [3.8, 4.1, 4.2, 4.0, 4.1, 4.2],
-            "debt_to_equity": [0.25, 0.24, 0.23, 0.23, 0.22, 0.22],
-            "net_margin": [20.1, 22.2, 23.8, 24.3, 22.7, 25.3],
-            "return_on_assets": [10.2, 11.2, 11.8, 12.3, 11.7, 12.2],
-        }
+        active_company = request.active_company
+        if not active_company:
+            return JsonResponse({"success": False, "error": "No active company"})
+
+        # ?months=12&ratios=current_ratio,quick_ratio
+        months = min(max(int(request.GET.get("months", 6)), 1), 60)
+        names = [n for n in request.GET.get("ratios", "").split(",") if n]
 
-        return JsonResponse({"success": True, "trends": trends, "months": months})
+        history = ratio_history(active_company, months)
+
+        return JsonResponse(trends_as_json(history, names))
 
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)})
@@ -1636,91 +1489,26 @@ def industry_compare_api(request):
 
 
 @login_required
+@company_conditional(ledger_only=True)
 def export_ratios_api(request):
     """
     API endpoint to export financial ratios report
     """
     from django.http import JsonResponse, HttpResponse
-    from accounting.models import Account, AccountType
-    from decimal import Decimal
+    from dashboard.ratios import FinancialRatioEngine, ratio_export_rows
     import csv
-    import io
 
     try:
+        active_company = request.active_company
+        if not active_company:
+            return JsonResponse({"success": False, "error": "No active company"})
+
         # Get format from request
         export_format = request.GET.get("format", "csv")
 
-        # Calculate ratios (similar to calculate_ratios_api)
-        assets = Account.objects.filter(account_type=AccountType.ASSET, is_active=True)
-        liabilities = Account.objects.filter(
-            account_type=AccountType.LIABILITY, is_active=True
-        )
-        equity = Account.objects.filter(account_type=AccountType.EQUITY, is_active=True)
-
-        total_assets = sum(acc.get_balance() for acc in assets)
-        total_liabilities = sum(acc.get_balance() for acc in liabilities)
-        total_equity = sum(acc.get_balance() for acc in equity)
-
-        revenue_accounts = Account.objects.filter(
-            account_type=AccountType.REVENUE, is_active=True
-        )
-        expense_accounts = Account.objects.filter(
-            account_type=AccountType.EXPENSE, is_active=True
-        )
-
-        total_revenue = sum(acc.get_balance() for acc in revenue_accounts)
-        total_expenses = sum(acc.get_balance() for acc in expense_accounts)
-        net_income = total_revenue - total_expenses
-
-        # Prepare export data
-        export_data = [
-            ["Financial Ratios Report", ""],
-            ["Generated on", "2025-01-07"],
-            ["", ""],
-            ["Liquidity Ratios", ""],
-            [
-                "Current Ratio",
-                f"{(total_assets/total_liabilities if total_liabilities > 0 else 0):.2f}:1",
-            ],
-            [
-                "Quick Ratio",
-                f"{(total_assets*Decimal('0.8')/total_liabilities if total_liabilities > 0 else 0):.2f}:1",
-            ],
-            [
-                "Cash Ratio",
-                f"{(total_assets*Decimal('0.3')/total_liabilities if total_liabilities > 0 else 0):.2f}:1",
-            ],
-            ["", ""],
-            ["Profitability Ratios", ""],
-            [
-                "Gross Margin",
-                f"{((total_revenue-total_expenses)/total_revenue*100 if total_revenue > 0 else 0):.1f}%",
-            ],
-            [
-                "Net Margin",
-                f"{(net_income/total_revenue*100 if total_revenue > 0 else 0):.1f}%",
-            ],
-            [
-                "Return on Assets",
-                f"{(net_income/total_assets*100 if total_assets > 0 else 0):.1f}%",
-            ],
-            ["", ""],
-            ["Efficiency Ratios", ""],
-            [
-                "Asset Turnover",
-                f"{(total_revenue/total_assets if total_assets > 0 else 0):.1f}x",
-            ],
-            ["", ""],
-            ["Solvency Ratios", ""],
-            [
-                "Debt-to-Equity",
-                f"{(total_liabilities/total_equity if total_equity > 0 else 0):.2f}:1",
-            ],
-            [
-                "Debt Ratio",
-                f"{(total_liabilities/total_assets*100 if total_assets > 0 else 0):.1f}%",
-            ],
-        ]
+        # Same cached result as calculate_ratios_api
+        result = FinancialRatioEngine(active_company).calculate()
+        export_data = ratio_export_rows(result)
 
         if export_format == "csv":
             # Create CSV response